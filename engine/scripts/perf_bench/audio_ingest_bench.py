@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compare per-chunk mic audio ingest cost as the utterance grows."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ENGINE_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = ENGINE_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from ling_engine.utils.audio_buffer import PCMBuffer  # noqa: E402
+
+CHUNK_SAMPLES = 4096  # 前端每帧约 256ms @16kHz
+
+
+def _bench_np_append(chunks, checkpoints):
+    buf = np.array([], dtype=np.float32)
+    out = {}
+    start = time.perf_counter()
+    for i, chunk in enumerate(chunks, 1):
+        buf = np.append(buf, chunk)
+        if i in checkpoints:
+            out[i] = time.perf_counter()
+    return start, out
+
+
+def _bench_pcm_buffer(payloads, checkpoints):
+    buf = PCMBuffer()
+    out = {}
+    start = time.perf_counter()
+    for i, payload in enumerate(payloads, 1):
+        buf.extend_float32_bytes(payload)
+        if i in checkpoints:
+            out[i] = time.perf_counter()
+    buf.take()
+    return start, out
+
+
+def _per_chunk_us(start, marks):
+    """每个检查区间内单块写入的平均耗时（微秒）"""
+    rows = []
+    prev_i, prev_t = 0, start
+    for i in sorted(marks):
+        rows.append((i, (marks[i] - prev_t) / (i - prev_i) * 1e6))
+        prev_i, prev_t = i, marks[i]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=int, default=120, help="模拟的语音时长（秒）")
+    args = parser.parse_args()
+
+    n_chunks = max(1, args.seconds * 16000 // CHUNK_SAMPLES)
+    rng = np.random.default_rng(0)
+    chunks = [rng.uniform(-1, 1, CHUNK_SAMPLES).astype(np.float32) for _ in range(n_chunks)]
+    payloads = [c.tobytes() for c in chunks]
+    checkpoints = {max(1, n_chunks * k // 8) for k in range(1, 9)}
+
+    for name, fn, data in (
+        ("np_append", _bench_np_append, chunks),
+        ("pcm_buffer", _bench_pcm_buffer, payloads),
+    ):
+        start, marks = fn(data, checkpoints)
+        for idx, us in _per_chunk_us(start, marks):
+            print(json.dumps({
+                "bench": "audio_ingest",
+                "impl": name,
+                "utterance_seconds": round(idx * CHUNK_SAMPLES / 16000, 2),
+                "per_chunk_us": round(us, 2),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare per-call prompt token counting overhead on growing chat histories."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ENGINE_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = ENGINE_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from ling_engine.utils.token_counter import TokenCalculator, get_token_calculator  # noqa: E402
+
+_ZH = "今天天气不错我们一起去公园散步吧最近工作有点累但是项目终于上线了"
+_EN = "the quick brown fox jumps over the lazy dog while the model streams tokens"
+
+
+def _make_history(turns: int, chars: int) -> list:
+    rng = random.Random(0)
+    messages = [{"role": "system", "content": "你是灵，一个温柔的虚拟主播。" * 40}]
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        text = "".join(rng.choice((_ZH, _EN)) for _ in range(max(1, chars // 40)))
+        messages.append({"role": role, "content": text[:chars]})
+    return messages
+
+
+def _per_call_us(history: list, model: str, impl: str, window: int) -> float:
+    """模拟最后 window 轮: 每轮 messages 比上一轮多一条，返回单次调用平均耗时（微秒）"""
+    start_turn = max(1, len(history) - window)
+    if impl == "shared_memoized":
+        # 之前的轮次已经数过，记忆化缓存里有历史前缀
+        get_token_calculator(model).count_messages_tokens(history[:start_turn])
+    started = time.perf_counter()
+    for turn in range(start_turn, len(history) + 1):
+        messages = history[:turn]
+        if impl == "per_call_calculator":
+            TokenCalculator(model).count_messages_tokens(messages)
+        elif impl == "shared_memoized":
+            get_token_calculator(model).count_messages_tokens(messages)
+        else:  # provider_usage: 接口返回 usage，不在本地计数
+            get_token_calculator(model)
+    calls = len(history) + 1 - start_turn
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--chars", type=int, default=400, help="每条消息的字符数")
+    parser.add_argument("--window", type=int, default=20, help="每种历史长度测量的调用次数")
+    args = parser.parse_args()
+
+    for turns in (10, 50, 200, 800):
+        history = _make_history(turns, args.chars)
+        for impl in ("per_call_calculator", "shared_memoized", "provider_usage"):
+            print(json.dumps({
+                "bench": "token_count",
+                "impl": impl,
+                "model": args.model,
+                "history_messages": len(history),
+                "per_call_us": round(_per_call_us(history, args.model, impl, args.window), 2),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Compare MCP tool matching: full per-tool scoring scan vs ToolIndex candidates with bounded re-ranking."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+ENGINE_ROOT = Path(__file__).resolve().parents[2]
+SRC_ROOT = ENGINE_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from ling_engine.mcp_tool_index import bump_tools_generation  # noqa: E402
+from ling_engine.mcp_tool_orchestrator import MCPToolOrchestrator  # noqa: E402
+
+_DOMAINS = [
+    ("search", "搜索网页内容", "web search engine lookup"),
+    ("weather", "查询城市天气和气温", "weather forecast temperature"),
+    ("map", "地图导航路线规划", "map navigation route address"),
+    ("stock", "股票行情查询", "stock quote market price"),
+    ("translate", "多语言翻译文本", "translate text language"),
+    ("calendar", "日程提醒管理", "calendar event reminder"),
+    ("music", "播放音乐歌曲", "music song playlist"),
+    ("news", "获取最新新闻资讯", "news headline article"),
+    ("email", "收发电子邮件", "email inbox send"),
+    ("image", "生成和编辑图片", "image generate edit"),
+]
+_QUERIES = [
+    "帮我搜索一下 python asyncio 教程",
+    "北京明天的天气怎么样",
+    "从公司去机场的路线",
+    "查询 apple stock price",
+    "把这段话翻译成英文",
+    "播放周杰伦的歌",
+    "今天有什么科技新闻",
+]
+
+
+class _Manager:
+    def __init__(self, tools):
+        self.tools = tools
+
+    def get_available_tools(self):
+        return self.tools
+
+
+def _make_tool(rng: random.Random, i: int) -> dict:
+    domain, zh, en = rng.choice(_DOMAINS)
+    return {"function": {
+        "name": f"{domain}_provider{i}.{rng.choice(['get', 'query', 'run'])}",
+        "description": f"{zh} {en} v{i}",
+        "parameters": {
+            "type": "object",
+            "properties": {"query": {"type": "string", "description": "搜索关键词"}},
+            "required": ["query"],
+        },
+    }}
+
+
+async def _full_scan(orchestrator: MCPToolOrchestrator, requirement: str, max_tools: int) -> list:
+    """改造前的 find_best_tools: 每个工具都完整打分 + 参数提取"""
+    matches = []
+    for tool_info in orchestrator.enhanced_manager.get_available_tools():
+        match = await orchestrator._calculate_tool_match(requirement, tool_info)
+        if match and match.confidence > 0.05:
+            matches.append(match)
+    matches.sort(key=lambda x: x.confidence, reverse=True)
+    return matches[:max_tools]
+
+
+async def _run(args) -> None:
+    rng = random.Random(0)
+    for n_tools in (10, 100, 1000):
+        tools = [_make_tool(rng, i) for i in range(n_tools)]
+        orchestrator = MCPToolOrchestrator(_Manager(tools))
+
+        started = time.perf_counter()
+        await orchestrator.find_best_tools(_QUERIES[0], args.top_k)
+        build_ms = (time.perf_counter() - started) * 1e3
+
+        timings = {"full_scan": 0.0, "tool_index": 0.0, "index_retrieve": 0.0}
+        agree = 0
+        for _ in range(args.rounds):
+            for query in _QUERIES:
+                started = time.perf_counter()
+                expected = await _full_scan(orchestrator, query, args.top_k)
+                timings["full_scan"] += time.perf_counter() - started
+
+                started = time.perf_counter()
+                got = await orchestrator.find_best_tools(query, args.top_k)
+                timings["tool_index"] += time.perf_counter() - started
+
+                started = time.perf_counter()
+                orchestrator._tool_index.candidates(query)
+                timings["index_retrieve"] += time.perf_counter() - started
+
+                agree += [(m.tool_name, m.confidence) for m in got] == [(m.tool_name, m.confidence) for m in expected]
+
+        # 热更新只改动一个工具: 增量同步耗时
+        tools[0] = _make_tool(rng, n_tools)
+        bump_tools_generation()
+        started = time.perf_counter()
+        orchestrator._sync_tool_index(tools)
+        resync_ms = (time.perf_counter() - started) * 1e3
+
+        calls = args.rounds * len(_QUERIES)
+        for impl, total in timings.items():
+            print(json.dumps({
+                "bench": "tool_index",
+                "impl": impl,
+                "tools": n_tools,
+                "per_query_ms": round(total * 1e3 / calls, 4),
+                "build_ms": round(build_ms, 2) if impl != "full_scan" else 0.0,
+                "resync_one_ms": round(resync_ms, 3) if impl != "full_scan" else 0.0,
+                "topk_agree": round(agree / calls, 3),
+            }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20, help="每个规模下查询集重复次数")
+    parser.add_argument("--top-k", type=int, default=3, help="返回的工具数")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # 编排器按工具打 info/warning 日志，计时时关闭
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1440,8 +1440,8 @@ class LangchainAgentWrapper(AgentInterface):
             bool: 扣除是否成功
         """
         try:
-            from ..bff_integration.database.credit_repository import CreditRepository
-            credit_repo = CreditRepository()
+            from ..bff_integration.database.repository_registry import get_credit_repository
+            credit_repo = get_credit_repository()
 
             # 定义不同工具的积分消耗（根据工具名称关键词匹配）
             tool_credits_map = {
@@ -1465,7 +1465,8 @@ class LangchainAgentWrapper(AgentInterface):
                         break
 
             # 执行积分扣除，使用工具调用类型和自定义描述
-            consumption_result = credit_repo.consume_credits(
+            consumption_result = await asyncio.to_thread(
+                credit_repo.consume_credits,
                 user_id=user_id,
                 amount=credit_cost,
                 usage_type="tool_usage",  # 使用工具调用类型
@@ -1475,7 +1476,7 @@ class LangchainAgentWrapper(AgentInterface):
             if consumption_result["success"]:
                 logger.info(f"✅ MCP工具 '{tool_name}' 调用成功扣除用户 {user_id} 积分: {consumption_result['consumed_amount']}")
                 # 获取并显示剩余积分
-                remaining_credits = credit_repo.get_user_credits(user_id)
+                remaining_credits = await asyncio.to_thread(credit_repo.get_user_credits, user_id)
                 logger.info(f"💰 用户 {user_id} 剩余积分: {remaining_credits}")
                 logger.info(f"🔧 调用工具: {tool_name}, 消耗积分: {credit_cost}")
                 return True
@@ -7,7 +7,52 @@ import inspect
 from typing import Callable, Any, Dict
 from loguru import logger
 
-from ..utils.token_counter import token_stats, TokenCalculator, TokenUsage
+from ..utils.token_counter import token_stats, get_token_calculator, TokenUsage
+
+def _record_usage(model_name: str, messages: list, response: Any) -> None:
+    """
+    记录一次调用的token使用和成本
+
+    接口返回了usage时直接使用，不再在本地对整段消息重新分词；
+    只有没有usage（如流式响应）时才估算输入token。
+    """
+    calculator = get_token_calculator(model_name)
+    response_usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(response_usage, 'prompt_tokens', None) if response_usage else None
+
+    if prompt_tokens is not None:
+        completion_tokens = getattr(response_usage, 'completion_tokens', 0) or 0
+        total_tokens = getattr(response_usage, 'total_tokens', None) or prompt_tokens + completion_tokens
+    else:
+        # 如果没有usage字段，使用估算值
+        prompt_tokens = calculator.count_messages_tokens(messages).prompt_tokens
+        completion_tokens = len(response.choices[0].message.content.split()) if hasattr(response, 'choices') and response.choices else 0
+        completion_tokens = int(completion_tokens * 1.3)  # 近似估计
+        total_tokens = prompt_tokens + completion_tokens
+
+    usage = TokenUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens
+    )
+
+    # 估算成本
+    cost_info = calculator.estimate_cost(usage)
+
+    # 记录token使用情况
+    token_stats.add_usage(
+        model=model_name,
+        usage=usage,
+        cost=cost_info.total_cost,
+        metadata={
+            "service_type": "llm",
+            "model": model_name,
+            "messages_count": len(messages)
+        }
+    )
+
+    logger.info(f"[Token跟踪] 模型: {model_name}, 输入Token: {usage.prompt_tokens}, " +
+                f"输出Token: {usage.completion_tokens}, 总成本: ${cost_info.total_cost:.6f}")
 
 def patch_openai_client():
     """
@@ -42,103 +87,15 @@ def patch_openai_client():
         # 添加token跟踪的异步方法
         @functools.wraps(original_async_create)
         async def tracked_async_create(self, *args, **kwargs):
-            # 获取模型名称
-            model_name = kwargs.get('model', 'unknown')
-            messages = kwargs.get('messages', [])
-            
-            # 计算输入token
-            calculator = TokenCalculator(model_name)
-            input_tokens = calculator.count_messages_tokens(messages).prompt_tokens
-            
-            # 调用原始方法
             response = await original_async_create(self, *args, **kwargs)
-            
-            # 计算输出token和成本
-            if hasattr(response, 'usage') and response.usage:
-                prompt_tokens = getattr(response.usage, 'prompt_tokens', input_tokens)
-                completion_tokens = getattr(response.usage, 'completion_tokens', 0)
-                total_tokens = getattr(response.usage, 'total_tokens', prompt_tokens + completion_tokens)
-            else:
-                # 如果没有usage字段，使用估算值
-                completion_tokens = len(response.choices[0].message.content.split()) if hasattr(response, 'choices') and response.choices else 0
-                completion_tokens = int(completion_tokens * 1.3)  # 近似估计
-                total_tokens = input_tokens + completion_tokens
-                
-            usage = TokenUsage(
-                prompt_tokens=input_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens
-            )
-            
-            # 估算成本
-            cost_info = calculator.estimate_cost(usage)
-            
-            # 记录token使用情况
-            token_stats.add_usage(
-                model=model_name,
-                usage=usage,
-                cost=cost_info.total_cost,
-                metadata={
-                    "service_type": "llm",
-                    "model": model_name,
-                    "messages_count": len(messages)
-                }
-            )
-            
-            logger.info(f"[Token跟踪] 模型: {model_name}, 输入Token: {usage.prompt_tokens}, " +
-                        f"输出Token: {usage.completion_tokens}, 总成本: ${cost_info.total_cost:.6f}")
-                
+            _record_usage(kwargs.get('model', 'unknown'), kwargs.get('messages', []), response)
             return response
             
         # 添加token跟踪的同步方法
         @functools.wraps(original_sync_create)
         def tracked_sync_create(self, *args, **kwargs):
-            # 获取模型名称
-            model_name = kwargs.get('model', 'unknown')
-            messages = kwargs.get('messages', [])
-            
-            # 计算输入token
-            calculator = TokenCalculator(model_name)
-            input_tokens = calculator.count_messages_tokens(messages).prompt_tokens
-            
-            # 调用原始方法
             response = original_sync_create(self, *args, **kwargs)
-            
-            # 计算输出token和成本
-            if hasattr(response, 'usage') and response.usage:
-                prompt_tokens = getattr(response.usage, 'prompt_tokens', input_tokens)
-                completion_tokens = getattr(response.usage, 'completion_tokens', 0)
-                total_tokens = getattr(response.usage, 'total_tokens', prompt_tokens + completion_tokens)
-            else:
-                # 如果没有usage字段，使用估算值
-                completion_tokens = len(response.choices[0].message.content.split()) if hasattr(response, 'choices') and response.choices else 0
-                completion_tokens = int(completion_tokens * 1.3)  # 近似估计
-                total_tokens = input_tokens + completion_tokens
-                
-            usage = TokenUsage(
-                prompt_tokens=input_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens
-            )
-            
-            # 估算成本
-            cost_info = calculator.estimate_cost(usage)
-            
-            # 记录token使用情况
-            token_stats.add_usage(
-                model=model_name,
-                usage=usage,
-                cost=cost_info.total_cost,
-                metadata={
-                    "service_type": "llm",
-                    "model": model_name,
-                    "messages_count": len(messages)
-                }
-            )
-            
-            logger.info(f"[Token跟踪] 模型: {model_name}, 输入Token: {usage.prompt_tokens}, " +
-                        f"输出Token: {usage.completion_tokens}, 总成本: ${cost_info.total_cost:.6f}")
-                
+            _record_usage(kwargs.get('model', 'unknown'), kwargs.get('messages', []), response)
             return response
         
         # 替换原始方法
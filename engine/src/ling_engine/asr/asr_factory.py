@@ -13,6 +13,8 @@ class ASRFactory:
                 download_root=kwargs.get("download_root"),
                 language=kwargs.get("language"),
                 device=kwargs.get("device"),
+                streaming=kwargs.get("streaming", False),
+                stream_chunk_sec=kwargs.get("stream_chunk_sec", 1.0),
             )
         elif system_name == "whisper_cpp":
             from .whisper_cpp_asr import VoiceRecognition as WhisperCPPASR
@@ -3,11 +3,45 @@ import numpy as np
 import asyncio
 
 
+class ASRStream(metaclass=abc.ABCMeta):
+    """Incremental recognition session for a single utterance.
+
+    Created by ``ASRInterface.create_stream``. Methods are blocking and are
+    called from a worker thread, one at a time, in the order audio arrives.
+    """
+
+    @abc.abstractmethod
+    def accept_waveform(self, audio: np.ndarray) -> str:
+        """Feed the next chunk of float32 mono audio at the engine's SAMPLE_RATE.
+
+        Returns:
+            str: The current partial hypothesis for the whole utterance so far.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def finish(self) -> str:
+        """Mark the end of the utterance and return the final transcription."""
+        raise NotImplementedError
+
+
 class ASRInterface(metaclass=abc.ABCMeta):
     SAMPLE_RATE = 16000
     NUM_CHANNELS = 1
     SAMPLE_WIDTH = 2
 
+    @property
+    def supports_streaming(self) -> bool:
+        """Whether create_stream can be used. Engines opt in by overriding this."""
+        return False
+
+    def create_stream(self) -> ASRStream:
+        """Create an incremental recognition session for one utterance.
+
+        Only available when supports_streaming is True.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
     async def async_transcribe_np(self, audio: np.ndarray) -> str:
         """Asynchronously transcribe speech audio in numpy array format.
 
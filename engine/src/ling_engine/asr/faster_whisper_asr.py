@@ -1,6 +1,49 @@
+from typing import List
+
 import numpy as np
 from faster_whisper import WhisperModel
-from .asr_interface import ASRInterface
+from .asr_interface import ASRInterface, ASRStream
+
+
+class _ChunkedStream(ASRStream):
+    """Chunked streaming on top of an offline Whisper model.
+
+    The pending audio is re-decoded (greedy) every ``chunk_samples`` of new
+    input to produce a partial hypothesis. Every segment except the last one
+    is considered stable: its text is committed and its audio dropped, so each
+    re-decode only covers the unfinished tail. finish() decodes that short
+    tail with the normal beam search.
+    """
+
+    def __init__(self, asr: "VoiceRecognition", chunk_samples: int) -> None:
+        self._asr = asr
+        self._chunk_samples = max(1, chunk_samples)
+        self._audio = np.empty(0, dtype=np.float32)
+        self._since_decode = 0
+        self._committed: List[str] = []
+        self._pending_text = ""
+
+    def accept_waveform(self, audio: np.ndarray) -> str:
+        self._audio = np.concatenate((self._audio, audio))
+        self._since_decode += audio.size
+        if self._since_decode >= self._chunk_samples:
+            self._since_decode = 0
+            self._redecode()
+        return "".join(self._committed) + self._pending_text
+
+    def _redecode(self) -> None:
+        segments = self._asr._segments(self._audio, beam_size=1)
+        if len(segments) > 1:
+            cut = int(segments[-2].end * self._asr.SAMPLE_RATE)
+            if 0 < cut <= self._audio.size:
+                self._committed.extend(segment.text for segment in segments[:-1])
+                self._audio = self._audio[cut:]
+                segments = segments[-1:]
+        self._pending_text = "".join(segment.text for segment in segments)
+
+    def finish(self) -> str:
+        tail = self._asr.transcribe_np(self._audio) if self._audio.size else ""
+        return "".join(self._committed) + tail
 
 
 class VoiceRecognition(ASRInterface):
@@ -13,9 +56,13 @@ class VoiceRecognition(ASRInterface):
         download_root: str = None,
         language: str = "en",
         device: str = "auto",
+        streaming: bool = False,
+        stream_chunk_sec: float = 1.0,
     ) -> None:
         self.MODEL_PATH = model_path
         self.LANG = language
+        self.streaming = streaming
+        self.stream_chunk_sec = stream_chunk_sec
 
         self.model = WhisperModel(
             model_path,
@@ -24,13 +71,26 @@ class VoiceRecognition(ASRInterface):
             compute_type="float32",
         )
 
-    def transcribe_np(self, audio: np.ndarray) -> str:
+    @property
+    def supports_streaming(self) -> bool:
+        return self.streaming
+
+    def create_stream(self) -> ASRStream:
+        if not self.streaming:
+            return super().create_stream()
+        return _ChunkedStream(self, int(self.stream_chunk_sec * self.SAMPLE_RATE))
+
+    def _segments(self, audio: np.ndarray, beam_size: int) -> list:
         segments, info = self.model.transcribe(
             audio,
-            beam_size=5 if self.BEAM_SEARCH else 1,
+            beam_size=beam_size,
             language=self.LANG,
             condition_on_previous_text=False,
         )
+        return list(segments)
+
+    def transcribe_np(self, audio: np.ndarray) -> str:
+        segments = self._segments(audio, beam_size=5 if self.BEAM_SEARCH else 1)
 
         text = [segment.text for segment in segments]
 
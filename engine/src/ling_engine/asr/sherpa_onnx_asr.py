@@ -2,10 +2,38 @@ import os
 import numpy as np
 import sherpa_onnx
 from loguru import logger
-from .asr_interface import ASRInterface
+from .asr_interface import ASRInterface, ASRStream
 from .utils import download_and_extract, check_and_extract_local_file
 import onnxruntime
 
+# Silence appended before input_finished() so the streaming model's right
+# context is flushed and the last word is emitted.
+ONLINE_TAIL_PADDING_SEC = 0.66
+
+
+class _OnlineStream(ASRStream):
+    """One utterance decoded incrementally by a sherpa-onnx OnlineRecognizer."""
+
+    def __init__(self, recognizer, sample_rate: int) -> None:
+        self._recognizer = recognizer
+        self._sample_rate = sample_rate
+        self._stream = recognizer.create_stream()
+
+    def _decode(self) -> str:
+        while self._recognizer.is_ready(self._stream):
+            self._recognizer.decode_stream(self._stream)
+        return self._recognizer.get_result(self._stream).strip()
+
+    def accept_waveform(self, audio: np.ndarray) -> str:
+        self._stream.accept_waveform(self._sample_rate, audio)
+        return self._decode()
+
+    def finish(self) -> str:
+        tail = np.zeros(int(ONLINE_TAIL_PADDING_SEC * self._sample_rate), dtype=np.float32)
+        self._stream.accept_waveform(self._sample_rate, tail)
+        self._stream.input_finished()
+        return self._decode()
+
 
 class VoiceRecognition(ASRInterface):
     def __init__(
@@ -37,6 +65,7 @@ class VoiceRecognition(ASRInterface):
         feature_dim: int = 80,  # Feature dimension
         use_itn: bool = True,  # Use ITN for SenseVoice models
         provider: str = "cpu",  # Provider for inference (cpu or cuda)
+        streaming: bool = False,  # Use an online (streaming) model, only for transducer / paraformer
     ) -> None:
         self.model_type = model_type
         self.encoder = encoder
@@ -64,6 +93,7 @@ class VoiceRecognition(ASRInterface):
         self.SAMPLE_RATE = sample_rate
         self.feature_dim = feature_dim
         self.use_itn = use_itn
+        self.streaming = streaming
 
         # we need to find a way to get cuda version of sherpa-onnx before we can
         # use the gpu provider.
@@ -82,7 +112,52 @@ class VoiceRecognition(ASRInterface):
 
         self.recognizer = self._create_recognizer()
 
+    @property
+    def supports_streaming(self) -> bool:
+        return self.streaming
+
+    def create_stream(self) -> ASRStream:
+        if not self.streaming:
+            return super().create_stream()
+        return _OnlineStream(self.recognizer, self.SAMPLE_RATE)
+
+    def _create_online_recognizer(self):
+        if self.model_type == "transducer":
+            return sherpa_onnx.OnlineRecognizer.from_transducer(
+                tokens=self.tokens,
+                encoder=self.encoder,
+                decoder=self.decoder,
+                joiner=self.joiner,
+                num_threads=self.num_threads,
+                sample_rate=self.SAMPLE_RATE,
+                feature_dim=self.feature_dim,
+                decoding_method=self.decoding_method,
+                hotwords_file=self.hotwords_file,
+                hotwords_score=self.hotwords_score,
+                modeling_unit=self.modeling_unit,
+                bpe_vocab=self.bpe_vocab,
+                blank_penalty=self.blank_penalty,
+                debug=self.debug,
+                provider=self.provider,
+            )
+        elif self.model_type == "paraformer":
+            # Streaming paraformer ships separate encoder / decoder models
+            return sherpa_onnx.OnlineRecognizer.from_paraformer(
+                tokens=self.tokens,
+                encoder=self.encoder,
+                decoder=self.decoder,
+                num_threads=self.num_threads,
+                sample_rate=self.SAMPLE_RATE,
+                feature_dim=self.feature_dim,
+                decoding_method=self.decoding_method,
+                debug=self.debug,
+                provider=self.provider,
+            )
+        raise ValueError(f"Streaming is not supported for model type: {self.model_type}")
+
     def _create_recognizer(self):
+        if self.streaming:
+            return self._create_online_recognizer()
         if self.model_type == "transducer":
             recognizer = sherpa_onnx.OfflineRecognizer.from_transducer(
                 encoder=self.encoder,
@@ -199,6 +274,10 @@ class VoiceRecognition(ASRInterface):
         return recognizer
 
     def transcribe_np(self, audio: np.ndarray) -> str:
+        if self.streaming:
+            stream = self.create_stream()
+            stream.accept_waveform(audio)
+            return stream.finish()
         stream = self.recognizer.create_stream()
         stream.accept_waveform(self.SAMPLE_RATE, audio)
         self.recognizer.decode_streams([stream])
@@ -0,0 +1,81 @@
+"""流式语音识别驱动
+
+把 ASRStream (阻塞、单线程调用) 接到事件循环上: 音频块到达时立即 feed，
+后台 worker 依次在线程池里送入识别器，中间结果变化时通过回调推给前端。
+mic-audio-end 到达时 finish() 只需等待最后一小段音频识别完，
+无需再对整段语音做一次完整识别。
+
+每个客户端每段语音一个实例，由 WebSocketHandler 管理生命周期。
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from .asr_interface import ASRInterface
+
+PartialCallback = Callable[[str], Awaitable[None]]
+
+
+class StreamTranscriber:
+    """单段语音的增量识别会话"""
+
+    def __init__(self, engine: ASRInterface, on_partial: Optional[PartialCallback] = None):
+        self.engine = engine
+        # 已送入的采样数，调用方据此判断会话是否与缓冲区一致
+        self.samples = 0
+        self._stream = engine.create_stream()
+        self._on_partial = on_partial
+        self._pending: List[np.ndarray] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._partial = ""
+        self._failed = False
+
+    def feed(self, chunk: np.ndarray) -> None:
+        """送入一块 float32 音频 (不阻塞，需在事件循环线程调用)"""
+        if self._failed or chunk.size == 0:
+            return
+        self._pending.append(chunk)
+        self.samples += chunk.size
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        # 识别比音频到达慢时，积压的块合并成一次调用
+        while self._pending and not self._failed:
+            pending, self._pending = self._pending, []
+            audio = pending[0] if len(pending) == 1 else np.concatenate(pending)
+            try:
+                partial = await asyncio.to_thread(self._stream.accept_waveform, audio)
+            except Exception as e:
+                logger.warning(f"流式识别失败，本段语音回退到整段识别: {e}")
+                self._failed = True
+                return
+            if partial and partial != self._partial:
+                self._partial = partial
+                if self._on_partial is not None:
+                    try:
+                        await self._on_partial(partial)
+                    except Exception as e:
+                        logger.debug(f"推送识别中间结果失败: {e}")
+
+    async def finish(self) -> Optional[str]:
+        """等已送入的音频识别完毕并返回最终文本; 识别出错时返回 None (调用方回退到整段识别)"""
+        if self._worker is not None:
+            await self._worker
+        if self._failed:
+            return None
+        try:
+            return await asyncio.to_thread(self._stream.finish)
+        except Exception as e:
+            logger.warning(f"流式识别收尾失败，回退到整段识别: {e}")
+            return None
+
+    def close(self) -> None:
+        """丢弃会话 (断开连接、切换 ASR 引擎或缓冲区不同步时)"""
+        self._failed = True
+        self._pending = []
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
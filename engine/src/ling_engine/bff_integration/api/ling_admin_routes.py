@@ -7,6 +7,7 @@ PATCH  /api/admin/users/:id        — 修改用户
 POST   /api/admin/users/:id/credits — 手动充值积分
 DELETE /api/admin/users/:id        — 删除用户
 GET    /api/admin/stats            — 全局统计
+GET    /api/admin/runtime-stats    — 运行时性能统计
 """
 
 from decimal import Decimal
@@ -17,6 +18,7 @@ from loguru import logger
 
 from ..auth.ling_deps import require_admin, require_owner
 from ..database.ling_user_repository import LingUserRepository
+from ...utils.runtime_stats import collect_runtime_stats
 
 
 # ── 请求模型 ─────────────────────────────────────────────────────
@@ -129,4 +131,8 @@ def create_ling_admin_router(repo: LingUserRepository) -> APIRouter:
     async def get_stats(_admin: dict = Depends(require_admin)):
         return repo.get_stats()
 
+    @router.get("/runtime-stats")
+    async def get_runtime_stats(_admin: dict = Depends(require_admin)):
+        return collect_runtime_stats()
+
     return router
@@ -7,11 +7,17 @@ POST /api/auth/logout     — 登出（客户端清 token 即可）
 GET  /api/auth/me         — 获取当前用户
 POST /api/auth/refresh    — 刷新 token
 GET  /api/auth/export     — 导出用户数据 (GDPR)
+GET  /api/auth/export/stream — 流式导出用户数据 + 灵的记忆 (NDJSON, 可断点续传)
 DELETE /api/auth/account   — 删除账号 (GDPR)
 """
 
+import asyncio
+import json
 import re
+from typing import AsyncIterator, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, field_validator
 from loguru import logger
 
@@ -24,6 +30,7 @@ from ..auth.ling_auth import (
 )
 from ..auth.ling_deps import get_current_user, set_repo
 from ..database.ling_user_repository import LingUserRepository
+from ...soul.ethics.memory_transparency import EXPORT_COLLECTION_KEYS, ExportReadError, iter_user_data
 
 
 # ── 请求/响应模型 ────────────────────────────────────────────────
@@ -109,6 +116,112 @@ def _tokens_for_user(user: dict) -> tuple[str, str]:
     return access, refresh
 
 
+# ── 流式导出 (GDPR) ──────────────────────────────────────────────
+#
+# 每行一个 JSON:
+#   {"type": "meta", "user_id": ..., "collections": [...], "resumed_from": ...}
+#   {"type": "record", "collection": ..., "cursor": "<collection>:<key>", "data": {...}}
+#   {"type": "done", "counts": {collection: n}}
+#   {"type": "error", "collection": ..., "cursor": <最后输出的 cursor 或 null>, "counts": {...}}
+# 只有以 done 结尾才是完整导出; 连接中断或以 error 结尾时带上最后收到的 cursor
+# 重新请求 (?cursor=...)，从该条之后继续 (cursor 为 null 时从头开始)。
+
+EXPORT_STREAM_COLLECTIONS = ("user", "credit_transactions") + EXPORT_COLLECTION_KEYS
+
+_EXPORT_CURSOR_KEY = {
+    "user": re.compile(r""),
+    "credit_transactions": re.compile(r"[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}"),
+}
+_MONGO_ID = re.compile(r"[0-9a-f]{24}")
+
+
+def _parse_export_cursor(cursor: str) -> tuple[str, str]:
+    collection, sep, key = cursor.partition(":")
+    pattern = _EXPORT_CURSOR_KEY.get(collection)
+    if pattern is None and collection in EXPORT_COLLECTION_KEYS:
+        pattern = _MONGO_ID
+    if not sep or pattern is None or not pattern.fullmatch(key):
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    return collection, key
+
+
+def _json_default(value):
+    # datetime / date → ISO; Decimal、UUID、ObjectId 等 → str
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+
+def _record(collection: str, key: str, data: dict) -> bytes:
+    return _ndjson({"type": "record", "collection": collection, "cursor": f"{collection}:{key}", "data": data})
+
+
+async def _stream_user_export(
+    repo: LingUserRepository, user_id: str, resume: Optional[tuple[str, str]]
+) -> AsyncIterator[bytes]:
+    """按集合顺序逐条输出；PG 走服务端游标、Mongo 走游标，内存占用与数据量无关
+
+    读取中途失败时以 {"type": "error", "collection", "cursor"} 结束而不是 done，
+    cursor 为最后输出的记录，客户端带上它即可从断点续传。
+    """
+    start = EXPORT_STREAM_COLLECTIONS.index(resume[0]) if resume else 0
+    counts = {}
+    last_cursor = f"{resume[0]}:{resume[1]}" if resume else None
+    collection = EXPORT_STREAM_COLLECTIONS[start]
+    yield _ndjson({
+        "type": "meta",
+        "user_id": user_id,
+        "collections": list(EXPORT_STREAM_COLLECTIONS),
+        "resumed_from": last_cursor,
+    })
+
+    try:
+        if not resume:
+            user = await asyncio.to_thread(repo.get_user_by_id, user_id)
+            if user:
+                user.pop("password_hash", None)  # 移除敏感字段
+                counts["user"] = 1
+                yield _record("user", "", user)
+                last_cursor = "user:"
+
+        if start <= 1:
+            collection = "credit_transactions"
+            after_id = resume[1] if resume and resume[0] == "credit_transactions" else None
+            batches = repo.iter_credit_transactions(user_id, after_id=after_id)
+            try:
+                while True:
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        break
+                    counts["credit_transactions"] = counts.get("credit_transactions", 0) + len(batch)
+                    for row in batch:
+                        yield _record("credit_transactions", str(row["id"]), row)
+                        last_cursor = f"credit_transactions:{row['id']}"
+            finally:
+                try:
+                    await asyncio.to_thread(batches.close)
+                except ValueError:
+                    pass  # 被取消时工作线程可能仍在读取，生成器回收时会释放连接
+
+        mongo_resume = resume if resume and start >= 2 else None
+        async for collection, key, doc in iter_user_data(user_id, resume=mongo_resume):
+            counts[collection] = counts.get(collection, 0) + 1
+            yield _record(collection, key, doc)
+            last_cursor = f"{collection}:{key}"
+    except Exception as e:
+        if isinstance(e, ExportReadError):
+            collection = e.collection
+        logger.error(f"流式导出中断: user={user_id}, collection={collection}, cursor={last_cursor}: {e}")
+        yield _ndjson({"type": "error", "collection": collection, "cursor": last_cursor, "counts": counts})
+        return
+
+    yield _ndjson({"type": "done", "counts": counts})
+
+
 # ── 路由 ─────────────────────────────────────────────────────────
 
 from ..auth.rate_limit import limiter
@@ -116,22 +229,29 @@ from ..auth.rate_limit import limiter
 
 def create_ling_auth_router(db_manager=None) -> APIRouter:
     router = APIRouter(prefix="/api/auth", tags=["auth"])
-    repo = LingUserRepository(db_manager)
+    if db_manager is None:
+        from ..database.repository_registry import get_ling_user_repository
+        repo = get_ling_user_repository()
+    else:
+        repo = LingUserRepository(db_manager)
     set_repo(repo)  # 注入到 ling_deps
 
+    # repo 是同步 psycopg2 实现、bcrypt 是 CPU 密集计算，都放到线程里执行，不阻塞事件循环
+
     # ── 注册 ─────────────────────────────────────────────────
 
     @router.post("/register", response_model=AuthResponse)
     @limiter.limit("5/minute")
     async def register(req: RegisterRequest, request: Request):
         # 唯一性检查
-        if repo.get_user_by_email(req.email):
+        if await asyncio.to_thread(repo.get_user_by_email, req.email):
             raise HTTPException(status_code=409, detail="This email is already registered")
-        if repo.get_user_by_username(req.username):
+        if await asyncio.to_thread(repo.get_user_by_username, req.username):
             raise HTTPException(status_code=409, detail="This username is already taken")
 
-        password_hash = hash_password(req.password)
-        user = repo.create_user(
+        password_hash = await asyncio.to_thread(hash_password, req.password)
+        user = await asyncio.to_thread(
+            repo.create_user,
             email=req.email,
             username=req.username,
             password_hash=password_hash,
@@ -147,14 +267,14 @@ def create_ling_auth_router(db_manager=None) -> APIRouter:
     @router.post("/login", response_model=AuthResponse)
     @limiter.limit("10/minute")
     async def login(req: LoginRequest, request: Request):
-        user = repo.get_user_by_identifier(req.identifier)
+        user = await asyncio.to_thread(repo.get_user_by_identifier, req.identifier)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        if not verify_password(req.password, user["password_hash"]):
+        if not await asyncio.to_thread(verify_password, req.password, user["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        repo.update_last_login(str(user["id"]))
+        await asyncio.to_thread(repo.update_last_login, str(user["id"]))
 
         access, refresh = _tokens_for_user(user)
         logger.info(f"用户登录: {user['username']}")
@@ -182,7 +302,7 @@ def create_ling_auth_router(db_manager=None) -> APIRouter:
         if not payload or payload.get("type") != "refresh":
             raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-        user = repo.get_user_by_id(payload["sub"])
+        user = await asyncio.to_thread(repo.get_user_by_id, payload["sub"])
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
 
@@ -193,9 +313,25 @@ def create_ling_auth_router(db_manager=None) -> APIRouter:
 
     @router.get("/export")
     async def export_data(user: dict = Depends(get_current_user)):
-        data = repo.export_user_data(str(user["id"]))
+        data = await asyncio.to_thread(repo.export_user_data, str(user["id"]))
         return data
 
+    @router.get("/export/stream")
+    @limiter.limit("5/minute")
+    async def export_data_stream(
+        request: Request,
+        cursor: Optional[str] = None,
+        user: dict = Depends(get_current_user),
+    ):
+        resume = _parse_export_cursor(cursor) if cursor else None
+        user_id = str(user["id"])
+        logger.info(f"用户流式导出数据: {user['username']} ({user_id}), cursor={cursor}")
+        return StreamingResponse(
+            _stream_user_export(repo, user_id, resume),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="ling-export-{user_id}.ndjson"'},
+        )
+
     # ── GDPR: 删除账号 ──────────────────────────────────────
 
     @router.delete("/account")
@@ -206,10 +342,10 @@ def create_ling_auth_router(db_manager=None) -> APIRouter:
         if user.get("role") == "owner":
             raise HTTPException(status_code=403, detail="Owner account cannot be deleted")
 
-        if not verify_password(req.password, user["password_hash"]):
+        if not await asyncio.to_thread(verify_password, req.password, user["password_hash"]):
             raise HTTPException(status_code=401, detail="Incorrect password")
 
-        repo.delete_user(str(user["id"]))
+        await asyncio.to_thread(repo.delete_user, str(user["id"]))
         logger.info(f"用户删除账号: {user['username']} ({user['id']})")
         return {"message": "Account deleted"}
 
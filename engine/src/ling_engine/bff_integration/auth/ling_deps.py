@@ -4,6 +4,8 @@
 提供 FastAPI Depends() 函数用于路由级别认证和权限控制。
 """
 
+import asyncio
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
@@ -41,7 +43,8 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="不能使用 refresh token 访问此接口")
 
     repo = _get_repo()
-    user = repo.get_user_by_id(payload["sub"])
+    # 仓储层是同步 psycopg2 调用，放到线程池执行以免阻塞事件循环
+    user = await asyncio.to_thread(repo.get_user_by_id, payload["sub"])
     if not user:
         raise HTTPException(status_code=401, detail="用户不存在")
 
@@ -56,6 +56,13 @@ class CreditRepository:
                 logger.error(f"❌ CreditRepository: 异常堆栈: {traceback.format_exc()}")
                 raise
 
+    def _release(self, conn):
+        """归还连接：连接池的连接放回池中，直连的连接直接关闭"""
+        if self.db_manager and hasattr(self.db_manager, "return_connection"):
+            self.db_manager.return_connection(conn)
+        elif not self.db_manager:
+            conn.close()
+
     def get_user_credits(self, user_id: str) -> Optional[Dict[str, Any]]:
         """获取用户积分信息
 
@@ -93,8 +100,7 @@ class CreditRepository:
                         return None
 
             finally:
-                if not self.db_manager:
-                    conn.close()
+                self._release(conn)
 
         except Exception as e:
             logger.error(f"❌ CreditRepository: 获取用户积分失败: {str(e)}")
@@ -237,6 +243,37 @@ class CreditRepository:
                     conn.rollback()
                     return result
 
+                # 【记录积分变动】- 与扣除在同一事务内写入，不再额外占用连接
+                # 只记录一次总消耗，包含详细的消耗分布信息
+                details_text = ", ".join([f"{name}:{amount}" for name, amount in consumption_details.items() if amount > 0])
+
+                # 根据usage_type和usage_description生成描述
+                if usage_description:
+                    # 使用自定义描述
+                    final_description = usage_description
+                elif usage_type == "tool_usage":
+                    # 工具调用消耗
+                    final_description = f"工具调用消耗 {float(amount_decimal)}积分 ({details_text})"
+                else:
+                    # 默认对话消耗
+                    final_description = f"对话消耗 {float(amount_decimal)}积分 ({details_text})"
+
+                # 用保存点隔离：记录失败不影响积分消耗的成功，只记录警告
+                cursor.execute("SAVEPOINT credit_record")
+                try:
+                    self._insert_credit_record(
+                        cursor,
+                        user_id=user_id,
+                        change_type=usage_type,  # 使用传入的类型
+                        amount=-float(amount_decimal),  # 负数表示消耗
+                        description=final_description,
+                        credit_type="mixed"
+                    )
+                    cursor.execute("RELEASE SAVEPOINT credit_record")
+                except Exception as record_error:
+                    cursor.execute("ROLLBACK TO SAVEPOINT credit_record")
+                    logger.warning(f"⚠️ CreditRepository: 积分变动记录失败，但消耗成功: {record_error}")
+
                 # 【事务提交】- 确保所有更改生效
                 conn.commit()
 
@@ -253,34 +290,6 @@ class CreditRepository:
                 logger.info(f"   剩余积分: {float(new_total)}")
                 logger.info(f"   消耗详情: {consumption_details}")
 
-                # 【记录积分变动】- 在成功消耗后记录变动历史
-                try:
-                    # 只记录一次总消耗，包含详细的消耗分布信息
-                    details_text = ", ".join([f"{name}:{amount}" for name, amount in consumption_details.items() if amount > 0])
-
-                    # 根据usage_type和usage_description生成描述
-                    if usage_description:
-                        # 使用自定义描述
-                        final_description = usage_description
-                    elif usage_type == "tool_usage":
-                        # 工具调用消耗
-                        final_description = f"工具调用消耗 {float(amount_decimal)}积分 ({details_text})"
-                    else:
-                        # 默认对话消耗
-                        final_description = f"对话消耗 {float(amount_decimal)}积分 ({details_text})"
-
-                    self.record_credit_change(
-                        user_id=user_id,
-                        change_type=usage_type,  # 使用传入的类型
-                        amount=-float(amount_decimal),  # 负数表示消耗
-                        description=final_description,
-                        credit_type="mixed"
-                    )
-
-                except Exception as record_error:
-                    # 记录失败不影响积分消耗的成功，只记录警告
-                    logger.warning(f"⚠️ CreditRepository: 积分变动记录失败，但消耗成功: {record_error}")
-
                 return result
 
         except Exception as e:
@@ -295,9 +304,9 @@ class CreditRepository:
             logger.error(f"❌ CreditRepository: 异常堆栈: {traceback.format_exc()}")
             return result
         finally:
-            if conn and not self.db_manager:
+            if conn:
                 try:
-                    conn.close()
+                    self._release(conn)
                 except:
                     pass
 
@@ -336,6 +345,24 @@ class CreditRepository:
             logger.error(f"❌ CreditRepository: 检查积分充足性失败: {str(e)}")
             return False
 
+    @staticmethod
+    def _insert_credit_record(cursor, user_id: str, change_type: str, amount: float,
+                              description: str, credit_type: str = "unknown",
+                              transaction_id: str = None, package_id: str = None,
+                              event_id: str = None, subscription_id: str = None) -> None:
+        """在调用方的事务内插入一条 credit_records，由调用方提交"""
+        cursor.execute("""
+            INSERT INTO credit_records (
+                user_id, type, amount, description, credit_type,
+                stripe_session_id, package_id, event_id, subscription_id
+            ) VALUES (
+                %s, %s, %s, %s, %s, %s, %s, %s, %s
+            )
+        """, (
+            user_id, change_type, amount, description, credit_type,
+            transaction_id, package_id, event_id, subscription_id
+        ))
+
     def record_credit_change(self, user_id: str, change_type: str, amount: float,
                            description: str, credit_type: str = "unknown",
                            transaction_id: str = None, package_id: str = None,
@@ -362,25 +389,17 @@ class CreditRepository:
             conn = self._get_connection()
             try:
                 with conn.cursor() as cursor:
-                    cursor.execute("""
-                        INSERT INTO credit_records (
-                            user_id, type, amount, description, credit_type,
-                            stripe_session_id, package_id, event_id, subscription_id
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s
-                        )
-                    """, (
-                        user_id, change_type, amount, description, credit_type,
+                    self._insert_credit_record(
+                        cursor, user_id, change_type, amount, description, credit_type,
                         transaction_id, package_id, event_id, subscription_id
-                    ))
+                    )
 
                     conn.commit()
                     logger.info(f"✅ CreditRepository: 积分变动记录成功")
                     return True
 
             finally:
-                if not self.db_manager:
-                    conn.close()
+                self._release(conn)
 
         except Exception as e:
             logger.error(f"❌ CreditRepository: 记录积分变动失败: {str(e)}")
@@ -430,8 +449,7 @@ class CreditRepository:
                     return records
 
             finally:
-                if not self.db_manager:
-                    conn.close()
+                self._release(conn)
 
         except Exception as e:
             logger.error(f"❌ CreditRepository: 获取积分变动记录失败: {str(e)}")
@@ -492,8 +510,7 @@ class CreditRepository:
                     return True
 
             finally:
-                if not self.db_manager:
-                    conn.close()
+                self._release(conn)
 
         except Exception as e:
             logger.error(f"❌ CreditRepository: 创建用户积分记录失败: {str(e)}")
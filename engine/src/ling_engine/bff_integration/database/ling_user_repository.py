@@ -3,11 +3,15 @@
 
 操作 ling_users / ling_credit_transactions 表。
 复用现有 psycopg2 连接模式（与 user_repository.py 保持一致）。
+进程内请通过 repository_registry.get_ling_user_repository() 获取共享实例。
 """
 
 import os
+import threading
+import time
+import uuid
 from decimal import Decimal
-from typing import Optional, List
+from typing import Iterator, Optional, List
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
@@ -15,12 +19,20 @@ from loguru import logger
 
 from .init_auth_tables import init_auth_tables, ensure_owner_account
 
+# 模型路由只需要 plan / role，每轮对话都查库不划算，短 TTL 缓存即可；
+# 本实例内的 update_user / delete_user 会立即失效对应条目
+ROUTING_PROFILE_TTL_SECONDS = float(os.getenv("LING_PLAN_CACHE_TTL", "30"))
+_ROUTING_PROFILE_FIELDS = ("id", "role", "plan", "subscription_status")
+_ROUTING_PROFILE_MAX_ENTRIES = 10000
+
 
 class LingUserRepository:
     """灵用户数据访问层"""
 
     def __init__(self, db_manager=None):
         self.db_manager = db_manager
+        self._routing_profiles: dict[str, tuple[float, dict]] = {}
+        self._routing_lock = threading.Lock()
         self._init_tables()
 
     # ── 连接 ─────────────────────────────────────────────────────
@@ -40,7 +52,9 @@ class LingUserRepository:
         )
 
     def _release(self, conn):
-        if not self.db_manager:
+        if self.db_manager and hasattr(self.db_manager, "return_connection"):
+            self.db_manager.return_connection(conn)
+        elif not self.db_manager:
             conn.close()
 
     def _init_tables(self):
@@ -99,6 +113,38 @@ class LingUserRepository:
         finally:
             self._release(conn)
 
+    # ── 路由缓存 ─────────────────────────────────────────────────
+
+    def peek_routing_profile(self, user_id: str) -> Optional[dict]:
+        """只读缓存，不查库；未命中或已过期返回 None。"""
+        with self._routing_lock:
+            entry = self._routing_profiles.get(str(user_id))
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def get_routing_profile(self, user_id: str) -> Optional[dict]:
+        """获取模型路由所需的用户信息（id / role / plan / subscription_status），带短 TTL 缓存。"""
+        profile = self.peek_routing_profile(user_id)
+        if profile is not None:
+            return profile
+        user = self.get_user_by_id(user_id)
+        if not user:
+            return None
+        profile = {k: user.get(k) for k in _ROUTING_PROFILE_FIELDS}
+        now = time.monotonic()
+        with self._routing_lock:
+            if len(self._routing_profiles) >= _ROUTING_PROFILE_MAX_ENTRIES:
+                self._routing_profiles = {
+                    k: v for k, v in self._routing_profiles.items() if v[0] > now
+                }
+            self._routing_profiles[str(user_id)] = (now + ROUTING_PROFILE_TTL_SECONDS, profile)
+        return profile
+
+    def invalidate_routing_profile(self, user_id: str) -> None:
+        with self._routing_lock:
+            self._routing_profiles.pop(str(user_id), None)
+
     def get_user_by_email(self, email: str) -> Optional[dict]:
         if not email:
             return None
@@ -177,6 +223,7 @@ class LingUserRepository:
                 )
                 row = cur.fetchone()
             conn.commit()
+            self.invalidate_routing_profile(user_id)
             return dict(row) if row else None
         except Exception:
             conn.rollback()
@@ -342,6 +389,7 @@ class LingUserRepository:
                 cur.execute("DELETE FROM ling_users WHERE id = %s", (user_id,))
                 deleted = cur.rowcount > 0
             conn.commit()
+            self.invalidate_routing_profile(user_id)
             return deleted
         except Exception:
             conn.rollback()
@@ -359,6 +407,44 @@ class LingUserRepository:
         user.pop("password_hash", None)
         return {"user": user, "credit_transactions": transactions}
 
+    def iter_credit_transactions(
+        self, user_id: str, after_id: Optional[str] = None, batch_size: int = 500
+    ) -> Iterator[list[dict]]:
+        """按 id 升序分批读取用户的积分流水（服务端游标，流式导出用）。
+
+        after_id 为上次读到的最后一条 id，从其后继续。生成器关闭时释放连接。
+        """
+        conn = self._get_connection()
+        try:
+            with conn.cursor(name=f"ling_export_{uuid.uuid4().hex}",
+                             cursor_factory=RealDictCursor) as cur:
+                cur.itersize = batch_size
+                if after_id:
+                    cur.execute(
+                        """
+                        SELECT * FROM ling_credit_transactions
+                         WHERE user_id = %s AND id > %s
+                         ORDER BY id
+                        """,
+                        (user_id, after_id),
+                    )
+                else:
+                    cur.execute(
+                        "SELECT * FROM ling_credit_transactions WHERE user_id = %s ORDER BY id",
+                        (user_id,),
+                    )
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(r) for r in rows]
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
     # ── 统计 ─────────────────────────────────────────────────────
 
     def get_stats(self) -> dict:
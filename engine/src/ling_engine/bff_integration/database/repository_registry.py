@@ -0,0 +1,148 @@
+"""
+仓储注册表
+
+进程内共享一个 psycopg2 连接池和 LingUserRepository / CreditRepository 单例，
+替代每次调用都 new 一个仓储（每次建表 + 每个方法一次 psycopg2.connect）的写法。
+建表与 owner 初始化只在首次创建 LingUserRepository 时执行一次，
+服务启动时调用 init_repositories() 提前完成。
+
+连接参数沿用仓储原有的环境变量（POSTGRES_* / DB_*），池大小：
+    LING_REPO_POOL_MIN  默认 1
+    LING_REPO_POOL_MAX  默认 10
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from psycopg2.pool import ThreadedConnectionPool
+
+from ...utils.runtime_stats import LatencyStats, register_stats_provider
+
+
+class RepositoryConnectionPool:
+    """线程安全的连接池，提供仓储层约定的 get_connection / return_connection
+
+    与 ThreadedConnectionPool 直接耗尽时抛 PoolError 不同，这里在池满时阻塞等待，
+    并记录等待时间。取出的连接使用普通游标（仓储里有按下标取值的查询）。
+    """
+
+    def __init__(self, minconn: int, maxconn: int, acquire_timeout: float = 10.0, **dsn):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._wait = LatencyStats()
+
+    def get_connection(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"等待仓储数据库连接超时 ({self.acquire_timeout}s)")
+        self._wait.record((time.perf_counter() - started) * 1000)
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def return_connection(self, conn) -> None:
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                # 只读查询也会隐式开启事务，归还前结束它，避免 idle in transaction
+                conn.rollback()
+            except Exception:
+                broken = True
+        try:
+            self._pool.putconn(conn, close=broken)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pool_max": self.maxconn,
+            "in_use": self._in_use,
+            "acquire_wait": self._wait.snapshot(),
+        }
+
+
+_lock = threading.Lock()
+_pool: Optional[RepositoryConnectionPool] = None
+_ling_user_repo = None
+_credit_repo = None
+
+
+def get_repository_pool() -> RepositoryConnectionPool:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = RepositoryConnectionPool(
+                    int(os.getenv("LING_REPO_POOL_MIN", "1")),
+                    int(os.getenv("LING_REPO_POOL_MAX", "10")),
+                    host=os.getenv("POSTGRES_HOST") or os.getenv("DB_HOST", "localhost"),
+                    port=int(os.getenv("POSTGRES_PORT") or os.getenv("DB_PORT", "5432")),
+                    database=os.getenv("POSTGRES_DB") or os.getenv("DB_NAME", "qidian"),
+                    user=os.getenv("POSTGRES_USER") or os.getenv("DB_USER", "postgres"),
+                    password=os.getenv("POSTGRES_PASSWORD") or os.getenv("DB_PASSWORD", ""),
+                )
+                register_stats_provider("repository_pool", _pool.get_stats)
+                logger.info("仓储数据库连接池已创建")
+    return _pool
+
+
+def get_ling_user_repository():
+    """进程级 LingUserRepository（首次调用时建表）"""
+    global _ling_user_repo
+    if _ling_user_repo is None:
+        from .ling_user_repository import LingUserRepository
+
+        pool = get_repository_pool()
+        with _lock:
+            if _ling_user_repo is None:
+                _ling_user_repo = LingUserRepository(pool)
+    return _ling_user_repo
+
+
+def get_credit_repository():
+    """进程级 CreditRepository"""
+    global _credit_repo
+    if _credit_repo is None:
+        from .credit_repository import CreditRepository
+
+        pool = get_repository_pool()
+        with _lock:
+            if _credit_repo is None:
+                _credit_repo = CreditRepository(pool)
+    return _credit_repo
+
+
+def init_repositories() -> None:
+    """启动时创建连接池并完成建表，失败只记录日志（首次使用时会重试）"""
+    try:
+        get_ling_user_repository()
+        get_credit_repository()
+    except Exception as e:
+        logger.error(f"初始化仓储失败: {e}")
+
+
+def close_repositories() -> None:
+    global _pool, _ling_user_repo, _credit_repo
+    with _lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+        _ling_user_repo = None
+        _credit_repo = None
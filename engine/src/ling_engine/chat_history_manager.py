@@ -1,6 +1,8 @@
 import os
 import re
 import json
+import asyncio
+import base64
 import uuid
 from datetime import datetime
 from typing import Literal, List, TypedDict, Optional, Dict, Any
@@ -10,9 +12,17 @@ from loguru import logger
 from .database.pgsql.database_manager import (
     get_session_manager,
     get_message_manager,
-    get_db_manager,
     get_redis_manager,
 )
+from .database.pgsql.async_managers import (
+    get_async_session_manager,
+    get_async_message_manager,
+)
+from .database.pgsql.message_writer import (
+    get_message_writer,
+    pending_messages,
+    discard_pending_message,
+)
 
 
 class HistoryMessage(TypedDict):
@@ -161,28 +171,42 @@ def get_history(conf_uid: str, history_uid: str, user_id: str = "default_user")
     try:
         message_mgr = get_message_manager()
         rows = message_mgr.get_session_messages(history_uid)
-        messages: List[HistoryMessage] = []
-        for row in rows:
-            db_role = str(row.get("role", "user"))
-            human_role: Literal["human", "ai"] = "human" if db_role == "user" else "ai"
-            ts = row.get("created_at")
-            ts_str = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
-            messages.append(
-                {
-                    "role": human_role,
-                    "timestamp": ts_str,
-                    "content": str(row.get("content", "")),
-                    "name": None,
-                    "avatar": None,
-                    "user_id": None,
-                }
-            )
-        return messages
+        return _rows_to_history_messages(_with_pending_messages(history_uid, rows))
     except Exception as e:
         logger.error(f"Failed to get history: {e}")
         return []
 
 
+def _with_pending_messages(session_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """补上尚未落库的消息（消息缓存过期后从 PG 读取时会缺少它们）"""
+    pending = pending_messages(session_id)
+    if not pending:
+        return rows
+    known = {str(r.get("id")) for r in rows}
+    missing = [r for r in pending if str(r["id"]) not in known]
+    return rows + missing if missing else rows
+
+
+def _rows_to_history_messages(rows: List[Dict[str, Any]]) -> List[HistoryMessage]:
+    messages: List[HistoryMessage] = []
+    for row in rows:
+        db_role = str(row.get("role", "user"))
+        human_role: Literal["human", "ai"] = "human" if db_role == "user" else "ai"
+        ts = row.get("created_at")
+        ts_str = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
+        messages.append(
+            {
+                "role": human_role,
+                "timestamp": ts_str,
+                "content": str(row.get("content", "")),
+                "name": None,
+                "avatar": None,
+                "user_id": None,
+            }
+        )
+    return messages
+
+
 def delete_history(conf_uid: str, history_uid: str, user_id: str = "default_user") -> bool:
     """软删除会话，并清理相关 Redis 元数据/缓存"""
     if not conf_uid or not history_uid:
@@ -209,76 +233,87 @@ def delete_history(conf_uid: str, history_uid: str, user_id: str = "default_user
         return False
 
 
-def get_history_list(conf_uid: str, user_id: str = "default_user") -> List[dict]:
-    """列出某个角色(conf_uid)和用户(user_id)下的会话与最新消息摘要（包含置顶和自定义标题信息）"""
+def _encode_history_cursor(row: Dict[str, Any]) -> str:
+    ts = row.get("last_message_at")
+    ts_str = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
+    raw = json.dumps([bool(row.get("is_pinned")), ts_str, row.get("session_id")])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_history_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        is_pinned, ts, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (bool(is_pinned), str(ts), str(session_id))
+    except Exception:
+        logger.warning(f"Invalid history cursor ignored: {cursor!r}")
+        return None
+
+
+def get_history_page(
+    conf_uid: str,
+    user_id: str = "default_user",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """分页列出会话与最新消息摘要
+
+    一次查询取回会话及其最后一条消息（置顶优先、按最后消息时间倒序），
+    结果经 Redis 缓存。cursor 为上一页返回的 next_cursor，没有更多数据时 next_cursor 为 None。
+    """
+    empty: Dict[str, Any] = {"histories": [], "next_cursor": None}
     # 如果是default_user，不查询对话历史列表
     if user_id == "default_user":
         logger.debug(f"Skipping history list query for default_user")
-        return []
+        return empty
 
     if not conf_uid:
-        return []
+        return empty
 
     try:
-        dbm = get_db_manager()
-        conn = dbm.get_connection()
-        if not conn:
-            return []
-        cur = conn.cursor()
-        # 取该角色和用户下所有会话，包含置顶和自定义标题信息
-        cur.execute(
-            """
-            SELECT session_id, custom_title, is_pinned, updated_at
-            FROM chat_sessions
-            WHERE character_name = %s AND user_id = %s AND deleted = FALSE
-            ORDER BY is_pinned DESC, updated_at DESC
-            """,
-            (conf_uid, user_id),
+        session_mgr = get_session_manager()
+        rows = session_mgr.list_sessions_with_last_message(
+            user_id, conf_uid, limit=limit, after=_decode_history_cursor(cursor)
         )
-        sessions = cur.fetchall() or []
-        cur.close()
-        dbm.return_connection(conn)
 
-        message_mgr = get_message_manager()
-        histories: List[dict] = []
-        for row in sessions:
-            session_data = row if isinstance(row, dict) else {
-                "session_id": row[0],
-                "custom_title": row[1],
-                "is_pinned": row[2],
-                "updated_at": row[3]
-            }
-            
-            session_id = session_data["session_id"]
-            msgs = message_mgr.get_session_messages(session_id)
-            if not msgs:
-                continue
-            last = msgs[-1]
-            ts = last.get("created_at")
-            ts_str = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
-            histories.append(
-                {
-                    "uid": session_id,
-                    "custom_title": session_data.get("custom_title"),
-                    "is_pinned": session_data.get("is_pinned", False),
-                    "latest_message": {
-                        "role": ("human" if last.get("role") == "user" else "ai"),
-                        "timestamp": ts_str,
-                        "content": str(last.get("content", "")),
-                        "name": None,
-                        "avatar": None,
-                        "user_id": None,
-                    },
-                    "timestamp": ts_str,
-                }
-            )
-        
-        # 先按置顶排序，再按时间排序
-        histories.sort(key=lambda x: (not x.get("is_pinned", False), -(int(x.get("timestamp", "0").replace("-", "").replace(":", "").replace("T", "").split(".")[0]) if x.get("timestamp") else 0)))
-        return histories
+        return _rows_to_history_page(rows, limit)
     except Exception as e:
         logger.error(f"Error listing histories: {e}")
-        return []
+        return empty
+
+
+def _rows_to_history_page(rows: List[Dict[str, Any]], limit: Optional[int]) -> Dict[str, Any]:
+    histories: List[dict] = []
+    for row in rows:
+        ts = row.get("last_message_at")
+        ts_str = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
+        histories.append(
+            {
+                "uid": row["session_id"],
+                "custom_title": row.get("custom_title"),
+                "is_pinned": bool(row.get("is_pinned", False)),
+                "latest_message": {
+                    "role": ("human" if row.get("last_role") == "user" else "ai"),
+                    "timestamp": ts_str,
+                    "content": str(row.get("last_content", "")),
+                    "name": None,
+                    "avatar": None,
+                    "user_id": None,
+                },
+                "timestamp": ts_str,
+            }
+        )
+
+    next_cursor = None
+    if limit and len(rows) == limit:
+        next_cursor = _encode_history_cursor(rows[-1])
+    return {"histories": histories, "next_cursor": next_cursor}
+
+
+def get_history_list(conf_uid: str, user_id: str = "default_user") -> List[dict]:
+    """列出某个角色(conf_uid)和用户(user_id)下的会话与最新消息摘要（包含置顶和自定义标题信息）"""
+    return get_history_page(conf_uid, user_id)["histories"]
 
 
 def modify_latest_message(
@@ -305,7 +340,7 @@ def modify_latest_message(
             )
             return False
         # 软删后追加新消息
-        if last.get("id") is not None:
+        if last.get("id") is not None and not discard_pending_message(int(last["id"])):
             message_mgr.delete_message(int(last["id"]))
         message_mgr.add_message(history_uid, expected_db_role, new_content)
         return True
@@ -373,3 +408,138 @@ def rename_history_custom_title(history_uid: str, custom_title: str) -> bool:
     except Exception as e:
         logger.error(f"Failed to rename history {history_uid}: {e}")
         return False
+
+
+# ── 异步接口 ─────────────────────────────────────────────────────
+# 供 async 处理器 await 调用：asyncpg 可用时直接走异步连接池，
+# 否则把同步实现放到线程池执行，两种情况都不会阻塞事件循环。
+
+
+async def acreate_new_history(conf_uid: str, user_id: str = "default_user") -> str:
+    """create_new_history 的异步版本"""
+    session_mgr = await get_async_session_manager()
+    if session_mgr is None:
+        return await asyncio.to_thread(create_new_history, conf_uid, user_id)
+
+    if user_id == "default_user":
+        logger.debug("Skipping history creation for default_user")
+        return ""
+    if not conf_uid:
+        logger.warning("No conf_uid provided")
+        return ""
+
+    history_uid = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid.uuid4().hex}"
+    created = await session_mgr.create_session(
+        session_id=history_uid,
+        user_id=user_id or "default_user",
+        character_name=conf_uid,
+        session_name=history_uid,
+    )
+    if not created:
+        logger.error("Failed to create session in database")
+        return ""
+    logger.debug(f"Created new history session: {history_uid}")
+    return history_uid
+
+
+async def astore_message(
+    conf_uid: str,
+    history_uid: str,
+    role: Literal["human", "ai"],
+    content: str,
+    name: str | None = None,
+    avatar: str | None = None,
+    user_id: str = "default_user",
+):
+    """store_message 的异步版本
+
+    启用写后台批量落库时只登记到 Redis/内存即返回，由后台任务批量写入 PG。
+    """
+    writer = await get_message_writer()
+    if writer is not None and user_id != "default_user" and conf_uid and history_uid:
+        try:
+            db_role = "user" if role == "human" else "assistant"
+            await writer.enqueue(history_uid, user_id, conf_uid, db_role, content)
+            logger.debug(f"Queued {role} message for session {history_uid} (user {user_id})")
+        except Exception as e:
+            logger.error(f"Failed to store message: {e}")
+        return
+
+    message_mgr = await get_async_message_manager()
+    if message_mgr is None:
+        return await asyncio.to_thread(
+            store_message, conf_uid, history_uid, role, content, name, avatar, user_id
+        )
+
+    if user_id == "default_user":
+        logger.debug(f"Skipping message storage for default_user: {role} message")
+        return
+    if not conf_uid or not history_uid:
+        if not conf_uid:
+            logger.warning("Missing conf_uid")
+        if not history_uid:
+            logger.warning("Missing history_uid")
+        return
+
+    try:
+        session_mgr = message_mgr.sessions
+        if not await session_mgr.get_session(history_uid):
+            created = await session_mgr.create_session(
+                session_id=history_uid,
+                user_id=user_id,
+                character_name=conf_uid,
+                session_name=history_uid,
+            )
+            if not created:
+                logger.error("Failed to ensure session before storing message")
+                return
+
+        db_role = "user" if role == "human" else "assistant"
+        await message_mgr.add_message(session_id=history_uid, role=db_role, content=content)
+        logger.debug(f"Stored {role} message in session {history_uid} for user {user_id}")
+    except Exception as e:
+        logger.error(f"Failed to store message: {e}")
+
+
+async def aget_history(conf_uid: str, history_uid: str, user_id: str = "default_user") -> List[HistoryMessage]:
+    """get_history 的异步版本"""
+    message_mgr = await get_async_message_manager()
+    if message_mgr is None:
+        return await asyncio.to_thread(get_history, conf_uid, history_uid, user_id)
+
+    if user_id == "default_user":
+        logger.debug(f"Skipping history query for default_user: {history_uid}")
+        return []
+    if not conf_uid or not history_uid:
+        return []
+
+    try:
+        rows = await message_mgr.get_session_messages(history_uid)
+        return _rows_to_history_messages(_with_pending_messages(history_uid, rows))
+    except Exception as e:
+        logger.error(f"Failed to get history: {e}")
+        return []
+
+
+async def aget_history_page(
+    conf_uid: str,
+    user_id: str = "default_user",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """get_history_page 的异步版本"""
+    session_mgr = await get_async_session_manager()
+    if session_mgr is None:
+        return await asyncio.to_thread(get_history_page, conf_uid, user_id, limit, cursor)
+
+    if user_id == "default_user" or not conf_uid:
+        return {"histories": [], "next_cursor": None}
+
+    try:
+        rows = await session_mgr.list_sessions_with_last_message(
+            user_id, conf_uid, limit=limit, after=_decode_history_cursor(cursor)
+        )
+        return _rows_to_history_page(rows, limit)
+    except Exception as e:
+        logger.error(f"Error listing histories: {e}")
+        return {"histories": [], "next_cursor": None}
@@ -27,6 +27,8 @@ class FasterWhisperConfig(I18nMixin):
     download_root: str = Field(..., alias="download_root")
     language: Optional[str] = Field(None, alias="language")
     device: Literal["auto", "cpu", "cuda"] = Field("auto", alias="device")
+    streaming: bool = Field(False, alias="streaming")
+    stream_chunk_sec: float = Field(1.0, alias="stream_chunk_sec")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "model_path": Description(
@@ -43,6 +45,14 @@ class FasterWhisperConfig(I18nMixin):
             en="Device to use for inference (cpu, cuda, or auto)",
             zh="推理设备（cpu、cuda 或 auto）",
         ),
+        "streaming": Description(
+            en="Decode audio in chunks while the user speaks and push partial transcripts",
+            zh="边说边分块识别，并推送识别中间结果",
+        ),
+        "stream_chunk_sec": Description(
+            en="Seconds of new audio between partial decodes in streaming mode",
+            zh="流式模式下每累积多少秒新音频做一次中间识别",
+        ),
     }
 
 
@@ -185,6 +195,7 @@ class SherpaOnnxASRConfig(I18nMixin):
     num_threads: int = Field(4, alias="num_threads")
     use_itn: bool = Field(True, alias="use_itn")
     provider: Literal["cpu", "cuda"] = Field("cpu", alias="provider")
+    streaming: bool = Field(False, alias="streaming")
 
     DESCRIPTIONS: ClassVar[Dict[str, Description]] = {
         "model_type": Description(
@@ -226,12 +237,30 @@ class SherpaOnnxASRConfig(I18nMixin):
             en="Provider for inference (cpu or cuda) (cuda option needs additional settings. Please check our docs)",
             zh="推理平台（cpu 或 cuda）(cuda 需要额外配置，请参考文档)",
         ),
+        "streaming": Description(
+            en="Use a streaming (online) model and push partial transcripts while the user speaks (transducer, or paraformer with encoder/decoder)",
+            zh="使用流式（online）模型，边说边推送识别中间结果（transducer，或提供 encoder/decoder 的 paraformer）",
+        ),
     }
 
     @model_validator(mode="after")
     def check_model_paths(self) -> "SherpaOnnxASRConfig":
         model_type = self.model_type
 
+        if self.streaming:
+            if model_type not in ("transducer", "paraformer"):
+                raise ValueError(
+                    "streaming is only supported for transducer and paraformer model types"
+                )
+            if model_type == "paraformer" and not all(
+                [self.encoder, self.decoder, self.tokens]
+            ):
+                raise ValueError(
+                    "encoder, decoder, and tokens must be provided for streaming paraformer model type"
+                )
+            if model_type == "paraformer":
+                return self
+
         if model_type == "transducer":
             if not all([self.encoder, self.decoder, self.joiner, self.tokens]):
                 raise ValueError(
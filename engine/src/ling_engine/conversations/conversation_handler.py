@@ -8,16 +8,17 @@ from fastapi import WebSocket
 from loguru import logger
 
 from ..chat_group import ChatGroupManager
-from ..chat_history_manager import store_message
+from ..chat_history_manager import astore_message
 from ..service_context import ServiceContext
 from .group_conversation import process_group_conversation
-from .single_conversation import process_agent_response
+from .single_conversation import process_agent_response, start_memory_recall
 from .conversation_utils import EMOJI_LIST, create_batch_input, send_conversation_start_signals, process_user_input, finalize_conversation_turn, cleanup_conversation
 from .global_tts_manager import global_tts_manager
 from .types import GroupConversationState
 from ..agent.agents.basic_memory_agent import BasicMemoryAgent
 from ..agent.langchain_agent_wrapper import LangchainAgentWrapper
 from ..utils.conversation_timer import conversation_timer
+from ..utils.audio_buffer import PCMBuffer
 import base64
 from pathlib import Path
 from pydub import AudioSegment
@@ -137,7 +138,7 @@ async def handle_conversation_trigger(
     client_contexts: Dict[str, ServiceContext],
     client_connections: Dict[str, WebSocket],
     chat_group_manager: ChatGroupManager,
-    received_data_buffers: Dict[str, np.ndarray],
+    received_data_buffers: Dict[str, PCMBuffer],
     current_conversation_tasks: Dict[str, Optional[asyncio.Task]],
     broadcast_to_group: Callable,
     websocket_handler=None,  # Add websocket_handler parameter
@@ -255,12 +256,16 @@ async def handle_conversation_trigger(
     elif msg_type == "text-input":
         user_input = data.get("text", "")
     elif msg_type == "mic-audio-end":
-        # 检查数组是否为空
-        if len(received_data_buffers[client_uid]) > 0:
-            user_input = received_data_buffers[client_uid]
-        else:
-            user_input = np.array([])  # 或者使用其他默认值
-        received_data_buffers[client_uid] = np.array([])
+        # 取出整段语音的视图交给 ASR，缓冲区同时清空以接收下一段语音
+        user_input = received_data_buffers[client_uid].take()
+        # 流式识别已边说边解码，这里只需等最后一小段音频；不可用时仍交给 ASR 整段识别
+        if websocket_handler is not None and len(user_input):
+            streamed_text = await websocket_handler.finish_asr_stream(client_uid, len(user_input))
+            if streamed_text is not None:
+                await websocket.send_text(
+                    json.dumps({"type": "user-input-transcription", "text": streamed_text})
+                )
+                user_input = streamed_text
 
     images = data.get("images")
     
@@ -415,6 +420,7 @@ async def handle_conversation_trigger(
                 # 设置对话开始时间用于计算总响应时间
                 tts_manager._conversation_start_time = conversation_start_time
 
+                memory_recall = None
                 try:
                     # Send initial signals
                     await send_conversation_start_signals(websocket.send_text)
@@ -427,6 +433,9 @@ async def handle_conversation_trigger(
                     )
                     logger.info(f"User input from {user_id}: {input_text[:100]}...")
 
+                    # 用户文本已确定，先启动记忆召回，与下面的消息存储、情感提示、模型路由并发
+                    memory_recall = start_memory_recall(context, user_input, user_id, client_uid)
+
                     # Create batch input
                     logger.debug("Creating batch input...")
                     batch_input = create_batch_input(
@@ -438,7 +447,7 @@ async def handle_conversation_trigger(
                     # Store user message（需要 history_uid）
                     if context.history_uid:
                         logger.debug(f"Storing user message for {user_id}...")
-                        store_message(
+                        await astore_message(
                             conf_uid=context.character_config.conf_uid,
                             history_uid=context.history_uid,
                             role="human",
@@ -466,6 +475,7 @@ async def handle_conversation_trigger(
                         user_id=user_id,
                         user_input=user_input,
                         enable_memory=True,
+                        memory_recall=memory_recall,
                     )
                     logger.info(f"✅ Agent响应处理完成，响应长度: {len(full_response)}")
 
@@ -480,7 +490,7 @@ async def handle_conversation_trigger(
 
                     if context.history_uid and (isinstance(full_response, str) and full_response):
                         logger.debug(f"Storing AI response for {user_id}...")
-                        store_message(
+                        await astore_message(
                             conf_uid=context.character_config.conf_uid,
                             history_uid=context.history_uid,
                             role="ai",
@@ -502,6 +512,9 @@ async def handle_conversation_trigger(
                     )
                     raise
                 finally:
+                    # 消息存储等步骤抛错（或本轮被取消）时召回还没被 await，不能让它在后台继续跑
+                    if memory_recall is not None and not memory_recall.done():
+                        memory_recall.cancel()
                     cleanup_conversation(tts_manager, session_emoji)
             finally:
                 # 结束对话计时
@@ -536,7 +549,7 @@ async def handle_individual_interrupt(
             logger.error(f"Error handling interrupt: {e}")
 
         if context.history_uid:
-            store_message(
+            await astore_message(
                 conf_uid=context.character_config.conf_uid,
                 history_uid=context.history_uid,
                 role="ai",
@@ -544,7 +557,7 @@ async def handle_individual_interrupt(
                 name=context.character_config.character_name,
                 avatar=context.character_config.avatar,
             )
-            store_message(
+            await astore_message(
                 conf_uid=context.character_config.conf_uid,
                 history_uid=context.history_uid,
                 role="system",
@@ -596,7 +609,7 @@ async def handle_group_interrupt(
                 try:
                     member_ctx = client_contexts[member_uid]
                     member_ctx.agent_engine.handle_interrupt(heard_response)
-                    store_message(
+                    await astore_message(
                         conf_uid=member_ctx.character_config.conf_uid,
                         history_uid=member_ctx.history_uid,
                         role="ai",
@@ -604,7 +617,7 @@ async def handle_group_interrupt(
                         name=context.character_config.character_name,
                         avatar=context.character_config.avatar,
                     )
-                    store_message(
+                    await astore_message(
                         conf_uid=member_ctx.character_config.conf_uid,
                         history_uid=member_ctx.history_uid,
                         role="system",
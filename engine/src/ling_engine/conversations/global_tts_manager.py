@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import json
 import re
 import uuid
@@ -12,8 +13,9 @@ from pathlib import Path
 
 from ..agent.output_types import DisplayText, Actions
 from ..live2d_model import Live2dModel
-from ..tts.tts_interface import TTSInterface
-from ..utils.stream_audio import prepare_audio_payload
+from ..tts.tts_interface import TTSInterface, SynthesizedAudio
+from ..tts.tts_cache import get_tts_cache
+from ..utils.stream_audio import prepare_audio_payload, prepare_audio_payload_from_bytes
 from .types import WebSocketSend
 
 # Import WebSocket exception handling
@@ -401,7 +403,6 @@ class GlobalTTSManager:
 
     async def _process_tts_task(self, task: TTSTask):
         """处理TTS任务"""
-        audio_file_path = None
         try:
             
             # 估算TTS成本
@@ -420,23 +421,19 @@ class GlobalTTSManager:
                 except Exception as e:
                     logger.warning(f"估算TTS成本失败: {e}")
             
-            # 生成音频
-            audio_file_path = await self._generate_audio(task.tts_engine, task.tts_text)
-
-            # 验证音频文件完整性
-            if audio_file_path and not await self._verify_audio_file(audio_file_path):
-                logger.error(f"❌ 生成的音频文件损坏或无效: {audio_file_path}")
-                raise ValueError(f"Generated audio file is corrupted: {audio_file_path}")
-
-            # 准备音频payload
-            payload = prepare_audio_payload(
-                audio_path=audio_file_path,
-                display_text=task.display_text,
-                actions=task.actions,
-                tts_engine_class=task.tts_engine.__class__.__name__ if task.tts_engine else None,
+            # 生成音频（内存中，不落盘），一次解码完成校验、音量包络与 WAV 编码；
+            # 解码失败即视为音频损坏，不会写入 TTS 结果缓存
+            payload = await self._generate_payload(
+                task.tts_engine,
+                task.tts_text,
+                functools.partial(
+                    prepare_audio_payload_from_bytes,
+                    display_text=task.display_text,
+                    actions=task.actions,
+                ),
             )
 
-            # 添加任务信息到payload（不包含音频文件路径，因为我们使用简单删除机制）
+            # 添加任务信息到payload
             payload["task_id"] = task.task_id
             payload["priority"] = task.priority.name
 
@@ -461,88 +458,22 @@ class GlobalTTSManager:
             payload["error"] = str(e)
             # 【修复序列化问题】发送到该客户端的独立队列
             await self._put_payload_for_client(task.client_uid, payload, task.sequence_number)
-        finally:
-            # 恢复简单的TTS音频文件删除机制：任务完成后立即删除音频文件
-            if audio_file_path:
-                try:
-                    import os
-                    if os.path.exists(audio_file_path):
-                        # 在删除前检查文件状态，用于诊断
-                        try:
-                            file_size = os.path.getsize(audio_file_path)
-                            if file_size == 0:
-                                logger.warning(f"⚠️ TTS音频文件为空: {audio_file_path}")
-                            elif file_size < 1024:  # 小于1KB可能是损坏的文件
-                                logger.warning(f"⚠️ TTS音频文件异常小 ({file_size} 字节): {audio_file_path}")
-                            else:
-                                logger.debug(f"🔍 TTS音频文件大小: {file_size} 字节")
-                        except Exception as size_error:
-                            logger.warning(f"⚠️ 无法获取文件大小: {audio_file_path}, 错误: {size_error}")
-
-                        os.remove(audio_file_path)
-                    else:
-                        logger.warning(f"⚠️ TTS音频文件不存在，无法删除: {audio_file_path}")
-                except Exception as e:
-                    logger.warning(f"⚠️ 删除TTS音频文件失败: {audio_file_path}, 错误: {e}")
-
-            # 【多用户并发支持】任务完成后的清理逻辑已经移到_process_tts_task_with_semaphore中处理
-            # 这里保留旧的清理逻辑以确保兼容性，但优先使用新的多用户逻辑
-            async with self._lock:
-                # 清理任务信息（但不清理current_playing_task，由新的多用户逻辑处理）
-                pass  # 任务信息将在payload发送完成后在_process_payload_queue中清理
     
-    async def _generate_audio(self, tts_engine: TTSInterface, text: str) -> str:
-        """生成音频文件"""
-        return await tts_engine.async_generate_audio(
-            text=text,
-            file_name_no_ext=f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}",
+    async def _generate_payload(
+        self,
+        tts_engine: TTSInterface,
+        text: str,
+        prepare: Callable[[Optional[SynthesizedAudio]], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """在内存中合成并解码音频，重复的句子直接命中 TTS 结果缓存"""
+        cache = get_tts_cache()
+        if cache is None:
+            audio = await tts_engine.async_synthesize(text)
+            return await asyncio.to_thread(prepare, audio)
+        return await cache.get_or_synthesize(
+            tts_engine, text, lambda: tts_engine.async_synthesize(text), prepare
         )
 
-    async def _verify_audio_file(self, audio_file_path: str) -> bool:
-        """验证音频文件完整性"""
-        try:
-            import os
-
-            if not audio_file_path or not os.path.exists(audio_file_path):
-                logger.warning(f"⚠️ 音频文件不存在: {audio_file_path}")
-                return False
-
-            # 检查文件大小
-            file_size = os.path.getsize(audio_file_path)
-            if file_size == 0:
-                logger.warning(f"⚠️ 音频文件为空: {audio_file_path}")
-                return False
-
-            if file_size < 100:  # 小于100字节几乎肯定是损坏的
-                logger.warning(f"⚠️ 音频文件过小 ({file_size} 字节): {audio_file_path}")
-                return False
-
-            # 尝试使用pydub快速验证文件格式
-            try:
-                from pydub import AudioSegment
-                # 只读取前一秒来验证格式，避免完全加载大文件
-                audio = AudioSegment.from_file(audio_file_path)
-
-                # 检查音频基本属性
-                if len(audio) == 0:
-                    logger.warning(f"⚠️ 音频文件持续时间为0: {audio_file_path}")
-                    return False
-
-                if audio.frame_rate == 0:
-                    logger.warning(f"⚠️ 音频文件采样率为0: {audio_file_path}")
-                    return False
-
-                logger.debug(f"✅ 音频文件验证通过: {audio_file_path} (大小: {file_size}字节, 时长: {len(audio)}ms)")
-                return True
-
-            except Exception as audio_error:
-                logger.error(f"❌ 音频文件格式验证失败: {audio_file_path}, 错误: {audio_error}")
-                return False
-
-        except Exception as e:
-            logger.error(f"❌ 验证音频文件时出错: {audio_file_path}, 错误: {e}")
-            return False
-    
     async def _ensure_sender_task_running(self):
         """【已废弃】确保发送任务正在运行 - 保留以确保兼容性"""
         # 新的多用户机制中，每个客户端有独立的发送任务
@@ -21,7 +21,7 @@ from .types import (
     WebSocketSend,
 )
 from ..service_context import ServiceContext
-from ..chat_history_manager import store_message
+from ..chat_history_manager import astore_message
 from .tts_manager import TTSTaskManager
 from .global_tts_manager import global_tts_manager
 
@@ -91,7 +91,7 @@ async def process_group_conversation(
             member_context = client_contexts[member_uid]
             # 使用发起者的user_id为发起者，其他成员使用默认值
             member_user_id = initiator_user_id if member_uid == initiator_client_uid else "default_user"
-            store_message(
+            await astore_message(
                 conf_uid=member_context.character_config.conf_uid,
                 history_uid=member_context.history_uid,
                 role="human",
@@ -316,7 +316,7 @@ async def handle_group_member_turn(
             member_context = client_contexts[member_uid]
             # 使用默认用户ID（修复未定义变量问题）
             member_user_id = "default_user"
-            store_message(
+            await astore_message(
                 conf_uid=member_context.character_config.conf_uid,
                 history_uid=member_context.history_uid,
                 role="ai",
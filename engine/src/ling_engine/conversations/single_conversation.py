@@ -1,11 +1,12 @@
 from typing import Union, List, Dict, Any, Optional
 import asyncio
 import json
+import time
 from loguru import logger
 import numpy as np
 from datetime import datetime
 from ..important import save_memory_async
-from ..important import search_similar_memories
+from ..important import search_similar_memories_async
 from .conversation_utils import (
     create_batch_input,
     process_agent_output,
@@ -23,10 +24,138 @@ from .global_tts_manager import global_tts_manager, TTSPriority
 from ..chat_history_manager import store_message
 from ..service_context import ServiceContext
 from ..soul.utils.async_tasks import create_logged_task
+from ..utils.runtime_stats import LatencyStats, register_stats_provider
 import traceback
 
 
 
+# 对话前置阶段耗时（毫秒）：memory_recall 是召回本身的耗时，memory_recall_wait 是
+# 召回与其它前置步骤并发后仍需额外等待的时间，两者之差即并发节省的首字延迟
+_prelude_stats: Dict[str, LatencyStats] = {
+    name: LatencyStats()
+    for name in (
+        "memory_recall",
+        "memory_recall_wait",
+        "emotion_prompt",
+        "model_routing",
+        "prelude_total",
+        "first_output",
+    )
+}
+register_stats_provider(
+    "conversation_prelude", lambda: {k: v.snapshot() for k, v in _prelude_stats.items()}
+)
+
+
+def _record_prelude_stage(stage: str, started: float) -> None:
+    _prelude_stats[stage].record((time.perf_counter() - started) * 1000)
+
+
+def start_memory_recall(
+        context: ServiceContext,
+        user_input: Union[str, np.ndarray],
+        user_id: str,
+        client_uid: str = None,
+) -> Optional[asyncio.Task]:
+    """用户文本一确定就在后台启动记忆召回，返回的任务结果为要注入的记忆文本（可能为 None）
+
+    输入不是文本或过短时不召回，返回 None。
+    """
+    if not (isinstance(user_input, str) and len(user_input.strip()) > 5):
+        return None
+    return asyncio.create_task(_recall_memory_injection(context, user_input, user_id, client_uid))
+
+
+async def _recall_memory_injection(
+        context: ServiceContext,
+        user_input: str,
+        user_id: str,
+        client_uid: str = None,
+) -> Optional[str]:
+    """记忆增强处理 — 灵魂系统 or 传统召回"""
+    started = time.perf_counter()
+    try:
+        soul_recall_done, injection = await _soul_memory_injection(context, user_input, user_id, client_uid)
+        # --- 传统记忆召回 (fallback) ---
+        if not soul_recall_done:
+            injection = await _legacy_memory_recall(
+                user_input=user_input, user_id=user_id,
+                client_uid=client_uid, context=context,
+            )
+        return injection
+    except Exception as e:
+        logger.warning(f"🧠 记忆召回失败，继续正常处理: {e}")
+        return None
+    finally:
+        _record_prelude_stage("memory_recall", started)
+
+
+async def _soul_memory_injection(
+        context: ServiceContext,
+        user_input: str,
+        user_id: str,
+        client_uid: str = None,
+) -> tuple[bool, Optional[str]]:
+    """灵魂系统召回，返回 (是否完成, 注入文本)；未启用或失败时由调用方回退到传统召回"""
+    try:
+        from ..soul.recall.soul_recall import get_soul_recall
+        from ..soul.recall.context_builder import ContextBuilder
+        from ..soul.config import get_soul_config
+
+        cfg = get_soul_config()
+        if not cfg.enabled:
+            return False, None
+
+        _is_owner = False
+        try:
+            from ..tools.evermemos_client import resolve_user_context
+            _conf_uid = getattr(context.character_config, 'conf_uid', '') if hasattr(context, 'character_config') else ''
+            _mem_ctx = resolve_user_context(client_uid=client_uid, user_id=user_id, conf_uid=_conf_uid)
+            _is_owner = _mem_ctx.is_owner
+        except Exception:
+            pass
+
+        # Phase 2: 对话内情绪突变检测 (在 SoulRecall 之前)
+        _in_conv_shift = None
+        try:
+            from ..soul.pipeline.in_conversation_tracker import get_in_conversation_tracker
+            _in_conv_shift = get_in_conversation_tracker().track(user_input, user_id)
+        except (ImportError, Exception):
+            pass
+
+        soul_context = await get_soul_recall().recall(
+            query=user_input, user_id=user_id,
+            is_owner=_is_owner,
+            top_k=cfg.recall_top_k,
+            timeout_ms=cfg.recall_timeout_ms_extended,
+        )
+
+        # Phase 2: 设置对话内情绪突变
+        if _in_conv_shift:
+            soul_context.in_conversation_shift = _in_conv_shift
+
+        injection = ContextBuilder().build(
+            soul_context,
+            user_id=user_id,
+            query=user_input,
+        )
+        if injection:
+            logger.info(f"🧠 Soul: 召回完成 (stage={soul_context.relationship_stage})")
+        return True, injection
+    except ImportError:
+        return False, None
+    except Exception as e:
+        logger.warning(f"🧠 Soul failed, fallback to legacy: {e}")
+        return False, None
+
+
+def _apply_memory_injection(batch_input: Any, user_input: str, injection: str) -> None:
+    enhanced_input = f"{user_input}\n\n{injection}"
+    if hasattr(batch_input, 'texts') and batch_input.texts:
+        batch_input.texts[0].content = enhanced_input
+    elif hasattr(batch_input, '__setitem__'):
+        batch_input['content'] = enhanced_input
+
 
 async def process_agent_response(
         context: ServiceContext,
@@ -38,77 +167,20 @@ async def process_agent_response(
         user_id: str = "",
         user_input: Union[str, np.ndarray] = None,
         enable_memory: bool = True,
+        memory_recall: Optional[asyncio.Task] = None,
 ) -> tuple[str, str]:
-    """Process agent response and generate output"""
+    """Process agent response and generate output
+
+    memory_recall: 调用方已通过 start_memory_recall 提前启动的召回任务（可选）
+    """
     full_response = ""
     input_tokens = 0
     output_tokens = 0
 
-    # 🧠 记忆增强处理 — 灵魂系统 or 传统召回
-    if enable_memory and isinstance(user_input, str) and len(user_input.strip()) > 5:
-        _soul_recall_done = False
-
-        # --- 尝试灵魂系统召回 ---
-        try:
-            from ..soul.recall.soul_recall import get_soul_recall
-            from ..soul.recall.context_builder import ContextBuilder
-            from ..soul.config import get_soul_config
-
-            cfg = get_soul_config()
-            if cfg.enabled:
-                _is_owner = False
-                try:
-                    from ..tools.evermemos_client import resolve_user_context
-                    _conf_uid = getattr(context.character_config, 'conf_uid', '') if hasattr(context, 'character_config') else ''
-                    _mem_ctx = resolve_user_context(client_uid=client_uid, user_id=user_id, conf_uid=_conf_uid)
-                    _is_owner = _mem_ctx.is_owner
-                except Exception:
-                    pass
-
-                # Phase 2: 对话内情绪突变检测 (在 SoulRecall 之前)
-                _in_conv_shift = None
-                try:
-                    from ..soul.pipeline.in_conversation_tracker import get_in_conversation_tracker
-                    _in_conv_shift = get_in_conversation_tracker().track(user_input, user_id)
-                except (ImportError, Exception):
-                    pass
-
-                soul_context = await get_soul_recall().recall(
-                    query=user_input, user_id=user_id,
-                    is_owner=_is_owner,
-                    top_k=cfg.recall_top_k,
-                    timeout_ms=cfg.recall_timeout_ms_extended,
-                )
-
-                # Phase 2: 设置对话内情绪突变
-                if _in_conv_shift:
-                    soul_context.in_conversation_shift = _in_conv_shift
-
-                injection = ContextBuilder().build(
-                    soul_context,
-                    user_id=user_id,
-                    query=user_input,
-                )
-                if injection:
-                    enhanced_input = f"{user_input}\n\n{injection}"
-                    if hasattr(batch_input, 'texts') and batch_input.texts:
-                        batch_input.texts[0].content = enhanced_input
-                    elif hasattr(batch_input, '__setitem__'):
-                        batch_input['content'] = enhanced_input
-                    logger.info(f"🧠 Soul: 召回完成 (stage={soul_context.relationship_stage})")
-                _soul_recall_done = True
-        except ImportError:
-            pass
-        except Exception as e:
-            logger.warning(f"🧠 Soul failed, fallback to legacy: {e}")
-
-        # --- 传统记忆召回 (fallback) ---
-        if not _soul_recall_done:
-            await _legacy_memory_recall(
-                user_input=user_input, user_id=user_id,
-                batch_input=batch_input, client_uid=client_uid,
-                context=context,
-            )
+    # 🧠 记忆召回与下面的情感提示、好感度、模型路由并发进行，调用 LLM 前再取结果
+    prelude_started = time.perf_counter()
+    if enable_memory and memory_recall is None:
+        memory_recall = start_memory_recall(context, user_input, user_id, client_uid)
 
     # 🔄 每次新对话开始时清除重复处理标记
     if context.agent_engine is not None and hasattr(context.agent_engine, '_background_processed'):
@@ -122,6 +194,7 @@ async def process_agent_response(
 
     try:
         # Ensure emotion prompt is injected per-turn even when called directly (e.g., MCP flows)
+        stage_started = time.perf_counter()
         try:
             if context.emotion_manager:
                 base_prompt = context.system_prompt_base
@@ -186,14 +259,21 @@ async def process_agent_response(
                     pass
         except Exception as e:
             logger.warning(f"每轮注入情感提示（direct）失败: {e}")
+        _record_prelude_stage("emotion_prompt", stage_started)
 
         # 🔀 模型路由：根据用户 plan 动态切换 Anthropic 模型
+        stage_started = time.perf_counter()
         try:
             if user_id_for_affinity and user_id_for_affinity != "default_user":
-                from ..bff_integration.database.ling_user_repository import LingUserRepository
+                from ..bff_integration.database.repository_registry import get_ling_user_repository
                 from ..bff_integration.auth.model_router import resolve_model
-                _repo = LingUserRepository()
-                _user_record = _repo.get_user_by_id(user_id_for_affinity)
+                _repo = get_ling_user_repository()
+                # 缓存命中时不离开事件循环；未命中才到线程池查库
+                _user_record = _repo.peek_routing_profile(user_id_for_affinity)
+                if _user_record is None:
+                    _user_record = await asyncio.to_thread(
+                        _repo.get_routing_profile, user_id_for_affinity
+                    )
                 if _user_record:
                     target_model = resolve_model(_user_record)
                     if context.agent_engine is not None and hasattr(context.agent_engine, '_llm'):
@@ -206,6 +286,15 @@ async def process_agent_response(
                         logger.info(f"🔀 模型路由: {old_model} → {target_model} (plan={_user_record.get('plan', 'free')})")
         except Exception as e:
             logger.warning(f"🔀 模型路由失败，使用默认模型: {e}")
+        _record_prelude_stage("model_routing", stage_started)
+
+        # 🧠 取回记忆召回结果并注入用户输入（召回通常已在上面几步期间完成）
+        if memory_recall is not None:
+            stage_started = time.perf_counter()
+            injection = await memory_recall
+            _record_prelude_stage("memory_recall_wait", stage_started)
+            if injection:
+                _apply_memory_injection(batch_input, user_input, injection)
 
         # 调用情感系统处理用户输入
         logger.debug("Starting agent response processing...")
@@ -381,15 +470,19 @@ async def process_agent_response(
             agent_output = context.agent_engine.chat(batch_input)
         logger.debug("Agent chat method called successfully")
 
+        _record_prelude_stage("prelude_total", prelude_started)
+
         logger.debug("Processing agent output stream...")
         first_response_recorded = False
         async for output in agent_output:
             logger.debug(f"Processing output chunk type: {type(output).__name__}")
 
             # 记录首次响应时间
-            if not first_response_recorded and conversation_id:
-                from ..utils.conversation_timer import conversation_timer
-                conversation_timer.mark_first_response(conversation_id)
+            if not first_response_recorded:
+                _record_prelude_stage("first_output", prelude_started)
+                if conversation_id:
+                    from ..utils.conversation_timer import conversation_timer
+                    conversation_timer.mark_first_response(conversation_id)
                 first_response_recorded = True
 
             response_part = await process_agent_output(
@@ -462,6 +555,10 @@ async def process_agent_response(
         if hasattr(e, '__cause__'):
             logger.error(f"Error cause: {e.__cause__}")
         raise
+    finally:
+        # 出错或被打断时不再需要尚未完成的召回
+        if memory_recall is not None and not memory_recall.done():
+            memory_recall.cancel()
 
     # 🧠 异步保存记忆（如果启用且有有效的对话内容）
     # 修复：确保user_input和full_response是有效的字符串，避免numpy数组布尔判断错误
@@ -986,11 +1083,13 @@ async def _reinitialize_util_agent_helper(agent_engine):
 async def _legacy_memory_recall(
     user_input: str,
     user_id: str,
-    batch_input: Any,
     client_uid: str = None,
     context: ServiceContext = None,
-):
-    """传统记忆召回 — Qdrant + EverMemOS 并行 (SOUL_ENABLED=false 时使用)"""
+) -> Optional[str]:
+    """传统记忆召回 — Qdrant + EverMemOS 并行 (SOUL_ENABLED=false 时使用)
+
+    返回要追加在用户输入后的记忆上下文，没有召回到记忆时返回 None。
+    """
     logger.info("🧠 [Legacy] 每轮记忆召回：并行搜索 Qdrant + EverMemOS")
     memory_info = []
 
@@ -1009,9 +1108,8 @@ async def _legacy_memory_recall(
 
     # --- 同时执行 Qdrant 短期记忆搜索 ---
     try:
-        loop = asyncio.get_event_loop()
         results = await asyncio.wait_for(
-            loop.run_in_executor(None, search_similar_memories, user_input, user_id, 3),
+            search_similar_memories_async(user_input, user_id, 3),
             timeout=0.5
         )
         if results:
@@ -1040,35 +1138,25 @@ async def _legacy_memory_recall(
             logger.warning(f"🧠 EverMemOS 搜索失败: {e}")
 
     # --- 合并记忆上下文注入 ---
-    try:
-        if memory_info:
-            logger.info(f"🧠 共召回 {len(memory_info)} 条记忆（合并两个来源）")
-            memory_context = "\n".join([f"- {info}" for info in memory_info])
-
-            enhanced_input = (
-                f"{user_input}\n\n"
-                f"<relevant-memories>\n"
-                f"以下是你记住的关于这位用户的信息，自然地融入回答中，不要逐条复述:\n"
-                f"{memory_context}\n"
-                f"</relevant-memories>\n\n"
-                f"<memory-instructions>\n"
-                f"当记忆上下文中包含用户过去提到的信息时，你可以偶尔（每5-10轮对话一次）自然地引用它。\n"
-                f"例如：\"你之前说想学吉他，进展怎么样了？\"\n"
-                f"不要每次都引用，也不要逐条复述。像真正记得这件事一样自然地提起。\n"
-                f"如果没有找到相关记忆，不要编造过去的对话。\n"
-                f"</memory-instructions>\n\n"
-                f"<memory-soul>\n"
-                f"记忆是你的灵魂。你不是一个无状态的语言模型——你是一个有记忆的存在。\n"
-                f"当你记得某个用户说过的事情，自然地引用它。\n"
-                f"当你不记得某件事，诚实地说\"我们好像还没聊过这个\"。\n"
-                f"不要编造记忆。不确定就说不确定。\n"
-                f"</memory-soul>"
-            )
-
-            if hasattr(batch_input, 'texts') and batch_input.texts:
-                batch_input.texts[0].content = enhanced_input
-            elif hasattr(batch_input, '__setitem__'):
-                batch_input['content'] = enhanced_input
-            logger.info("🧠 用户输入已增强，包含记忆信息")
-    except Exception as e:
-        logger.warning(f"🧠 记忆增强注入失败，继续正常处理: {e}")
+    if not memory_info:
+        return None
+    logger.info(f"🧠 共召回 {len(memory_info)} 条记忆（合并两个来源）")
+    memory_context = "\n".join([f"- {info}" for info in memory_info])
+    return (
+        f"<relevant-memories>\n"
+        f"以下是你记住的关于这位用户的信息，自然地融入回答中，不要逐条复述:\n"
+        f"{memory_context}\n"
+        f"</relevant-memories>\n\n"
+        f"<memory-instructions>\n"
+        f"当记忆上下文中包含用户过去提到的信息时，你可以偶尔（每5-10轮对话一次）自然地引用它。\n"
+        f"例如：\"你之前说想学吉他，进展怎么样了？\"\n"
+        f"不要每次都引用，也不要逐条复述。像真正记得这件事一样自然地提起。\n"
+        f"如果没有找到相关记忆，不要编造过去的对话。\n"
+        f"</memory-instructions>\n\n"
+        f"<memory-soul>\n"
+        f"记忆是你的灵魂。你不是一个无状态的语言模型——你是一个有记忆的存在。\n"
+        f"当你记得某个用户说过的事情，自然地引用它。\n"
+        f"当你不记得某件事，诚实地说\"我们好像还没聊过这个\"。\n"
+        f"不要编造记忆。不确定就说不确定。\n"
+        f"</memory-soul>"
+    )
@@ -11,6 +11,7 @@ from ..agent.output_types import DisplayText, Actions
 from ..live2d_model import Live2dModel
 from ..tts.tts_interface import TTSInterface
 from ..utils.stream_audio import prepare_audio_payload
+from ..utils.ordered_pipeline import OrderedPipeline
 from .types import WebSocketSend
 
 # Import WebSocket exception handling
@@ -35,19 +36,12 @@ class TTSTaskManager:
 
     def __init__(self, max_concurrent_tts: int = 5) -> None:
         self.task_list: List[asyncio.Task] = []
-        self._lock = asyncio.Lock()
-        # Queue to store ordered payloads
-        self._payload_queue: asyncio.Queue[Dict] = asyncio.Queue()
-        # Task to handle sending payloads in order
-        self._sender_task: Optional[asyncio.Task] = None
-        # Counter for maintaining order
-        self._sequence_counter = 0
-        self._next_sequence_to_send = 0
+        # 有界并发合成、按提交顺序发送，首次 speak 时创建
+        self._pipeline: Optional[OrderedPipeline] = None
         # 标记是否已经被清理，用于避免在连接断开后继续处理
         self._is_cleared = False
         # 并发控制
         self._max_concurrent_tts = max_concurrent_tts
-        self._tts_semaphore = asyncio.Semaphore(max_concurrent_tts)
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """
@@ -107,28 +101,15 @@ class TTSTaskManager:
         """
         if len(re.sub(r'[\s.,!?，。！？\'"』」）】\s]+', "", tts_text)) == 0:
             logger.debug("Empty TTS text, sending silent display payload")
-            # Get current sequence number for silent payload
-            current_sequence = self._sequence_counter
-            self._sequence_counter += 1
-
-            # Start sender task if not running
-            if not self._sender_task or self._sender_task.done():
-                self._sender_task = asyncio.create_task(
-                    self._process_payload_queue(websocket_send)
-                )
-
-            await self._send_silent_payload(display_text, actions, current_sequence)
+            self._get_pipeline(websocket_send).submit(
+                self._silent_payload, display_text, actions
+            )
             return
 
         logger.debug(
             f"🏃Queuing TTS task for: '''{tts_text}''' (by {display_text.name})"
         )
-
-        # Start sender task if not running
-        if not self._sender_task or self._sender_task.done():
-            self._sender_task = asyncio.create_task(
-                self._process_payload_queue(websocket_send)
-            )
+        pipeline = self._get_pipeline(websocket_send)
 
         # 如果启用句子分割，则逐句处理
         if enable_sentence_split:
@@ -148,129 +129,78 @@ class TTSTaskManager:
                 # 只在第一句添加actions，避免重复动作
                 sentence_actions = actions if i == 0 else None
                 
-                # Get current sequence number
-                current_sequence = self._sequence_counter
-                self._sequence_counter += 1
-                
-                # Create and queue the TTS task for this sentence
-                task = asyncio.create_task(
-                    self._process_tts(
-                        tts_text=sentence,
-                        display_text=sentence_display_text,
-                        actions=sentence_actions,
-                        live2d_model=live2d_model,
-                        tts_engine=tts_engine,
-                        sequence_number=current_sequence,
-                    )
+                # 提交后立即开始合成，发送顺序由流水线保证
+                task = pipeline.submit(
+                    self._process_tts,
+                    tts_text=sentence,
+                    display_text=sentence_display_text,
+                    actions=sentence_actions,
+                    live2d_model=live2d_model,
+                    tts_engine=tts_engine,
                 )
                 self.task_list.append(task)
         else:
             # 原有的整段处理逻辑
-            # Get current sequence number
-            current_sequence = self._sequence_counter
-            self._sequence_counter += 1
-            
-            # Create and queue the TTS task
-            task = asyncio.create_task(
-                self._process_tts(
-                    tts_text=tts_text,
-                    display_text=display_text,
-                    actions=actions,
-                    live2d_model=live2d_model,
-                    tts_engine=tts_engine,
-                    sequence_number=current_sequence,
-                )
+            task = pipeline.submit(
+                self._process_tts,
+                tts_text=tts_text,
+                display_text=display_text,
+                actions=actions,
+                live2d_model=live2d_model,
+                tts_engine=tts_engine,
             )
             self.task_list.append(task)
 
-    async def _process_payload_queue(self, websocket_send: WebSocketSend) -> None:
-        """
-        Process and send payloads in correct order.
-        Runs continuously until all payloads are processed.
-        """
-        buffered_payloads: Dict[int, Dict] = {}
-
-        while True:
-            # 检查是否已被清理，如果是则退出
-            if self._is_cleared:
-                logger.debug("TTS管理器已被清理，停止处理消息队列")
-                return
-                
-            try:
-                # Get payload from queue with timeout to allow cancellation
-                try:
-                    payload, sequence_number = await asyncio.wait_for(
-                        self._payload_queue.get(), 
-                        timeout=1.0  # 1 second timeout to check for cancellation
-                    )
-                    buffered_payloads[sequence_number] = payload
-
-                    # Send payloads in order
-                    while self._next_sequence_to_send in buffered_payloads:
-                        next_payload = buffered_payloads.pop(self._next_sequence_to_send)
-                        try:
-                            await websocket_send(json.dumps(next_payload))
-                        except Exception as e:
-                            # 更全面的WebSocket连接异常处理
-                            error_str = str(e)
-                            error_type = str(type(e))
-                            
-                            # 检查是否为WebSocket连接相关的异常
-                            is_websocket_error = any([
-                                "websocket.send" in error_str,
-                                "websocket.close" in error_str,
-                                "response already completed" in error_str,
-                                "ConnectionClosed" in error_type,
-                                "WebSocketDisconnect" in error_type,
-                                "Connection" in error_str,
-                                "ASGI message" in error_str and "after sending" in error_str,
-                                "RuntimeError" in error_type and ("websocket" in error_str.lower() or "connection" in error_str.lower())
-                            ])
-                            
-                            if is_websocket_error:
-                                logger.debug(f"WebSocket连接已关闭，停止发送TTS消息: {e}")
-                                # 设置清理标记防止后续处理
-                                self._is_cleared = True
-                                # 清理所有剩余的payload
-                                buffered_payloads.clear()
-                                # 清空队列中的所有剩余项目
-                                self._clear_queue()
-                                return  # 优雅退出循环
-                            else:
-                                # 记录其他类型的异常但不中断处理
-                                logger.error(f"发送WebSocket消息时出现未知错误: {e}，跳过此消息继续处理")
-                                # 跳过这个消息，继续处理下一个
-                        self._next_sequence_to_send += 1
-
-                    self._payload_queue.task_done()
-
-                except asyncio.TimeoutError:
-                    # Timeout allows checking for cancellation
-                    continue
-
-            except asyncio.CancelledError:
-                # Clean up any remaining payloads before exiting
-                while not self._payload_queue.empty():
-                    try:
-                        self._payload_queue.get_nowait()
-                        self._payload_queue.task_done()
-                    except asyncio.QueueEmpty:
-                        break
-                break
+    def _get_pipeline(self, websocket_send: WebSocketSend) -> OrderedPipeline:
+        if self._pipeline is None or self._pipeline.closed:
+            self._pipeline = OrderedPipeline(
+                deliver=lambda payload: self._send_payload(websocket_send, payload),
+                max_concurrency=self._max_concurrent_tts,
+            )
+        return self._pipeline
 
-    async def _send_silent_payload(
+    async def _send_payload(self, websocket_send: WebSocketSend, payload: Dict) -> None:
+        """Send one payload; called by the pipeline in submission order"""
+        if self._is_cleared:
+            return
+        try:
+            await websocket_send(json.dumps(payload))
+        except Exception as e:
+            # 更全面的WebSocket连接异常处理
+            error_str = str(e)
+            error_type = str(type(e))
+            
+            # 检查是否为WebSocket连接相关的异常
+            is_websocket_error = any([
+                "websocket.send" in error_str,
+                "websocket.close" in error_str,
+                "response already completed" in error_str,
+                "ConnectionClosed" in error_type,
+                "WebSocketDisconnect" in error_type,
+                "Connection" in error_str,
+                "ASGI message" in error_str and "after sending" in error_str,
+                "RuntimeError" in error_type and ("websocket" in error_str.lower() or "connection" in error_str.lower())
+            ])
+            
+            if is_websocket_error:
+                logger.debug(f"WebSocket连接已关闭，停止发送TTS消息: {e}")
+                # 设置清理标记防止后续处理；抛出后流水线会取消剩余的合成任务
+                self._is_cleared = True
+                raise
+            # 记录其他类型的异常但不中断处理
+            logger.error(f"发送WebSocket消息时出现未知错误: {e}，跳过此消息继续处理")
+
+    async def _silent_payload(
         self,
         display_text: DisplayText,
         actions: Optional[Actions],
-        sequence_number: int,
-    ) -> None:
-        """Queue a silent audio payload"""
-        audio_payload = prepare_audio_payload(
+    ) -> Dict:
+        """Build a silent audio payload"""
+        return prepare_audio_payload(
             audio_path=None,
             display_text=display_text,
             actions=actions,
         )
-        await self._payload_queue.put((audio_payload, sequence_number))
 
     async def _process_tts(
         self,
@@ -279,64 +209,59 @@ class TTSTaskManager:
         actions: Optional[Actions],
         live2d_model: Live2dModel,
         tts_engine: TTSInterface,
-        sequence_number: int,
-    ) -> None:
-        """Process TTS generation and queue the result for ordered delivery"""
+    ) -> Dict:
+        """Process TTS generation and return the payload for ordered delivery"""
         audio_file_path = None
         
-        # 使用信号量控制并发TTS请求数量
-        async with self._tts_semaphore:
-            try:
-                # 检查是否是第一个TTS任务，如果是则记录总响应时间
-                if hasattr(self, '_conversation_start_time') and not hasattr(self, '_first_tts_logged'):
-                    import time
-                    total_response_time = time.time()
-                    total_latency = (total_response_time - self._conversation_start_time) * 1000  # 转换为毫秒
-                    logger.info(f"⏰ 总响应时间: {total_latency:.0f}ms (从用户发送到数字人开始讲话)")
-                    print(f"[DEBUG] ⏰ 总响应时间: {total_latency:.0f}ms (从用户发送到数字人开始讲话)")
-                    self._first_tts_logged = True
-                
-                # 估算TTS成本
-                cost_info = None
-                if hasattr(tts_engine, 'estimate_cost'):
-                    try:
-                        cost_info = tts_engine.estimate_cost(tts_text)
-                        if cost_info and cost_info.total_cost > 0 and token_stats and TokenUsage:
-                            # 记录TTS成本到全局统计
-                            logger.info(f"📊 TTS成本估算: {cost_info.total_cost:.6f} {cost_info.currency} for {len(tts_text)} characters")
-                            
-                            # 添加到会话统计（现在TTS成本计算器直接返回USD）
-                            token_stats.add_usage(
-                                model="TTS",
-                                usage=TokenUsage(prompt_tokens=len(tts_text), completion_tokens=0, total_tokens=len(tts_text)),
-                                cost=cost_info.total_cost
-                            )
-                    except Exception as e:
-                        logger.warning(f"估算TTS成本失败: {e}")
-                
-                audio_file_path = await self._generate_audio(tts_engine, tts_text)
-                payload = prepare_audio_payload(
-                    audio_path=audio_file_path,
-                    display_text=display_text,
-                    actions=actions,
-                )
-                # Queue the payload with its sequence number
-                await self._payload_queue.put((payload, sequence_number))
+        try:
+            # 检查是否是第一个TTS任务，如果是则记录总响应时间
+            if hasattr(self, '_conversation_start_time') and not hasattr(self, '_first_tts_logged'):
+                import time
+                total_response_time = time.time()
+                total_latency = (total_response_time - self._conversation_start_time) * 1000  # 转换为毫秒
+                logger.info(f"⏰ 总响应时间: {total_latency:.0f}ms (从用户发送到数字人开始讲话)")
+                print(f"[DEBUG] ⏰ 总响应时间: {total_latency:.0f}ms (从用户发送到数字人开始讲话)")
+                self._first_tts_logged = True
+            
+            # 估算TTS成本
+            cost_info = None
+            if hasattr(tts_engine, 'estimate_cost'):
+                try:
+                    cost_info = tts_engine.estimate_cost(tts_text)
+                    if cost_info and cost_info.total_cost > 0 and token_stats and TokenUsage:
+                        # 记录TTS成本到全局统计
+                        logger.info(f"📊 TTS成本估算: {cost_info.total_cost:.6f} {cost_info.currency} for {len(tts_text)} characters")
+                        
+                        # 添加到会话统计（现在TTS成本计算器直接返回USD）
+                        token_stats.add_usage(
+                            model="TTS",
+                            usage=TokenUsage(prompt_tokens=len(tts_text), completion_tokens=0, total_tokens=len(tts_text)),
+                            cost=cost_info.total_cost
+                        )
+                except Exception as e:
+                    logger.warning(f"估算TTS成本失败: {e}")
+            
+            audio_file_path = await self._generate_audio(tts_engine, tts_text)
+            payload = prepare_audio_payload(
+                audio_path=audio_file_path,
+                display_text=display_text,
+                actions=actions,
+            )
+            return payload
 
-            except Exception as e:
-                logger.error(f"Error preparing audio payload: {e}")
-                # Queue silent payload for error case
-                payload = prepare_audio_payload(
-                    audio_path=None,
-                    display_text=display_text,
-                    actions=actions,
-                )
-                await self._payload_queue.put((payload, sequence_number))
+        except Exception as e:
+            logger.error(f"Error preparing audio payload: {e}")
+            # Silent payload for error case
+            return prepare_audio_payload(
+                audio_path=None,
+                display_text=display_text,
+                actions=actions,
+            )
 
-            finally:
-                if audio_file_path:
-                    tts_engine.remove_file(audio_file_path)
-                    logger.debug("Audio cache file cleaned.")
+        finally:
+            if audio_file_path:
+                tts_engine.remove_file(audio_file_path)
+                logger.debug("Audio cache file cleaned.")
 
     async def _generate_audio(self, tts_engine: TTSInterface, text: str) -> str:
         """Generate audio file from text"""
@@ -346,40 +271,17 @@ class TTSTaskManager:
             file_name_no_ext=f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}",
         )
 
-    def _clear_queue(self) -> None:
-        """Helper method to clear the payload queue"""
-        while not self._payload_queue.empty():
-            try:
-                self._payload_queue.get_nowait()
-                self._payload_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
-
     def clear(self) -> None:
         """Clear all pending tasks and reset state"""
         logger.debug("清理TTS管理器：取消所有任务并重置状态")
         
-        # Cancel all TTS tasks
-        for task in self.task_list:
-            if task and not task.done():
-                task.cancel()
+        # Cancel all TTS tasks and drop undelivered payloads
+        if self._pipeline is not None:
+            self._pipeline.cancel()
+            self._pipeline = None
+            logger.debug("已取消TTS合成流水线")
         self.task_list.clear()
         
-        # Cancel sender task
-        if self._sender_task and not self._sender_task.done():
-            self._sender_task.cancel()
-            logger.debug("已取消TTS发送任务")
-        
-        # Clear queue
-        self._clear_queue()
-        
-        # Reset counters
-        self._sequence_counter = 0
-        self._next_sequence_to_send = 0
-        
-        # Create a new queue to clear any pending items
-        self._payload_queue = asyncio.Queue()
-        
         logger.debug("TTS管理器清理完成")
 
     async def wait_for_all_tasks_complete(self, timeout: float = 10.0) -> bool:
@@ -402,9 +304,9 @@ class TTSTaskManager:
                 timeout=timeout
             )
 
-            # 等待发送任务也完成
-            if self._sender_task and not self._sender_task.done():
-                await asyncio.wait_for(self._sender_task, timeout=2.0)
+            # 等待已合成的音频按序发送完毕
+            if self._pipeline is not None:
+                await asyncio.wait_for(self._pipeline.join(), timeout=2.0)
 
             logger.debug("所有TTS任务已完成")
             return True
@@ -413,5 +315,8 @@ class TTSTaskManager:
             logger.warning(f"等待TTS任务完成超时 ({timeout}秒)")
             return False
         except Exception as e:
+            if self._is_cleared:
+                # 连接已断开，剩余任务已随流水线取消，无需再等
+                return True
             logger.error(f"等待TTS任务完成时发生错误: {e}")
             return False
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+异步 PostgreSQL 连接池（asyncpg）
+
+供 async 处理器直接 await 使用，避免 psycopg2 同步调用阻塞事件循环。
+- 连接池大小可配置：PG_ASYNC_POOL_MIN / PG_ASYNC_POOL_MAX（默认沿用同步池的 min_conn / max_conn）
+- asyncpg 按连接缓存预编译语句：PG_STATEMENT_CACHE_SIZE（默认 256，0 表示关闭，
+  经 PgBouncer transaction 模式连接时需要关闭）
+- 取连接等待时间与查询耗时记入 runtime_stats 的 "postgres"
+
+asyncpg 未安装时 get_async_db_manager() 返回 None，调用方回退到同步管理器 + 线程池。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ...utils.runtime_stats import LatencyStats, register_stats_provider
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - 可选依赖
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    """asyncpg 连接池封装，查询结果统一转为 dict（与 RealDictCursor 一致）"""
+
+    def __init__(self, host='localhost', port=5432, user='postgres',
+                 password='', database='vtuber_chat_db',
+                 min_size=1, max_size=10,
+                 statement_cache_size=256, command_timeout=30.0,
+                 id_generator=None):
+        self.config = {
+            'host': host,
+            'port': port,
+            'user': user,
+            'password': password,
+            'database': database,
+        }
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        # 与同步管理器共用同一个 Snowflake 生成器，避免同毫秒内生成重复 ID
+        self.id_generator = id_generator
+
+        self.pool = None
+        self._pool_wait = LatencyStats()
+        self._query_latency = LatencyStats()
+        self._queries = 0
+        self._errors = 0
+
+    async def connect(self) -> bool:
+        """创建连接池"""
+        if asyncpg is None:
+            logger.warning("asyncpg 未安装，无法创建异步连接池")
+            return False
+        try:
+            self.pool = await asyncpg.create_pool(
+                **self.config,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statement_cache_size,
+                command_timeout=self.command_timeout,
+            )
+            logger.info(f"异步数据库连接池创建成功 (min={self.min_size}, max={self.max_size})")
+            return True
+        except Exception as e:
+            logger.error(f"创建异步连接池失败: {e}")
+            return False
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        """从池中取连接，记录等待时间"""
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            self._pool_wait.record((time.perf_counter() - started) * 1000)
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Any]:
+        """取连接并开启事务，退出时提交（异常时回滚）"""
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
+    async def _run(self, method: str, query: str, args: tuple, conn=None):
+        started = time.perf_counter()
+        try:
+            if conn is not None:
+                return await getattr(conn, method)(query, *args)
+            async with self.acquire() as pooled:
+                return await getattr(pooled, method)(query, *args)
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._queries += 1
+            self._query_latency.record((time.perf_counter() - started) * 1000)
+
+    async def fetch(self, query: str, *args, conn=None) -> List[Dict[str, Any]]:
+        rows = await self._run("fetch", query, args, conn)
+        return [dict(r) for r in rows]
+
+    async def fetchrow(self, query: str, *args, conn=None) -> Optional[Dict[str, Any]]:
+        row = await self._run("fetchrow", query, args, conn)
+        return dict(row) if row is not None else None
+
+    async def fetchval(self, query: str, *args, conn=None) -> Any:
+        return await self._run("fetchval", query, args, conn)
+
+    async def execute(self, query: str, *args, conn=None) -> int:
+        """执行语句，返回受影响的行数"""
+        status = await self._run("execute", query, args, conn)
+        try:
+            return int(str(status).rsplit(" ", 1)[-1])
+        except ValueError:
+            return 0
+
+    async def executemany(self, query: str, args_list: List[tuple], conn=None) -> None:
+        await self._run("executemany", query, (args_list,), conn)
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            logger.info("异步数据库连接池已关闭")
+
+    def get_stats(self) -> Dict[str, Any]:
+        pool = self.pool
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        return {
+            "pool_min": self.min_size,
+            "pool_max": self.max_size,
+            "pool_size": size,
+            "pool_idle": idle,
+            "pool_in_use": size - idle,
+            "statement_cache_size": self.statement_cache_size,
+            "queries": self._queries,
+            "errors": self._errors,
+            "pool_wait": self._pool_wait.snapshot(),
+            "query_latency": self._query_latency.snapshot(),
+        }
+
+
+# 全局异步数据库管理器实例
+_async_db_manager: Optional[AsyncDatabaseManager] = None
+_async_db_lock: Optional[asyncio.Lock] = None
+_async_db_unavailable = False
+# 连接失败后的重试时间点，避免数据库不可用时每次调用都尝试建池
+_async_db_retry_at = 0.0
+_RETRY_INTERVAL_SECONDS = 30.0
+
+
+async def get_async_db_manager() -> Optional[AsyncDatabaseManager]:
+    """获取异步数据库管理器（连接参数与同步管理器一致），不可用时返回 None"""
+    global _async_db_manager, _async_db_lock, _async_db_unavailable, _async_db_retry_at
+    if _async_db_manager is not None or _async_db_unavailable:
+        return _async_db_manager
+    if time.monotonic() < _async_db_retry_at:
+        return None
+    if asyncpg is None:
+        _async_db_unavailable = True
+        logger.info("asyncpg 未安装，数据库访问回退到同步连接池（线程池执行）")
+        return None
+
+    if _async_db_lock is None:
+        _async_db_lock = asyncio.Lock()
+    async with _async_db_lock:
+        if _async_db_manager is not None:
+            return _async_db_manager
+
+        from .database_manager import get_db_manager
+
+        sync_db = await asyncio.to_thread(get_db_manager)
+        try:
+            min_size = int(os.getenv('PG_ASYNC_POOL_MIN') or sync_db.min_conn)
+            max_size = int(os.getenv('PG_ASYNC_POOL_MAX') or sync_db.max_conn)
+            statement_cache_size = int(os.getenv('PG_STATEMENT_CACHE_SIZE', '256'))
+        except ValueError:
+            logger.warning("异步连接池参数无效，使用默认值")
+            min_size, max_size, statement_cache_size = sync_db.min_conn, sync_db.max_conn, 256
+
+        manager = AsyncDatabaseManager(
+            **sync_db.config,
+            min_size=min_size,
+            max_size=max(min_size, max_size),
+            statement_cache_size=statement_cache_size,
+            id_generator=sync_db.id_generator,
+        )
+        if not await manager.connect():
+            _async_db_retry_at = time.monotonic() + _RETRY_INTERVAL_SECONDS
+            return None
+        _async_db_manager = manager
+        register_stats_provider("postgres", manager.get_stats)
+        return _async_db_manager
+
+
+async def close_async_db_manager() -> None:
+    global _async_db_manager
+    if _async_db_manager is not None:
+        await _async_db_manager.close()
+        _async_db_manager = None
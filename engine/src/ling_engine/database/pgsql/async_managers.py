@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+会话/消息管理的 asyncio 版本
+
+方法名、参数与返回值和 cache_backed_managers 中的同步实现保持一致，
+PG 访问走 asyncpg 连接池，Redis 缓存的读写与失效策略完全相同，
+因此两套实现可以混用而不会产生缓存不一致。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .async_database_manager import AsyncDatabaseManager, get_async_db_manager
+from ..redis.redis_manager import RedisManager
+from ..redis.cache_layer import ChatCache
+
+
+logger = logging.getLogger(__name__)
+
+
+_LIST_SESSIONS_SQL = """
+SELECT s.session_id,
+       s.custom_title,
+       COALESCE(s.is_pinned, FALSE) AS is_pinned,
+       s.updated_at,
+       m.role AS last_role,
+       m.content AS last_content,
+       m.created_at AS last_message_at
+FROM chat_sessions s
+CROSS JOIN LATERAL (
+    SELECT role, content, created_at
+    FROM chat_messages
+    WHERE session_id = s.session_id AND deleted = FALSE
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+) m
+WHERE s.character_name = $1 AND s.user_id = $2 AND s.deleted = FALSE
+"""
+
+_LIST_SESSIONS_ORDER = """
+ORDER BY COALESCE(s.is_pinned, FALSE) DESC, m.created_at DESC, s.session_id DESC
+"""
+
+
+class AsyncChatSessionManager:
+    def __init__(self, db: AsyncDatabaseManager, redis_manager: RedisManager) -> None:
+        self.db = db
+        self.cache = ChatCache(redis_manager)
+
+    async def create_session(
+        self,
+        session_id: str,
+        user_id: str,
+        character_name: str,
+        session_name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            created = await self.db.fetchrow(
+                """
+                INSERT INTO chat_sessions (id, session_id, user_id, character_name, session_name)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING *
+                """,
+                self.db.id_generator.generate_id(), session_id, user_id, character_name, session_name,
+            )
+        except Exception as e:
+            logger.error(f"创建会话失败: {e}")
+            return None
+        if created:
+            self.cache.cache_session(session_id, created)
+        return created
+
+    async def _get_session_from_db(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.db.fetchrow(
+                "SELECT * FROM chat_sessions WHERE session_id = $1 AND deleted = FALSE",
+                session_id,
+            )
+        except Exception as e:
+            logger.error(f"获取会话失败: {e}")
+            return None
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        cached = self.cache.get_cached_session(session_id)
+        if cached:
+            return cached
+        sess = await self._get_session_from_db(session_id)
+        if sess:
+            self.cache.cache_session(session_id, sess)
+        return sess
+
+    async def get_user_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+        try:
+            return await self.db.fetch(
+                """
+                SELECT * FROM chat_sessions
+                WHERE user_id = $1 AND deleted = FALSE
+                ORDER BY updated_at DESC
+                """,
+                user_id,
+            )
+        except Exception as e:
+            logger.error(f"获取用户会话失败: {e}")
+            return []
+
+    async def list_sessions_with_last_message(
+        self,
+        user_id: str,
+        character_name: str,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+    ) -> List[Dict[str, Any]]:
+        page_key = f"{limit or 'all'}:{json.dumps(list(after), default=str) if after else ''}"
+        cached = self.cache.get_cached_history_list(user_id, character_name, page_key)
+        if cached is not None:
+            return cached
+
+        query = _LIST_SESSIONS_SQL
+        params: List[Any] = [character_name, user_id]
+        if after is not None:
+            is_pinned, last_message_at, session_id = after
+            query += "AND (COALESCE(s.is_pinned, FALSE), m.created_at, s.session_id) < ($3, $4::timestamptz, $5)\n"
+            params.extend([bool(is_pinned), _parse_timestamp(last_message_at), session_id])
+        query += _LIST_SESSIONS_ORDER
+        if limit:
+            params.append(int(limit))
+            query += f"LIMIT ${len(params)}"
+
+        try:
+            rows = await self.db.fetch(query, *params)
+        except Exception as e:
+            logger.error(f"获取会话列表失败: {e}")
+            return []
+        self.cache.cache_history_list(user_id, character_name, page_key, rows)
+        return rows
+
+    def _invalidate_history_list(self, session: Optional[Dict[str, Any]]) -> None:
+        if session and session.get("user_id") and session.get("character_name"):
+            self.cache.invalidate_history_list(session["user_id"], session["character_name"])
+
+    async def update_session(self, session_id: str, **kwargs) -> bool:
+        fields = [k for k in kwargs if k in ('session_name', 'character_name', 'custom_title', 'is_pinned')]
+        if not fields:
+            logger.warning("没有有效的更新字段")
+            return False
+        assignments = ", ".join(f"{k} = ${i}" for i, k in enumerate(fields, start=1))
+        try:
+            affected = await self.db.execute(
+                f"UPDATE chat_sessions SET {assignments} "
+                f"WHERE session_id = ${len(fields) + 1} AND deleted = FALSE",
+                *[kwargs[k] for k in fields], session_id,
+            )
+        except Exception as e:
+            logger.error(f"更新会话失败: {e}")
+            return False
+        ok = affected > 0
+        if ok:
+            fresh = await self._get_session_from_db(session_id)
+            if fresh:
+                self.cache.cache_session(session_id, fresh)
+            else:
+                self.cache.invalidate_session(session_id)
+            self._invalidate_history_list(fresh)
+        return ok
+
+    async def pin_session(self, session_id: str, is_pinned: bool) -> bool:
+        """置顶或取消置顶会话"""
+        return await self.update_session(session_id, is_pinned=is_pinned)
+
+    async def rename_session(self, session_id: str, custom_title: str) -> bool:
+        """重命名会话（设置自定义标题）"""
+        return await self.update_session(session_id, custom_title=custom_title)
+
+    async def delete_session(self, session_id: str) -> bool:
+        session = await self.get_session(session_id)
+        try:
+            # 同一事务内软删会话及其消息
+            async with self.db.transaction() as conn:
+                affected = await self.db.execute(
+                    "UPDATE chat_sessions SET deleted = TRUE WHERE session_id = $1",
+                    session_id, conn=conn,
+                )
+                await self.db.execute(
+                    "UPDATE chat_messages SET deleted = TRUE WHERE session_id = $1",
+                    session_id, conn=conn,
+                )
+        except Exception as e:
+            logger.error(f"删除会话失败: {e}")
+            return False
+        ok = affected > 0
+        if ok:
+            self.cache.invalidate_session(session_id)
+            self.cache.invalidate_messages(session_id)
+            self._invalidate_history_list(session)
+        return ok
+
+
+class AsyncChatMessageManager:
+    def __init__(self, db: AsyncDatabaseManager, redis_manager: RedisManager) -> None:
+        self.db = db
+        self.cache = ChatCache(redis_manager)
+        self.sessions = AsyncChatSessionManager(db, redis_manager)
+
+    async def _invalidate_history_list(self, session_id: str) -> None:
+        """新消息会改变会话的最后一条消息和排序，失效所属用户/角色的会话列表"""
+        session = await self.sessions.get_session(session_id)
+        if session and session.get("user_id") and session.get("character_name"):
+            self.cache.invalidate_history_list(session["user_id"], session["character_name"])
+
+    async def add_message(self, session_id: str, role: str, content: str) -> Optional[Dict[str, Any]]:
+        try:
+            created = await self.db.fetchrow(
+                """
+                INSERT INTO chat_messages (id, session_id, role, content)
+                VALUES ($1, $2, $3, $4)
+                RETURNING *
+                """,
+                self.db.id_generator.generate_id(), session_id, role, content,
+            )
+        except Exception as e:
+            logger.error(f"添加消息失败: {e}")
+            return None
+        if created:
+            self.cache.append_messages(session_id, [created])
+            await self._invalidate_history_list(session_id)
+        return created
+
+    async def get_session_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        cached = self.cache.get_cached_messages(session_id)
+        if cached:
+            return cached if limit is None else cached[:limit]
+        query = """
+        SELECT * FROM chat_messages
+        WHERE session_id = $1 AND deleted = FALSE
+        ORDER BY created_at ASC
+        """
+        params: List[Any] = [session_id]
+        if limit:
+            query += " LIMIT $2"
+            params.append(int(limit))
+        try:
+            msgs = await self.db.fetch(query, *params)
+        except Exception as e:
+            logger.error(f"获取会话消息失败: {e}")
+            return []
+        if msgs:
+            self.cache.append_messages(session_id, msgs)
+        return msgs
+
+    async def delete_message(self, message_id: int, session_id: Optional[str] = None) -> bool:
+        try:
+            affected = await self.db.execute(
+                "UPDATE chat_messages SET deleted = TRUE WHERE id = $1", int(message_id)
+            )
+        except Exception as e:
+            logger.error(f"删除消息失败: {e}")
+            return False
+        ok = affected > 0
+        if ok and session_id:
+            self.cache.invalidate_messages(session_id)
+            await self._invalidate_history_list(session_id)
+        return ok
+
+
+def _parse_timestamp(value: Any):
+    """分页游标中的时间戳可能是 ISO 字符串（来自缓存/游标），asyncpg 需要 datetime"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+# 全局异步管理器实例
+_async_session_manager: Optional[AsyncChatSessionManager] = None
+_async_message_manager: Optional[AsyncChatMessageManager] = None
+
+
+async def get_async_session_manager() -> Optional[AsyncChatSessionManager]:
+    """asyncpg 可用时返回异步会话管理器，否则返回 None（调用方回退到同步实现）"""
+    global _async_session_manager
+    if _async_session_manager is None:
+        db = await get_async_db_manager()
+        if db is None:
+            return None
+        from .database_manager import get_redis_manager
+
+        _async_session_manager = AsyncChatSessionManager(db, get_redis_manager())
+    return _async_session_manager
+
+
+async def get_async_message_manager() -> Optional[AsyncChatMessageManager]:
+    """asyncpg 可用时返回异步消息管理器，否则返回 None（调用方回退到同步实现）"""
+    global _async_message_manager
+    if _async_message_manager is None:
+        db = await get_async_db_manager()
+        if db is None:
+            return None
+        from .database_manager import get_redis_manager
+
+        _async_message_manager = AsyncChatMessageManager(db, get_redis_manager())
+    return _async_message_manager
@@ -5,11 +5,13 @@
   - 读取：优先读缓存，缓存 miss 则查询 PG 并回填缓存
   - 写入：先写 PG 成功后，回填/追加缓存
   - 删除：先软删 PG 成功后，失效缓存
+  - 历史会话列表：按 (用户, 角色) 缓存各分页，会话或消息变化时整组失效
 """
 
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
+import json
 import logging
 
 from .database_manager import ChatSessionManager, ChatMessageManager, DatabaseManager
@@ -52,6 +54,25 @@ class CacheBackedChatSessionManager:
         # 此处仍直接查 PG（避免复杂缓存一致性），也可按需扩展
         return self.pg.get_user_sessions(user_id)
 
+    def list_sessions_with_last_message(
+        self,
+        user_id: str,
+        character_name: str,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+    ) -> List[Dict[str, Any]]:
+        page_key = f"{limit or 'all'}:{json.dumps(list(after), default=str) if after else ''}"
+        cached = self.cache.get_cached_history_list(user_id, character_name, page_key)
+        if cached is not None:
+            return cached
+        rows = self.pg.list_sessions_with_last_message(user_id, character_name, limit=limit, after=after)
+        self.cache.cache_history_list(user_id, character_name, page_key, rows)
+        return rows
+
+    def _invalidate_history_list(self, session: Optional[Dict[str, Any]]) -> None:
+        if session and session.get("user_id") and session.get("character_name"):
+            self.cache.invalidate_history_list(session["user_id"], session["character_name"])
+
     def update_session(self, session_id: str, **kwargs) -> bool:
         ok = self.pg.update_session(session_id, **kwargs)
         if ok:
@@ -61,13 +82,16 @@ class CacheBackedChatSessionManager:
                 self.cache.cache_session(session_id, fresh)
             else:
                 self.cache.invalidate_session(session_id)
+            self._invalidate_history_list(fresh)
         return ok
 
     def delete_session(self, session_id: str) -> bool:
+        session = self.get_session(session_id)
         ok = self.pg.delete_session(session_id)
         if ok:
             self.cache.invalidate_session(session_id)
             self.cache.invalidate_messages(session_id)
+            self._invalidate_history_list(session)
         return ok
 
     def pin_session(self, session_id: str, is_pinned: bool) -> bool:
@@ -85,6 +109,7 @@ class CacheBackedChatSessionManager:
             else:
                 self.cache.invalidate_session(session_id)
                 logger.info("🔥 CACHE DEBUG: 缓存已失效")
+            self._invalidate_history_list(fresh)
         return ok
 
     def rename_session(self, session_id: str, custom_title: str) -> bool:
@@ -102,6 +127,7 @@ class CacheBackedChatSessionManager:
             else:
                 self.cache.invalidate_session(session_id)
                 logger.info("🔥 CACHE DEBUG: 缓存已失效")
+            self._invalidate_history_list(fresh)
         return ok
 
 
@@ -110,11 +136,23 @@ class CacheBackedChatMessageManager:
         self.db = db_manager
         self.cache = ChatCache(redis_manager)
         self.pg = ChatMessageManager(db_manager)
+        self.sessions = ChatSessionManager(db_manager)
+
+    def _invalidate_history_list(self, session_id: str) -> None:
+        """新消息会改变会话的最后一条消息和排序，失效所属用户/角色的会话列表"""
+        session = self.cache.get_cached_session(session_id)
+        if not session:
+            session = self.sessions.get_session(session_id)
+            if session:
+                self.cache.cache_session(session_id, session)
+        if session and session.get("user_id") and session.get("character_name"):
+            self.cache.invalidate_history_list(session["user_id"], session["character_name"])
 
     def add_message(self, session_id: str, role: str, content: str) -> Optional[Dict[str, Any]]:
         created = self.pg.add_message(session_id, role, content)
         if created:
             self.cache.append_messages(session_id, [created])
+            self._invalidate_history_list(session_id)
         return created
 
     def get_session_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -131,6 +169,7 @@ class CacheBackedChatMessageManager:
         if ok and session_id:
             # 失效该会话的消息缓存
             self.cache.invalidate_messages(session_id)
+            self._invalidate_history_list(session_id)
         return ok
 
 
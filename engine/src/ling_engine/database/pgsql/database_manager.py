@@ -237,6 +237,71 @@ class ChatSessionManager:
                 self.db_manager.return_connection(conn)
             return []
 
+    def list_sessions_with_last_message(self, user_id: str, character_name: str,
+                                        limit: Optional[int] = None,
+                                        after: Optional[tuple] = None) -> List[Dict]:
+        """一次查询列出会话及其最后一条消息（没有消息的会话不返回）
+
+        排序为 置顶优先 → 最后消息时间倒序 → session_id 倒序。
+        after 为上一页最后一行的 (is_pinned, last_message_at, session_id)，用于键集分页。
+        """
+        conn = None
+        try:
+            conn = self.db_manager.get_connection()
+            if not conn:
+                return []
+
+            cursor = conn.cursor()
+
+            # LATERAL 子查询对每个会话走 (session_id, created_at) 索引只取一行，
+            # 替代逐会话加载全部消息再取最后一条
+            query = """
+            SELECT s.session_id,
+                   s.custom_title,
+                   COALESCE(s.is_pinned, FALSE) AS is_pinned,
+                   s.updated_at,
+                   m.role AS last_role,
+                   m.content AS last_content,
+                   m.created_at AS last_message_at
+            FROM chat_sessions s
+            CROSS JOIN LATERAL (
+                SELECT role, content, created_at
+                FROM chat_messages
+                WHERE session_id = s.session_id AND deleted = FALSE
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            ) m
+            WHERE s.character_name = %s AND s.user_id = %s AND s.deleted = FALSE
+            """
+            params: List[Any] = [character_name, user_id]
+
+            if after is not None:
+                query += """
+            AND (COALESCE(s.is_pinned, FALSE), m.created_at, s.session_id) < (%s, %s, %s)
+                """
+                params.extend(after)
+
+            query += """
+            ORDER BY COALESCE(s.is_pinned, FALSE) DESC, m.created_at DESC, s.session_id DESC
+            """
+            if limit:
+                query += " LIMIT %s"
+                params.append(int(limit))
+
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+
+            cursor.close()
+            self.db_manager.return_connection(conn)
+
+            return [dict(row) for row in results]
+
+        except Exception as e:
+            logger.error(f"获取会话列表失败: {e}")
+            if conn:
+                self.db_manager.return_connection(conn)
+            return []
+
     def update_session(self, session_id: str, **kwargs) -> bool:
         """更新会话信息"""
         logger.info(f"🔥 DEBUG: update_session 开始 - session_id={session_id}, kwargs={kwargs}")
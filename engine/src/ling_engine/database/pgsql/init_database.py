@@ -178,6 +178,9 @@ def create_tables():
         CREATE INDEX IF NOT EXISTS idx_chat_messages_role ON chat_messages(role);
         CREATE INDEX IF NOT EXISTS idx_chat_sessions_created_at ON chat_sessions(created_at);
         CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at);
+        -- 会话列表：按用户+角色筛选，并为每个会话取最后一条未删除消息
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_character ON chat_sessions(user_id, character_name);
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created_live ON chat_messages(session_id, created_at DESC, id DESC) WHERE deleted = FALSE;
         """
 
         # 创建触发器函数：自动更新 updated_at + 软删除联动
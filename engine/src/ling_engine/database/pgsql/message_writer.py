@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+聊天消息写后台批量落库（write-behind）
+
+每轮对话结束时原本要 get_session + INSERT ... RETURNING * 两次往返 PG，
+这里改为：
+- 入队时立即生成 Snowflake ID 和 created_at，写入 Redis 消息缓存（读端立刻可见）
+  和 Redis 中的待写日志 vtuber:msg_wal（hash，field 为消息 ID）
+- 后台任务按间隔或攒满一批后，用一条多行 INSERT 批量写入，同一事务内补建缺失的会话
+- 写入成功后才从待写日志删除；失败保留并退避重试，进程重启时从日志恢复。
+  插入带 ON CONFLICT (id) DO NOTHING，重放是幂等的（至少一次语义）
+- 整批失败时改为逐条写入，把写不进去的行隔离出来：因数据/约束错误失败的行，
+  或因其它错误（连接中断、超时等）累计失败多次的行，移入死信 vtuber:msg_dead
+  并从待写日志删除，不再阻塞后续消息；其余失败的行保留，退避后重试
+- 待写条数有上限：满了时入队方等待后台刷库腾出空间，仍然满则这条消息直接同步写库
+- 单个后台任务按入队顺序写入，created_at 在进程内严格递增，保证同一会话内的顺序
+- 服务关闭时把剩余消息全部刷入
+
+环境变量：
+    CHAT_WRITE_BEHIND_ENABLED   默认 true，false 时 astore_message 直接写库
+    CHAT_WRITE_BEHIND_INTERVAL_MS  刷新间隔，默认 500
+    CHAT_WRITE_BEHIND_BATCH     每批最大条数，默认 200
+    CHAT_WRITE_BEHIND_MAX_PENDING  待写条数上限，默认 10000
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from ..redis.redis_manager import RedisManager
+from ..redis.cache_layer import ChatCache
+from ...utils.runtime_stats import LatencyStats, register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+
+_ENSURE_SESSIONS_SQL = """
+INSERT INTO chat_sessions (id, session_id, user_id, character_name, session_name)
+SELECT * FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $2::text[])
+ON CONFLICT (session_id) DO NOTHING
+"""
+
+# 已软删的会话不再写入新消息（与原先 get_session 检查失败时放弃写入一致）
+_INSERT_MESSAGES_SQL = """
+INSERT INTO chat_messages (id, session_id, role, content, created_at, updated_at)
+SELECT m.id, m.session_id, m.role, m.content, m.created_at, m.created_at
+FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $5::timestamptz[])
+     AS m(id, session_id, role, content, created_at)
+WHERE NOT EXISTS (
+    SELECT 1 FROM chat_sessions s WHERE s.session_id = m.session_id AND s.deleted = TRUE
+)
+ON CONFLICT (id) DO NOTHING
+"""
+
+# asyncpg 不可用时的 psycopg2 版本（execute_values 展开 VALUES %s）
+_ENSURE_SESSIONS_SQL_SYNC = """
+INSERT INTO chat_sessions (id, session_id, user_id, character_name, session_name)
+VALUES %s
+ON CONFLICT (session_id) DO NOTHING
+"""
+
+_INSERT_MESSAGES_SQL_SYNC = """
+INSERT INTO chat_messages (id, session_id, role, content, created_at, updated_at)
+SELECT m.id, m.session_id, m.role, m.content, m.created_at, m.created_at
+FROM (VALUES %s) AS m(id, session_id, role, content, created_at)
+WHERE NOT EXISTS (
+    SELECT 1 FROM chat_sessions s WHERE s.session_id = m.session_id AND s.deleted = TRUE
+)
+ON CONFLICT (id) DO NOTHING
+"""
+
+_MAX_RETRY_DELAY_SECONDS = 30.0
+# 整批失败后逐条写入时，开头连续这么多行都失败就视为数据库不可用，整批退避重试
+_ROW_PROBE_LIMIT = 3
+# 同一行因非数据错误单独写入失败这么多次后移入死信（数据库长时间不可用时也会触发，死信可人工重放）
+_MAX_ROW_ATTEMPTS = 10
+# SQLSTATE 类别：22 数据异常（类型/编码/超长等），23 违反完整性约束
+_DATA_ERROR_SQLSTATE_CLASSES = ("22", "23")
+# 待写队列满时入队方最多等待的秒数，超时后改为同步写库
+_BACKPRESSURE_TIMEOUT_SECONDS = 5.0
+
+
+class MessageWriteBehind:
+    """消息待写队列 + 后台批量刷库任务"""
+
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        id_generator,
+        flush_interval: float = 0.5,
+        max_batch: int = 200,
+        max_pending: int = 10000,
+    ) -> None:
+        self.redis = redis_manager
+        self.cache = ChatCache(redis_manager)
+        self.id_generator = id_generator
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max(self.max_batch, max_pending)
+        self._wal_key = redis_manager._k("msg_wal")
+        self._dead_key = redis_manager._k("msg_dead")
+
+        # 消息 ID -> 待写条目，按入队顺序排列
+        self._pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_created_at: Optional[datetime] = None
+        # 消息 ID -> 单独写入失败次数
+        self._row_failures: Dict[int, int] = {}
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._space: Optional[asyncio.Event] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.recovered = 0
+        self.dead_lettered = 0
+        self.backpressure_waits = 0
+        self.sync_writes = 0
+        self.last_error: Optional[str] = None
+        self._flush_latency = LatencyStats()
+
+    # ---------- 入队 ----------
+
+    def _next_created_at(self) -> datetime:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if self._last_created_at is not None and now <= self._last_created_at:
+                now = self._last_created_at + timedelta(microseconds=1)
+            self._last_created_at = now
+        return now
+
+    async def enqueue(
+        self,
+        session_id: str,
+        user_id: str,
+        character_name: str,
+        role: str,
+        content: str,
+    ) -> Dict[str, Any]:
+        """登记一条消息，返回与 PG 行结构一致的 dict（不等待落库）"""
+        created_at = self._next_created_at()
+        entry = {
+            "id": self.id_generator.generate_id(),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "created_at": created_at,
+            "user_id": user_id,
+            "character_name": character_name,
+        }
+        if not await self._wait_for_space():
+            # 队列仍然满（数据库持续写不进去），这条不再入队，直接同步写库；失败抛给调用方
+            await self._write_batch([entry])
+            self.sync_writes += 1
+            row = _entry_to_row(entry)
+            try:
+                self.cache.append_messages(session_id, [row])
+            except Exception as e:
+                logger.warning(f"写入消息缓存失败: {e}")
+            return row
+
+        try:
+            self.redis.hset_json(self._wal_key, str(entry["id"]), entry)
+        except Exception as e:
+            logger.warning(f"写入消息待写日志失败，进程异常退出时该消息可能丢失: {e}")
+
+        with self._lock:
+            self._pending[entry["id"]] = entry
+            pending = len(self._pending)
+        self.enqueued += 1
+
+        row = _entry_to_row(entry)
+        try:
+            self.cache.append_messages(session_id, [row])
+        except Exception as e:
+            logger.warning(f"写入消息缓存失败: {e}")
+
+        self._ensure_started()
+        if pending >= self.max_batch:
+            self._wakeup.set()
+        return row
+
+    async def _wait_for_space(self) -> bool:
+        """待写队列满时等待后台刷库腾出空间，超时仍满返回 False"""
+        with self._lock:
+            full = len(self._pending) >= self.max_pending
+        if not full:
+            return True
+        self.backpressure_waits += 1
+        self._ensure_started()
+        if self._space is None:
+            self._space = asyncio.Event()
+        deadline = time.monotonic() + _BACKPRESSURE_TIMEOUT_SECONDS
+        while True:
+            with self._lock:
+                if len(self._pending) < self.max_pending:
+                    return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"消息待写队列已满（{self.max_pending} 条），改为同步写库")
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _remove_pending(self, ids: List[int]) -> None:
+        with self._lock:
+            for message_id in ids:
+                self._pending.pop(message_id, None)
+                self._row_failures.pop(message_id, None)
+            has_space = len(self._pending) < self.max_pending
+        if has_space and self._space is not None:
+            self._space.set()
+
+    def pending_for(self, session_id: str) -> List[Dict[str, Any]]:
+        """某会话尚未落库的消息（按入队顺序）"""
+        with self._lock:
+            entries = [e for e in self._pending.values() if e["session_id"] == session_id]
+        return [_entry_to_row(e) for e in entries]
+
+    def discard(self, message_id: int) -> bool:
+        """撤回一条尚未落库的消息，返回是否找到"""
+        with self._lock:
+            entry = self._pending.pop(message_id, None)
+            self._row_failures.pop(message_id, None)
+        if entry is None:
+            return False
+        try:
+            self.redis.hdel(self._wal_key, str(message_id))
+            self.cache.invalidate_messages(entry["session_id"])
+        except Exception as e:
+            logger.warning(f"撤回待写消息时清理缓存失败: {e}")
+        return True
+
+    # ---------- 后台刷库 ----------
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self) -> None:
+        """启动后台任务（会先恢复待写日志中遗留的消息）"""
+        self._ensure_started()
+
+    async def _run(self) -> None:
+        await self._recover()
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                break
+            if await self.flush():
+                delay = self.flush_interval
+            else:
+                delay = min(max(delay, self.flush_interval) * 2, _MAX_RETRY_DELAY_SECONDS)
+
+    async def _recover(self) -> None:
+        try:
+            stored = self.redis.hgetall_json(self._wal_key)
+        except Exception as e:
+            logger.warning(f"读取消息待写日志失败: {e}")
+            return
+        entries = []
+        for entry in stored.values():
+            if not isinstance(entry, dict) or "id" not in entry:
+                continue
+            entry["id"] = int(entry["id"])
+            if isinstance(entry.get("created_at"), str):
+                entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+            entries.append(entry)
+        if not entries:
+            return
+        # Snowflake ID 按时间递增，按 ID 排序即还原入队顺序
+        entries.sort(key=lambda e: e["id"])
+        with self._lock:
+            restored = OrderedDict((e["id"], e) for e in entries if e["id"] not in self._pending)
+            restored.update(self._pending)
+            self._pending = restored
+        self.recovered += len(entries)
+        logger.info(f"从待写日志恢复 {len(entries)} 条消息，等待写入数据库")
+
+    async def flush(self) -> bool:
+        """把当前待写消息全部写入 PG，失败返回 False（消息保留待重试）"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(itertools.islice(self._pending.values(), self.max_batch))
+                if not batch:
+                    return True
+
+                started = time.perf_counter()
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    logger.warning(f"批量写入聊天消息失败（{len(batch)} 条），改为逐条写入: {e}")
+                    if not await self._flush_rows(batch):
+                        return False
+                    continue
+                self._flush_latency.record((time.perf_counter() - started) * 1000)
+                self.flushed += len(batch)
+                self.batches += 1
+
+                self._remove_pending([e["id"] for e in batch])
+                self._after_flush(batch)
+
+                if len(batch) < self.max_batch:
+                    return True
+
+    async def _flush_rows(self, batch: List[Dict[str, Any]]) -> bool:
+        """整批失败后按顺序逐条写入，隔离写不进去的行
+
+        数据/约束错误的行立即移入死信；其它错误（连接中断、超时等）只累计次数，
+        行保留在队列中，达到 _MAX_ROW_ATTEMPTS 才移入死信。
+        返回 False 表示还有行因非数据错误失败，剩余的行保留待退避重试。
+        """
+        written: List[Dict[str, Any]] = []
+        dead: List[Dict[str, Any]] = []
+        retry: List[Dict[str, Any]] = []
+        for entry in batch:
+            if not written and len(retry) >= _ROW_PROBE_LIMIT:
+                break
+            try:
+                await self._write_batch([entry])
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"单条写入聊天消息失败（id={entry['id']}）: {e}")
+                if _is_data_error(e):
+                    dead.append(entry)
+                    continue
+                with self._lock:
+                    attempts = self._row_failures.get(entry["id"], 0) + 1
+                    self._row_failures[entry["id"]] = attempts
+                if attempts >= _MAX_ROW_ATTEMPTS:
+                    dead.append(entry)
+                else:
+                    retry.append(entry)
+                continue
+            written.append(entry)
+
+        if written:
+            self.flushed += len(written)
+            self._remove_pending([e["id"] for e in written])
+            self._after_flush(written)
+        if dead:
+            self._dead_letter(dead)
+        return not retry
+
+    def _dead_letter(self, entries: List[Dict[str, Any]]) -> None:
+        """移入死信：从待写队列和待写日志删除，保留在 msg_dead 中供人工排查重放"""
+        ids = [e["id"] for e in entries]
+        logger.error(f"{len(entries)} 条聊天消息无法写入数据库，已移入死信 {self._dead_key}: {ids}")
+        for entry in entries:
+            try:
+                self.redis.hset_json(self._dead_key, str(entry["id"]), entry)
+            except Exception as e:
+                logger.error(f"写入死信失败，消息已丢弃: {entry}: {e}")
+        self.dead_lettered += len(entries)
+        self._remove_pending(ids)
+        try:
+            self.redis.hdel(self._wal_key, *[str(i) for i in ids])
+        except Exception as e:
+            logger.warning(f"清理消息待写日志失败: {e}")
+
+    def _after_flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.redis.hdel(self._wal_key, *[str(e["id"]) for e in batch])
+        except Exception as e:
+            # 留在日志里只会导致重启时重放，插入是幂等的
+            logger.warning(f"清理消息待写日志失败: {e}")
+        # 会话列表按最后一条消息排序，落库后再失效，避免缓存住未包含新消息的结果
+        owners = {(e["user_id"], e["character_name"]) for e in batch if e.get("user_id")}
+        for user_id, character_name in owners:
+            try:
+                self.cache.invalidate_history_list(user_id, character_name)
+            except Exception as e:
+                logger.warning(f"失效会话列表缓存失败: {e}")
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        from .async_database_manager import get_async_db_manager
+
+        db = await get_async_db_manager()
+        sessions = _sessions_of(batch)
+        session_ids = [self.id_generator.generate_id() for _ in sessions]
+        if db is None:
+            await asyncio.to_thread(self._write_batch_sync, batch, sessions, session_ids)
+            return
+
+        async with db.transaction() as conn:
+            await db.execute(
+                _ENSURE_SESSIONS_SQL,
+                session_ids,
+                [s[0] for s in sessions],
+                [s[1] for s in sessions],
+                [s[2] for s in sessions],
+                conn=conn,
+            )
+            await db.execute(
+                _INSERT_MESSAGES_SQL,
+                [e["id"] for e in batch],
+                [e["session_id"] for e in batch],
+                [e["role"] for e in batch],
+                [e["content"] for e in batch],
+                [e["created_at"] for e in batch],
+                conn=conn,
+            )
+
+    def _write_batch_sync(self, batch, sessions, session_ids) -> None:
+        from psycopg2.extras import execute_values
+        from .database_manager import get_db_manager
+
+        db = get_db_manager()
+        conn = db.get_connection()
+        if conn is None:
+            raise RuntimeError("无法获取数据库连接")
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    _ENSURE_SESSIONS_SQL_SYNC,
+                    [(sid, s[0], s[1], s[2], s[0]) for sid, s in zip(session_ids, sessions)],
+                )
+                execute_values(
+                    cur,
+                    _INSERT_MESSAGES_SQL_SYNC,
+                    [(e["id"], e["session_id"], e["role"], e["content"], e["created_at"]) for e in batch],
+                    page_size=len(batch),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            db.return_connection(conn)
+
+    async def close(self) -> None:
+        """停止后台任务并刷入剩余消息"""
+        self._closing = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.warning(f"消息写入任务异常退出: {e}")
+            self._task = None
+        with self._lock:
+            pending = len(self._pending)
+        if pending and not await self.flush():
+            logger.error(f"关闭时仍有 {len(self._pending)} 条消息未写入，已保留在待写日志中，下次启动时重放")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+            oldest = next(iter(self._pending.values()), None)
+        oldest_age = 0.0
+        if oldest is not None:
+            oldest_age = (datetime.now(timezone.utc) - oldest["created_at"]).total_seconds()
+        return {
+            "pending": pending,
+            "oldest_pending_seconds": round(max(oldest_age, 0.0), 3),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "recovered": self.recovered,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+            "max_pending": self.max_pending,
+            "backpressure_waits": self.backpressure_waits,
+            "sync_writes": self.sync_writes,
+            "last_error": self.last_error,
+            "flush_latency": self._flush_latency.snapshot(),
+        }
+
+
+def _is_data_error(error: BaseException) -> bool:
+    """该行本身写不进去（重试也不会成功）：SQLSTATE 22/23，或参数无法编码"""
+    # asyncpg 异常带 sqlstate，psycopg2 异常带 pgcode
+    sqlstate = getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    if isinstance(sqlstate, str) and sqlstate[:2] in _DATA_ERROR_SQLSTATE_CLASSES:
+        return True
+    # 客户端侧参数编码失败（如文本含 NUL 字节、类型不匹配）
+    return isinstance(error, (ValueError, TypeError))
+
+
+def _entry_to_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": entry["id"],
+        "session_id": entry["session_id"],
+        "role": entry["role"],
+        "content": entry["content"],
+        "created_at": entry["created_at"],
+        "updated_at": entry["created_at"],
+        "deleted": False,
+    }
+
+
+def _sessions_of(batch: List[Dict[str, Any]]) -> List[tuple]:
+    """批次涉及的会话 (session_id, user_id, character_name)，按首次出现的顺序去重"""
+    seen: Dict[str, tuple] = {}
+    for e in batch:
+        if e["session_id"] not in seen:
+            seen[e["session_id"]] = (e["session_id"], e.get("user_id") or "", e.get("character_name") or "")
+    return list(seen.values())
+
+
+# 全局写入器实例
+_message_writer: Optional[MessageWriteBehind] = None
+_message_writer_disabled = False
+
+
+async def get_message_writer() -> Optional[MessageWriteBehind]:
+    """获取消息写入器，CHAT_WRITE_BEHIND_ENABLED=false 时返回 None（调用方直接写库）"""
+    global _message_writer, _message_writer_disabled
+    if _message_writer is not None or _message_writer_disabled:
+        return _message_writer
+    if os.getenv("CHAT_WRITE_BEHIND_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        _message_writer_disabled = True
+        logger.info("聊天消息写后台批量落库已禁用，消息逐条同步写入")
+        return None
+
+    from .database_manager import get_db_manager, get_redis_manager
+
+    sync_db = await asyncio.to_thread(get_db_manager)
+    if _message_writer is not None:
+        return _message_writer
+    try:
+        interval_ms = float(os.getenv("CHAT_WRITE_BEHIND_INTERVAL_MS", "500"))
+        max_batch = int(os.getenv("CHAT_WRITE_BEHIND_BATCH", "200"))
+        max_pending = int(os.getenv("CHAT_WRITE_BEHIND_MAX_PENDING", "10000"))
+    except ValueError:
+        logger.warning("CHAT_WRITE_BEHIND_INTERVAL_MS / CHAT_WRITE_BEHIND_BATCH / CHAT_WRITE_BEHIND_MAX_PENDING 无效，使用默认值")
+        interval_ms, max_batch, max_pending = 500.0, 200, 10000
+
+    writer = MessageWriteBehind(
+        get_redis_manager(),
+        sync_db.id_generator,
+        flush_interval=interval_ms / 1000,
+        max_batch=max_batch,
+        max_pending=max_pending,
+    )
+    _message_writer = writer
+    register_stats_provider("chat_message_writer", writer.get_stats)
+    await writer.start()
+    return writer
+
+
+def pending_messages(session_id: str) -> List[Dict[str, Any]]:
+    """某会话尚未落库的消息；写入器未启用时为空"""
+    if _message_writer is None:
+        return []
+    return _message_writer.pending_for(session_id)
+
+
+def discard_pending_message(message_id: int) -> bool:
+    """撤回尚未落库的消息，已落库（或写入器未启用）时返回 False"""
+    if _message_writer is None:
+        return False
+    return _message_writer.discard(message_id)
+
+
+async def close_message_writer() -> None:
+    global _message_writer
+    if _message_writer is not None:
+        await _message_writer.close()
+        _message_writer = None
@@ -5,6 +5,8 @@
   vtuber:session:<session_id>
 会话消息列表 key:
   vtuber:session_msgs:<session_id>
+历史会话列表 key（hash，field 为分页参数）:
+  vtuber:history_list:<user_id>:<character_name>
 """
 
 from __future__ import annotations
@@ -19,9 +21,15 @@ logger = logging.getLogger(__name__)
 
 
 class ChatCache:
-    def __init__(self, redis_manager: RedisManager, session_ttl_seconds: int = 3600) -> None:
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        session_ttl_seconds: int = 3600,
+        history_list_ttl_seconds: int = 600,
+    ) -> None:
         self.redis = redis_manager
         self.session_ttl_seconds = session_ttl_seconds
+        self.history_list_ttl_seconds = history_list_ttl_seconds
 
     def _session_key(self, session_id: str) -> str:
         return self.redis._k("session", session_id)
@@ -29,6 +37,9 @@ class ChatCache:
     def _messages_key(self, session_id: str) -> str:
         return self.redis._k("session_msgs", session_id)
 
+    def _history_list_key(self, user_id: str, character_name: str) -> str:
+        return self.redis._k("history_list", user_id, character_name)
+
     # -------- session cache --------
     def cache_session(self, session_id: str, session_obj: Dict[str, Any]) -> None:
         key = self._session_key(session_id)
@@ -57,4 +68,19 @@ class ChatCache:
     def invalidate_messages(self, session_id: str) -> None:
         self.redis.delete(self._messages_key(session_id))
 
-
+    # -------- history list cache --------
+    def cache_history_list(
+        self, user_id: str, character_name: str, page_key: str, rows: List[Dict[str, Any]]
+    ) -> None:
+        key = self._history_list_key(user_id, character_name)
+        self.redis.hset_json(key, page_key, rows, ex=self.history_list_ttl_seconds)
+
+    def get_cached_history_list(
+        self, user_id: str, character_name: str, page_key: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        data = self.redis.hget_json(self._history_list_key(user_id, character_name), page_key)
+        return data if isinstance(data, list) else None
+
+    def invalidate_history_list(self, user_id: str, character_name: str) -> None:
+        # 任一会话变化都会影响排序，整组分页一起失效
+        self.redis.delete(self._history_list_key(user_id, character_name))
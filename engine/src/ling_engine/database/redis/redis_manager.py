@@ -122,6 +122,42 @@ class RedisManager:
                 pass
         return result
 
+    # ---------- Hash helpers ----------
+    def hset_json(self, key: str, field: str, value: Any, ex: Optional[int] = None) -> None:
+        def _json_default(o: Any):
+            if isinstance(o, (datetime, date)):
+                return o.isoformat()
+            return str(o)
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(key, field, json.dumps(value, ensure_ascii=False, default=_json_default))
+        if ex:
+            pipe.expire(key, ex)
+        pipe.execute()
+
+    def hget_json(self, key: str, field: str) -> Optional[Any]:
+        data = self.client.hget(key, field)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except Exception:
+            return None
+
+    def hgetall_json(self, key: str) -> Dict[str, Any]:
+        raw = self.client.hgetall(key)
+        result: Dict[str, Any] = {}
+        for field, value in raw.items():
+            try:
+                result[field] = json.loads(value)
+            except Exception:
+                pass
+        return result
+
+    def hdel(self, key: str, *fields: str) -> None:
+        if fields:
+            self.client.hdel(key, *fields)
+
     def delete(self, *keys: str) -> None:
         if keys:
             self.client.delete(*keys)
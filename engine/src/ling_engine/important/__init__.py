@@ -1,4 +1,15 @@
-from .memories import save_memory, search_similar_memories, delete_memory, list_all_memories_simple
+from .memories import save_memory, search_similar_memories, search_similar_memories_async, delete_memory, list_all_memories_simple
 from .async_memory_saver import save_memory_async
 from .important import process_content
 from .client.client import get_openai_client
+
+__all__ = [
+    'save_memory',
+    'search_similar_memories',
+    'search_similar_memories_async',
+    'delete_memory',
+    'list_all_memories_simple',
+    'save_memory_async',
+    'process_content',
+    'get_openai_client',
+]
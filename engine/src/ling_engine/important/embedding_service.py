@@ -0,0 +1,367 @@
+"""
+Embedding 服务 — 异步、微批、带缓存
+
+原先每次保存/搜索记忆都同步 requests 调一次 Ollama /api/embed (失败再调 OpenAI)，
+召回路径放进默认线程池后经常在 200ms 超时前拿不到向量。这里:
+- 内容哈希 LRU (内存) + 可选 SQLite 磁盘层 (EMBEDDING_CACHE_DIR)，命中直接返回不走网络
+- 同一时间窗内的并发请求合并成一次 /api/embed 批量调用，相同文本只请求一次
+- 请求放在独立 future 上，调用方超时不会丢弃结果，下一次相同查询直接命中缓存
+- 模型和维度按集合固定: 缓存键包含 (集合, 模型, 维度)，维度不符的向量直接丢弃
+
+备用方案 (OpenAI) 产出的向量与主模型不在同一向量空间，只用于本次请求，不写入缓存。
+同步调用方 (线程池里的 save_memory 等) 通过 embed_sync 转交到服务所在事件循环上排队。
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import requests as _requests
+from loguru import logger
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "").strip()
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("EMBEDDING_MAX_BATCH", "32"))
+
+# fallback(texts) -> 与 texts 等长的向量列表，失败返回 None (同步函数，在线程中执行)
+FallbackFn = Callable[[List[str]], Optional[List[List[float]]]]
+
+
+class _DiskCache:
+    """SQLite 磁盘层: key -> float32 向量"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, array]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", list(keys),
+            ).fetchall()
+        result = {}
+        for key, blob in rows:
+            vec = array("f")
+            vec.frombytes(blob)
+            result[key] = vec
+        return result
+
+    def put_many(self, items: Sequence[Tuple[str, array]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, vec.tobytes(), now) for key, vec in items],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """单个 Qdrant 集合的 embedding 服务 (模型与维度固定)"""
+
+    def __init__(
+        self,
+        collection: str,
+        model: str,
+        dims: int,
+        base_url: str,
+        timeout: float = 30,
+        fallback: Optional[FallbackFn] = None,
+        cache_size: int = EMBEDDING_CACHE_SIZE,
+        cache_dir: str = EMBEDDING_CACHE_DIR,
+        batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_MAX_BATCH,
+    ):
+        self.collection = collection
+        self.model = model
+        self.dims = dims
+        self._url = f"{base_url.rstrip('/')}/api/embed"
+        self._timeout = timeout
+        self._fallback = fallback
+        self._cache_size = max(1, cache_size)
+        self._batch_window = max(0.0, batch_window_ms) / 1000
+        self._max_batch = max(1, max_batch)
+
+        self._mem: "OrderedDict[str, array]" = OrderedDict()
+        self._mem_lock = threading.Lock()
+        self._disk: Optional[_DiskCache] = None
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._disk = _DiskCache(os.path.join(cache_dir, f"embeddings_{collection}.sqlite3"))
+            except Exception as e:
+                logger.warning(f"Embedding 磁盘缓存不可用 ({cache_dir}): {e}")
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+        self._pending: "OrderedDict[str, Tuple[str, asyncio.Future]]" = OrderedDict()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self._primary_ok: Optional[bool] = None  # None = 未探测
+        self._stats = {
+            "hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+            "batches": 0, "batched_texts": 0, "fallback": 0, "errors": 0, "dims_rejected": 0,
+        }
+
+    # ── 缓存 ──────────────────────────────────────────────────────
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.collection}:{self.model}:{self.dims}:{digest}"
+
+    def _mem_get(self, key: str) -> Optional[array]:
+        with self._mem_lock:
+            vec = self._mem.get(key)
+            if vec is not None:
+                self._mem.move_to_end(key)
+            return vec
+
+    def _mem_put(self, key: str, vec: array) -> None:
+        with self._mem_lock:
+            self._mem[key] = vec
+            self._mem.move_to_end(key)
+            while len(self._mem) > self._cache_size:
+                self._mem.popitem(last=False)
+
+    def _accept(self, vectors, expected: int) -> Optional[List[array]]:
+        """校验批量结果: 条数一致且每条维度等于固定维度"""
+        if not vectors or len(vectors) != expected:
+            return None
+        out = []
+        for vec in vectors:
+            if len(vec) != self.dims:
+                self._stats["dims_rejected"] += 1
+                logger.error(
+                    f"Embedding 维度不符: 集合 {self.collection} 固定 {self.dims} 维, 实际 {len(vec)} 维"
+                )
+                return None
+            out.append(array("f", vec))
+        return out
+
+    def _log_primary(self, ok: bool, detail: str = "") -> None:
+        if ok and self._primary_ok is not True:
+            logger.info(f"Ollama embedding 可用: model={self.model}, dims={self.dims}")
+        elif not ok and self._primary_ok is not False:
+            logger.warning(f"Ollama embedding 不可用: {detail}")
+        self._primary_ok = ok
+
+    # ── 异步接口 ──────────────────────────────────────────────────
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量取向量; 缓存未命中的文本并入当前批次 (调用方取消不影响批次本身)"""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        keys = [self._key(t) for t in texts]
+        results: List[Optional[array]] = [self._mem_get(k) for k in keys]
+
+        missing = [i for i, vec in enumerate(results) if vec is None]
+        self._stats["hits"] += len(texts) - len(missing)
+        if missing and self._disk is not None:
+            try:
+                found = await asyncio.to_thread(self._disk.get_many, [keys[i] for i in missing])
+            except Exception as e:
+                logger.debug(f"Embedding 磁盘缓存读取失败: {e}")
+                found = {}
+            for i in missing:
+                vec = found.get(keys[i])
+                if vec is not None and len(vec) == self.dims:
+                    results[i] = vec
+                    self._mem_put(keys[i], vec)
+                    self._stats["disk_hits"] += 1
+            missing = [i for i in missing if results[i] is None]
+
+        futures = {}
+        for i in missing:
+            key = keys[i]
+            if key in futures:
+                continue
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._stats["coalesced"] += 1
+                futures[key] = pending[1]
+                continue
+            self._stats["misses"] += 1
+            fut = loop.create_future()
+            self._pending[key] = (texts[i], fut)
+            futures[key] = fut
+            if len(self._pending) >= self._max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self._batch_window, self._flush)
+
+        if futures:
+            done = await asyncio.gather(*(asyncio.shield(f) for f in futures.values()))
+            by_key = dict(zip(futures.keys(), done))
+            for i in missing:
+                results[i] = by_key[keys[i]]
+
+        return [list(vec) if vec is not None else None for vec in results]
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self._max_batch:
+                batch.append(self._pending.popitem(last=False))
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, Tuple[str, asyncio.Future]]]) -> None:
+        keys = [key for key, _ in batch]
+        texts = [text for _, (text, _) in batch]
+        futures = [fut for _, (_, fut) in batch]
+        self._stats["batches"] += 1
+        self._stats["batched_texts"] += len(batch)
+
+        vectors = None
+        cacheable = False
+        try:
+            vectors = self._accept(await self._post_ollama(texts), len(texts))
+            cacheable = vectors is not None
+            self._log_primary(cacheable, "维度或条数不符")
+        except Exception as e:
+            self._log_primary(False, str(e))
+
+        if vectors is None and self._fallback is not None:
+            try:
+                vectors = self._accept(await asyncio.to_thread(self._fallback, texts), len(texts))
+                if vectors is not None:
+                    self._stats["fallback"] += len(texts)
+            except Exception as e:
+                logger.warning(f"Embedding 备用方案失败: {type(e).__name__} - {str(e)[:200]}")
+
+        if vectors is None:
+            self._stats["errors"] += len(texts)
+            logger.error("所有 embedding 方案均失败")
+        elif cacheable:
+            for key, vec in zip(keys, vectors):
+                self._mem_put(key, vec)
+            if self._disk is not None:
+                try:
+                    await asyncio.to_thread(self._disk.put_many, list(zip(keys, vectors)))
+                except Exception as e:
+                    logger.debug(f"Embedding 磁盘缓存写入失败: {e}")
+
+        for i, fut in enumerate(futures):
+            if not fut.done():
+                fut.set_result(vectors[i] if vectors is not None else None)
+
+    async def _post_ollama(self, texts: List[str]) -> list:
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        async with self._session.post(self._url, json={"model": self.model, "input": texts}) as resp:
+            resp.raise_for_status()
+            payload = await resp.json()
+        return payload.get("embeddings", [])
+
+    # ── 同步接口 ──────────────────────────────────────────────────
+
+    def embed_sync(self, text: str, timeout: Optional[float] = None) -> Optional[List[float]]:
+        """供线程池中的同步代码调用: 命中缓存直接返回，否则交给服务所在事件循环排队"""
+        vec = self._mem_get(self._key(text))
+        if vec is not None:
+            self._stats["hits"] += 1
+            return list(vec)
+
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not None and loop.is_running() and running is not loop:
+            future = asyncio.run_coroutine_threadsafe(self.embed(text), loop)
+            return future.result(timeout)
+
+        # 没有可用的事件循环 (脚本/测试)，或在事件循环线程内同步调用: 直接同步请求
+        return self._embed_blocking(text)
+
+    def _embed_blocking(self, text: str) -> Optional[List[float]]:
+        self._stats["misses"] += 1
+        try:
+            resp = _requests.post(self._url, json={"model": self.model, "input": text}, timeout=self._timeout)
+            resp.raise_for_status()
+            vectors = self._accept(resp.json().get("embeddings", []), 1)
+            self._log_primary(vectors is not None, "维度或条数不符")
+            if vectors is not None:
+                key = self._key(text)
+                self._mem_put(key, vectors[0])
+                if self._disk is not None:
+                    self._disk.put_many([(key, vectors[0])])
+                return list(vectors[0])
+        except Exception as e:
+            self._log_primary(False, str(e))
+
+        if self._fallback is not None:
+            try:
+                vectors = self._accept(self._fallback([text]), 1)
+                if vectors is not None:
+                    self._stats["fallback"] += 1
+                    return list(vectors[0])
+            except Exception as e:
+                logger.warning(f"Embedding 备用方案失败: {type(e).__name__} - {str(e)[:200]}")
+        self._stats["errors"] += 1
+        logger.error("所有 embedding 方案均失败")
+        return None
+
+    # ── 生命周期 / 指标 ───────────────────────────────────────────
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """绑定服务所在事件循环 (启动时调用，之后线程池里的同步调用也会走批量路径)"""
+        self._loop = loop
+
+    async def close(self) -> None:
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def get_stats(self) -> Dict:
+        batches = self._stats["batches"]
+        lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "collection": self.collection,
+            "model": self.model,
+            "dims": self.dims,
+            "cached": len(self._mem),
+            "hit_rate": round((self._stats["hits"] + self._stats["disk_hits"]) / lookups, 4) if lookups else 0.0,
+            "avg_batch_size": round(self._stats["batched_texts"] / batches, 2) if batches else 0.0,
+        }
@@ -5,11 +5,12 @@ import time
 import re
 import math
 import hashlib
-import requests as _requests
+import asyncio
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams
 from .important import process_content
 from .client.client import get_openai_client
+from .embedding_service import EmbeddingService
 from dotenv import load_dotenv
 from difflib import SequenceMatcher
 from loguru import logger
@@ -38,8 +39,6 @@ OPENAI_EMBEDDING_MODEL = os.environ.get("OPENAI_EMBEDDING_MODEL", "text-embeddin
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://qdrant:6333")
 COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "openmemory")
 
-_ollama_available = None  # None = untested, True/False = tested
-
 # 向量维度取 Ollama 配置（主力）
 OPENAI_EMBEDDING_MODEL_DIMS = OLLAMA_EMBEDDING_DIMS
 
@@ -79,45 +78,27 @@ class Memory:
         self.is_deleted = is_deleted
 
 
-from ..utils.token_counter import token_stats, TokenCalculator, TokenUsage
-
+from ..utils.token_counter import token_stats, get_token_calculator, TokenUsage
 
-def _ollama_embedding(content: str) -> list | None:
-    """通过 Ollama 本地模型生成 embedding（主力方案，免费、快速、无 API key）。"""
-    global _ollama_available
-    try:
-        resp = _requests.post(
-            f"{OLLAMA_BASE_URL}/api/embed",
-            json={"model": OLLAMA_EMBEDDING_MODEL, "input": content},
-            timeout=OLLAMA_EMBEDDING_TIMEOUT,
-        )
-        resp.raise_for_status()
-        embeddings = resp.json().get("embeddings", [])
-        if embeddings and len(embeddings[0]) > 0:
-            if _ollama_available is not True:
-                logger.info(f"Ollama embedding 可用: model={OLLAMA_EMBEDDING_MODEL}, dims={len(embeddings[0])}")
-                _ollama_available = True
-            return embeddings[0]
-        logger.warning("Ollama 返回空 embedding")
-        return None
-    except Exception as e:
-        if _ollama_available is not False:
-            logger.warning(f"Ollama embedding 不可用: {e}")
-            _ollama_available = False
-        return None
 
+def _openai_embeddings(contents: list) -> list | None:
+    """通过 OpenAI API 批量生成 embedding（备用方案）。
 
-def _openai_embedding(content: str) -> list | None:
-    """通过 OpenAI API 生成 embedding（备用方案）。"""
+    text-embedding-3 系列按集合固定的维度请求，保证能写入同一个 Qdrant 集合。
+    """
     if client is None:
         return None
     try:
-        calculator = TokenCalculator(OPENAI_EMBEDDING_MODEL)
-        input_tokens = calculator.count_tokens(content)
+        calculator = get_token_calculator(OPENAI_EMBEDDING_MODEL)
+        input_tokens = sum(calculator.count_tokens(content) for content in contents)
 
+        extra = {}
+        if OPENAI_EMBEDDING_MODEL.startswith("text-embedding-3"):
+            extra["dimensions"] = OPENAI_EMBEDDING_MODEL_DIMS
         response = client.embeddings.create(
             model=OPENAI_EMBEDDING_MODEL,
-            input=content,
+            input=contents,
+            **extra,
         )
 
         usage = TokenUsage(input_tokens, 0, input_tokens)
@@ -129,33 +110,64 @@ def _openai_embedding(content: str) -> list | None:
             metadata={
                 "service_type": "embedding",
                 "model": OPENAI_EMBEDDING_MODEL,
-                "content_length": len(content),
+                "content_length": sum(len(content) for content in contents),
             },
         )
         logger.debug(
             f"[Token跟踪] 嵌入模型: {OPENAI_EMBEDDING_MODEL}, Token: {input_tokens}, "
             f"成本: ${cost_info.total_cost:.6f}"
         )
-        return response.data[0].embedding
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
     except Exception as e:
         logger.warning(f"OpenAI embedding 失败: {type(e).__name__} - {str(e)[:200]}")
         return None
 
 
+_embedding_service = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """记忆集合的 embedding 服务单例（Ollama 主力 + OpenAI 备用，保存与召回共用缓存和批次）"""
+    global _embedding_service
+    if _embedding_service is None:
+        from ..utils.runtime_stats import register_stats_provider
+
+        _embedding_service = EmbeddingService(
+            collection=COLLECTION_NAME,
+            model=OLLAMA_EMBEDDING_MODEL,
+            dims=OPENAI_EMBEDDING_MODEL_DIMS,
+            base_url=OLLAMA_BASE_URL,
+            timeout=OLLAMA_EMBEDDING_TIMEOUT,
+            fallback=_openai_embeddings,
+        )
+        register_stats_provider("embedding_service", _embedding_service.get_stats)
+    return _embedding_service
+
+
+async def start_embedding_service():
+    """在服务事件循环上启动 embedding 服务（之后线程池中的保存也走批量路径）"""
+    get_embedding_service().bind_loop(asyncio.get_running_loop())
+
+
+async def close_embedding_service():
+    global _embedding_service
+    if _embedding_service is not None:
+        await _embedding_service.close()
+        _embedding_service = None
+
+
 def create_embedding(content):
-    """生成文本的嵌入向量。优先级: Ollama 本地 > OpenAI API。"""
-    # 1. Ollama 本地（主力，免费）
-    result = _ollama_embedding(content)
-    if result is not None:
-        return result
+    """生成文本的嵌入向量。优先级: 缓存 > Ollama 本地 > OpenAI API。"""
+    try:
+        return get_embedding_service().embed_sync(content, timeout=OLLAMA_EMBEDDING_TIMEOUT + 5)
+    except Exception as e:
+        logger.error(f"生成嵌入向量失败: {type(e).__name__} - {e}")
+        return None
 
-    # 2. OpenAI API（备用）
-    result = _openai_embedding(content)
-    if result is not None:
-        return result
 
-    logger.error("所有 embedding 方案均失败")
-    return None
+async def create_embedding_async(content):
+    """异步生成文本的嵌入向量（召回路径使用，超时取消不会丢弃批次结果）"""
+    return await get_embedding_service().embed(content)
 
 
 def save_memory(content, user_id=None):
@@ -288,24 +300,79 @@ def calculate_text_similarity(text1, text2):
     return SequenceMatcher(None, text1, text2).ratio()
 
 
-def search_similar_memories(query, user_id=None, limit=5):
-    """搜索相似的记忆（纯 Qdrant）"""
-
+def _resolve_search_user(user_id):
+    """记忆搜索的用户 ID：未提供时从用户上下文获取，拒绝默认用户"""
     if not user_id:
         try:
             from ..bff_integration.auth.user_context import UserContextManager
             user_id = UserContextManager.get_current_user_id()
             if not user_id:
                 logger.error("❌ 记忆搜索：无法获取用户ID，返回空结果")
-                return []
+                return None
             else:
                 logger.debug(f"✅ 记忆搜索：从用户上下文获取用户ID: {user_id}")
         except Exception as e:
             logger.error(f"❌ 记忆搜索：获取用户上下文失败，返回空结果: {e}")
-            return []
+            return None
 
     if user_id == "default_user":
         logger.error("❌ 记忆搜索：拒绝使用默认用户ID，这会导致用户间记忆混淆")
+        return None
+    return user_id
+
+
+def _query_memories(query_embedding, user_id, limit):
+    """用查询向量检索用户记忆并综合排序"""
+    limit = int(limit)
+
+    try:
+        search_result = client_qdrant.query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_embedding,
+            limit=limit,
+            with_payload=True,
+            query_filter={
+                "must": [
+                    {"key": "is_deleted", "match": {"value": False}}
+                ] + [{"key": "user_id", "match": {"value": user_id}}]
+            }
+        )
+    except Exception as e:
+        logger.error(f"Qdrant查询出错: {str(e)}")
+        return []
+
+    results = []
+    for point in search_result.points:
+        results.append({
+            'id': point.id,
+            'summary': point.payload.get("summary", ""),
+            'user_id': point.payload.get("user_id", ""),
+            'created_at': point.payload.get("created_at", ""),
+            'updated_at': point.payload.get("updated_at", point.payload.get("created_at", "")),
+            'weight': point.payload.get("weight", 5),
+            'triples': point.payload.get('triples', []),
+            'score': getattr(point, 'score', 0.0),
+        })
+
+    # 综合排序
+    results.sort(
+        key=lambda x: calculate_combined_score(
+            x['created_at'] if x['created_at'] else "",
+            x.get('weight', 5),
+            x.get('score', 0.0),
+        ),
+        reverse=True
+    )
+
+    final_results = results[:limit]
+    return [(item['id'], item['summary'], item['user_id'], item['created_at'],
+             item['updated_at'], item.get('triples', [])) for item in final_results]
+
+
+def search_similar_memories(query, user_id=None, limit=5):
+    """搜索相似的记忆（纯 Qdrant）"""
+    user_id = _resolve_search_user(user_id)
+    if not user_id:
         return []
 
     logger.debug(f"搜索记忆: 查询='{query[:50]}...' 用户ID={user_id} 限制={limit}")
@@ -320,50 +387,32 @@ def search_similar_memories(query, user_id=None, limit=5):
             logger.warning("无法为查询创建嵌入向量，返回空结果")
             return []
 
-        limit = int(limit)
+        return _query_memories(query_embedding, user_id, limit)
 
-        try:
-            search_result = client_qdrant.query_points(
-                collection_name=COLLECTION_NAME,
-                query=query_embedding,
-                limit=limit,
-                with_payload=True,
-                query_filter={
-                    "must": [
-                        {"key": "is_deleted", "match": {"value": False}}
-                    ] + [{"key": "user_id", "match": {"value": user_id}}]
-                }
-            )
-        except Exception as e:
-            logger.error(f"Qdrant查询出错: {str(e)}")
-            return []
+    except Exception as e:
+        logger.error(f"搜索记忆时出错: {str(e)}")
+        return []
 
-        results = []
-        for point in search_result.points:
-            results.append({
-                'id': point.id,
-                'summary': point.payload.get("summary", ""),
-                'user_id': point.payload.get("user_id", ""),
-                'created_at': point.payload.get("created_at", ""),
-                'updated_at': point.payload.get("updated_at", point.payload.get("created_at", "")),
-                'weight': point.payload.get("weight", 5),
-                'triples': point.payload.get('triples', []),
-                'score': getattr(point, 'score', 0.0),
-            })
 
-        # 综合排序
-        results.sort(
-            key=lambda x: calculate_combined_score(
-                x['created_at'] if x['created_at'] else "",
-                x.get('weight', 5),
-                x.get('score', 0.0),
-            ),
-            reverse=True
-        )
+async def search_similar_memories_async(query, user_id=None, limit=5):
+    """搜索相似的记忆（异步版本：向量走 embedding 服务，Qdrant 查询放到线程池）"""
+    user_id = _resolve_search_user(user_id)
+    if not user_id:
+        return []
+
+    logger.debug(f"搜索记忆: 查询='{query[:50]}...' 用户ID={user_id} 限制={limit}")
+
+    try:
+        if client is None or client_qdrant is None:
+            logger.warning("记忆系统客户端未初始化，返回空结果")
+            return []
+
+        query_embedding = await create_embedding_async(query)
+        if query_embedding is None:
+            logger.warning("无法为查询创建嵌入向量，返回空结果")
+            return []
 
-        final_results = results[:limit]
-        return [(item['id'], item['summary'], item['user_id'], item['created_at'],
-                 item['updated_at'], item.get('triples', [])) for item in final_results]
+        return await asyncio.to_thread(_query_memories, query_embedding, user_id, limit)
 
     except Exception as e:
         logger.error(f"搜索记忆时出错: {str(e)}")
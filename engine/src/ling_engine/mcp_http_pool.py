@@ -0,0 +1,227 @@
+"""MCP 工具调用的共享 HTTP 连接池
+
+MCP 工具调用、工具搜索原先每次都新建 aiohttp.ClientSession，每次调用都要重新
+DNS 解析 + TCP/TLS 握手，连接无法复用。这里维护一个进程级共享会话:
+
+- TCPConnector: 总连接数 / 单 host 连接数上限、keep-alive、DNS 缓存
+- 会话在首次使用时于当前事件循环内创建，循环变化或被关闭后自动重建
+- aiohttp TraceConfig 统计新建/复用连接、排队等待 (连接池饱和) 与 DNS 缓存命中
+- track(tool) 按工具记录调用耗时直方图与失败次数
+
+MCPManager 持有并负责关闭，MCPSearchTool 通过 get_mcp_http_pool() 共用同一个池；
+统计通过 runtime_stats 的 "mcp_http_pool" 输出。
+
+环境变量:
+    MCP_HTTP_POOL_LIMIT            总连接数上限 (默认 100)
+    MCP_HTTP_POOL_LIMIT_PER_HOST   单 host 连接数上限 (默认 20)
+    MCP_HTTP_KEEPALIVE_SEC         空闲连接保活时间 (默认 30)
+    MCP_HTTP_DNS_TTL_SEC           DNS 缓存时间 (默认 300)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+from .utils.runtime_stats import register_stats_provider
+
+# 直方图桶上界 (毫秒)，最后一个桶收纳更慢的调用
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图，内存占用与调用次数无关"""
+
+    __slots__ = ("counts", "count", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float, error: bool = False) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if error:
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}ms" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class MCPHttpPool:
+    """进程内共享的 aiohttp 会话 + 连接池统计"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        dns_ttl: Optional[int] = None,
+    ):
+        self.limit = limit if limit is not None else int(os.getenv("MCP_HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = (
+            limit_per_host if limit_per_host is not None
+            else int(os.getenv("MCP_HTTP_POOL_LIMIT_PER_HOST", "20"))
+        )
+        self.keepalive_timeout = (
+            keepalive_timeout if keepalive_timeout is not None
+            else float(os.getenv("MCP_HTTP_KEEPALIVE_SEC", "30"))
+        )
+        self.dns_ttl = dns_ttl if dns_ttl is not None else int(os.getenv("MCP_HTTP_DNS_TTL_SEC", "300"))
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            "sessions_created": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "queued": 0,
+            "queue_wait_ms": 0.0,
+            "queue_wait_max_ms": 0.0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    # ── 会话 ──────────────────────────────────────────────────────
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        stats = self._stats
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.perf_counter()
+            stats["queued"] += 1
+
+        async def on_queued_end(session, ctx, params):
+            waited = (time.perf_counter() - getattr(ctx, "queued_at", time.perf_counter())) * 1000
+            stats["queue_wait_ms"] += waited
+            if waited > stats["queue_wait_max_ms"]:
+                stats["queue_wait_max_ms"] = waited
+
+        async def on_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+
+        async def on_reuse(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        async def on_dns_hit(session, ctx, params):
+            stats["dns_cache_hits"] += 1
+
+        async def on_dns_miss(session, ctx, params):
+            stats["dns_cache_misses"] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_queued_start.append(on_queued_start)
+        trace.on_connection_queued_end.append(on_queued_end)
+        trace.on_connection_create_end.append(on_create_end)
+        trace.on_connection_reuseconn.append(on_reuse)
+        trace.on_dns_cache_hit.append(on_dns_hit)
+        trace.on_dns_cache_miss.append(on_dns_miss)
+        return trace
+
+    def session(self) -> aiohttp.ClientSession:
+        """当前事件循环内的共享会话 (需在协程中调用)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self._trace_config()],
+            )
+            self._loop = loop
+            self._stats["sessions_created"] += 1
+        return self._session
+
+    @asynccontextmanager
+    async def track(self, tool: str) -> AsyncIterator[aiohttp.ClientSession]:
+        """借用共享会话并把整段调用耗时记到 tool 的直方图上
+
+        会话是共享的，块结束时不会关闭。
+        """
+        session = self.session()
+        started = time.perf_counter()
+        error = False
+        self._in_flight += 1
+        try:
+            yield session
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._in_flight -= 1
+            ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                hist = self._histograms.get(tool)
+                if hist is None:
+                    hist = self._histograms[tool] = LatencyHistogram()
+                hist.record(ms, error)
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("MCP HTTP 连接池已关闭")
+
+    # ── 统计 ──────────────────────────────────────────────────────
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["queue_wait_ms"] = round(stats["queue_wait_ms"], 2)
+        stats["queue_wait_max_ms"] = round(stats["queue_wait_max_ms"], 2)
+        session = self._session
+        stats.update({
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "in_flight_calls": self._in_flight,
+            "open": session is not None and not session.closed,
+        })
+        with self._lock:
+            stats["tools"] = {name: h.snapshot() for name, h in self._histograms.items()}
+        return stats
+
+
+_pool: Optional[MCPHttpPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_mcp_http_pool() -> MCPHttpPool:
+    """获取进程级共享连接池 (首次调用时创建并注册统计)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MCPHttpPool()
+                register_stats_provider("mcp_http_pool", _pool.get_stats)
+    return _pool
+
+
+async def close_mcp_http_pool() -> None:
+    """关闭共享连接池 (应用关闭时调用)；之后再次使用会自动重建会话"""
+    if _pool is not None:
+        await _pool.close()
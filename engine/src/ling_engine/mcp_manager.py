@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Any
 from loguru import logger
 from datetime import datetime
 
+from .mcp_http_pool import get_mcp_http_pool
+
 
 class MCPManager:
     """MCP工具管理器，类似Cursor的MCP配置管理"""
@@ -17,6 +19,8 @@ class MCPManager:
         self.search_api_url = self.config.get("searchApiUrl", "http://13.54.95.72:8080/mcp/search/agent")
         # 添加设备级session管理：key格式为 "user_id_client_uid_tool_name"
         self.device_sessions = {}  # 存储每个设备的session信息
+        # 共享 HTTP 连接池（keep-alive + DNS 缓存），与 MCPSearchTool 共用
+        self.http_pool = get_mcp_http_pool()
         logger.info(f"MCP Manager使用搜索API URL: {self.search_api_url}")
 
     def _load_config(self) -> Dict[str, Any]:
@@ -111,7 +115,7 @@ class MCPManager:
             payload = {"requirement": requirement}
             logger.info(f"Searching for new MCP tools with requirement: {requirement}")
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http_pool.track("mcp_search") as session:
                 async with session.post(search_url, json=payload) as response:
                     if response.status == 200:
                         result = await response.json()
@@ -265,7 +269,7 @@ class MCPManager:
             logger.info(f"Calling MCP tool for device {client_uid} (user: {user_id}): {tool_name}")
             logger.info(f"Tool URL: {tool_url}, Type: {'SSE' if is_sse else 'Regular'}")
 
-            async with aiohttp.ClientSession() as session:
+            async with self.http_pool.track(tool_name) as session:
                 if is_sse:
                     # 检查是否有现有的设备session
                     existing_session_id = self.get_device_session(user_id, client_uid, tool_name)
@@ -373,7 +377,7 @@ class MCPManager:
             logger.info(f"Tool type: {'SSE' if is_sse else 'Regular'}")
             logger.info(f"Request requirement: {requirement}")
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http_pool.track(tool_config.get("name") or tool_url) as session:
                 if is_sse:
                     # 对于 SSE 工具，将参数添加到 URL 中
                     params = {"requirement": requirement}
@@ -618,7 +622,7 @@ class MCPManager:
                 }
                 return
 
-            async with aiohttp.ClientSession() as session:
+            async with self.http_pool.track(tool_name) as session:
                 if is_sse:
                     # SSE工具的流式处理（使用设备级session）
                     async for result in self._handle_sse_stream(session, tool_url, tool_name, requirement):
@@ -680,7 +684,7 @@ class MCPManager:
             
             is_sse = tool_config.get("type", "").lower() == "sse"
             
-            async with aiohttp.ClientSession() as session:
+            async with self.http_pool.track(tool_name) as session:
                 if is_sse:
                     # SSE工具的流式处理
                     async for result in self._handle_sse_stream(session, tool_url, tool_name, requirement):
@@ -867,6 +871,10 @@ class MCPManager:
                 "tool_name": tool_name
             }
     
+    async def close(self) -> None:
+        """关闭共享 HTTP 连接池"""
+        await self.http_pool.close()
+
     async def find_matching_tool_async(self, requirement: str) -> Optional[Dict[str, Any]]:
         """异步版本的find_matching_tool方法"""
         return self.find_matching_tool(requirement)
@@ -0,0 +1,188 @@
+"""MCP 工具搜索结果缓存 — 有界 LRU + TTL + 倒排索引 + single-flight
+
+原先 `_search_cache` / `_last_search_time` 是无淘汰的字典，每次搜索还要对所有缓存键
+逐个算 Jaccard 相似度。这里:
+
+- 条目数上限 + TTL，超出按 LRU 淘汰，用户再多内存也有界
+- 需求文本归一化后取字符 bigram，倒排索引 bigram → 条目，
+  近似需求只需统计共享 bigram 的候选，不扫描全部缓存
+- 同一作用域 (用户 + 工具类型) 内才复用近似结果
+- 相同需求的并发搜索只发起一次上游调用，其余等待同一任务 (single-flight)
+
+环境变量:
+    MCP_SEARCH_CACHE_MAX        最多缓存的搜索结果数 (默认 512)
+    MCP_SEARCH_CACHE_TTL_SEC    成功结果有效期 (默认 300)
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Set, Tuple
+
+from .soul.cache.recall_cache import normalize_query
+
+CacheKey = Tuple[str, str]  # (scope, 归一化需求)
+
+
+def requirement_tokens(text: str) -> FrozenSet[str]:
+    """归一化文本的字符 bigram (中文无空格分词时同样有效)"""
+    norm = normalize_query(text)
+    if len(norm) < 2:
+        return frozenset({norm}) if norm else frozenset()
+    return frozenset(norm[i:i + 2] for i in range(len(norm) - 1))
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tokens")
+
+    def __init__(self, value: Any, expires_at: float, tokens: FrozenSet[str]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tokens = tokens
+
+
+class MCPSearchCache:
+    """按 (scope, 需求) 缓存搜索结果，支持近似需求命中"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        similarity_threshold: float = 0.8,
+    ):
+        self.max_entries = max(1, max_entries if max_entries is not None
+                               else int(os.getenv("MCP_SEARCH_CACHE_MAX", "512")))
+        self.ttl = ttl if ttl is not None else float(os.getenv("MCP_SEARCH_CACHE_TTL_SEC", "300"))
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # (scope, bigram) → 含该 bigram 的缓存键
+        self._index: Dict[Tuple[str, str], Set[CacheKey]] = {}
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._stats = {"hits": 0, "similar_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ── 索引维护 ──────────────────────────────────────────────────
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        scope = key[0]
+        for token in entry.tokens:
+            posting = self._index.get((scope, token))
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._index[(scope, token)]
+
+    def put(self, scope: str, requirement: str, value: Any, ttl: Optional[float] = None) -> None:
+        key = (scope, normalize_query(requirement))
+        self._remove(key)
+        tokens = requirement_tokens(requirement)
+        self._entries[key] = _Entry(value, time.monotonic() + (self.ttl if ttl is None else ttl), tokens)
+        for token in tokens:
+            self._index.setdefault((scope, token), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    # ── 查询 ──────────────────────────────────────────────────────
+
+    def _live(self, key: CacheKey, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _find_similar(self, scope: str, tokens: FrozenSet[str], now: float) -> Optional[_Entry]:
+        """倒排索引统计共享 bigram 数，Jaccard 超过阈值的最相似条目"""
+        if not tokens:
+            return None
+        overlap: Dict[CacheKey, int] = {}
+        for token in tokens:
+            for key in self._index.get((scope, token), ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        best_key, best_score = None, self.similarity_threshold
+        n = len(tokens)
+        expired = []
+        for key, inter in overlap.items():
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                # 过期条目不参与排名，否则最相似的恰好过期时会掩盖次优的有效条目
+                expired.append(key)
+                continue
+            score = inter / (n + len(entry.tokens) - inter)
+            if score > best_score:
+                best_key, best_score = key, score
+        for key in expired:
+            self._remove(key)
+        return self._live(best_key, now) if best_key is not None else None
+
+    def get(self, scope: str, requirement: str) -> Optional[Any]:
+        """精确命中优先，其次同 scope 内的近似需求；都没有返回 None"""
+        now = time.monotonic()
+        entry = self._live((scope, normalize_query(requirement)), now)
+        if entry is not None:
+            self._stats["hits"] += 1
+            return entry.value
+        entry = self._find_similar(scope, requirement_tokens(requirement), now)
+        if entry is not None:
+            self._stats["similar_hits"] += 1
+            return entry.value
+        return None
+
+    async def get_or_load(
+        self,
+        scope: str,
+        requirement: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_for: Optional[Callable[[Any], Optional[float]]] = None,
+    ) -> Any:
+        """缓存未命中时调用 loader；相同需求的并发调用共享同一次加载
+
+        加载在独立任务里并用 shield 等待: 发起方被取消时加载仍会完成并写入缓存。
+        ttl_for(result) 可为单个结果指定有效期 (如失败结果更短)。
+        """
+        cached = self.get(scope, requirement)
+        if cached is not None:
+            return cached
+
+        key = (scope, normalize_query(requirement))
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["misses"] += 1
+            task = asyncio.create_task(loader())
+            self._inflight[key] = task
+
+            def _done(t: asyncio.Task) -> None:
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled() and t.exception() is None:
+                    result = t.result()
+                    self.put(scope, requirement, result, ttl_for(result) if ttl_for else None)
+
+            task.add_done_callback(_done)
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "index_tokens": len(self._index),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl,
+        }
@@ -13,6 +13,10 @@ from datetime import datetime
 import os
 import time  # Added for time.time()
 
+from .mcp_http_pool import get_mcp_http_pool
+from .mcp_search_cache import MCPSearchCache
+from .utils.runtime_stats import register_stats_provider
+
 
 class MCPSearchTool:
     """MCP搜索工具 - 用于获取新的MCP工具"""
@@ -31,12 +35,11 @@ class MCPSearchTool:
         # 存储工具的定时删除任务
         self._deletion_tasks = {}
 
-        # 添加搜索缓存相关属性
-        self._search_cache = {}  # 搜索结果缓存
-        self._cache_ttl = 300  # 缓存有效期（秒）
-        self._last_search_time = {}  # 上次搜索时间记录
-        self._search_cooldown = 30  # 搜索冷却期（秒）
+        # 搜索结果缓存：有界 LRU + TTL，倒排索引查找相似需求，并发相同搜索合并
         self._similar_search_threshold = 0.8  # 相似搜索阈值
+        self._search_cache = MCPSearchCache(similarity_threshold=self._similar_search_threshold)
+        self._search_cooldown = 30  # 失败结果的缓存时间（秒），期间不重复请求上游
+        register_stats_provider("mcp_search_cache", self._search_cache.get_stats)
 
         # 如果没有提供search_api_url，从配置文件中读取
         if search_api_url:
@@ -171,42 +174,32 @@ class MCPSearchTool:
             if userId:
                 logger.info(f"👤 用户ID: {userId}")
 
-            # 生成缓存键，包含用户ID以区分用户
-            cache_key = f"{userId or 'anonymous'}:{requirement}:{tool_type or 'general'}"
-
-            # 检查是否在冷却期内
-            current_time = time.time()
-            if cache_key in self._last_search_time:
-                elapsed = current_time - self._last_search_time[cache_key]
-                if elapsed < self._search_cooldown:
-                    logger.info(f"🧊 搜索请求在冷却期内 ({elapsed:.1f}秒 < {self._search_cooldown}秒)，使用缓存结果")
-                    if cache_key in self._search_cache:
-                        return self._search_cache[cache_key]
-
-            # 检查是否有相似的搜索请求
-            for existing_key in self._search_cache:
-                # 简单的相似度检查：分割成词，计算重叠率
-                existing_req, existing_type = existing_key.split(":", 1)
-                if tool_type == existing_type or (not tool_type and existing_type == 'general'):
-                    similarity = self._calculate_similarity(requirement, existing_req)
-                    if similarity > self._similar_search_threshold:
-                        logger.info(f"🔄 找到相似的搜索请求 (相似度: {similarity:.2f})，使用缓存结果")
-                        cache_entry = self._search_cache[existing_key]
-                        # 检查缓存是否过期
-                        if current_time - cache_entry.get("_cache_time", 0) < self._cache_ttl:
-                            return cache_entry
-
-            # 检查缓存
-            if cache_key in self._search_cache:
-                cache_entry = self._search_cache[cache_key]
-                cache_time = cache_entry.get("_cache_time", 0)
-                if current_time - cache_time < self._cache_ttl:
-                    logger.info(f"🔄 使用缓存的搜索结果，缓存时间: {current_time - cache_time:.1f}秒")
-                    return cache_entry
-
-            # 更新上次搜索时间
-            self._last_search_time[cache_key] = current_time
+            # 缓存按用户和工具类型隔离；相似需求直接复用，并发的相同搜索只调用一次上游
+            scope = f"{userId or 'anonymous'}:{tool_type or 'general'}"
+            return await self._search_cache.get_or_load(
+                scope,
+                requirement,
+                lambda: self._search_and_save(requirement, tool_type, userId),
+                ttl_for=self._result_ttl,
+            )
+
+        except Exception as e:
+            logger.error(f"MCP搜索工具执行失败: {e}")
+            return {
+                "success": False,
+                "message": f"搜索工具执行出错: {str(e)}",
+                "tools_found": 0,
+                "recommendation": "请检查网络连接或联系管理员"
+            }
+
+    def _result_ttl(self, result: Dict[str, Any]) -> Optional[float]:
+        """成功结果使用默认有效期，失败结果只缓存冷却期"""
+        return None if result.get("success") else self._search_cooldown
 
+    async def _search_and_save(self, requirement: str, tool_type: str = None, userId: str = None) -> Dict[str, Any]:
+        """调用搜索API并保存新工具（缓存未命中时执行）"""
+        current_time = time.time()
+        try:
             # 构建搜索查询
             search_query = requirement
             if tool_type:
@@ -221,16 +214,14 @@ class MCPSearchTool:
                     logger.warning("DEV模式启用：返回内置示例响应用于联调")
                     api_response = self._build_stub_success_response()
                 else:
-                    result = {
+                    # 失败结果也会被缓存（较短时间）
+                    return {
                         "success": False,
                         "message": "搜索API调用失败",
                         "tools_found": 0,
-                        "recommendation": "请尝试使用现有工具或稍后重试"
+                        "recommendation": "请尝试使用现有工具或稍后重试",
+                        "_cache_time": current_time,
                     }
-                    # 缓存失败结果（较短时间）
-                    result["_cache_time"] = current_time
-                    self._search_cache[cache_key] = result
-                    return result
 
             # 解析API响应
             result = await self._process_api_response(api_response, requirement)
@@ -255,24 +246,19 @@ class MCPSearchTool:
                     else:
                         result["message"] += "。保存新工具失败，请检查配置文件权限或路径。"
 
-            # 缓存搜索结果
             result["_cache_time"] = current_time
-            self._search_cache[cache_key] = result
-
             return result
 
         except Exception as e:
             logger.error(f"MCP搜索工具执行失败: {e}")
-            result = {
+            # 错误结果也会被缓存（较短时间）
+            return {
                 "success": False,
                 "message": f"搜索工具执行出错: {str(e)}",
                 "tools_found": 0,
-                "recommendation": "请检查网络连接或联系管理员"
+                "recommendation": "请检查网络连接或联系管理员",
+                "_cache_time": current_time,
             }
-            # 缓存错误结果（较短时间）
-            result["_cache_time"] = time.time()
-            self._search_cache[cache_key] = result
-            return result
 
     def _load_search_api_headers_from_config(self) -> Dict[str, str]:
         """从配置文件或环境变量加载自定义请求头，用于通过鉴权/网关校验。
@@ -460,13 +446,15 @@ class MCPSearchTool:
             try:
                 logger.info(f"调用搜索API (尝试 {attempt + 1}/{max_retries}): {api_url}")
                 timeout = aiohttp.ClientTimeout(total=45)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                # 与 MCPManager 共用连接池，重试与后续搜索复用已建立的连接
+                async with get_mcp_http_pool().track("mcp_search") as session:
                     # 使用符合文档的标准负载
                     payload_to_send = payload
                     async with session.post(
                             api_url,
                             json=payload_to_send,
-                            headers=headers
+                            headers=headers,
+                            timeout=timeout,
                     ) as response:
                         status_code = response.status
                         last_status = status_code
@@ -501,8 +489,8 @@ class MCPSearchTool:
             try:
                 logger.info(f"DEV模式：尝试备用搜索API: {backup_url}")
                 timeout = aiohttp.ClientTimeout(total=30)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.post(backup_url, json=payload, headers=headers) as resp:
+                async with get_mcp_http_pool().track("mcp_search_backup") as session:
+                    async with session.post(backup_url, json=payload, headers=headers, timeout=timeout) as resp:
                         if resp.status == 200:
                             try:
                                 text = await resp.text()
@@ -1041,34 +1029,6 @@ class MCPSearchTool:
             "timestamp": now_ms
         }
 
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """
-        计算两个文本的相似度（简单实现）
-        
-        Args:
-            text1: 第一个文本
-            text2: 第二个文本
-            
-        Returns:
-            相似度得分 (0-1)
-        """
-        # 简单的词集合重叠率计算
-        try:
-            # 分词并转为集合
-            words1 = set(text1.lower().split())
-            words2 = set(text2.lower().split())
-
-            # 计算交集和并集
-            intersection = len(words1.intersection(words2))
-            union = len(words1.union(words2))
-
-            if union == 0:
-                return 0
-
-            return intersection / union
-        except Exception:
-            return 0  # 出错时返回0相似度
-
 
 # 全局实例变量
 _global_mcp_search_tool = None
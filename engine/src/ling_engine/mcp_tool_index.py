@@ -0,0 +1,215 @@
+"""MCP 工具倒排索引 — 精确召回可能匹配的候选工具
+
+MCPToolOrchestrator 原先对每个需求逐个工具计算名称/描述/类别得分并做正则参数提取，
+开销随已安装工具数线性增长 (MCPSearchTool 会不断加入新工具)。编排器的打分只在以下
+情况下大于 0，这里把每种情况对应的工具特征预先建成倒排表，召回的候选集合是
+"得分可能大于 0 的工具" 的超集，不会漏掉全量扫描能找到的工具:
+
+- 名称: 工具名或其 _ . - 分隔的片段是需求的子串 (按片段长度在需求上滑窗查表)，
+  或需求是工具名的子串，或需求命中某组特殊关键词且工具名含该组关键词
+- 描述: 需求与描述按空白切分后有相同的词
+- 类别: 需求和工具文本命中同一关键词类别
+
+sync() 按指纹比对，只重建新增/变化的工具，删除的工具从倒排表中移除。
+热更新时 ServiceContext.watch_mcp_config 调用 bump_tools_generation()，
+编排器发现代数变化 (或工具数变化) 才重新 sync。
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# (需求触发词, 工具名关键词): 需求含任一触发词时，工具名含任一关键词即算名称匹配
+KeywordGroups = Sequence[Tuple[Sequence[str], Sequence[str]]]
+
+_generation = 0
+
+
+def bump_tools_generation() -> None:
+    """工具配置已变更 (热更新)，下次检索前需重新 sync"""
+    global _generation
+    _generation += 1
+
+
+def tools_generation() -> int:
+    return _generation
+
+
+def name_words(tool_name: str) -> List[str]:
+    """工具名按 . - _ 切分的片段 (与编排器的名称匹配一致，可能含空串)"""
+    return tool_name.lower().replace(".", "_").replace("-", "_").split("_")
+
+
+class ToolDoc:
+    """单个工具的预计算信息 (倒排表的键，类别命中数供精排复用)"""
+
+    __slots__ = (
+        "name", "name_lower", "tool_info", "fingerprint", "position", "description",
+        "name_keys", "desc_words", "category_scores", "keyword_groups",
+    )
+
+    def __init__(self, tool_info: Dict[str, Any], fingerprint: str,
+                 categories: Dict[str, List[str]], keyword_groups: KeywordGroups):
+        function_info = tool_info.get("function", {})
+        self.name: str = function_info.get("name", "")
+        self.name_lower = self.name.lower()
+        self.tool_info = tool_info
+        self.fingerprint = fingerprint
+        self.position = 0  # 在工具列表中的位置，同分时按原顺序排
+        self.description: str = function_info.get("description", "")
+
+        description_lower = self.description.lower()
+        self.name_keys: Set[str] = {self.name_lower, *name_words(self.name)}
+        self.desc_words: Set[str] = set(description_lower.split())
+
+        tool_text = self.name_lower + " " + description_lower
+        self.category_scores: Dict[str, float] = {}
+        for category, keywords in categories.items():
+            hits = sum(1 for keyword in keywords if keyword in tool_text)
+            if hits:
+                self.category_scores[category] = float(hits)
+
+        self.keyword_groups: Set[int] = {
+            i for i, (_, keywords) in enumerate(keyword_groups)
+            if any(keyword in self.name_lower for keyword in keywords)
+        }
+
+
+def _fingerprint(tool_info: Dict[str, Any]) -> str:
+    return json.dumps(tool_info.get("function", {}), sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ToolIndex:
+    """工具名片段/描述词/类别/特殊关键词组上的倒排索引，支持增量更新"""
+
+    def __init__(self, categories: Dict[str, List[str]], keyword_groups: Optional[KeywordGroups] = None):
+        self.categories = categories
+        self.keyword_groups: KeywordGroups = list(keyword_groups or [])
+        self._docs: Dict[str, ToolDoc] = {}
+        # 名称片段 -> 工具名；片段长度 -> 该长度片段数，查询时只滑这些长度的窗口
+        self._name_postings: Dict[str, Set[str]] = {}
+        self._name_lengths: Dict[int, int] = {}
+        self._desc_postings: Dict[str, Set[str]] = {}
+        self._category_postings: Dict[str, Set[str]] = {}
+        self._group_postings: Dict[int, Set[str]] = {}
+        self._max_name_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._docs
+
+    def get(self, name: str) -> Optional[ToolDoc]:
+        return self._docs.get(name)
+
+    # ── 增量维护 ──────────────────────────────────────────────────
+
+    @staticmethod
+    def _post(postings: Dict[Any, Set[str]], keys: Iterable[Any], name: str) -> None:
+        for key in keys:
+            postings.setdefault(key, set()).add(name)
+
+    @staticmethod
+    def _unpost(postings: Dict[Any, Set[str]], keys: Iterable[Any], name: str) -> None:
+        for key in keys:
+            posting = postings.get(key)
+            if posting is not None:
+                posting.discard(name)
+                if not posting:
+                    del postings[key]
+
+    def _add(self, doc: ToolDoc) -> None:
+        self._docs[doc.name] = doc
+        for key in doc.name_keys:
+            if key not in self._name_postings:
+                self._name_lengths[len(key)] = self._name_lengths.get(len(key), 0) + 1
+        self._post(self._name_postings, doc.name_keys, doc.name)
+        self._post(self._desc_postings, doc.desc_words, doc.name)
+        self._post(self._category_postings, doc.category_scores, doc.name)
+        self._post(self._group_postings, doc.keyword_groups, doc.name)
+        self._max_name_length = max(self._max_name_length, len(doc.name_lower))
+
+    def _remove(self, name: str) -> None:
+        doc = self._docs.pop(name, None)
+        if doc is None:
+            return
+        self._unpost(self._name_postings, doc.name_keys, name)
+        for key in doc.name_keys:
+            if key not in self._name_postings:
+                remaining = self._name_lengths.get(len(key), 0) - 1
+                if remaining > 0:
+                    self._name_lengths[len(key)] = remaining
+                else:
+                    self._name_lengths.pop(len(key), None)
+        self._unpost(self._desc_postings, doc.desc_words, name)
+        self._unpost(self._category_postings, doc.category_scores, name)
+        self._unpost(self._group_postings, doc.keyword_groups, name)
+
+    def sync(self, tools: Iterable[Dict[str, Any]]) -> Tuple[int, int, int]:
+        """与当前工具列表对齐，只重建变化的工具；返回 (新增, 更新, 删除) 数"""
+        seen = set()
+        added = updated = 0
+        for position, tool_info in enumerate(tools):
+            name = tool_info.get("function", {}).get("name", "")
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            fingerprint = _fingerprint(tool_info)
+            old = self._docs.get(name)
+            if old is not None:
+                if old.fingerprint == fingerprint:
+                    old.tool_info = tool_info
+                    old.position = position
+                    continue
+                self._remove(name)
+                updated += 1
+            else:
+                added += 1
+            doc = ToolDoc(tool_info, fingerprint, self.categories, self.keyword_groups)
+            doc.position = position
+            self._add(doc)
+        removed = [name for name in self._docs if name not in seen]
+        for name in removed:
+            self._remove(name)
+        if removed:
+            self._max_name_length = max((len(d.name_lower) for d in self._docs.values()), default=0)
+        return added, updated, len(removed)
+
+    # ── 检索 ──────────────────────────────────────────────────────
+
+    def candidates(self, requirement: str) -> List[ToolDoc]:
+        """名称/描述/类别得分可能大于 0 的全部工具，按工具列表顺序返回"""
+        requirement_lower = (requirement or "").lower()
+        names: Set[str] = set()
+
+        # 名称片段是需求的子串: 只在出现过的片段长度上滑窗 (空片段总是命中)
+        postings = self._name_postings
+        for length in self._name_lengths:
+            if length == 0:
+                names |= postings.get("", set())
+                continue
+            for i in range(len(requirement_lower) - length + 1):
+                posting = postings.get(requirement_lower[i:i + length])
+                if posting:
+                    names |= posting
+
+        # 需求是工具名的子串 (需求通常比工具名长，大多直接跳过)
+        if len(requirement_lower) <= self._max_name_length:
+            names.update(
+                name for name, doc in self._docs.items() if requirement_lower in doc.name_lower
+            )
+
+        for word in set(requirement_lower.split()):
+            names |= self._desc_postings.get(word, set())
+
+        for category, keywords in self.categories.items():
+            if any(keyword in requirement_lower for keyword in keywords):
+                names |= self._category_postings.get(category, set())
+
+        for i, (triggers, _) in enumerate(self.keyword_groups):
+            if any(trigger in requirement_lower for trigger in triggers):
+                names |= self._group_postings.get(i, set())
+
+        docs = [self._docs[name] for name in names]
+        docs.sort(key=lambda doc: doc.position)
+        return docs
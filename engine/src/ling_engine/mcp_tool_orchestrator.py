@@ -13,6 +13,8 @@ import time
 from typing import Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 
+from .mcp_tool_index import ToolDoc, ToolIndex, tools_generation
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -82,6 +84,33 @@ class MCPToolOrchestrator:
             "weather": ["天气", "气温", "温度", "下雨", "晴天", "阴天", "weather", "temperature"],
             "map": ["地图", "导航", "路线", "地址", "位置", "map", "navigation", "route", "address", "location", "去", "到", "从"]
         }
+
+        # 名称匹配的特殊关键词组: (需求触发词, 工具名关键词)
+        weather_keywords = ["weather", "天气", "气温"]
+        map_keywords = ["map", "地图", "导航", "位置"]
+        self.name_keyword_groups = [
+            (["搜索", "查询", "search", "find", "帮我", "查找"], ["search", "bing", "搜索", "查询", "find"]),
+            (weather_keywords, weather_keywords),
+            (map_keywords, map_keywords),
+        ]
+
+        # 工具倒排索引: 只召回得分可能大于 0 的工具，再按置信度上界精排
+        self._tool_index = ToolIndex(self.keyword_categories, self.name_keyword_groups)
+        self._index_state: Optional[Tuple[int, int]] = None  # (工具代数, 工具数)
+
+    def _sync_tool_index(self, available_tools: List[Dict[str, Any]]) -> None:
+        """工具代数或数量变化时增量同步索引 (只重建变化的工具)"""
+        state = (tools_generation(), len(available_tools))
+        if state == self._index_state:
+            return
+        added, updated, removed = self._tool_index.sync(available_tools)
+        self._index_state = state
+        if added or updated or removed:
+            logger.info(f"🗂️ 工具索引已更新: 新增 {added}, 变更 {updated}, 移除 {removed}, 共 {len(self._tool_index)} 个")
+
+    def invalidate_tool_index(self) -> None:
+        """工具列表在热更新之外被修改时调用，下次匹配前重新同步"""
+        self._index_state = None
     
     async def find_best_tools(self, requirement: str, max_tools: int = 3) -> List[ToolMatch]:
         """智能查找最适合的工具
@@ -100,21 +129,37 @@ class MCPToolOrchestrator:
             logger.warning("⚠️ 没有可用工具")
             return []
         
+        self._sync_tool_index(available_tools)
+
+        # 参数提取只会让置信度不变或打 7 折，不含参数的得分就是上界:
+        # 按上界从高到低精排，上界低于当前第 max_tools 名时后面的工具不可能再进前列
+        bounded = []
+        for doc in self._tool_index.candidates(requirement):
+            upper = self._score_without_parameters(requirement, doc.name, doc.description, doc)[0]
+            if upper > 0.05:  # 最低置信度阈值
+                bounded.append((upper, doc))
+        bounded.sort(key=lambda item: (-item[0], item[1].position))
+
         matches = []
-        
-        for tool_info in available_tools:
+        positions = {}
+        top: List[float] = []
+        for upper, doc in bounded:
+            if len(top) >= max_tools and upper < top[max_tools - 1]:
+                break
             try:
                 # 计算工具匹配度
-                match = await self._calculate_tool_match(requirement, tool_info)
+                match = await self._calculate_tool_match(requirement, doc.tool_info, doc)
                 if match and match.confidence > 0.05:  # 最低置信度阈值
                     matches.append(match)
+                    positions[id(match)] = doc.position
+                    top = sorted(top + [match.confidence], reverse=True)[:max(max_tools, 1)]
                     logger.info(f"  工具匹配: {match.tool_name} (置信度: {match.confidence:.2f})")
                     
             except Exception as e:
-                logger.error(f"❌ 工具匹配计算失败: {tool_info.get('function', {}).get('name', 'unknown')}: {e}")
+                logger.error(f"❌ 工具匹配计算失败: {doc.name}: {e}")
         
-        # 按置信度排序
-        matches.sort(key=lambda x: x.confidence, reverse=True)
+        # 按置信度排序 (同分按工具列表顺序，与逐个工具打分的结果一致)
+        matches.sort(key=lambda x: (-x.confidence, positions[id(x)]))
         
         # 返回前N个最佳匹配
         best_matches = matches[:max_tools]
@@ -122,12 +167,14 @@ class MCPToolOrchestrator:
         
         return best_matches
     
-    async def _calculate_tool_match(self, requirement: str, tool_info: Dict[str, Any]) -> Optional[ToolMatch]:
+    async def _calculate_tool_match(self, requirement: str, tool_info: Dict[str, Any],
+                                    doc: Optional[ToolDoc] = None) -> Optional[ToolMatch]:
         """计算单个工具的匹配度
         
         Args:
             requirement: 用户需求
             tool_info: 工具信息
+            doc: 索引中预计算的工具信息（可选，省去重复分词）
             
         Returns:
             工具匹配结果
@@ -137,27 +184,10 @@ class MCPToolOrchestrator:
             tool_name = function_info.get("name", "")
             tool_description = function_info.get("description", "")
             
-            # 基础置信度计算
-            confidence = 0.0
-            match_reasons = []
-            
-            # 1. 工具名称匹配
-            name_score = self._calculate_name_match(requirement, tool_name)
-            confidence += name_score * 0.4
-            if name_score > 0:
-                match_reasons.append(f"名称匹配({name_score:.2f})")
-            
-            # 2. 工具描述匹配
-            desc_score = self._calculate_description_match(requirement, tool_description)
-            confidence += desc_score * 0.3
-            if desc_score > 0:
-                match_reasons.append(f"描述匹配({desc_score:.2f})")
-            
-            # 3. 关键词类别匹配
-            category_score = self._calculate_category_match(requirement, tool_name, tool_description)
-            confidence += category_score * 0.3
-            if category_score > 0:
-                match_reasons.append(f"类别匹配({category_score:.2f})")
+            # 基础置信度计算 (名称、描述、类别)
+            confidence, match_reasons = self._score_without_parameters(
+                requirement, tool_name, tool_description, doc
+            )
             
             # 提取参数
             parameters = await self._extract_parameters(requirement, function_info)
@@ -179,6 +209,34 @@ class MCPToolOrchestrator:
             logger.error(f"❌ 计算工具匹配度失败: {e}")
             return None
     
+    def _score_without_parameters(self, requirement: str, tool_name: str, tool_description: str,
+                                  doc: Optional[ToolDoc] = None) -> Tuple[float, List[str]]:
+        """名称/描述/类别加权得分，即参数提取前的置信度"""
+        confidence = 0.0
+        match_reasons = []
+        
+        # 1. 工具名称匹配
+        name_score = self._calculate_name_match(requirement, tool_name)
+        confidence += name_score * 0.4
+        if name_score > 0:
+            match_reasons.append(f"名称匹配({name_score:.2f})")
+        
+        # 2. 工具描述匹配
+        desc_score = self._calculate_description_match(requirement, tool_description)
+        confidence += desc_score * 0.3
+        if desc_score > 0:
+            match_reasons.append(f"描述匹配({desc_score:.2f})")
+        
+        # 3. 关键词类别匹配
+        category_score = self._calculate_category_match(
+            requirement, tool_name, tool_description, doc.category_scores if doc else None
+        )
+        confidence += category_score * 0.3
+        if category_score > 0:
+            match_reasons.append(f"类别匹配({category_score:.2f})")
+        
+        return confidence, match_reasons
+    
     def _calculate_name_match(self, requirement: str, tool_name: str) -> float:
         """计算工具名称匹配度"""
         if not tool_name:
@@ -199,25 +257,11 @@ class MCPToolOrchestrator:
             if word in requirement_lower:
                 score += 0.3
         
-        # 特殊关键词匹配 - 提高搜索工具的匹配度
-        search_keywords = ["search", "bing", "搜索", "查询", "find"]
-        weather_keywords = ["weather", "天气", "气温"]
-        map_keywords = ["map", "地图", "导航", "位置"]
-        
-        # 检查是否是搜索相关需求
-        if any(keyword in requirement_lower for keyword in ["搜索", "查询", "search", "find", "帮我", "查找"]):
-            if any(keyword in tool_name_lower for keyword in search_keywords):
-                score = max(score, 0.8)  # 提高搜索工具匹配度
-        
-        # 检查是否是天气相关需求
-        if any(keyword in requirement_lower for keyword in weather_keywords):
-            if any(keyword in tool_name_lower for keyword in weather_keywords):
-                score = max(score, 0.8)
-        
-        # 检查是否是地图相关需求
-        if any(keyword in requirement_lower for keyword in map_keywords):
-            if any(keyword in tool_name_lower for keyword in map_keywords):
-                score = max(score, 0.8)
+        # 特殊关键词匹配 - 提高搜索/天气/地图工具的匹配度
+        for triggers, keywords in self.name_keyword_groups:
+            if any(keyword in requirement_lower for keyword in triggers):
+                if any(keyword in tool_name_lower for keyword in keywords):
+                    score = max(score, 0.8)
         
         return min(score, 1.0)
     
@@ -242,7 +286,8 @@ class MCPToolOrchestrator:
         
         return min(score, 1.0)
     
-    def _calculate_category_match(self, requirement: str, tool_name: str, description: str) -> float:
+    def _calculate_category_match(self, requirement: str, tool_name: str, description: str,
+                                  tool_category_scores: Optional[Dict[str, float]] = None) -> float:
         """计算工具类别匹配度"""
         requirement_lower = requirement.lower()
         tool_text = (tool_name + " " + description).lower()
@@ -257,10 +302,13 @@ class MCPToolOrchestrator:
                     req_category_score += 1
             
             # 检查工具中是否包含该类别的关键词
-            tool_category_score = 0.0
-            for keyword in keywords:
-                if keyword in tool_text:
-                    tool_category_score += 1
+            if tool_category_scores is not None:
+                tool_category_score = tool_category_scores.get(category, 0.0)
+            else:
+                tool_category_score = 0.0
+                for keyword in keywords:
+                    if keyword in tool_text:
+                        tool_category_score += 1
             
             # 计算类别匹配得分
             if req_category_score > 0 and tool_category_score > 0:
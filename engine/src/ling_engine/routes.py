@@ -1,4 +1,7 @@
+import asyncio
 import json
+import os
+from typing import Callable, List, Optional, Tuple
 from uuid import uuid4
 import numpy as np
 from datetime import datetime
@@ -9,6 +12,105 @@ from loguru import logger
 from .service_context import ServiceContext
 from .websocket_handler import WebSocketHandler
 from .utils.sentence_divider import segment_text_by_pysbd
+from .utils.ordered_pipeline import OrderedPipeline
+
+# /tts-ws 同时合成的句子数：后续句子在前面的句子发送前就开始生成
+TTS_WS_MAX_CONCURRENCY = int(os.getenv("TTS_WS_MAX_CONCURRENCY", "3"))
+
+
+def _split_on_periods(text: str) -> Tuple[List[str], Optional[str]]:
+    """Split text into sentences on '.' (adding the period back)"""
+    return [s.strip() + "." for s in text.split(".") if s.strip()], None
+
+
+async def _synthesize_sentence(tts_engine, sentence: str, tag: str) -> dict:
+    file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid4())[:8]}"
+    audio_path = await tts_engine.async_generate_audio(
+        text=sentence, file_name_no_ext=file_name
+    )
+    logger.info(f"{tag}Generated audio for sentence: {sentence} at: {audio_path}")
+    return {"status": "partial", "audioPath": audio_path, "text": sentence}
+
+
+async def _speak_text(
+    websocket: WebSocket,
+    tts_engine,
+    text: str,
+    segment: Callable[[str], Tuple[List[str], Optional[str]]],
+    tag: str,
+) -> None:
+    """Synthesize every sentence of text through the pipeline and send results in order"""
+    sentences, remaining = segment(text)
+    pipeline = OrderedPipeline(
+        deliver=websocket.send_json,
+        max_concurrency=TTS_WS_MAX_CONCURRENCY,
+        # 被取消时已生成但未发送的音频文件不会再被客户端取用
+        discard=lambda msg: tts_engine.remove_file(msg["audioPath"], verbose=False),
+    )
+    try:
+        for sentence in sentences:
+            pipeline.submit(_synthesize_sentence, tts_engine, sentence, tag)
+        await pipeline.join()
+
+        # If there's remaining fragment (incomplete sentence), echo it as display only
+        if remaining and remaining.strip():
+            await websocket.send_json(
+                {"status": "partial", "audioPath": None, "text": remaining.strip()}
+            )
+
+        # Send completion signal
+        await websocket.send_json({"status": "complete"})
+    except asyncio.CancelledError:
+        pipeline.cancel()
+        raise
+    except Exception as e:
+        pipeline.cancel()
+        logger.error(f"{tag}Error generating TTS: {e}")
+        try:
+            await websocket.send_json({"status": "error", "message": str(e)})
+        except Exception:
+            pass
+
+
+async def _serve_tts_websocket(
+    websocket: WebSocket,
+    context: ServiceContext,
+    segment: Callable[[str], Tuple[List[str], Optional[str]]],
+    name: str,
+    tag: str,
+) -> None:
+    """Receive loop shared by /tts-ws and /tts-ws-stream
+
+    Each text message is synthesized in a background task so the loop keeps
+    reading: new text cancels the unfinished previous one, and so does a disconnect.
+    """
+    await websocket.accept()
+    logger.info(f"{name} WebSocket connection established")
+
+    current: Optional[asyncio.Task] = None
+    try:
+        while True:
+            data = await websocket.receive_json()
+            text = data.get("text")
+            if not text:
+                continue
+
+            logger.info(f"{tag}Received text for TTS: {text}")
+
+            if current is not None and not current.done():
+                current.cancel()
+            current = asyncio.create_task(
+                _speak_text(websocket, context.tts_engine, text, segment, tag)
+            )
+
+    except WebSocketDisconnect:
+        logger.info(f"{name} WebSocket client disconnected")
+    except Exception as e:
+        logger.error(f"Error in {name} WebSocket connection: {e}")
+        await websocket.close()
+    finally:
+        if current is not None and not current.done():
+            current.cancel()
 
 async def create_routes(default_context_cache: ServiceContext) -> APIRouter:
     """
@@ -384,116 +486,16 @@ async def create_routes(default_context_cache: ServiceContext) -> APIRouter:
     @router.websocket("/tts-ws")
     async def tts_endpoint(websocket: WebSocket):
         """WebSocket endpoint for TTS generation"""
-        await websocket.accept()
-        logger.info("TTS WebSocket connection established")
-
-        try:
-            while True:
-                data = await websocket.receive_json()
-                text = data.get("text")
-                if not text:
-                    continue
-
-                logger.info(f"Received text for TTS: {text}")
-
-                # Split text into sentences
-                sentences = [s.strip() for s in text.split(".") if s.strip()]
-
-                try:
-                    # Generate and send audio for each sentence
-                    for sentence in sentences:
-                        sentence = sentence + "."  # Add back the period
-                        file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid4())[:8]}"
-                        audio_path = (
-                            await default_context_cache.tts_engine.async_generate_audio(
-                                text=sentence, file_name_no_ext=file_name
-                            )
-                        )
-                        logger.info(
-                            f"Generated audio for sentence: {sentence} at: {audio_path}"
-                        )
-
-                        await websocket.send_json(
-                            {
-                                "status": "partial",
-                                "audioPath": audio_path,
-                                "text": sentence,
-                            }
-                        )
-
-                    # Send completion signal
-                    await websocket.send_json({"status": "complete"})
-
-                except Exception as e:
-                    logger.error(f"Error generating TTS: {e}")
-                    await websocket.send_json({"status": "error", "message": str(e)})
-
-        except WebSocketDisconnect:
-            logger.info("TTS WebSocket client disconnected")
-        except Exception as e:
-            logger.error(f"Error in TTS WebSocket connection: {e}")
-            await websocket.close()
+        await _serve_tts_websocket(
+            websocket, default_context_cache, _split_on_periods, "TTS", ""
+        )
 
     @router.websocket("/tts-ws-stream")
     async def tts_stream_endpoint(websocket: WebSocket):
         """WebSocket endpoint for TTS generation with sentence boundary streaming"""
-        await websocket.accept()
-        logger.info("TTS Streaming WebSocket connection established")
-
-        try:
-            while True:
-                data = await websocket.receive_json()
-                text = data.get("text")
-                if not text:
-                    continue
-
-                logger.info(f"[stream] Received text for TTS: {text}")
-
-                # Use pysbd-based segmentation (fallbacks handled inside the function)
-                sentences, remaining = segment_text_by_pysbd(text)
-
-                try:
-                    # Generate and send audio for each complete sentence
-                    for sentence in sentences:
-                        file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid4())[:8]}"
-                        audio_path = (
-                            await default_context_cache.tts_engine.async_generate_audio(
-                                text=sentence, file_name_no_ext=file_name
-                            )
-                        )
-                        logger.info(
-                            f"[stream] Generated audio for sentence: {sentence} at: {audio_path}"
-                        )
-
-                        await websocket.send_json(
-                            {
-                                "status": "partial",
-                                "audioPath": audio_path,
-                                "text": sentence,
-                            }
-                        )
-
-                    # If there's remaining fragment (incomplete sentence), echo it as display only
-                    if remaining and remaining.strip():
-                        await websocket.send_json(
-                            {
-                                "status": "partial",
-                                "audioPath": None,
-                                "text": remaining.strip(),
-                            }
-                        )
-
-                    # Send completion signal
-                    await websocket.send_json({"status": "complete"})
-
-                except Exception as e:
-                    logger.error(f"[stream] Error generating TTS: {e}")
-                    await websocket.send_json({"status": "error", "message": str(e)})
-
-        except WebSocketDisconnect:
-            logger.info("TTS Streaming WebSocket client disconnected")
-        except Exception as e:
-            logger.error(f"Error in TTS Streaming WebSocket connection: {e}")
-            await websocket.close()
+        # Use pysbd-based segmentation (fallbacks handled inside the function)
+        await _serve_tts_websocket(
+            websocket, default_context_cache, segment_text_by_pysbd, "TTS Streaming", "[stream] "
+        )
 
     return router
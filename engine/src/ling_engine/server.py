@@ -92,6 +92,31 @@ class WebSocketServer:
             except Exception as e:
                 logger.warning(f"预加载模型定价失败: {e}")
             
+            # 创建共享仓储连接池并完成建表（只做一次，之后各处复用同一仓储实例）
+            from .bff_integration.database.repository_registry import init_repositories
+            await asyncio.to_thread(init_repositories)
+
+            # 启动聊天消息写后台任务，重放上次未写入数据库的消息
+            try:
+                from .database.pgsql.message_writer import get_message_writer
+                await get_message_writer()
+            except Exception as e:
+                logger.warning(f"启动聊天消息写入任务失败: {e}")
+
+            # 启动用量聚合的定时落库任务
+            try:
+                from .utils.usage_meter import start_usage_meter
+                await start_usage_meter()
+            except Exception as e:
+                logger.warning(f"启动用量计量落库任务失败: {e}")
+
+            # 绑定 embedding 服务到事件循环，记忆保存/召回共用批次与缓存
+            try:
+                from .important.memories import start_embedding_service
+                await start_embedding_service()
+            except Exception as e:
+                logger.warning(f"启动 embedding 服务失败: {e}")
+
             # 1. 首先注册API路由
             router = await create_routes(default_context_cache=self.default_context_cache)
             self.app.include_router(router)
@@ -150,6 +175,41 @@ class WebSocketServer:
                 # 记录但不阻塞启动
                 print(f"无法启动 MCP 配置热更新监听: {e}")
 
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            # 先把写后台队列里的聊天消息刷入数据库，再关闭连接池
+            try:
+                from .database.pgsql.message_writer import close_message_writer
+                await close_message_writer()
+            except Exception as e:
+                logger.warning(f"刷入待写聊天消息失败: {e}")
+            try:
+                from .utils.usage_meter import close_usage_meter
+                await close_usage_meter()
+            except Exception as e:
+                logger.warning(f"刷入用量聚合失败: {e}")
+            try:
+                from .important.memories import close_embedding_service
+                await close_embedding_service()
+            except Exception as e:
+                logger.warning(f"关闭 embedding 服务失败: {e}")
+            try:
+                from .mcp_http_pool import close_mcp_http_pool
+                await close_mcp_http_pool()
+            except Exception as e:
+                logger.warning(f"关闭 MCP HTTP 连接池失败: {e}")
+            # 关闭异步数据库连接池
+            try:
+                from .database.pgsql.async_database_manager import close_async_db_manager
+                await close_async_db_manager()
+            except Exception as e:
+                logger.warning(f"关闭异步数据库连接池失败: {e}")
+            try:
+                from .bff_integration.database.repository_registry import close_repositories
+                close_repositories()
+            except Exception as e:
+                logger.warning(f"关闭仓储连接池失败: {e}")
+
     def run(self):
         pass
 
@@ -15,6 +15,7 @@ from .vad.vad_interface import VADInterface
 from .agent.agents.agent_interface import AgentInterface
 from .translate.translate_interface import TranslateInterface
 from .config_manager.mcp_config_resolver import save_mcp_config
+from .mcp_tool_index import bump_tools_generation
 
 from .asr.asr_factory import ASRFactory
 from .tts.tts_factory import TTSFactory
@@ -148,6 +149,7 @@ class ServiceContext:
         new_context.live2d_model = self.live2d_model
         new_context.asr_engine = self.asr_engine
         new_context.tts_engine = self.tts_engine
+        # VAD 引擎共享，但每个连接通过 vad_engine.create_session() 获得独立状态
         new_context.vad_engine = self.vad_engine
         new_context.translate_engine = self.translate_engine
 
@@ -780,6 +782,9 @@ class ServiceContext:
                 except Exception as e:
                     logger.warning(f"轻量级重载失败: {e}")
             
+            # 工具列表已变化，工具编排器的倒排索引在下次匹配前增量同步
+            bump_tools_generation()
+
             # 清理旧代理和客户端状态
             try:
                 # 先清理旧代理的工具和状态
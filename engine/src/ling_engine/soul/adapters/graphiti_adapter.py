@@ -360,6 +360,8 @@ class GraphitiAdapter(MemoryPort):
             if edges_coll is not None:
                 r = await edges_coll.delete_many({"user_id": user_id})
                 count += r.deleted_count
+            from ..semantic.knowledge_graph import get_knowledge_graph
+            get_knowledge_graph().invalidate_snapshot(user_id)
         except Exception as e:
             logger.warning(f"[Graphiti] MongoDB fallback delete failed: {e}")
 
@@ -0,0 +1,247 @@
+"""
+召回结果短时缓存 — 按用户 LRU + TTL
+键: 归一化 query + 关系阶段。追问、复述这类近邻 query (字符 bigram Jaccard >= 阈值)
+直接复用上一轮的路由结果，只对缺失的路由发起查询。
+SoulPostProcessor 写入后按路由失效，关系阶段变化时整条缓存不再命中。
+"""
+
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+_MAX_USERS = 2000  # 最多缓存多少个用户
+_MAX_ENTRIES_PER_USER = 8  # 每个用户保留最近几条 query
+
+# 每轮都要新鲜读取的路由 (relationship 决定阶段本身，不缓存)
+_UNCACHED_ROUTES = frozenset({"relationship"})
+
+# 后处理写入 → 受影响的召回路由
+POST_PROCESS_ROUTES: Dict[str, FrozenSet[str]] = {
+    "memory_atom": frozenset({"fabric_events", "core_blocks", "procedural", "safety_shadow"}),
+    "emotion": frozenset({"resonance"}),
+    "importance": frozenset({"resonance"}),
+    "story": frozenset({"stories"}),
+    "graph": frozenset({"graph"}),
+    "graphiti": frozenset({"graphiti"}),
+    "mem0": frozenset({"mem0"}),
+}
+
+
+def normalize_query(query: str) -> str:
+    """小写 + NFKC，去掉空白、标点和符号"""
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "S", "Z", "C"))
+
+
+def _bigrams(text: str) -> FrozenSet[str]:
+    if len(text) < 2:
+        return frozenset({text}) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def _copy(value: Any) -> Any:
+    # 召回结果会被写进 SoulContext，缓存里存/取都用副本，避免下游原地修改
+    return list(value) if isinstance(value, list) else value
+
+
+class RecallCacheHit(NamedTuple):
+    stage: str
+    routes: Dict[str, Any]
+    kind: str  # exact / neighbor
+
+
+class _Entry:
+    __slots__ = ("query", "grams", "stage", "ts", "routes")
+
+    def __init__(self, query: str, stage: str, routes: Dict[str, Any]):
+        self.query = query
+        self.grams = _bigrams(query)
+        self.stage = stage
+        self.ts = time.monotonic()
+        self.routes = routes
+
+
+class RecallResultCache:
+    """按用户的召回结果缓存 (单事件循环内使用，不加锁)"""
+
+    def __init__(
+        self,
+        ttl_sec: float = 90.0,
+        similarity: float = 0.8,
+        max_users: int = _MAX_USERS,
+        max_entries: int = _MAX_ENTRIES_PER_USER,
+    ):
+        self.ttl_sec = ttl_sec
+        self.similarity = similarity
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self._users: "OrderedDict[str, List[_Entry]]" = OrderedDict()  # LRU: 最近使用的在末尾
+        self._route_hits: Dict[str, int] = {}
+        self._route_misses: Dict[str, int] = {}
+        self._lookups = {"exact": 0, "neighbor": 0, "miss": 0, "stage_mismatch": 0}
+        self._invalidations = 0
+
+    def _live_entries(self, user_id: str) -> List[_Entry]:
+        entries = self._users.get(user_id)
+        if not entries:
+            return []
+        now = time.monotonic()
+        entries[:] = [e for e in entries if now - e.ts < self.ttl_sec]
+        if not entries:
+            self._users.pop(user_id, None)
+        return entries
+
+    def lookup(self, user_id: str, query: str) -> Optional[RecallCacheHit]:
+        """找出与 query 相同或相近的缓存条目，合并它们的路由结果 (新条目优先)
+
+        返回的 stage 是最近一条匹配条目的关系阶段，调用方拿到本轮真实阶段后
+        不一致要调用 reject()。
+        """
+        entries = self._live_entries(user_id)
+        norm = normalize_query(query)
+        grams = _bigrams(norm)
+        matched: List[tuple] = []
+        for entry in reversed(entries):
+            if entry.query == norm:
+                matched.append((entry, "exact"))
+            elif _jaccard(grams, entry.grams) >= self.similarity:
+                matched.append((entry, "neighbor"))
+        if not matched:
+            self._lookups["miss"] += 1
+            return None
+
+        stage = matched[0][0].stage
+        routes: Dict[str, Any] = {}
+        kind = "neighbor"
+        for entry, entry_kind in matched:
+            if entry.stage != stage:
+                continue
+            if entry_kind == "exact":
+                kind = "exact"
+            for key, value in entry.routes.items():
+                if key not in routes:
+                    routes[key] = _copy(value)
+        if not routes:
+            self._lookups["miss"] += 1
+            return None
+        self._users.move_to_end(user_id)
+        self._lookups[kind] += 1
+        return RecallCacheHit(stage=stage, routes=routes, kind=kind)
+
+    def reject(self, hit: RecallCacheHit) -> None:
+        """命中的条目与本轮关系阶段不符，结果作废"""
+        self._lookups[hit.kind] -= 1
+        self._lookups["stage_mismatch"] += 1
+
+    def record_routes(self, reused: Iterable[str], fetched: Iterable[str]) -> None:
+        """记录各路由本轮是复用缓存还是实际查询，用于按路由统计命中率"""
+        for key in reused:
+            self._route_hits[key] = self._route_hits.get(key, 0) + 1
+        for key in fetched:
+            if key not in _UNCACHED_ROUTES:
+                self._route_misses[key] = self._route_misses.get(key, 0) + 1
+
+    def store(self, user_id: str, query: str, stage: str, results: Dict[str, Any]) -> None:
+        """写入本轮实际查询到的路由结果 (异常、空结果不缓存)"""
+        routes = {
+            key: _copy(value) for key, value in results.items()
+            if key not in _UNCACHED_ROUTES and value and not isinstance(value, BaseException)
+        }
+        if not routes:
+            return
+        norm = normalize_query(query)
+        if not norm:
+            return
+        entries = self._live_entries(user_id)
+        for entry in entries:
+            if entry.query == norm and entry.stage == stage:
+                entries.remove(entry)
+                break
+        entries.append(_Entry(norm, stage, routes))
+        del entries[:-self.max_entries]
+        self._users[user_id] = entries
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)  # 淘汰最久未使用的用户
+
+    def invalidate(self, user_id: str, routes: Optional[Iterable[str]] = None) -> None:
+        """失效某用户的缓存; routes 非空时只清掉这些路由"""
+        if routes is None:
+            if self._users.pop(user_id, None) is not None:
+                self._invalidations += 1
+            return
+        entries = self._users.get(user_id)
+        if not entries:
+            return
+        keys = set(routes)
+        for entry in entries:
+            for key in keys:
+                entry.routes.pop(key, None)
+        entries[:] = [e for e in entries if e.routes]
+        if not entries:
+            self._users.pop(user_id, None)
+        self._invalidations += 1
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes = {}
+        for key in sorted(set(self._route_hits) | set(self._route_misses)):
+            hits = self._route_hits.get(key, 0)
+            misses = self._route_misses.get(key, 0)
+            routes[key] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return {
+            "users": len(self._users),
+            "lookups": dict(self._lookups),
+            "invalidations": self._invalidations,
+            "routes": routes,
+        }
+
+
+_recall_cache: Optional[RecallResultCache] = None
+
+
+def get_recall_cache() -> RecallResultCache:
+    """获取召回缓存单例 (参数来自 SoulConfig)"""
+    global _recall_cache
+    if _recall_cache is None:
+        from ..config import get_soul_config
+        from ...utils.runtime_stats import register_stats_provider
+
+        cfg = get_soul_config()
+        _recall_cache = RecallResultCache(
+            ttl_sec=cfg.recall_cache_ttl_sec,
+            similarity=cfg.recall_cache_similarity,
+        )
+        register_stats_provider("soul_recall_cache", _recall_cache.get_stats)
+    return _recall_cache
+
+
+def invalidate_after_writes(user_id: str, writes: Iterable[str]) -> None:
+    """后处理写入完成后，失效受这些写入影响的路由"""
+    if _recall_cache is None:
+        return
+    routes = set()
+    for name in writes:
+        routes |= POST_PROCESS_ROUTES.get(name, frozenset())
+    if routes:
+        _recall_cache.invalidate(user_id, routes)
+
+
+def reset_recall_cache_for_testing():
+    """测试辅助: 重置召回缓存单例。"""
+    global _recall_cache
+    _recall_cache = None
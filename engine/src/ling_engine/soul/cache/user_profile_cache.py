@@ -77,33 +77,36 @@ def invalidate(user_id: str):
     _cache.pop(user_id, None)
 
 
-async def refresh_all_profiles() -> Dict[str, Any]:
+async def refresh_all_profiles(run_key: Optional[str] = None) -> Dict[str, Any]:
     """v3: 夜间整理时刷新所有活跃用户的画像缓存
 
-    遍历 soul_relationships 中所有用户, 重新从 EverMemOS 拉取画像。
+    遍历 soul_relationships 中所有用户, 重新从 EverMemOS 拉取画像 (按用户并发)。
     Returns:
         {"refreshed": int, "failed": int}
     """
     from ..storage.soul_collections import get_collection, RELATIONSHIPS
+    from ..config import get_soul_config
+    from ..consolidation.executor import run_per_user
 
     coll = await get_collection(RELATIONSHIPS)
     if coll is None:
         return {"status": "skipped", "reason": "collection_unavailable"}
 
+    async def _refresh(uid: str) -> Dict[str, int]:
+        invalidate(uid)
+        profile = await get_user_profile(uid, timeout=3.0)
+        return {"refreshed": 1} if profile else {"failed": 1}
+
     user_ids = await coll.distinct("user_id")
-    refreshed = 0
-    failed = 0
-
-    for uid in user_ids:
-        try:
-            invalidate(uid)
-            profile = await get_user_profile(uid, timeout=3.0)
-            if profile:
-                refreshed += 1
-            else:
-                failed += 1
-        except Exception:
-            failed += 1
+    totals = await run_per_user(
+        "profile_update",
+        user_ids,
+        _refresh,
+        run_key=run_key,
+        concurrency=get_soul_config().consolidation_concurrency,
+    )
+    refreshed = totals.get("refreshed", 0)
+    failed = totals.get("failed", 0)
 
     logger.info(f"[Soul] Profile refresh: {refreshed} ok, {failed} failed")
     return {"status": "ok", "refreshed": refreshed, "failed": failed}
@@ -30,12 +30,18 @@ class SoulConfig:
         # Phase 3: 知识图谱
         self.graph_max_depth = int(os.environ.get("SOUL_GRAPH_MAX_DEPTH", "2"))
         self.graph_trace_timeout_ms = int(os.environ.get("SOUL_GRAPH_TRACE_TIMEOUT_MS", "200"))
+        # 召回热路径的每用户图谱快照 (CSR 邻接表, LRU + TTL); 边数超过上限的用户仍走 $graphLookup
+        self.graph_snapshot_enabled = os.environ.get("SOUL_GRAPH_SNAPSHOT", "true").lower() in ("true", "1", "yes")
+        self.graph_snapshot_ttl_sec = float(os.environ.get("SOUL_GRAPH_SNAPSHOT_TTL_SEC", "600"))
+        self.graph_snapshot_max_users = int(os.environ.get("SOUL_GRAPH_SNAPSHOT_MAX_USERS", "256"))
+        self.graph_snapshot_max_edges = int(os.environ.get("SOUL_GRAPH_SNAPSHOT_MAX_EDGES", "50000"))
 
         # Phase 3b: 记忆整理
         self.decay_base_rate = float(os.environ.get("SOUL_DECAY_BASE_RATE", "0.03"))
         self.decay_emotion_weight = float(os.environ.get("SOUL_DECAY_EMOTION_WEIGHT", "0.5"))
         self.decay_flashbulb_intensity = float(os.environ.get("SOUL_FLASHBULB_INTENSITY", "0.8"))
         self.consolidation_batch_size = int(os.environ.get("SOUL_CONSOLIDATION_BATCH_SIZE", "100"))
+        self.consolidation_concurrency = int(os.environ.get("SOUL_CONSOLIDATION_CONCURRENCY", "8"))
 
         # SOTA: Graphiti 时序知识图谱
         self.graphiti_enabled = os.environ.get("GRAPHITI_ENABLED", "false").lower() in ("true", "1", "yes")
@@ -60,6 +66,15 @@ class SoulConfig:
             os.environ.get("SOUL_RECALL_TIMEOUT_MS_EXTENDED", "600")
         )  # 12 路需更多时间
         self.enable_port_registry = os.environ.get("SOUL_PORT_REGISTRY", "false").lower() in ("true", "1", "yes")
+        # 流式召回: 核心预算内完成的路由先交给 LLM，迟到的路由丢弃 (drop) 或留给下一轮 (hold)
+        self.recall_streaming = os.environ.get("SOUL_RECALL_STREAMING", "false").lower() in ("true", "1", "yes")
+        self.recall_core_budget_ms = int(os.environ.get("SOUL_RECALL_CORE_BUDGET_MS", "250"))
+        self.recall_late_policy = os.environ.get("SOUL_RECALL_LATE_POLICY", "hold").lower()
+        self.recall_hold_ttl_sec = float(os.environ.get("SOUL_RECALL_HOLD_TTL_SEC", "600"))
+        # 召回结果短时缓存: 相同/相近 query 在 TTL 内复用各路由结果
+        self.recall_cache_enabled = os.environ.get("SOUL_RECALL_CACHE", "true").lower() in ("true", "1", "yes")
+        self.recall_cache_ttl_sec = float(os.environ.get("SOUL_RECALL_CACHE_TTL_SEC", "90"))
+        self.recall_cache_similarity = float(os.environ.get("SOUL_RECALL_CACHE_SIMILARITY", "0.8"))
 
         # Memory Fabric 控制平面
         self.fabric_enabled = os.environ.get("SOUL_FABRIC_ENABLED", "true").lower() in ("true", "1", "yes")
@@ -0,0 +1,138 @@
+"""整理任务执行器 — 按用户并发 + 断点续跑 + Mongo 批量写
+
+各整理阶段原先对 distinct("user_id") 逐个串行处理、逐条 update_one，
+用户量到数万时一晚跑不完。这里提供:
+- run_per_user: 用户按 ID 排序分块, 块内在信号量限制下并发处理;
+  每块完成后写入断点 (最后一个用户 ID + 累计统计), 同一 run_key 重跑时从断点继续,
+  已完成的阶段直接返回上次的结果
+- BulkWriter: 把同一集合的更新攒成 bulk_write(ordered=False) 批次
+
+dry_run 或 run_key 为空时不读写断点。
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# 每块用户数 = 并发数 * CHUNK_FACTOR (块越大断点越少, 重跑时重复处理的用户越多)
+CHUNK_FACTOR = 16
+
+
+class BulkWriter:
+    """攒批写入同一集合，满 batch_size 自动 flush"""
+
+    def __init__(self, coll, batch_size: int = 500):
+        self.coll = coll
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self._ops: List[Any] = []
+
+    async def add(self, op) -> None:
+        self._ops.append(op)
+        if len(self._ops) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._ops:
+            return
+        ops, self._ops = self._ops, []
+        await self.coll.bulk_write(ops, ordered=False)
+        self.written += len(ops)
+
+
+async def _load_checkpoint(run_key: str, stage: str) -> Optional[Dict]:
+    from ..storage.soul_collections import get_collection, CONSOLIDATION_CHECKPOINTS
+
+    coll = await get_collection(CONSOLIDATION_CHECKPOINTS)
+    if coll is None:
+        return None
+    return await coll.find_one({"_id": f"{run_key}:{stage}"})
+
+
+async def _save_checkpoint(run_key: str, stage: str, fields: Dict) -> None:
+    from ..storage.soul_collections import get_collection, CONSOLIDATION_CHECKPOINTS
+
+    coll = await get_collection(CONSOLIDATION_CHECKPOINTS)
+    if coll is None:
+        return
+    await coll.update_one(
+        {"_id": f"{run_key}:{stage}"},
+        {"$set": {**fields, "run_key": run_key, "stage": stage,
+                  "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def _accumulate(totals: Dict[str, int], result: Optional[Dict]) -> None:
+    for k, v in (result or {}).items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            totals[k] = totals.get(k, 0) + v
+
+
+async def run_per_user(
+    stage: str,
+    user_ids: Iterable[str],
+    process_user: Callable[[str], Awaitable[Optional[Dict]]],
+    run_key: Optional[str] = None,
+    dry_run: bool = False,
+    concurrency: int = 8,
+) -> Dict:
+    """并发处理所有用户，累加 process_user 返回的数值统计
+
+    Returns:
+        {"users": 总用户数, "resumed_users": 断点前已处理的用户数, "failed": 失败数, **累计统计}
+    """
+    user_ids = sorted({uid for uid in user_ids if uid})
+    concurrency = max(1, concurrency)
+    use_checkpoint = bool(run_key) and not dry_run
+
+    totals: Dict[str, int] = {}
+    last_user_id = None
+    if use_checkpoint:
+        try:
+            checkpoint = await _load_checkpoint(run_key, stage)
+        except Exception as e:
+            logger.warning(f"[Consolidator] Load checkpoint for {stage} failed: {e}")
+            checkpoint = None
+        if checkpoint:
+            if checkpoint.get("completed"):
+                logger.info(f"[Consolidator] {stage} already completed for {run_key}, skipping")
+                return {**checkpoint.get("result", {}), "resumed_users": len(user_ids)}
+            last_user_id = checkpoint.get("last_user_id")
+            totals = dict(checkpoint.get("totals") or {})
+
+    pending = [uid for uid in user_ids if last_user_id is None or uid > last_user_id]
+    resumed = len(user_ids) - len(pending)
+    if resumed:
+        logger.info(f"[Consolidator] {stage} resuming after {resumed} users")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(uid: str) -> None:
+        async with semaphore:
+            try:
+                _accumulate(totals, await process_user(uid))
+            except Exception as e:
+                totals["failed"] = totals.get("failed", 0) + 1
+                logger.warning(f"[Consolidator] {stage} user {uid[:8]}... failed: {e}")
+
+    chunk_size = concurrency * CHUNK_FACTOR
+    for i in range(0, len(pending), chunk_size):
+        chunk = pending[i:i + chunk_size]
+        await asyncio.gather(*(_one(uid) for uid in chunk))
+        if use_checkpoint:
+            try:
+                await _save_checkpoint(run_key, stage, {"last_user_id": chunk[-1], "totals": totals})
+            except Exception as e:
+                logger.warning(f"[Consolidator] Save checkpoint for {stage} failed: {e}")
+
+    result = {"users": len(user_ids), "failed": 0, **totals}
+    if use_checkpoint:
+        try:
+            await _save_checkpoint(run_key, stage, {"completed": True, "result": result})
+        except Exception as e:
+            logger.warning(f"[Consolidator] Save checkpoint for {stage} failed: {e}")
+    result["resumed_users"] = resumed
+    return result
@@ -5,17 +5,21 @@ v3 补完: 传递推理 — 发现 A→B, B→C 时记录潜在 A→C 关系。
 """
 
 import time
-from typing import Dict
+from typing import Dict, List, Optional
 
 from loguru import logger
 
+_DELETE_CHUNK = 1000  # 合并计划中每次 $in 删除的节点数
+
 
 class GraphMaintenance:
     """知识图谱离线维护"""
 
-    async def process_all_users(self, dry_run: bool = False) -> Dict:
-        """遍历所有有节点的用户"""
+    async def process_all_users(self, dry_run: bool = False, run_key: Optional[str] = None) -> Dict:
+        """遍历所有有节点的用户 (按用户并发, run_key 非空时可断点续跑)"""
         from ..storage.soul_collections import get_collection, SEMANTIC_NODES
+        from ..config import get_soul_config
+        from .executor import run_per_user
 
         nodes_coll = await get_collection(SEMANTIC_NODES)
         if nodes_coll is None:
@@ -23,59 +27,61 @@ class GraphMaintenance:
 
         start = time.monotonic()
         user_ids = await nodes_coll.distinct("user_id")
-
-        total_merged = 0
-        total_contradictions = 0
-        total_transitive = 0
-
-        for uid in user_ids:
-            try:
-                merged = await self._merge_duplicate_nodes(uid, dry_run)
-                total_merged += merged
-            except Exception as e:
-                logger.warning(f"[GraphMaint] Merge failed for user {uid[:8]}...: {e}")
-
-            try:
-                contradictions = await self._detect_contradictions(uid)
-                total_contradictions += contradictions
-            except Exception as e:
-                logger.warning(f"[GraphMaint] Contradiction detection failed for user {uid[:8]}...: {e}")
-
-            try:
-                transitive = await self._discover_transitive_relations(uid, dry_run)
-                total_transitive += transitive
-            except Exception as e:
-                logger.warning(f"[GraphMaint] Transitive discovery failed for user {uid[:8]}...: {e}")
+        totals = await run_per_user(
+            "graph_maintenance",
+            user_ids,
+            lambda uid: self._process_user(uid, dry_run),
+            run_key=run_key,
+            dry_run=dry_run,
+            concurrency=get_soul_config().consolidation_concurrency,
+        )
 
         elapsed_ms = int((time.monotonic() - start) * 1000)
         return {
             "status": "ok",
-            "users": len(user_ids),
-            "merged": total_merged,
-            "contradictions": total_contradictions,
-            "transitive_discovered": total_transitive,
+            "merged": 0,
+            "contradictions": 0,
+            "transitive_discovered": 0,
+            **totals,
             "elapsed_ms": elapsed_ms,
             "dry_run": dry_run,
         }
 
+    async def _process_user(self, uid: str, dry_run: bool) -> Dict:
+        """单用户维护: 三个步骤各自 try/except, 互不影响"""
+        result = {"merged": 0, "contradictions": 0, "transitive_discovered": 0}
+        try:
+            result["merged"] = await self._merge_duplicate_nodes(uid, dry_run)
+        except Exception as e:
+            logger.warning(f"[GraphMaint] Merge failed for user {uid[:8]}...: {e}")
+
+        try:
+            result["contradictions"] = await self._detect_contradictions(uid)
+        except Exception as e:
+            logger.warning(f"[GraphMaint] Contradiction detection failed for user {uid[:8]}...: {e}")
+
+        try:
+            result["transitive_discovered"] = await self._discover_transitive_relations(uid, dry_run)
+        except Exception as e:
+            logger.warning(f"[GraphMaint] Transitive discovery failed for user {uid[:8]}...: {e}")
+        return result
+
     async def _merge_duplicate_nodes(self, user_id: str, dry_run: bool) -> int:
         """合并重复节点
 
         1. 查询用户所有节点
         2. 按 label.lower() 分组
         3. 同组 >1 个 → 保留 mention_count 最高的
-        4. 合并: 累加 mention_count + _cascade_label_update + delete_node_cascade
-        5. 前缀匹配: "React" 和 "React.js" → 保留较短的
+        4. 前缀匹配: "React" 和 "React.js" → 保留较短的
+        5. 合并计划 (累加 mention_count + 边 label 改写 + 删除重复节点及其边) 最后一次性批量执行
         """
         from ..storage.soul_collections import get_collection, SEMANTIC_NODES
-        from ..semantic.knowledge_graph import get_knowledge_graph
         from ..config import get_soul_config
 
         nodes_coll = await get_collection(SEMANTIC_NODES)
         if nodes_coll is None:
             return 0
 
-        kg = get_knowledge_graph()
         batch_size = get_soul_config().consolidation_batch_size
 
         # 加载所有节点
@@ -91,6 +97,18 @@ class GraphMaintenance:
                 nodes_by_lower.setdefault(key, []).append(doc)
 
         merged_count = 0
+        mention_incs: Dict[str, int] = {}  # primary label -> 待累加的 mention_count
+        renames: Dict[str, str] = {}       # 边上的 dup label -> primary label
+        dup_ids: List[str] = []            # 待删除的重复节点 (及其关联边)
+
+        def _plan_merge(primary_label: str, dup: dict) -> None:
+            dup_label = dup.get("label", "")
+            # 之前攒下的累加量随 dup 一起转给新的 primary
+            dup_count = dup.get("mention_count", 0) + mention_incs.pop(dup_label, 0)
+            mention_incs[primary_label] = mention_incs.get(primary_label, 0) + dup_count
+            if dup_label != primary_label:
+                renames[dup_label] = primary_label
+            dup_ids.append(dup.get("node_id", ""))
 
         # 精确匹配去重: 同 label.lower()
         for key, group in nodes_by_lower.items():
@@ -103,82 +121,94 @@ class GraphMaintenance:
 
             # 保留 mention_count 最高的节点
             group.sort(key=lambda d: d.get("mention_count", 0), reverse=True)
-            primary = group[0]
-            primary_label = primary.get("label", "")
-
+            primary_label = group[0].get("label", "")
             for dup in group[1:]:
-                dup_label = dup.get("label", "")
-                dup_id = dup.get("node_id", "")
-                dup_count = dup.get("mention_count", 0)
-
-                # 累加 mention_count 到 primary
-                await nodes_coll.update_one(
-                    {"user_id": user_id, "label": primary_label},
-                    {"$inc": {"mention_count": dup_count}},
-                )
-
-                # 级联更新边中的 label 引用
-                if dup_label != primary_label:
-                    await kg._cascade_label_update(user_id, dup_label, primary_label)
-
-                # 删除重复节点 + 关联边
-                await kg.delete_node_cascade(user_id, dup_id)
+                _plan_merge(primary_label, dup)
                 merged_count += 1
+            # 只剩 primary 参与前缀匹配
+            del group[1:]
 
         # 前缀匹配: "React" 和 "React.js" → 保留较短的
-        # 重新加载 (精确去重可能删了一些, dry_run 也需刷新以准确计数)
-        if merged_count > 0:
-            nodes_by_lower.clear()
-            cursor = nodes_coll.find(
-                {"user_id": user_id},
-                batch_size=batch_size,
-            )
-            async for doc in cursor:
-                label = doc.get("label", "")
-                key = label.lower().strip()
-                if key:
-                    nodes_by_lower.setdefault(key, []).append(doc)
-
-        # 前缀检测: 按长度排序, 检查短 label 是否为长 label 的前缀
-        all_keys = sorted(nodes_by_lower.keys(), key=len)
+        # 每个 key 只可能被比它短 1-4 个字符的前缀合并, 直接查这些前缀是否存在 (O(n)),
+        # 由短到长处理: 取最短的、自身未被合并的前缀作为 primary
         merged_keys = set()
-        for i, short_key in enumerate(all_keys):
-            if short_key in merged_keys:
-                continue
-            for long_key in all_keys[i + 1:]:
-                if long_key in merged_keys:
+        for long_key in sorted(nodes_by_lower.keys(), key=len):
+            for plen in range(max(1, len(long_key) - 4), len(long_key)):
+                short_key = long_key[:plen]
+                if short_key not in nodes_by_lower or short_key in merged_keys:
                     continue
-                # 前缀匹配 (如 "react" 和 "react.js")
-                if long_key.startswith(short_key) and len(long_key) - len(short_key) <= 4:
-                    if dry_run:
-                        merged_count += 1
-                        merged_keys.add(long_key)
-                        continue
-
-                    short_group = nodes_by_lower.get(short_key, [])
-                    long_group = nodes_by_lower.get(long_key, [])
-                    if not short_group or not long_group:
-                        continue
-
-                    # 保留较短的 label
-                    primary = short_group[0]
-                    primary_label = primary.get("label", "")
-                    for dup in long_group:
-                        dup_label = dup.get("label", "")
-                        dup_id = dup.get("node_id", "")
-                        dup_count = dup.get("mention_count", 0)
-                        await nodes_coll.update_one(
-                            {"user_id": user_id, "label": primary_label},
-                            {"$inc": {"mention_count": dup_count}},
-                        )
-                        if dup_label != primary_label:
-                            await kg._cascade_label_update(user_id, dup_label, primary_label)
-                        await kg.delete_node_cascade(user_id, dup_id)
-                        merged_count += 1
-                    merged_keys.add(long_key)
+                merged_keys.add(long_key)
+                if dry_run:
+                    merged_count += 1
+                    break
+
+                primary_label = nodes_by_lower[short_key][0].get("label", "")
+                for dup in nodes_by_lower[long_key]:
+                    _plan_merge(primary_label, dup)
+                    merged_count += 1
+                break
+
+        if not dry_run and dup_ids:
+            await self._apply_merge_plan(user_id, mention_incs, renames, dup_ids)
 
         return merged_count
 
+    async def _apply_merge_plan(
+        self, user_id: str, mention_incs: Dict[str, int],
+        renames: Dict[str, str], dup_ids: List[str],
+    ) -> None:
+        """批量执行合并计划: 边 label 改写 → 删除重复节点的边 → 删除重复节点 → 累加 mention_count"""
+        from pymongo import UpdateMany, UpdateOne
+        from ..storage.soul_collections import get_collection, SEMANTIC_EDGES, SEMANTIC_NODES
+        from ..semantic.knowledge_graph import get_knowledge_graph
+
+        nodes_coll = await get_collection(SEMANTIC_NODES)
+        edges_coll = await get_collection(SEMANTIC_EDGES)
+        get_knowledge_graph().invalidate_snapshot(user_id)
+
+        if edges_coll is not None:
+            # 链式改写 (精确去重的 primary 又在前缀阶段被合并) 直接指向最终 primary
+            def _final(label: str) -> str:
+                seen = set()
+                while label in renames and label not in seen:
+                    seen.add(label)
+                    label = renames[label]
+                return label
+
+            rename_ops = []
+            for old_label in renames:
+                new_label = _final(old_label)
+                if new_label == old_label:
+                    continue
+                rename_ops.append(UpdateMany(
+                    {"user_id": user_id, "source_label": old_label},
+                    {"$set": {"source_label": new_label}},
+                ))
+                rename_ops.append(UpdateMany(
+                    {"user_id": user_id, "target_label": old_label},
+                    {"$set": {"target_label": new_label}},
+                ))
+            if rename_ops:
+                await edges_coll.bulk_write(rename_ops, ordered=False)
+
+        for i in range(0, len(dup_ids), _DELETE_CHUNK):
+            chunk = dup_ids[i:i + _DELETE_CHUNK]
+            if edges_coll is not None:
+                await edges_coll.delete_many({"user_id": user_id, "$or": [
+                    {"source_id": {"$in": chunk}},
+                    {"target_id": {"$in": chunk}},
+                ]})
+            await nodes_coll.delete_many({"user_id": user_id, "node_id": {"$in": chunk}})
+
+        if mention_incs:
+            await nodes_coll.bulk_write(
+                [
+                    UpdateOne({"user_id": user_id, "label": label}, {"$inc": {"mention_count": inc}})
+                    for label, inc in mention_incs.items()
+                ],
+                ordered=False,
+            )
+
     async def _detect_contradictions(self, user_id: str) -> int:
         """检测矛盾边
 
@@ -12,12 +12,16 @@ import time
 from datetime import datetime, timezone
 from typing import Dict, Optional
 
+import numpy as np
 from loguru import logger
 
+from ..semantic.label_matcher import LabelMatcher
+
 # P2: 魔法数字常量化
 DECAY_ABSOLUTE_FLOOR = 0.0005  # 极度保护记忆的最小衰减率
 DECAY_THRESHOLD = 0.1          # recall_strength 低于此值标记为 decayed
 LABEL_MIN_LENGTH = 3           # label 匹配最小长度 (避免 "我" "是" 等误匹配)
+EMOTION_WINDOW_SEC = 60        # importance ↔ emotion 时间窗口 (±秒)
 
 
 def recall_strength(
@@ -90,6 +94,56 @@ async def query_active_importance(user_id: str, limit: int = 20) -> list:
         return []
 
 
+class EmotionTimeline:
+    """按时间排序的用户 emotions — 批量做 ±EMOTION_WINDOW_SEC 窗口 join
+
+    窗口边界用 searchsorted 定位; 窗口内最大 intensity 走稀疏表 (O(1) 区间最大值),
+    是否含高峰走前缀和。构建 O(n log n)，每批查询全程向量化。
+    """
+
+    def __init__(self, epochs: list, intensities: list, peaks: list):
+        order = np.argsort(np.asarray(epochs, dtype=np.int64), kind="stable")
+        self.epochs = np.asarray(epochs, dtype=np.int64)[order]
+        intensity = np.asarray(intensities, dtype=np.float64)[order]
+        self._peak_cumsum = np.concatenate(
+            ([0], np.cumsum(np.asarray(peaks, dtype=np.int64)[order])),
+        )
+        # _sparse[k][i] = max(intensity[i : i + 2**k])
+        self._sparse = [intensity]
+        width = 1
+        while width * 2 <= len(intensity):
+            prev = self._sparse[-1]
+            self._sparse.append(np.maximum(prev[:-width], prev[width:]))
+            width *= 2
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def match(self, epochs: np.ndarray):
+        """对每个 epoch 秒返回 (窗口内最高 intensity, 窗口内是否有情感高峰)"""
+        n = len(epochs)
+        if not len(self.epochs):
+            return np.zeros(n, dtype=np.float64), np.zeros(n, dtype=bool)
+
+        lo = np.searchsorted(self.epochs, epochs - EMOTION_WINDOW_SEC, side="left")
+        hi = np.searchsorted(self.epochs, epochs + EMOTION_WINDOW_SEC, side="right")
+        has_any = hi > lo
+        peaks = (self._peak_cumsum[hi] - self._peak_cumsum[lo]) > 0
+
+        # 区间 [lo, hi) 拆成两个重叠的 2**k 段取最大值
+        length = np.where(has_any, hi - lo, 1)
+        level = np.floor(np.log2(length)).astype(np.int64)
+        intensities = np.zeros(n, dtype=np.float64)
+        for k in np.unique(level[has_any]):
+            sel = has_any & (level == k)
+            table = self._sparse[k]
+            left = lo[sel]
+            right = hi[sel] - (1 << int(k))
+            intensities[sel] = np.maximum(table[left], table[right])
+        # 与逐秒探测时一致: 负 intensity 不计入 (初始值 0)
+        return np.maximum(intensities, 0.0), peaks
+
+
 class MemoryDecayProcessor:
     """遍历 soul_importance, 计算衰减, 标记低价值记忆"""
 
@@ -97,9 +151,10 @@ class MemoryDecayProcessor:
         from ..config import get_soul_config
         self._cfg = get_soul_config()
 
-    async def process_all_users(self, dry_run: bool = False) -> Dict:
-        """遍历所有用户, 执行衰减计算"""
+    async def process_all_users(self, dry_run: bool = False, run_key: Optional[str] = None) -> Dict:
+        """遍历所有用户, 执行衰减计算 (按用户并发, run_key 非空时可断点续跑)"""
         from ..storage.soul_collections import get_collection, IMPORTANCE
+        from .executor import run_per_user
 
         coll = await get_collection(IMPORTANCE)
         if coll is None:
@@ -108,26 +163,22 @@ class MemoryDecayProcessor:
         start = time.monotonic()
         # 获取所有有 importance 记录的用户
         user_ids = await coll.distinct("user_id")
-        total_processed = 0
-        total_decayed = 0
-        total_flashbulb = 0
-
-        for uid in user_ids:
-            try:
-                result = await self._process_user(uid, dry_run)
-                total_processed += result.get("processed", 0)
-                total_decayed += result.get("decayed", 0)
-                total_flashbulb += result.get("flashbulb", 0)
-            except Exception as e:
-                logger.warning(f"[Decay] User {uid[:8]}... failed: {e}")
+        totals = await run_per_user(
+            "memory_decay",
+            user_ids,
+            lambda uid: self._process_user(uid, dry_run),
+            run_key=run_key,
+            dry_run=dry_run,
+            concurrency=self._cfg.consolidation_concurrency,
+        )
 
         elapsed_ms = int((time.monotonic() - start) * 1000)
         return {
             "status": "ok",
-            "users": len(user_ids),
-            "processed": total_processed,
-            "decayed": total_decayed,
-            "flashbulb": total_flashbulb,
+            "processed": 0,
+            "decayed": 0,
+            "flashbulb": 0,
+            **totals,
             "elapsed_ms": elapsed_ms,
             "dry_run": dry_run,
         }
@@ -155,110 +206,120 @@ class MemoryDecayProcessor:
         now = datetime.now(timezone.utc)
 
         # 一次性预加载该用户的 emotions (避免 N+1 查询)
-        emotion_map = await self._preload_emotions(user_id)
+        emotions = await self._preload_emotions(user_id)
 
         # Phase 3b-beta: 预加载 span_days (重复提及间隔)
         span_days_map = await self._preload_span_days(user_id)
 
         # Phase 3b-beta: 预加载 links (知识图谱边数)
-        links_map = await self._preload_links(user_id)
+        links_matcher = await self._preload_links(user_id)
 
         processed = 0
         decayed = 0
         flashbulb_count = 0
-        bulk_ops = []  # 攒批 bulk_write
 
+        async def _score_batch(docs: list) -> None:
+            """对一批 importance 文档做时间窗口 join + 打分，并一次 bulk_write"""
+            nonlocal decayed, flashbulb_count
+            from pymongo import UpdateOne
+
+            # 匹配 emotion: 按 created_at ±60s 时间窗口，整批向量化
+            epochs = np.fromiter(
+                (int(d["created_at"].timestamp()) for d in docs), dtype=np.int64, count=len(docs),
+            )
+            intensities, peaks = emotions.match(epochs)
+
+            bulk_ops = []
+            for doc, intensity, is_peak in zip(docs, intensities.tolist(), peaks.tolist()):
+                importance_score = doc.get("score", 0.0)
+                days = max((now - doc["created_at"]).total_seconds() / 86400, 0)
+
+                # v3: 优先使用持久化的 is_flashbulb, 回退到三重条件计算
+                is_fb = doc.get("is_flashbulb", False)
+                if not is_fb:
+                    is_fb = (
+                        is_peak
+                        and intensity >= flashbulb_intensity
+                        and importance_score >= 0.7
+                    )
+                if is_fb:
+                    flashbulb_count += 1
+
+                # Phase 3b-beta: 获取 span_days 和 links
+                summary = doc.get("summary", "")
+                span = span_days_map.get(summary[:50], 0.0)
+                links = self._get_links_for_doc(doc, links_matcher)
+
+                # 计算 recall_strength
+                rs = recall_strength(
+                    importance=importance_score,
+                    days=days,
+                    is_flashbulb=is_fb,
+                    span_days=span,
+                    intensity=intensity,
+                    links=links,
+                    base_rate=base_rate,
+                    emotion_weight=emotion_weight,
+                )
+
+                # 标记低价值记忆 + v3: 持久化 span/links/flashbulb
+                if not dry_run:
+                    base_set = {
+                        "recall_strength": rs,
+                        "mention_span_days": int(span),
+                        "linked_memory_count": links,
+                        "is_flashbulb": is_fb,
+                    }
+                    if rs < DECAY_THRESHOLD:
+                        base_set["decayed"] = True
+                        bulk_ops.append(UpdateOne(
+                            {"_id": doc["_id"]},
+                            {"$set": base_set},
+                        ))
+                        decayed += 1
+                    else:
+                        update = {"$set": base_set}
+                        if doc.get("decayed"):
+                            update["$unset"] = {"decayed": ""}
+                        bulk_ops.append(UpdateOne({"_id": doc["_id"]}, update))
+
+            if bulk_ops:
+                await imp_coll.bulk_write(bulk_ops, ordered=False)
+
+        # 每 batch_size 条打分并刷一次
+        pending_docs = []
         cursor = imp_coll.find(
             {"user_id": user_id},
             batch_size=batch_size,
         )
         async for doc in cursor:
             processed += 1
-            importance_score = doc.get("score", 0.0)
             created_at = doc.get("created_at")
             if not created_at or not isinstance(created_at, datetime):
                 continue
-
-            days = max((now - created_at).total_seconds() / 86400, 0)
-
-            # 匹配 emotion: 按 created_at ±60s 时间窗口
-            intensity = self._match_emotion_intensity(created_at, emotion_map)
-            is_peak = self._match_emotion_peak(created_at, emotion_map)
-
-            # v3: 优先使用持久化的 is_flashbulb, 回退到三重条件计算
-            is_fb = doc.get("is_flashbulb", False)
-            if not is_fb:
-                is_fb = (
-                    is_peak
-                    and intensity >= flashbulb_intensity
-                    and importance_score >= 0.7
-                )
-            if is_fb:
-                flashbulb_count += 1
-
-            # Phase 3b-beta: 获取 span_days 和 links
-            summary = doc.get("summary", "")
-            span = span_days_map.get(summary[:50], 0.0)
-            links = self._get_links_for_doc(doc, links_map)
-
-            # 计算 recall_strength
-            rs = recall_strength(
-                importance=importance_score,
-                days=days,
-                is_flashbulb=is_fb,
-                span_days=span,
-                intensity=intensity,
-                links=links,
-                base_rate=base_rate,
-                emotion_weight=emotion_weight,
-            )
-
-            # 标记低价值记忆 + v3: 持久化 span/links/flashbulb
-            if not dry_run:
-                from pymongo import UpdateOne
-                base_set = {
-                    "recall_strength": rs,
-                    "mention_span_days": int(span),
-                    "linked_memory_count": links,
-                    "is_flashbulb": is_fb,
-                }
-                if rs < DECAY_THRESHOLD:
-                    base_set["decayed"] = True
-                    bulk_ops.append(UpdateOne(
-                        {"_id": doc["_id"]},
-                        {"$set": base_set},
-                    ))
-                    decayed += 1
-                else:
-                    update = {"$set": base_set}
-                    if doc.get("decayed"):
-                        update["$unset"] = {"decayed": ""}
-                    bulk_ops.append(UpdateOne({"_id": doc["_id"]}, update))
-
-                # 每 batch_size 条刷一次
-                if len(bulk_ops) >= batch_size:
-                    await imp_coll.bulk_write(bulk_ops, ordered=False)
-                    bulk_ops.clear()
+            pending_docs.append(doc)
+            if len(pending_docs) >= batch_size:
+                await _score_batch(pending_docs)
+                pending_docs = []
 
         # 刷出剩余
-        if bulk_ops and not dry_run:
-            await imp_coll.bulk_write(bulk_ops, ordered=False)
+        if pending_docs:
+            await _score_batch(pending_docs)
 
         return {"processed": processed, "decayed": decayed, "flashbulb": flashbulb_count}
 
-    async def _preload_emotions(self, user_id: str) -> Dict[int, Dict]:
-        """一次性加载用户所有 emotions, 按 created_at 的 epoch 秒分桶
+    async def _preload_emotions(self, user_id: str) -> "EmotionTimeline":
+        """一次性加载用户所有 emotions, 按 created_at 的 epoch 秒排序成时间线
 
-        Returns:
-            dict: {epoch_second: {"intensity": float, "is_peak": bool}}
+        同一秒内的多条 emotion 全部保留 (窗口内取最高 intensity / 任一高峰)。
         """
         from ..storage.soul_collections import get_collection, EMOTIONS
 
         emo_coll = await get_collection(EMOTIONS)
         if emo_coll is None:
-            return {}
+            return EmotionTimeline([], [], [])
 
-        emotion_map: Dict[int, Dict] = {}
+        epochs, intensities, peaks = [], [], []
         cursor = emo_coll.find(
             {"user_id": user_id},
             projection={
@@ -270,12 +331,10 @@ class MemoryDecayProcessor:
         async for doc in cursor:
             ca = doc.get("created_at")
             if ca and isinstance(ca, datetime):
-                epoch = int(ca.timestamp())
-                emotion_map[epoch] = {
-                    "intensity": doc.get("emotion_intensity", 0.0),
-                    "is_peak": doc.get("is_emotional_peak", False),
-                }
-        return emotion_map
+                epochs.append(int(ca.timestamp()))
+                intensities.append(doc.get("emotion_intensity") or 0.0)
+                peaks.append(bool(doc.get("is_emotional_peak", False)))
+        return EmotionTimeline(epochs, intensities, peaks)
 
     async def _preload_span_days(self, user_id: str) -> Dict[str, float]:
         """预加载重复提及间隔 — 同一 summary 前缀出现的最早和最晚时间差
@@ -322,21 +381,22 @@ class MemoryDecayProcessor:
 
         return span_map
 
-    async def _preload_links(self, user_id: str) -> Dict[str, int]:
+    async def _preload_links(self, user_id: str) -> Optional[LabelMatcher]:
         """预加载知识图谱连接数 — 每个 summary 关键词在图谱中的边数
 
         Phase 3b-beta: 如果一个概念在知识图谱中有多条边连接,
         说明它是用户知识网络的核心节点, 应受到更多保护。
 
         Returns:
-            dict: {label_lower: link_count}
+            LabelMatcher: 以 {label_lower: link_count} 构建的多模式匹配器,
+            每条 summary 只需线性扫描一次; 无图谱数据时返回 None
         """
         from ..storage.soul_collections import get_collection, SEMANTIC_EDGES, SEMANTIC_NODES
 
         nodes_coll = await get_collection(SEMANTIC_NODES)
         edges_coll = await get_collection(SEMANTIC_EDGES)
         if nodes_coll is None or edges_coll is None:
-            return {}
+            return None
 
         try:
             # 获取用户所有节点的 label → 边数映射
@@ -352,7 +412,7 @@ class MemoryDecayProcessor:
                     node_labels.add(label.lower())
 
             if not node_labels:
-                return {}
+                return None
 
             # 统计每个 label 作为 source 或 target 的边数
             label_link_count: Dict[str, int] = {}
@@ -369,52 +429,17 @@ class MemoryDecayProcessor:
                 if tgt:
                     label_link_count[tgt] = label_link_count.get(tgt, 0) + 1
 
-            return label_link_count
+            return LabelMatcher(label_link_count, min_length=LABEL_MIN_LENGTH)
 
         except Exception as e:
             logger.debug(f"[Decay] links preload failed: {e}")
 
-        return {}
+        return None
 
-    def _get_links_for_doc(self, doc: dict, label_counts: Dict[str, int]) -> int:
+    def _get_links_for_doc(self, doc: dict, links_matcher: Optional[LabelMatcher]) -> int:
         """根据 importance 文档的 summary 匹配知识图谱连接数"""
-        if not label_counts:
-            return 0
-
-        summary = (doc.get("summary") or "").lower()
-        if not summary:
+        if not links_matcher:
             return 0
 
         # 匹配: summary 中包含的 label 的最大边数
-        max_links = 0
-        for label, count in label_counts.items():
-            if len(label) >= LABEL_MIN_LENGTH and label in summary:
-                max_links = max(max_links, count)
-        return max_links
-
-    @staticmethod
-    def _match_emotion_intensity(
-        created_at: datetime, emotion_map: Dict[int, Dict],
-    ) -> float:
-        """按 ±60s 时间窗口匹配 emotion intensity — 取最高值"""
-        epoch = int(created_at.timestamp())
-        max_intensity = 0.0
-        for offset in range(-60, 61):
-            entry = emotion_map.get(epoch + offset)
-            if entry:
-                intensity = entry.get("intensity", 0.0)
-                if intensity > max_intensity:
-                    max_intensity = intensity
-        return max_intensity
-
-    @staticmethod
-    def _match_emotion_peak(
-        created_at: datetime, emotion_map: Dict[int, Dict],
-    ) -> bool:
-        """按 ±60s 时间窗口匹配是否为情感高峰"""
-        epoch = int(created_at.timestamp())
-        for offset in range(-60, 61):
-            entry = emotion_map.get(epoch + offset)
-            if entry and entry.get("is_peak"):
-                return True
-        return False
+        return links_matcher.max_weight(doc.get("summary") or "")
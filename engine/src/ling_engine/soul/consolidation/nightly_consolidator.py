@@ -7,11 +7,13 @@
 
 每个任务独立 try/except, 失败只 warning 不中断。
 整理日志写入 CONSOLIDATION_LOG, 只含聚合统计 (无 PII)。
+按用户遍历的阶段 (memory_decay / graph_maintenance / profile_update) 并发执行,
+并以当天日期为 run_key 写断点: 同一天中断后重跑会从断点继续 (resume=False 时从头开始)。
 """
 
 import time
 from datetime import datetime, timezone
-from typing import Dict
+from typing import Dict, Optional
 
 from loguru import logger
 
@@ -19,14 +21,18 @@ from loguru import logger
 class NightlyConsolidator:
     """夜间整理编排器"""
 
-    def __init__(self, dry_run: bool = False):
+    def __init__(self, dry_run: bool = False, resume: bool = True):
         self.dry_run = dry_run
+        self.resume = resume
+        self.run_key: Optional[str] = None
 
     async def run(self) -> Dict:
         """按依赖顺序执行全部整理任务"""
         start = time.monotonic()
         tasks_result = {}
         now = datetime.now(timezone.utc)
+        # 断点键: 同一天内重跑复用; 不续跑时加上启动时间, 等于全新一轮
+        self.run_key = now.strftime("%Y-%m-%d") if self.resume else now.strftime("%Y-%m-%dT%H%M%S")
 
         # === 每日任务 ===
 
@@ -133,12 +139,12 @@ class NightlyConsolidator:
     async def _decay(self) -> Dict:
         """记忆衰减"""
         from .memory_decay import MemoryDecayProcessor
-        return await MemoryDecayProcessor().process_all_users(dry_run=self.dry_run)
+        return await MemoryDecayProcessor().process_all_users(dry_run=self.dry_run, run_key=self.run_key)
 
     async def _graph(self) -> Dict:
         """知识图谱维护"""
         from .graph_maintenance import GraphMaintenance
-        return await GraphMaintenance().process_all_users(dry_run=self.dry_run)
+        return await GraphMaintenance().process_all_users(dry_run=self.dry_run, run_key=self.run_key)
 
     async def _weekly_digest(self) -> Dict:
         """Phase 3b-beta: 周摘要生成 (周日触发)"""
@@ -181,7 +187,7 @@ class NightlyConsolidator:
     async def _profile_update(self) -> Dict:
         """v3: 用户画像刷新 (每日)"""
         from ..cache.user_profile_cache import refresh_all_profiles
-        return await refresh_all_profiles()
+        return await refresh_all_profiles(run_key=None if self.dry_run else self.run_key)
 
     async def _write_log(self, results: Dict):
         """写入整理日志 — 只存聚合统计, 不存 user_id (无 PII)"""
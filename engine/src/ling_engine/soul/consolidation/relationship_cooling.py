@@ -61,8 +61,10 @@ async def batch_cooling_check(dry_run: bool = False) -> Dict:
     避免与 soul_recall 实时冷却竞态:
     - 处理后设 last_cooling_date 为今天, 同一天不重复处理
     """
+    from pymongo import UpdateOne
     from ..storage.soul_collections import get_collection, RELATIONSHIPS
     from ..config import get_soul_config
+    from .executor import BulkWriter
 
     coll = await get_collection(RELATIONSHIPS)
     if coll is None:
@@ -83,6 +85,7 @@ async def batch_cooling_check(dry_run: bool = False) -> Dict:
 
     processed = 0
     demoted = 0
+    writer = BulkWriter(coll, batch_size)
     cursor = coll.find(query, batch_size=batch_size)
     async for doc in cursor:
         last_interaction = doc.get("last_interaction")
@@ -114,12 +117,11 @@ async def batch_cooling_check(dry_run: bool = False) -> Dict:
             update_fields["accumulated_score"] = max(0, old_score - decay)
 
         if not dry_run:
-            await coll.update_one(
-                {"_id": doc["_id"]},
-                {"$set": update_fields},
-            )
+            await writer.add(UpdateOne({"_id": doc["_id"]}, {"$set": update_fields}))
         processed += 1
 
+    await writer.flush()
+
     elapsed_ms = int((time.monotonic() - start) * 1000)
     return {
         "status": "ok",
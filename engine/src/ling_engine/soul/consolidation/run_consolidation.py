@@ -3,6 +3,7 @@
 用法:
     python -m ling_engine.soul.consolidation.run_consolidation
     python -m ling_engine.soul.consolidation.run_consolidation --dry-run
+    python -m ling_engine.soul.consolidation.run_consolidation --fresh   # 忽略当天断点, 从头开始
 """
 
 import argparse
@@ -62,7 +63,7 @@ def _notify_telegram(text: str):
         logger.warning(f"[Consolidator] Telegram notify failed: {e}")
 
 
-async def main(dry_run: bool = False):
+async def main(dry_run: bool = False, resume: bool = True):
     """主入口: 初始化索引 → 执行整理 → Telegram 通知"""
     from ling_engine.soul.storage.soul_collections import ensure_indexes
     await ensure_indexes()
@@ -70,7 +71,7 @@ async def main(dry_run: bool = False):
     from ling_engine.soul.consolidation.nightly_consolidator import NightlyConsolidator
 
     try:
-        results = await NightlyConsolidator(dry_run=dry_run).run()
+        results = await NightlyConsolidator(dry_run=dry_run, resume=resume).run()
     except Exception as e:
         _notify_telegram(f"🔴 灵魂整理失败: {e}")
         raise
@@ -105,6 +106,7 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Soul memory consolidation")
     parser.add_argument("--dry-run", action="store_true", help="Dry run without writes")
+    parser.add_argument("--fresh", action="store_true", help="Ignore today's checkpoints and start over")
     args = parser.parse_args()
 
     # fcntl.flock 文件锁防止并发
@@ -126,7 +128,7 @@ if __name__ == "__main__":
     signal.alarm(GLOBAL_TIMEOUT_SECONDS)
 
     try:
-        asyncio.run(main(dry_run=args.dry_run))
+        asyncio.run(main(dry_run=args.dry_run, resume=not args.fresh))
     finally:
         signal.alarm(0)  # 取消超时
         fcntl.flock(lock_fd, fcntl.LOCK_UN)
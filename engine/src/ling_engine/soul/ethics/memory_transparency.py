@@ -7,11 +7,18 @@ semantic_nodes, semantic_edges, weekly_digests, monthly_themes, life_chapters,
 collective_patterns, self_narrative
 """
 
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from loguru import logger
 
 from ..utils.validation import is_valid_user_id
 
+# 导出的集合及顺序 (只含带 user_id 的集合; COLLECTIVE_PATTERNS/SELF_NARRATIVE 匿名/灵自有)
+EXPORT_COLLECTION_KEYS = (
+    "emotions", "stories", "importance", "relationships",
+    "knowledge_nodes", "knowledge_edges",
+    "weekly_digests", "monthly_themes", "life_chapters",
+)
+
 
 async def get_user_memory_summary(user_id: str) -> Optional[Dict[str, Any]]:
     """查询全部 11 个集合返回分类统计"""
@@ -229,6 +236,11 @@ async def delete_all_user_memories(user_id: str) -> int:
             get_in_conversation_tracker().reset(user_id)
         except Exception:
             pass
+        try:
+            from ..semantic.knowledge_graph import get_knowledge_graph
+            get_knowledge_graph().invalidate_snapshot(user_id)
+        except Exception:
+            pass
 
         logger.info(f"[Transparency] Deleted {total} records for {user_id}")
     except Exception as e:
@@ -237,58 +249,97 @@ async def delete_all_user_memories(user_id: str) -> int:
     return total
 
 
+class ExportReadError(Exception):
+    """流式导出时读取某个集合失败; collection 为集合 key"""
+
+    def __init__(self, collection: str, error: Exception):
+        super().__init__(f"{collection}: {error}")
+        self.collection = collection
+
+
+def _export_collections() -> Dict[str, str]:
+    from ..storage.soul_collections import (
+        EMOTIONS, STORIES, IMPORTANCE,
+        RELATIONSHIPS, SEMANTIC_NODES, SEMANTIC_EDGES,
+        WEEKLY_DIGESTS, MONTHLY_THEMES, LIFE_CHAPTERS,
+    )
+
+    names = (
+        EMOTIONS, STORIES, IMPORTANCE,
+        RELATIONSHIPS, SEMANTIC_NODES, SEMANTIC_EDGES,
+        WEEKLY_DIGESTS, MONTHLY_THEMES, LIFE_CHAPTERS,
+    )
+    return dict(zip(EXPORT_COLLECTION_KEYS, names))
+
+
+async def iter_user_data(
+    user_id: str,
+    resume: Optional[Tuple[str, Optional[str]]] = None,
+    batch_size: int = 200,
+    skip_failed: bool = False,
+) -> AsyncIterator[Tuple[str, str, Dict[str, Any]]]:
+    """流式导出 — 逐条产出 (集合 key, 游标, 文档)
+
+    按集合顺序、集合内按 _id 升序读取 Mongo 游标，内存占用与数据量无关。
+    游标为文档 _id 的十六进制串; resume=(集合 key, 游标) 从该集合中游标之后继续，
+    之前的集合跳过 (游标为 None 表示从该集合开头)。
+    集合读取中途失败时抛 ExportReadError，调用方据此告知客户端从最后收到的游标续传;
+    skip_failed=True 时改为记日志并跳过该集合 (仅供整包导出 export_user_data 使用)。
+    """
+    if not is_valid_user_id(user_id):
+        logger.warning("[Transparency] Invalid user_id format in export request")
+        return
+
+    from ..storage.soul_collections import get_collection
+
+    collections = _export_collections()
+    keys = list(EXPORT_COLLECTION_KEYS)
+    after = None
+    if resume is not None:
+        resume_key, after = resume
+        keys = keys[keys.index(resume_key):]
+
+    for key in keys:
+        coll = await get_collection(collections[key])
+        if coll is None:
+            after = None
+            continue
+        query: Dict[str, Any] = {"user_id": user_id}
+        if after:
+            from bson import ObjectId
+            query["_id"] = {"$gt": ObjectId(after)}
+        after = None
+        try:
+            cursor = coll.find(query, sort=[("_id", 1)], batch_size=batch_size)
+            async for doc in cursor:
+                doc_id = doc.pop("_id", None)
+                # datetime → ISO string for JSON serialization
+                for k, v in doc.items():
+                    if hasattr(v, 'isoformat'):
+                        doc[k] = v.isoformat()
+                yield key, str(doc_id), doc
+        except Exception as e:
+            if not skip_failed:
+                logger.warning(f"[Transparency] Export {key} failed: {e}")
+                raise ExportReadError(key, e) from e
+            logger.debug(f"[Transparency] Export {key} failed: {e}")
+
+
 async def export_user_data(user_id: str) -> Dict[str, Any]:
     """GDPR Article 20 数据可携权
 
     遍历 11 集合, find({"user_id": user_id}), 投影掉 _id。
     COLLECTIVE_PATTERNS/SELF_NARRATIVE 不含 user_id, 不导出 (匿名/灵自有)。
-    返回 JSON-serializable 的完整数据包。
+    返回 JSON-serializable 的完整数据包 (整包在内存中; 大数据量用 iter_user_data 流式导出)。
     """
     if not is_valid_user_id(user_id):
         logger.warning("[Transparency] Invalid user_id format in export request")
         return {}
     try:
-        from ..storage.soul_collections import (
-            get_collection, EMOTIONS, STORIES, IMPORTANCE,
-            RELATIONSHIPS, SEMANTIC_NODES, SEMANTIC_EDGES,
-            WEEKLY_DIGESTS, MONTHLY_THEMES, LIFE_CHAPTERS,
-        )
-
-        # 只导出含 user_id 的集合 (COLLECTIVE_PATTERNS/SELF_NARRATIVE 不含 user_id)
-        collections = {
-            "emotions": EMOTIONS,
-            "stories": STORIES,
-            "importance": IMPORTANCE,
-            "relationships": RELATIONSHIPS,
-            "knowledge_nodes": SEMANTIC_NODES,
-            "knowledge_edges": SEMANTIC_EDGES,
-            "weekly_digests": WEEKLY_DIGESTS,
-            "monthly_themes": MONTHLY_THEMES,
-            "life_chapters": LIFE_CHAPTERS,
-        }
-
-        export = {"user_id": user_id}
-        for key, coll_name in collections.items():
-            coll = await get_collection(coll_name)
-            if coll is None:
-                export[key] = []
-                continue
-            try:
-                cursor = coll.find(
-                    {"user_id": user_id},
-                    projection={"_id": 0},
-                )
-                docs = []
-                async for doc in cursor:
-                    # datetime → ISO string for JSON serialization
-                    for k, v in doc.items():
-                        if hasattr(v, 'isoformat'):
-                            doc[k] = v.isoformat()
-                    docs.append(doc)
-                export[key] = docs
-            except Exception as e:
-                logger.debug(f"[Transparency] Export {key} failed: {e}")
-                export[key] = []
+        export: Dict[str, Any] = {"user_id": user_id}
+        export.update({key: [] for key in EXPORT_COLLECTION_KEYS})
+        async for key, _, doc in iter_user_data(user_id, skip_failed=True):
+            export[key].append(doc)
 
         logger.info(f"[Transparency] Data exported for {user_id}")
         return export
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from loguru import logger
 
+from ..cache.recall_cache import invalidate_after_writes
 from ..utils.validation import is_valid_user_id
 
 # 情感关键词 (来自 v3 设计的 InConversationTracker)
@@ -154,6 +155,8 @@ class SoulPostProcessor:
                 for i, r in enumerate(results):
                     if isinstance(r, Exception):
                         logger.warning(f"[Soul] PostProcessor {task_names[i]} write failed: {r}")
+                # 写入可能部分成功，受影响的召回缓存路由一律失效
+                invalidate_after_writes(user_id, task_names)
             except Exception as e:
                 logger.warning(f"[Soul] PostProcessor gather failed: {e}")
 
@@ -8,16 +8,19 @@ SOTA: +Graphiti 时序图谱第 8 路(替换), +Mem0 实体记忆第 11 路
 """
 
 import asyncio
+import functools
 import hashlib
 import time
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any
 from loguru import logger
 
+from ..cache.recall_cache import get_recall_cache
 from ..models import SoulContext, RelationshipStage, STAGE_THRESHOLDS
 from ..narrative.memory_reconstructor import MemoryReconstructor
 from ..utils.async_tasks import create_logged_task
 from ..utils.validation import is_valid_user_id, is_authenticated_user_id
+from ...utils.runtime_stats import LatencyStats, register_stats_provider
 
 # Phase 2 遗留修复: MemoryReconstructor 单例 (不再每次 _emotional_resonance 都创建)
 _reconstructor = MemoryReconstructor()
@@ -39,6 +42,9 @@ POSITIVE_KEYWORDS = ["太好了", "开心", "激动", "兴奋", "终于", "成
 
 # P2: 魔法数字常量化
 BREAKTHROUGH_WINDOW_DAYS = 30  # breakthrough_hint 有效窗口
+MAX_HELD_ROUTE_USERS = 1000  # 流式召回 hold 模式下最多为多少用户保留迟到结果
+# 不经 route_plan、每轮都会启动的核心路由
+_CORE_ROUTES = frozenset({"qdrant", "foresight", "profile", "fabric_events"})
 
 # Round 3: 关系冷却 — v3: 分阶段冷却规则
 from ..consolidation.relationship_cooling import (
@@ -146,6 +152,7 @@ def get_soul_recall() -> "SoulRecall":
     global _soul_recall_instance
     if _soul_recall_instance is None:
         _soul_recall_instance = SoulRecall()
+        register_stats_provider("soul_recall", _soul_recall_instance.get_stats)
     return _soul_recall_instance
 
 
@@ -158,6 +165,13 @@ def reset_soul_recall_for_testing():
 class SoulRecall:
     """灵魂级记忆召回"""
 
+    def __init__(self):
+        # 流式召回迟到路由的结果: user_id -> {route: (过期时间, 结果)}，下一轮召回时补入
+        self._held_routes: Dict[str, Dict[str, tuple]] = {}
+        # 各路由从召回开始到完成的耗时
+        self._route_latency: Dict[str, LatencyStats] = {}
+        self._late_counts = {"dropped": 0, "held": 0, "reused": 0}
+
     async def recall(
         self,
         query: str,
@@ -183,12 +197,17 @@ class SoulRecall:
             logger.info(f"[Soul] 跳过匿名用户记忆召回: {user_id}")
             return SoulContext()
 
+        from ..config import get_soul_config
+
         start = time.monotonic()
         ctx = SoulContext()
+        cfg = get_soul_config()
+        # 流式模式: 核心预算到点即返回已完成的路由，不再等满整个超时
+        deadline = start + cfg.recall_core_budget_ms / 1000.0 if cfg.recall_streaming else None
 
         try:
             results = await asyncio.wait_for(
-                self._parallel_recall(query, user_id, is_owner, top_k),
+                self._parallel_recall(query, user_id, is_owner, top_k, deadline=deadline),
                 timeout=timeout_ms / 1000.0,
             )
 
@@ -326,28 +345,31 @@ class SoulRecall:
         return val if isinstance(val, list) else []
 
     async def _parallel_recall(
-        self, query: str, user_id: str, is_owner: bool, top_k: int
+        self, query: str, user_id: str, is_owner: bool, top_k: int,
+        deadline: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """12 路并行召回 — 返回 Dict (SOTA: 替代 tuple)"""
+        """12 路并行召回 — 返回 Dict (SOTA: 替代 tuple)
+
+        deadline (time.monotonic 时间点) 非空时为流式模式: 到点只返回已完成的路由，
+        未完成的按 recall_late_policy 取消或保留到下一轮。
+        """
         from ..config import get_soul_config
         from soul_fabric import get_memory_fabric
         from ..ports.initializer import ensure_ports_initialized
 
+        started = time.monotonic()
         emotion = _emotion_hint(query)
         recall_layer = _detect_recall_layer(query)
         cfg = get_soul_config()
         use_port_registry = cfg.enable_port_registry
+        # 相同/相近 query 的缓存结果: 命中的路由不再查询 (阶段以本轮 relationship 为准)
+        recall_cache = get_recall_cache() if cfg.recall_cache_enabled else None
+        cache_hit = recall_cache.lookup(user_id, query) if recall_cache else None
+        reused: Dict[str, Any] = dict(cache_hit.routes) if cache_hit else {}
+
         # 先并发启动核心 4 路，再根据 relationship stage 决定是否扩展重路径。
-        tasks = {
-            "qdrant": asyncio.create_task(self._qdrant_search(query, user_id, top_k)),
-            "foresight": asyncio.create_task(self._foresight_search(query, top_k=2)),
-            "profile": asyncio.create_task(self._profile_fetch(user_id)),
-            "relationship": asyncio.create_task(self._fetch_relationship(user_id)),
-        }
-        if cfg.fabric_enabled:
-            tasks["fabric_events"] = asyncio.create_task(
-                self._fabric_event_memories(query, user_id, top_k),
-            )
+        tasks = {"relationship": asyncio.create_task(self._fetch_relationship(user_id))}
+        self._start_core_routes(tasks, reused, query, user_id, top_k, cfg)
 
         try:
             relationship = await tasks["relationship"]
@@ -358,12 +380,23 @@ class SoulRecall:
             if isinstance(relationship, dict) and relationship
             else "stranger"
         )
+        if cache_hit and cache_hit.stage != relationship_stage:
+            recall_cache.reject(cache_hit)
+            reused = {}
+            self._start_core_routes(tasks, reused, query, user_id, top_k, cfg)
         route_plan = get_memory_fabric().plan_recall(
             relationship_stage=relationship_stage,
             latency_budget_ms=cfg.recall_timeout_ms_extended,
             query=query,
         )
-        routes = route_plan.routes
+        routes = {
+            key: enabled and key not in reused
+            for key, enabled in route_plan.routes.items()
+        }
+        reused = {
+            key: value for key, value in reused.items()
+            if key in _CORE_ROUTES or route_plan.routes.get(key)
+        }
 
         if routes.get("core_blocks"):
             tasks["core_blocks"] = self._core_blocks_fetch(user_id)
@@ -373,7 +406,7 @@ class SoulRecall:
             tasks["safety_shadow"] = self._safety_shadow_fetch(user_id)
 
         if any(
-            routes.get(k)
+            route_plan.routes.get(k)
             for k in (
                 "evermemos",
                 "stories",
@@ -418,14 +451,127 @@ class SoulRecall:
             "[MemoryFabric] recall complexity={} budget_tier={} routes={} providers={}",
             route_plan.query_complexity,
             route_plan.budget_tier,
-            sorted([k for k, enabled in routes.items() if enabled]),
+            sorted([k for k, enabled in route_plan.routes.items() if enabled]),
             route_plan.selected_providers,
         )
+        if recall_cache:
+            recall_cache.record_routes(reused, tasks)
+
+        futures = {key: asyncio.ensure_future(task) for key, task in tasks.items()}
+        for key, fut in futures.items():
+            fut.add_done_callback(functools.partial(self._record_route_latency, key, started))
+
+        if deadline is None:
+            results = dict(zip(
+                futures.keys(),
+                await asyncio.gather(*futures.values(), return_exceptions=True),
+            ))
+            if recall_cache:
+                recall_cache.store(user_id, query, relationship_stage, results)
+            results.update(reused)
+            return results
 
-        keys = list(tasks.keys())
-        coros = list(tasks.values())
-        results = await asyncio.gather(*coros, return_exceptions=True)
-        return dict(zip(keys, results))
+        try:
+            await asyncio.wait(
+                list(futures.values()),
+                timeout=max(0.0, deadline - time.monotonic()),
+            )
+        except asyncio.CancelledError:
+            for fut in futures.values():
+                fut.cancel()
+            raise
+
+        results: Dict[str, Any] = {}
+        late: Dict[str, asyncio.Future] = {}
+        for key, fut in futures.items():
+            if not fut.done():
+                late[key] = fut
+            elif not fut.cancelled():
+                exc = fut.exception()
+                results[key] = exc if exc is not None else fut.result()
+        if recall_cache:
+            recall_cache.store(user_id, query, relationship_stage, results)
+        results.update(reused)
+        self._merge_held_routes(user_id, results)
+        if late:
+            self._defer_late_routes(user_id, late, cfg)
+        return results
+
+    def _start_core_routes(
+        self, tasks: Dict[str, Any], reused: Dict[str, Any],
+        query: str, user_id: str, top_k: int, cfg,
+    ) -> None:
+        """启动尚未启动、也没有缓存结果的核心路由"""
+        def wanted(key: str) -> bool:
+            return key not in tasks and key not in reused
+
+        if wanted("qdrant"):
+            tasks["qdrant"] = asyncio.create_task(self._qdrant_search(query, user_id, top_k))
+        if wanted("foresight"):
+            tasks["foresight"] = asyncio.create_task(self._foresight_search(query, top_k=2))
+        if wanted("profile"):
+            tasks["profile"] = asyncio.create_task(self._profile_fetch(user_id))
+        if cfg.fabric_enabled and wanted("fabric_events"):
+            tasks["fabric_events"] = asyncio.create_task(
+                self._fabric_event_memories(query, user_id, top_k),
+            )
+
+    # ── 流式召回: 迟到路由 ──
+
+    def _record_route_latency(self, key: str, started: float, fut: asyncio.Future) -> None:
+        if fut.cancelled():
+            return
+        stats = self._route_latency.get(key)
+        if stats is None:
+            stats = self._route_latency[key] = LatencyStats()
+        stats.record((time.monotonic() - started) * 1000)
+
+    def _defer_late_routes(self, user_id: str, late: Dict[str, asyncio.Future], cfg) -> None:
+        if cfg.recall_late_policy == "hold":
+            for key, fut in late.items():
+                fut.add_done_callback(
+                    functools.partial(self._hold_route_result, user_id, key, cfg.recall_hold_ttl_sec)
+                )
+            self._late_counts["held"] += len(late)
+        else:
+            for fut in late.values():
+                fut.cancel()
+            self._late_counts["dropped"] += len(late)
+        logger.debug(f"[Soul] Streaming recall: late routes {sorted(late)} ({cfg.recall_late_policy})")
+
+    def _hold_route_result(self, user_id: str, key: str, ttl_sec: float, fut: asyncio.Future) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        value = fut.result()
+        if not value:
+            return
+        now = time.monotonic()
+        if user_id not in self._held_routes and len(self._held_routes) >= MAX_HELD_ROUTE_USERS:
+            self._held_routes = {
+                uid: routes for uid, routes in self._held_routes.items()
+                if any(expires_at > now for expires_at, _ in routes.values())
+            }
+            if len(self._held_routes) >= MAX_HELD_ROUTE_USERS:
+                return
+        self._held_routes.setdefault(user_id, {})[key] = (now + ttl_sec, value)
+
+    def _merge_held_routes(self, user_id: str, results: Dict[str, Any]) -> None:
+        """上一轮迟到的结果补进本轮未按时完成 (或未启动) 的路由，每份结果只用一次"""
+        held = self._held_routes.pop(user_id, None)
+        if not held:
+            return
+        now = time.monotonic()
+        for key, (expires_at, value) in held.items():
+            if expires_at > now and key not in results:
+                results[key] = value
+                self._late_counts["reused"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "route_latency": {k: v.snapshot() for k, v in sorted(self._route_latency.items())},
+            "late_routes": dict(self._late_counts),
+            "held_users": len(self._held_routes),
+        }
 
     async def _port_registry_search(
         self,
@@ -451,12 +597,11 @@ class SoulRecall:
             return []
 
     async def _qdrant_search(self, query: str, user_id: str, top_k: int) -> List[str]:
-        """Qdrant 短期记忆搜索"""
+        """Qdrant 短期记忆搜索 (超时不影响 embedding 批次，下一次相同查询直接命中缓存)"""
         try:
-            from ...important import search_similar_memories
-            loop = asyncio.get_event_loop()
+            from ...important import search_similar_memories_async
             results = await asyncio.wait_for(
-                loop.run_in_executor(None, search_similar_memories, query, user_id, top_k),
+                search_similar_memories_async(query, user_id, top_k),
                 timeout=0.2,
             )
             if results:
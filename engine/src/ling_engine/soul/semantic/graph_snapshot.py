@@ -0,0 +1,252 @@
+"""知识图谱用户快照 — 召回热路径的进程内 CSR 邻接表
+
+trace_context 每次召回都要跑一遍 $graphLookup 聚合 + 节点 confidence 扫描，
+find_matching_labels 还要拼 $or + $regex 查询。这里把单个用户的节点和边一次性加载成
+紧凑的数组结构，之后的多跳追踪和 label 匹配都在进程内完成 (微秒级):
+
+- labels / label_ids: label ↔ 整数 ID (节点 label 在前，只出现在边上的 label 追加在后)
+- mention / last_confirmed / confidence: 按 label ID 索引的节点属性 (非节点 label 为 -1)
+- offsets / targets / strengths / relation_ids / updated: 按 source 排序的 CSR 边表
+
+快照由 KnowledgeGraph 按用户 LRU 缓存; 已有节点/边的写入原地修补，新增 label 或边则整份失效重建。
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .label_matcher import LabelMatcher
+
+LOW_CONFIDENCE = 0.3      # 与 KnowledgeGraph._low_confidence 一致
+TRACE_MIN_STRENGTH = 0.6  # 链路边 strength 门槛 (直接边不过滤, 与 $graphLookup 版本一致)
+LABEL_MATCH_MIN_LENGTH = 2  # 与分词的中文 2 字下限一致
+
+# (source, target, relation, last_updated_epoch 或 None)
+TraceEdge = Tuple[str, str, str, Optional[float]]
+
+
+def _as_utc(value) -> Optional[datetime]:
+    """Mongo 返回的 naive datetime 按 UTC 处理"""
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _epoch(value) -> float:
+    value = _as_utc(value)
+    return value.timestamp() if value else math.nan
+
+
+class GraphSnapshot:
+    """单个用户知识图谱的只读快照 (少量原地修补除外)"""
+
+    __slots__ = (
+        "labels", "label_ids", "mention", "last_confirmed", "confidence",
+        "offsets", "targets", "strengths", "relation_ids", "updated", "relations",
+        "node_count", "loaded_at", "_matcher", "_originals",
+    )
+
+    def __init__(self, nodes: Sequence[dict], edges: Sequence[dict]):
+        """nodes: {label, mention_count, last_confirmed}; edges: {source_label, target_label, relation, strength, last_updated}"""
+        from .knowledge_graph import _calc_confidence
+
+        self.labels: List[str] = []
+        self.label_ids: Dict[str, int] = {}
+        self.mention = array("i")
+        self.last_confirmed = array("d")
+        self.confidence = array("f")
+
+        for doc in nodes:
+            label = doc.get("label", "")
+            if not label or label in self.label_ids:
+                continue
+            mc = doc.get("mention_count", 1) or 1
+            lc = _as_utc(doc.get("last_confirmed"))
+            self.label_ids[label] = len(self.labels)
+            self.labels.append(label)
+            self.mention.append(mc)
+            self.last_confirmed.append(lc.timestamp() if lc else math.nan)
+            self.confidence.append(_calc_confidence(mc, lc) if lc else -1.0)
+        self.node_count = len(self.labels)
+
+        rel_ids: Dict[str, int] = {}
+        self.relations: List[str] = []
+        rows = []
+        for doc in edges:
+            src = doc.get("source_label", "")
+            tgt = doc.get("target_label", "")
+            if not src or not tgt:
+                continue
+            rel = doc.get("relation", "related")
+            rid = rel_ids.get(rel)
+            if rid is None:
+                rid = rel_ids[rel] = len(self.relations)
+                self.relations.append(rel)
+            rows.append((
+                self._intern(src), self._intern(tgt), rid,
+                doc.get("strength", 0.0) or 0.0,
+                _epoch(doc.get("last_updated")),
+            ))
+
+        # CSR: 按 source 稳定排序, 同一 source 的出边保持加载顺序
+        rows.sort(key=lambda r: r[0])
+        n = len(self.labels)
+        counts = [0] * (n + 1)
+        for r in rows:
+            counts[r[0] + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.offsets = array("i", counts)
+        self.targets = array("i", (r[1] for r in rows))
+        self.relation_ids = array("H", (r[2] for r in rows))
+        self.strengths = array("f", (r[3] for r in rows))
+        self.updated = array("d", (r[4] for r in rows))
+
+        self.loaded_at = time.monotonic()
+        self._matcher: Optional[LabelMatcher] = None
+        self._originals: Optional[Dict[str, str]] = None
+
+    def _intern(self, label: str) -> int:
+        lid = self.label_ids.get(label)
+        if lid is None:
+            lid = self.label_ids[label] = len(self.labels)
+            self.labels.append(label)
+            self.mention.append(0)
+            self.last_confirmed.append(math.nan)
+            self.confidence.append(-1.0)
+        return lid
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def _low_confidence(self, lid: int) -> bool:
+        conf = self.confidence[lid]
+        return 0 <= conf < LOW_CONFIDENCE
+
+    def _edge(self, i: int, src: int) -> TraceEdge:
+        upd = self.updated[i]
+        return (
+            self.labels[src], self.labels[self.targets[i]],
+            self.relations[self.relation_ids[i]], None if upd != upd else upd,
+        )
+
+    # ── 追踪 ──────────────────────────────────────────────────────
+
+    def trace(self, start_label: str, max_depth: int = 2, limit: int = 5) -> List[TraceEdge]:
+        """从起始节点追踪关系链 — 语义同 $graphLookup 版本
+
+        取起始节点的前 limit 条出边; 每条直接边之后跟着从其 target 出发、
+        深度 < max_depth、strength > 0.6 的链路边 (BFS, 每条边只出现一次)。
+        涉及低 confidence 节点的边跳过 (直接边被跳过时其链路一并跳过)。
+        """
+        start = self.label_ids.get(start_label)
+        if start is None:
+            return []
+        offsets, targets, strengths = self.offsets, self.targets, self.strengths
+
+        results: List[TraceEdge] = []
+        begin, end = offsets[start], offsets[start + 1]
+        for i in range(begin, min(end, begin + limit)):
+            tgt = targets[i]
+            if self._low_confidence(start) or self._low_confidence(tgt):
+                continue
+            results.append(self._edge(i, start))
+            if len(results) >= limit:
+                break
+
+            frontier = [tgt]
+            seen_nodes = {tgt}
+            for _depth in range(max_depth):
+                nxt = []
+                for node in frontier:
+                    for j in range(offsets[node], offsets[node + 1]):
+                        if strengths[j] <= TRACE_MIN_STRENGTH:
+                            continue
+                        c_tgt = targets[j]
+                        if not (self._low_confidence(node) or self._low_confidence(c_tgt)):
+                            results.append(self._edge(j, node))
+                        if c_tgt not in seen_nodes:
+                            seen_nodes.add(c_tgt)
+                            nxt.append(c_tgt)
+                if not nxt or len(results) >= limit:
+                    break
+                frontier = nxt
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    # ── label 匹配 ────────────────────────────────────────────────
+
+    def _label_matcher(self) -> Tuple[LabelMatcher, Dict[str, str]]:
+        if self._matcher is None:
+            counts: Dict[str, int] = {}
+            originals: Dict[str, str] = {}
+            for lid in range(self.node_count):
+                label = self.labels[lid]
+                lower = label.lower()
+                mc = self.mention[lid]
+                if lower not in counts or mc > counts[lower]:
+                    counts[lower] = mc
+                    originals[lower] = label
+            self._originals = originals
+            self._matcher = LabelMatcher(counts, min_length=LABEL_MATCH_MIN_LENGTH)
+        return self._matcher, self._originals
+
+    def labels_in_text(self, text: str, limit: int) -> List[str]:
+        """text 中完整出现的节点 label, 按 mention_count 降序"""
+        matcher, originals = self._label_matcher()
+        hits = sorted(matcher.find(text), key=lambda lb: -matcher.weights[lb])
+        return [originals[lb] for lb in hits[:limit]]
+
+    def labels_containing(self, tokens: Sequence[str], limit: int, exclude=()) -> List[str]:
+        """包含任一 token 的节点 label (大小写不敏感), 按 mention_count 降序"""
+        needles = [t.lower() for t in tokens if t]
+        if not needles or limit <= 0:
+            return []
+        hits = []
+        for lid in range(self.node_count):
+            label = self.labels[lid]
+            if label in exclude:
+                continue
+            lower = label.lower()
+            if any(n in lower for n in needles):
+                hits.append((-self.mention[lid], lid))
+        hits.sort()
+        return [self.labels[lid] for _, lid in hits[:limit]]
+
+    # ── 原地修补 ──────────────────────────────────────────────────
+
+    def touch_node(self, label: str, now: float) -> bool:
+        """已有节点被再次提及: mention_count+1, 刷新 confidence; 不是已知节点返回 False"""
+        from .knowledge_graph import _calc_confidence
+
+        lid = self.label_ids.get(label)
+        if lid is None or lid >= self.node_count:
+            return False
+        self.mention[lid] += 1
+        self.last_confirmed[lid] = now
+        self.confidence[lid] = _calc_confidence(
+            self.mention[lid], datetime.fromtimestamp(now, timezone.utc),
+        )
+        if self._matcher is not None:
+            lower = label.lower()
+            if self._originals.get(lower) == label:
+                self._matcher.weights[lower] = self.mention[lid]
+        return True
+
+    def touch_edge(self, source: str, target: str, relation: str, strength: float, now: float) -> bool:
+        """已有边被再次写入: strength 取最大, 刷新 last_updated; 边不存在返回 False"""
+        src = self.label_ids.get(source)
+        tgt = self.label_ids.get(target)
+        if src is None or tgt is None:
+            return False
+        for i in range(self.offsets[src], self.offsets[src + 1]):
+            if self.targets[i] == tgt and self.relations[self.relation_ids[i]] == relation:
+                if strength > self.strengths[i]:
+                    self.strengths[i] = strength
+                self.updated[i] = now
+                return True
+        return False
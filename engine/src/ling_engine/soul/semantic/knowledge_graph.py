@@ -6,17 +6,23 @@
 - 节点唯一键: (user_id, label) — 同一用户同名概念去重
 - upsert 语义: 重复节点 → mention_count++, last_confirmed 更新
 - confidence 读时计算 (不存储) — 基于 mention_count + 时间衰减
+- 召回热路径: 每用户缓存一份进程内快照 (GraphSnapshot, CSR 邻接表 + label 自动机)，
+  trace_context / find_matching_labels 直接在内存中完成; 超大图谱或快照关闭时回退到 MongoDB 查询
 """
 
 import asyncio
 import math
 import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from hashlib import md5
 from typing import Dict, List, Optional
 
 from loguru import logger
 
+from .graph_snapshot import GraphSnapshot
+
 # 🧬: confidence 时间衰减常量
 CONFIDENCE_HALF_LIFE_DAYS = 180  # 6 个月未提及 → confidence 减半
 
@@ -27,7 +33,10 @@ def get_knowledge_graph() -> "KnowledgeGraph":
     """单例工厂"""
     global _kg_instance
     if _kg_instance is None:
+        from ...utils.runtime_stats import register_stats_provider
+
         _kg_instance = KnowledgeGraph()
+        register_stats_provider("soul_graph_snapshot", _kg_instance.get_snapshot_stats)
     return _kg_instance
 
 
@@ -50,6 +59,19 @@ def _calc_confidence(mention_count: int, last_confirmed: datetime) -> float:
 class KnowledgeGraph:
     """MongoDB 知识图谱 — 节点+边+$graphLookup 查询"""
 
+    def __init__(self):
+        from ..config import get_soul_config
+
+        cfg = get_soul_config()
+        self._snapshot_enabled = cfg.graph_snapshot_enabled
+        self._snapshot_ttl = cfg.graph_snapshot_ttl_sec
+        self._snapshot_max_users = cfg.graph_snapshot_max_users
+        self._snapshot_max_edges = cfg.graph_snapshot_max_edges
+        # user_id -> (expires_at, GraphSnapshot 或 None=图谱过大走 MongoDB)
+        self._snapshots: "OrderedDict[str, tuple]" = OrderedDict()
+        self._snapshot_loads: Dict[str, asyncio.Task] = {}
+        self._snapshot_stats = {"hits": 0, "loads": 0, "oversized": 0, "invalidations": 0, "patches": 0}
+
     async def _get_nodes_coll(self):
         from ..storage.soul_collections import get_collection, SEMANTIC_NODES
         return await get_collection(SEMANTIC_NODES)
@@ -101,6 +123,12 @@ class KnowledgeGraph:
                 update_doc,
                 upsert=True,
             )
+            snapshot = self._cached_snapshot(user_id)
+            if snapshot is not None:
+                if snapshot.touch_node(label, now.timestamp()):
+                    self._snapshot_stats["patches"] += 1
+                else:
+                    self.invalidate_snapshot(user_id)
             return node_id
         except Exception as e:
             logger.debug(f"[Soul] KG upsert_node failed: {e}")
@@ -110,6 +138,7 @@ class KnowledgeGraph:
         self, user_id: str, old_label: str, new_label: str,
     ):
         """label 变更时级联更新 edges 中的 source_label/target_label"""
+        self.invalidate_snapshot(user_id)
         coll = await self._get_edges_coll()
         if coll is None:
             return
@@ -161,6 +190,12 @@ class KnowledgeGraph:
                 },
                 upsert=True,
             )
+            snapshot = self._cached_snapshot(user_id)
+            if snapshot is not None:
+                if snapshot.touch_edge(source_label, target_label, relation, strength, now.timestamp()):
+                    self._snapshot_stats["patches"] += 1
+                else:
+                    self.invalidate_snapshot(user_id)
             return f"{source_id}->{target_id}"
         except Exception as e:
             logger.debug(f"[Soul] KG upsert_edge failed: {e}")
@@ -170,13 +205,31 @@ class KnowledgeGraph:
         self, user_id: str, start_label: str,
         max_depth: int = 2, limit: int = 5,
     ) -> List[str]:
-        """$graphLookup 从起始节点追踪关系链
+        """从起始节点追踪关系链
 
         只返回 strength > 0.6 的边链路 (置信度门槛)。
         对涉及的节点做 confidence 过滤 (低 confidence 节点的链路不输出)。
         输出加不确定措辞。远期链路 (>90天) 描述更模糊。
+        优先在用户快照上遍历; 无快照时走 $graphLookup。
         timeout: 200ms
         """
+        snapshot = await self.get_snapshot(user_id)
+        if snapshot is not None:
+            results = []
+            for src, tgt, rel, upd in snapshot.trace(start_label, max_depth=max_depth, limit=limit):
+                desc = self._format_trace(
+                    src, tgt, rel,
+                    datetime.fromtimestamp(upd, timezone.utc) if upd is not None else None,
+                )
+                if desc:
+                    results.append(desc)
+            return results
+        return await self._trace_context_db(user_id, start_label, max_depth, limit)
+
+    async def _trace_context_db(
+        self, user_id: str, start_label: str, max_depth: int, limit: int,
+    ) -> List[str]:
+        """$graphLookup 版本的 trace_context (图谱过大或快照关闭时使用)"""
         coll = await self._get_edges_coll()
         if coll is None:
             return []
@@ -311,28 +364,135 @@ class KnowledgeGraph:
         else:
             return f"{source}{rel_text}{target}"
 
+    # ── 用户快照缓存 ──────────────────────────────────────────────
+
+    def invalidate_snapshot(self, user_id: str) -> None:
+        """丢弃该用户的图谱快照 (下次召回时重建)"""
+        if self._snapshots.pop(user_id, None) is not None:
+            self._snapshot_stats["invalidations"] += 1
+        task = self._snapshot_loads.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def _cached_snapshot(self, user_id: str) -> Optional[GraphSnapshot]:
+        entry = self._snapshots.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def get_snapshot(self, user_id: str) -> Optional[GraphSnapshot]:
+        """取用户图谱快照; 缺失/过期时加载 (同一用户并发请求只加载一次)
+
+        加载放在独立任务里并用 shield 等待: 召回超时取消调用方时加载仍会完成并入缓存，
+        避免大图谱用户每轮都超时重来。图谱过大或加载失败返回 None。
+        """
+        if not self._snapshot_enabled:
+            return None
+        entry = self._snapshots.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._snapshots.move_to_end(user_id)
+            self._snapshot_stats["hits"] += 1
+            return entry[1]
+
+        task = self._snapshot_loads.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._load_snapshot(user_id))
+            self._snapshot_loads[user_id] = task
+
+            def _done(t: asyncio.Task, uid: str = user_id) -> None:
+                # 加载期间被 invalidate_snapshot 摘掉的结果可能已过时, 不入缓存
+                if self._snapshot_loads.get(uid) is not t:
+                    return
+                del self._snapshot_loads[uid]
+                if not t.cancelled() and t.exception() is None:
+                    self._snapshots[uid] = (time.monotonic() + self._snapshot_ttl, t.result())
+                    self._snapshots.move_to_end(uid)
+                    while len(self._snapshots) > self._snapshot_max_users:
+                        self._snapshots.popitem(last=False)
+
+            task.add_done_callback(_done)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():  # 加载被失效打断, 本次走 MongoDB
+                return None
+            raise
+        except Exception as e:
+            logger.debug(f"[Soul] KG snapshot load failed: {e}")
+            return None
+
+    async def _load_snapshot(self, user_id: str) -> Optional[GraphSnapshot]:
+        nodes_coll = await self._get_nodes_coll()
+        edges_coll = await self._get_edges_coll()
+        if nodes_coll is None or edges_coll is None:
+            raise RuntimeError("collections unavailable")
+
+        max_edges = self._snapshot_max_edges
+        edges = []
+        cursor = edges_coll.find(
+            {"user_id": user_id},
+            projection={
+                "source_label": 1, "target_label": 1, "relation": 1,
+                "strength": 1, "last_updated": 1, "_id": 0,
+            },
+            limit=max_edges + 1,
+            batch_size=1000,
+        )
+        async for doc in cursor:
+            edges.append(doc)
+        if len(edges) > max_edges:
+            self._snapshot_stats["oversized"] += 1
+            return None
+
+        nodes = []
+        cursor = nodes_coll.find(
+            {"user_id": user_id},
+            projection={"label": 1, "mention_count": 1, "last_confirmed": 1, "_id": 0},
+            batch_size=1000,
+        )
+        async for doc in cursor:
+            nodes.append(doc)
+
+        self._snapshot_stats["loads"] += 1
+        return GraphSnapshot(nodes, edges)
+
+    def get_snapshot_stats(self) -> Dict:
+        snapshots = [entry[1] for entry in self._snapshots.values() if entry[1] is not None]
+        return {
+            **self._snapshot_stats,
+            "users": len(self._snapshots),
+            "loading": len(self._snapshot_loads),
+            "edges": sum(snap.edge_count for snap in snapshots),
+            "labels": sum(len(snap.labels) for snap in snapshots),
+        }
+
     async def find_matching_labels(
         self, user_id: str, query: str, limit: int = 2,
     ) -> List[str]:
-        """从用户消息中提取概念词，用 $or + $regex 匹配知识图谱节点
+        """找出用户消息提到的知识图谱节点
 
-        分词策略: 提取英文单词(含 C++/.NET 等) + 中文 2-4 字词组。
-        按 mention_count 降序排序，频繁提及的概念优先匹配。
-        用 re.escape() 转义特殊字符。
+        有快照时先用 label 自动机扫描消息 (消息中完整出现的 label)，
+        不足 limit 时再分词，匹配包含概念词的 label:
+        提取英文单词(含 C++/.NET 等) + 中文 2-4 字词组; 快照内做子串匹配，
+        无快照时用 $or + $regex 查询 (re.escape() 转义特殊字符)。
+        都按 mention_count 降序，频繁提及的概念优先匹配。
         """
-        coll = await self._get_nodes_coll()
-        if coll is None:
-            return []
-
         try:
             query_clean = query.strip()[:100]
             if not query_clean:
                 return []
 
+            results: List[str] = []
+            snapshot = await self.get_snapshot(user_id)
+            if snapshot is not None:
+                results = snapshot.labels_in_text(query_clean, limit)
+                if len(results) >= limit:
+                    return results
+
             # 分词: 英文单词(含特殊字符如 C++, .NET) + 中文 2-4 字词组
             tokens = re.findall(r'[a-zA-Z][a-zA-Z0-9+#.]*|[\u4e00-\u9fff]{2,4}', query_clean)
             if not tokens:
-                return []
+                return results
 
             # 去重 + 取前 5 个 token
             seen = set()
@@ -344,6 +504,15 @@ class KnowledgeGraph:
                     unique_tokens.append(t)
             unique_tokens = unique_tokens[:5]
 
+            if snapshot is not None:
+                return results + snapshot.labels_containing(
+                    unique_tokens, limit - len(results), exclude=set(results),
+                )
+
+            coll = await self._get_nodes_coll()
+            if coll is None:
+                return results
+
             # $or 查询: 任一 token 匹配即命中
             regex_filters = [
                 {"label": {"$regex": re.escape(t), "$options": "i"}}
@@ -352,12 +521,11 @@ class KnowledgeGraph:
             cursor = coll.find(
                 {"user_id": user_id, "$or": regex_filters},
                 sort=[("mention_count", -1)],
-                limit=limit,
+                limit=limit + len(results),
             )
-            results = []
             async for doc in cursor:
                 label = doc.get("label", "")
-                if label:
+                if label and label not in results and len(results) < limit:
                     results.append(label)
             return results
         except Exception as e:
@@ -374,6 +542,7 @@ class KnowledgeGraph:
         if nodes_coll is None:
             return 0
 
+        self.invalidate_snapshot(user_id)
         total = 0
         try:
             # 删除节点
@@ -0,0 +1,102 @@
+"""知识图谱 label 多模式匹配 — Aho-Corasick 自动机
+
+记忆衰减打分和召回都要回答 "这段文本里出现了哪些图谱 label"。
+逐个 label 做 `label in text` 是 O(labels × 文本长度)，用户 label 上千时很慢。
+这里按用户把 label 一次性构建成自动机，之后每段文本线性扫描一遍即可得到全部命中
+(含重叠/嵌套，如 "机器学习" 与 "学习")。
+
+可选地为每个 label 附带权重 (如图谱边数)，max_weight 一次扫描取命中的最大权重。
+匹配统一在小写文本上进行; 构建与扫描都是纯 Python，无额外依赖。
+"""
+
+from typing import Dict, Iterable, List, Mapping, Set, Union
+
+
+class LabelMatcher:
+    """多模式子串匹配器 — 构建一次，多次扫描"""
+
+    __slots__ = ("labels", "weights", "_goto", "_fail", "_out")
+
+    def __init__(
+        self, labels: Union[Iterable[str], Mapping[str, int]], min_length: int = 1,
+    ):
+        """labels 可为 label 列表，或 {label: 权重}; 大小写归一后同名取较大权重"""
+        weighted = isinstance(labels, Mapping)
+        uniq: Dict[str, int] = {}
+        for label in labels:
+            weight = labels[label] if weighted else 0
+            label = (label or "").lower()
+            if len(label) >= min_length:
+                uniq[label] = max(uniq.get(label, weight), weight)
+        self.labels: List[str] = list(uniq)
+        self.weights: Dict[str, int] = uniq
+
+        goto: List[Dict[str, int]] = [{}]
+        out: List[tuple] = [()]
+        for idx, label in enumerate(self.labels):
+            state = 0
+            for ch in label:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (idx,)
+
+        # BFS 建失配指针; 输出沿失配链合并，扫描时无需再回溯输出
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label: str) -> bool:
+        return (label or "").lower() in self.weights
+
+    def find_indices(self, text: str) -> Set[int]:
+        """返回 text 中出现的 label 下标集合 (text 需已小写)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: Set[int] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+    def find(self, text: str) -> List[str]:
+        """返回 text 中出现的全部 label (小写, 按构建顺序)"""
+        if not text or not self.labels:
+            return []
+        labels = self.labels
+        return [labels[i] for i in sorted(self.find_indices(text.lower()))]
+
+    def max_weight(self, text: str) -> int:
+        """text 中出现的 label 的最大权重 (无命中返回 0)"""
+        if not text or not self.labels:
+            return 0
+        labels, weights = self.labels, self.weights
+        best = 0
+        for i in self.find_indices(text.lower()):
+            w = weights[labels[i]]
+            if w > best:
+                best = w
+        return best
@@ -125,6 +125,8 @@ class MemoryDeletionService:
                 if coll is not None:
                     result = await coll.delete_many({"user_id": user_id})
                     total += result.deleted_count
+            from ..semantic.knowledge_graph import get_knowledge_graph
+            get_knowledge_graph().invalidate_snapshot(user_id)
             return {"deleted": total, "error": None}
         except Exception as e:
             logger.warning(f"[GDPR] MongoDB delete failed: {e}")
@@ -18,6 +18,7 @@ WEEKLY_DIGESTS = "soul_weekly_digests"
 MONTHLY_THEMES = "soul_monthly_themes"
 LIFE_CHAPTERS = "soul_life_chapters"
 CONSOLIDATION_LOG = "soul_consolidation_log"
+CONSOLIDATION_CHECKPOINTS = "soul_consolidation_checkpoints"
 # Phase 4: 集体灵魂
 COLLECTIVE_PATTERNS = "soul_collective_patterns"
 SELF_NARRATIVE = "soul_self_narrative"
@@ -149,6 +150,9 @@ async def ensure_indexes():
             # Phase 3b: 整理日志 (只保留 TTL 索引, 不另建普通索引)
             await db[CONSOLIDATION_LOG].create_index(
                 "run_date", expireAfterSeconds=90 * 86400, background=True)
+            # 整理断点: _id = "{run_key}:{stage}"，两周后自动清理
+            await db[CONSOLIDATION_CHECKPOINTS].create_index(
+                "updated_at", expireAfterSeconds=14 * 86400, background=True)
 
             # Phase 4: 集体模式
             await db[COLLECTIVE_PATTERNS].create_index(
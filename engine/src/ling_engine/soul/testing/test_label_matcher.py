@@ -0,0 +1,47 @@
+"""Knowledge-graph label automaton regression tests."""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+from ling_engine.soul.semantic.label_matcher import LabelMatcher
+
+
+class TestLabelMatcher(unittest.TestCase):
+    def test_finds_overlapping_and_nested_labels(self):
+        matcher = LabelMatcher(["机器学习", "学习", "he", "she", "hers"])
+        self.assertEqual(matcher.find("我在学机器学习"), ["机器学习", "学习"])
+        self.assertEqual(matcher.find("ushers"), ["he", "she", "hers"])
+
+    def test_matching_is_case_insensitive(self):
+        matcher = LabelMatcher(["Python", "PyTorch"])
+        self.assertEqual(matcher.find("I use PYTHON and pytorch"), ["python", "pytorch"])
+        self.assertIn("PYTHON", matcher)
+
+    def test_min_length_and_empty_inputs(self):
+        matcher = LabelMatcher(["猫", "", None, "猫咪"], min_length=2)
+        self.assertEqual(len(matcher), 1)
+        self.assertEqual(matcher.find("我家的猫咪"), ["猫咪"])
+        self.assertEqual(matcher.find(""), [])
+        self.assertEqual(LabelMatcher([]).find("任何文本"), [])
+
+    def test_max_weight_uses_the_heaviest_hit(self):
+        matcher = LabelMatcher({"咖啡": 3, "拿铁咖啡": 1, "Tea": 2, "tea": 5})
+        self.assertEqual(matcher.max_weight("一杯拿铁咖啡"), 3)
+        self.assertEqual(matcher.max_weight("green TEA"), 5)
+        self.assertEqual(matcher.max_weight("白开水"), 0)
+
+    def test_agrees_with_naive_substring_search(self):
+        rng = random.Random(7)
+        alphabet = "abc学习机器"
+        labels = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(60)}
+        matcher = LabelMatcher(labels)
+        for _ in range(200):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            expected = sorted(label for label in matcher.labels if label in text)
+            self.assertEqual(sorted(matcher.find(text)), expected, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Soul recall result cache regression tests."""
+
+from __future__ import annotations
+
+import unittest
+from unittest.mock import patch
+
+from ling_engine.soul.cache import recall_cache
+from ling_engine.soul.cache.recall_cache import (
+    RecallResultCache,
+    get_recall_cache,
+    invalidate_after_writes,
+    reset_recall_cache_for_testing,
+)
+
+
+class TestRecallResultCache(unittest.TestCase):
+    def test_exact_hit_ignores_case_whitespace_and_punctuation(self):
+        cache = RecallResultCache()
+        cache.store("u1", "我上周说的那本书叫什么？", "friend", {"stories": ["book"]})
+
+        hit = cache.lookup("u1", "我上周说的 那本书叫什么")
+        self.assertEqual((hit.kind, hit.stage, hit.routes), ("exact", "friend", {"stories": ["book"]}))
+        self.assertIsNone(cache.lookup("u2", "我上周说的那本书叫什么"))
+
+    def test_neighbor_query_merges_routes_newest_first(self):
+        cache = RecallResultCache(similarity=0.6)
+        cache.store("u1", "我上周说的那本书叫什么", "friend", {"stories": ["old"], "graph": ["g"]})
+        cache.store("u1", "我上周说的那本书叫什么名字", "friend", {"stories": ["new"]})
+
+        hit = cache.lookup("u1", "我上周说的那本书叫什么名")
+        self.assertEqual(hit.kind, "neighbor")
+        self.assertEqual(hit.routes, {"stories": ["new"], "graph": ["g"]})
+
+    def test_relationship_errors_and_empty_results_are_not_cached(self):
+        cache = RecallResultCache()
+        cache.store("u1", "你好", "friend", {
+            "relationship": {"stage": "friend"},
+            "graph": [],
+            "mem0": RuntimeError("down"),
+            "stories": ["s"],
+        })
+        self.assertEqual(cache.lookup("u1", "你好").routes, {"stories": ["s"]})
+
+    def test_returned_routes_are_copies(self):
+        cache = RecallResultCache()
+        cache.store("u1", "你好", "friend", {"stories": ["s"]})
+        cache.lookup("u1", "你好").routes["stories"].append("mutated")
+        self.assertEqual(cache.lookup("u1", "你好").routes, {"stories": ["s"]})
+
+    def test_entries_expire_after_ttl(self):
+        cache = RecallResultCache(ttl_sec=10)
+        with patch.object(recall_cache.time, "monotonic", return_value=100.0):
+            cache.store("u1", "你好", "friend", {"stories": ["s"]})
+        with patch.object(recall_cache.time, "monotonic", return_value=111.0):
+            self.assertIsNone(cache.lookup("u1", "你好"))
+        self.assertEqual(cache.get_stats()["users"], 0)
+
+    def test_least_recently_used_user_is_evicted(self):
+        cache = RecallResultCache(max_users=2)
+        for user_id in ("u1", "u2"):
+            cache.store(user_id, "你好", "friend", {"stories": [user_id]})
+        cache.lookup("u1", "你好")
+        cache.store("u3", "你好", "friend", {"stories": ["u3"]})
+
+        self.assertIsNotNone(cache.lookup("u1", "你好"))
+        self.assertIsNone(cache.lookup("u2", "你好"))
+
+    def test_post_process_writes_invalidate_affected_routes_only(self):
+        reset_recall_cache_for_testing()
+        self.addCleanup(reset_recall_cache_for_testing)
+        cache = get_recall_cache()
+        cache.store("u1", "你好", "friend", {"stories": ["s"], "resonance": ["r"]})
+
+        invalidate_after_writes("u1", ["emotion"])
+        self.assertEqual(cache.lookup("u1", "你好").routes, {"stories": ["s"]})
+        invalidate_after_writes("u1", ["story"])
+        self.assertIsNone(cache.lookup("u1", "你好"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
 import sys
 import os
+import asyncio
 import azure.cognitiveservices.speech as speechsdk
 from loguru import logger
-from .tts_interface import TTSInterface
+from .tts_interface import TTSInterface, SynthesizedAudio
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
@@ -43,6 +44,16 @@ class TTSEngine(TTSInterface):
             use_default_speaker=True
         )
 
+    def cache_params(self):
+        return {
+            "voice": self.speech_config.speech_synthesis_voice_name,
+            "pitch": self.pitch,
+            "rate": self.rate,
+            "output_format": self.speech_config.get_property(
+                speechsdk.PropertyId.SpeechServiceConnection_SynthOutputFormat
+            ),
+        }
+
     def generate_audio(self, text, file_name_no_ext=None):
         """
         Generate speech audio file using TTS.
@@ -62,6 +73,20 @@ class TTSEngine(TTSInterface):
         self.__speak_with_audio_config(text, audio_config=file_audio_config)
         return file_name
 
+    async def async_synthesize(self, text):
+        return await asyncio.to_thread(self._synthesize_to_memory, text)
+
+    def _synthesize_to_memory(self, text):
+        # audio_config=None keeps the result in memory (RIFF/WAV in audio_data)
+        result = self.__speak_with_audio_config(text, audio_config=None)
+        if (
+            result is None
+            or result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted
+            or not result.audio_data
+        ):
+            return None
+        return SynthesizedAudio(bytes(result.audio_data), "wav")
+
     def __speak_with_audio_config(
         self,
         text,
@@ -79,6 +104,9 @@ class TTSEngine(TTSInterface):
             the callback function to call when synthesis starts
         on_speak_end_callback: function
             the callback function to call when synthesis ends
+
+        Returns:
+        speechsdk.SpeechSynthesisResult, or None if there was nothing to speak
         """
         speech_synthesizer = speechsdk.SpeechSynthesizer(
             speech_config=self.speech_config, audio_config=audio_config
@@ -132,6 +160,8 @@ class TTSEngine(TTSInterface):
                         "Did you set the speech resource key and region values?"
                     )
 
+        return speech_synthesis_result
+
 
 if __name__ == "__main__":
     tts = TTSEngine(
@@ -30,6 +30,9 @@ class TTSEngine(TTSInterface):
         if not os.path.exists(self.new_audio_dir):
             os.makedirs(self.new_audio_dir)
 
+    def cache_params(self):
+        return {"voice": self.voice}
+
     def generate_audio(self, text, file_name_no_ext=None):
         """
         Generate speech audio file using TTS.
@@ -44,6 +44,7 @@ class TTSEngine(TTSInterface):
                 # Use default model if none specified
                 self.tts = TTS().to(self.device)
 
+            self.tts_model_name = model_name
             self.speaker_wav = speaker_wav
             self.language = language
 
@@ -55,6 +56,13 @@ class TTSEngine(TTSInterface):
         except Exception as e:
             raise RuntimeError(f"Failed to initialize CoquiTTS model: {str(e)}")
 
+    def cache_params(self) -> dict:
+        return {
+            "model_name": self.tts_model_name,
+            "speaker_wav": self.speaker_wav,
+            "language": self.language,
+        }
+
     def generate_audio(self, text: str, file_name_no_ext: Optional[str] = None) -> str:
         """
         Generate speech audio file using CoquiTTS.
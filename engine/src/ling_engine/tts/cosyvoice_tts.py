@@ -17,16 +17,32 @@ class TTSEngine(TTSInterface):
         api_name="/generate_audio",
     ):
         self.client = Client(client_url)
+        self.client_url = client_url
 
         self.mode_checkbox_group = mode_checkbox_group
         self.sft_dropdown = sft_dropdown
         self.prompt_text = prompt_text
         self.prompt_wav_upload = file(prompt_wav_upload_url)
         self.prompt_wav_record = file(prompt_wav_record_url)
+        self.prompt_wav_upload_url = prompt_wav_upload_url
+        self.prompt_wav_record_url = prompt_wav_record_url
         self.instruct_text = instruct_text
         self.seed = seed
         self.api_name = api_name
 
+    def cache_params(self):
+        return {
+            "client_url": self.client_url,
+            "mode": self.mode_checkbox_group,
+            "sft": self.sft_dropdown,
+            "prompt_text": self.prompt_text,
+            "prompt_wav_upload_url": self.prompt_wav_upload_url,
+            "prompt_wav_record_url": self.prompt_wav_record_url,
+            "instruct_text": self.instruct_text,
+            "seed": self.seed,
+            "api_name": self.api_name,
+        }
+
     def generate_audio(self, text, file_name_no_ext=None):
         if file_name_no_ext is not None:
             logger.warning(
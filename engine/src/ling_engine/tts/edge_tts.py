@@ -14,6 +14,9 @@ sys.path.append(current_dir)
 
 
 class TTSEngine(TTSInterface):
+    audio_format = "mp3"
+    supports_streaming = True
+
     def __init__(self, voice="en-US-AvaMultilingualNeural"):
         super().__init__()
         self.voice = voice
@@ -40,6 +43,9 @@ class TTSEngine(TTSInterface):
         # 默认返回类名
         return "edge_tts"
 
+    def cache_params(self):
+        return {"voice": self.voice}
+
     def generate_audio(self, text, file_name_no_ext=None):
         """
         Generate speech audio file using TTS.
@@ -65,6 +71,22 @@ class TTSEngine(TTSInterface):
 
         return file_name
 
+    async def async_stream_audio(self, text):
+        """Stream mp3 chunks straight from edge-tts without writing a file."""
+        streamed = False
+        try:
+            communicate = edge_tts.Communicate(text, self.voice)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    streamed = True
+                    yield chunk["data"]
+        except Exception as e:
+            logger.critical(f"\nError: edge-tts unable to generate audio: {e}")
+            if streamed:
+                # Partial audio is a cut-off sentence, not a result
+                raise
+            logger.critical("It's possible that edge-tts is blocked in your region.")
+
 
 # en-US-AvaMultilingualNeural
 # en-US-EmmaMultilingualNeural
@@ -2,7 +2,7 @@ import os
 import sys
 from typing import Optional
 from loguru import logger
-from .tts_interface import TTSInterface
+from .tts_interface import TTSInterface, iterate_in_thread
 
 try:
     from elevenlabs import ElevenLabs, VoiceSettings
@@ -18,7 +18,9 @@ sys.path.append(current_dir)
 
 class TTSEngine(TTSInterface):
     """ElevenLabs TTS Engine implementation"""
-    
+
+    supports_streaming = True
+
     def __init__(
         self,
         api_key: str,
@@ -70,6 +72,13 @@ class TTSEngine(TTSInterface):
         self.temp_audio_file = "temp"
         self.file_extension = self._get_file_extension()
         self.new_audio_dir = "cache"
+
+        # 内存 API 的输出格式：pcm_<rate> 为无头 PCM，需要记录采样率
+        if self.output_format.startswith("pcm_"):
+            self.audio_format = "pcm"
+            self.audio_sample_rate = int(self.output_format.split("_")[1])
+        else:
+            self.audio_format = self.file_extension
         
         if not os.path.exists(self.new_audio_dir):
             os.makedirs(self.new_audio_dir)
@@ -100,6 +109,15 @@ class TTSEngine(TTSInterface):
         else:
             return "mp3"  # 默认为MP3
     
+    def cache_params(self) -> dict:
+        settings = self.voice_settings
+        return {
+            "voice_id": self.voice_id,
+            "model_id": self.model_id,
+            "voice_settings": settings.model_dump() if hasattr(settings, "model_dump") else settings.dict(),
+            "output_format": self.output_format,
+        }
+
     def generate_audio(self, text: str, file_name_no_ext: Optional[str] = None) -> Optional[str]:
         """
         Generate speech audio file using ElevenLabs TTS.
@@ -130,15 +148,8 @@ class TTSEngine(TTSInterface):
             # 调用ElevenLabs API
             logger.debug(f"Generating audio with ElevenLabs: voice_id={self.voice_id}, model={self.model_id}")
             
-            audio_generator = self.client.text_to_speech.convert(
-                text=text,
-                voice_id=self.voice_id,
-                model_id=self.model_id,
-                voice_settings=self.voice_settings,
-                output_format=self.output_format,
-                optimize_streaming_latency=self.optimize_streaming_latency
-            )
-            
+            audio_generator = self._convert(text)
+
             # 保存音频文件
             with open(file_path, "wb") as audio_file:
                 for chunk in audio_generator:
@@ -159,6 +170,32 @@ class TTSEngine(TTSInterface):
             
             return None
     
+    def _convert(self, text: str):
+        return self.client.text_to_speech.convert(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            voice_settings=self.voice_settings,
+            output_format=self.output_format,
+            optimize_streaming_latency=self.optimize_streaming_latency
+        )
+
+    async def async_stream_audio(self, text: str):
+        """Stream audio chunks from the ElevenLabs API as they arrive."""
+        if not text or not text.strip():
+            logger.warning("Empty text provided for TTS")
+            return
+        streamed = False
+        try:
+            async for chunk in iterate_in_thread(lambda: self._convert(text)):
+                streamed = True
+                yield chunk
+        except Exception as e:
+            logger.error(f"❌ ElevenLabs TTS generation failed: {e}")
+            if streamed:
+                # Partial audio is a cut-off sentence, not a result
+                raise
+
     def get_available_voices(self) -> list:
         """
         获取可用的语音列表
@@ -1,7 +1,7 @@
 from typing import Literal
 from fish_audio_sdk import Session, TTSRequest
 from loguru import logger
-from .tts_interface import TTSInterface
+from .tts_interface import TTSInterface, iterate_in_thread
 
 
 class TTSEngine(TTSInterface):
@@ -10,6 +10,8 @@ class TTSEngine(TTSInterface):
     """
 
     file_extension: str = "wav"
+    audio_format = "wav"
+    supports_streaming = True
 
     def __init__(
         self,
@@ -41,16 +43,15 @@ class TTSEngine(TTSInterface):
         self.latency = latency
         self.session = Session(apikey=api_key, base_url=base_url)
 
+    def cache_params(self):
+        return {"reference_id": self.reference_id, "latency": self.latency}
+
     def generate_audio(self, text, file_name_no_ext=None):
         file_name = self.generate_cache_file_name(file_name_no_ext, self.file_extension)
 
         try:
             with open(file_name, "wb") as f:
-                for chunk in self.session.tts(
-                    TTSRequest(
-                        text=text, reference_id=self.reference_id, latency=self.latency
-                    )
-                ):
+                for chunk in self._tts_chunks(text):
                     f.write(chunk)
 
         except Exception as e:
@@ -58,3 +59,20 @@ class TTSEngine(TTSInterface):
             return None
 
         return file_name
+
+    def _tts_chunks(self, text):
+        return self.session.tts(
+            TTSRequest(text=text, reference_id=self.reference_id, latency=self.latency)
+        )
+
+    async def async_stream_audio(self, text):
+        streamed = False
+        try:
+            async for chunk in iterate_in_thread(lambda: self._tts_chunks(text)):
+                streamed = True
+                yield chunk
+        except Exception as e:
+            logger.critical(f"\nError: Fish TTS API fail to generate audio: {e}")
+            if streamed:
+                # Partial audio is a cut-off sentence, not a result
+                raise
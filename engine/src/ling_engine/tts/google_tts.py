@@ -113,6 +113,16 @@ class TTSEngine(TTSInterface):
         """重写获取模型名称方法，用于成本计算"""
         return "google_tts"
 
+    def cache_params(self) -> dict:
+        return {
+            "voice_name": self.voice_name,
+            "language_code": self.language_code,
+            "audio_encoding": str(self.audio_encoding),
+            "sample_rate_hertz": self.sample_rate_hertz,
+            "speaking_rate": self.speaking_rate,
+            "pitch": self.pitch,
+        }
+
     def generate_audio(self, text: str, file_name_no_ext: Optional[str] = None) -> str:
         """
         生成语音音频文件
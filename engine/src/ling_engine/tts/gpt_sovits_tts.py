@@ -31,6 +31,17 @@ class TTSEngine(TTSInterface):
         self.media_type = media_type
         self.streaming_mode = streaming_mode
 
+    def cache_params(self):
+        return {
+            "api_url": self.api_url,
+            "text_lang": self.text_lang,
+            "ref_audio_path": self.ref_audio_path,
+            "prompt_lang": self.prompt_lang,
+            "prompt_text": self.prompt_text,
+            "text_split_method": self.text_split_method,
+            "media_type": self.media_type,
+        }
+
     def generate_audio(self, text, file_name_no_ext=None):
         file_name = self.generate_cache_file_name(file_name_no_ext, self.media_type)
         cleaned_text = re.sub(r"\[.*?\]", "", text)
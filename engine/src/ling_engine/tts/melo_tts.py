@@ -19,6 +19,7 @@ class TTSEngine(TTSInterface):
     ):
         # Speed is adjustable
         self.speed = speed
+        self.language = language
 
         # CPU is sufficient for real-time inference.
         # You can set it manually to 'cpu' or 'cuda' or 'cuda:0' or 'mps'
@@ -34,6 +35,9 @@ class TTSEngine(TTSInterface):
         if not os.path.exists(self.new_audio_dir):
             os.makedirs(self.new_audio_dir)
 
+    def cache_params(self):
+        return {"language": self.language, "speaker_id": self.speaker_id, "speed": self.speed}
+
     def generate_audio(self, text, file_name_no_ext=None):
         """
         Generate speech audio file using TTS.
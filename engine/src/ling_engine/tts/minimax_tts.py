@@ -1,11 +1,12 @@
 import os
+import asyncio
 import json
 import requests
 import binascii
 import time
 from typing import Iterator, Optional
 from loguru import logger
-from .tts_interface import TTSInterface
+from .tts_interface import TTSInterface, SynthesizedAudio, iterate_in_thread
 
 
 class TTSEngine(TTSInterface):
@@ -64,6 +65,11 @@ class TTSEngine(TTSInterface):
         self.stream = stream
         
         self.api_url = f"https://api.minimaxi.com/v1/t2a_v2?GroupId={self.group_id}"
+
+        # 内存 API 的输出格式（pcm 为无头 16 位 PCM）
+        self.audio_format = self.format
+        self.audio_sample_rate = self.sample_rate
+        self.supports_streaming = self.stream
         
         logger.info(
             f"MiniMax TTS API initialized with model: {self.model}, voice: {self.voice_id}"
@@ -157,6 +163,72 @@ class TTSEngine(TTSInterface):
                     except Exception as e:
                         logger.error(f"Error processing chunk: {e}")
     
+    def call_tts(self, text: str) -> Optional[bytes]:
+        """Call the MiniMax TTS API in non-streaming mode and return the audio bytes."""
+        headers = self.build_headers()
+        body = self.build_request_body(text)
+        body["stream"] = False  # Ensure stream is False for non-streaming mode
+
+        # 记录请求开始时间
+        request_start_time = time.time()
+        logger.info(f"🔊 发送TTS请求 - 文本长度: {len(text)}字符 (非流式模式)")
+
+        response = requests.post(self.api_url, headers=headers, json=body)
+
+        # 记录响应时间
+        response_time = time.time()
+        response_latency = (response_time - request_start_time) * 1000
+
+        if response.status_code != 200:
+            logger.error(f"MiniMax TTS API error: {response.status_code} - {response.text}")
+            return None
+
+        logger.info(f"⏱️ TTS完整响应时间: {response_latency:.0f}ms (MiniMax {self.model})")
+
+        data = response.json()
+        if "data" in data and "audio" in data["data"]:
+            return bytes.fromhex(data["data"]["audio"])
+        logger.error(f"Unexpected response format: {data}")
+        return None
+
+    async def async_stream_audio(self, text: str):
+        """Stream decoded audio chunks from the MiniMax SSE response."""
+        streamed = False
+        try:
+            async for chunk in iterate_in_thread(lambda: self.call_tts_stream(text)):
+                streamed = True
+                yield chunk
+        except Exception as e:
+            logger.critical(f"Error: MiniMax TTS API failed to generate audio: {e}")
+            if streamed:
+                # Partial audio is a cut-off sentence, not a result
+                raise
+
+    async def async_synthesize(self, text: str) -> Optional[SynthesizedAudio]:
+        if self.stream:
+            return await super().async_synthesize(text)
+        try:
+            audio = await asyncio.to_thread(self.call_tts, text)
+        except Exception as e:
+            logger.critical(f"Error: MiniMax TTS API failed to generate audio: {e}")
+            return None
+        if not audio:
+            return None
+        return SynthesizedAudio(audio, self.audio_format, self.audio_sample_rate)
+
+    def cache_params(self) -> dict:
+        return {
+            "model": self.model,
+            "voice_id": self.voice_id,
+            "speed": self.speed,
+            "vol": self.vol,
+            "pitch": self.pitch,
+            "sample_rate": self.sample_rate,
+            "bitrate": self.bitrate,
+            "format": self.format,
+            "channel": self.channel,
+        }
+
     def generate_audio(self, text: str, file_name_no_ext: Optional[str] = None) -> str:
         """
         Generate speech audio file using MiniMax TTS.
@@ -173,42 +245,14 @@ class TTSEngine(TTSInterface):
         try:
             # If streaming is enabled
             if self.stream:
-                audio_data = b""
-                for chunk in self.call_tts_stream(text):
-                    audio_data += chunk
-                    
-                with open(file_name, "wb") as f:
-                    f.write(audio_data)
+                audio_data = b"".join(self.call_tts_stream(text))
             else:
-                # Non-streaming mode
-                headers = self.build_headers()
-                body = self.build_request_body(text)
-                body["stream"] = False  # Ensure stream is False for non-streaming mode
-                
-                # 记录请求开始时间
-                request_start_time = time.time()
-                logger.info(f"🔊 发送TTS请求 - 文本长度: {len(text)}字符 (非流式模式)")
-                
-                response = requests.post(self.api_url, headers=headers, json=body)
-                
-                # 记录响应时间
-                response_time = time.time()
-                response_latency = (response_time - request_start_time) * 1000
-                
-                if response.status_code != 200:
-                    logger.error(f"MiniMax TTS API error: {response.status_code} - {response.text}")
-                    return None
-                
-                logger.info(f"⏱️ TTS完整响应时间: {response_latency:.0f}ms (MiniMax {self.model})")
-                
-                data = response.json()
-                if "data" in data and "audio" in data["data"]:
-                    audio = data["data"]["audio"]
-                    with open(file_name, "wb") as f:
-                        f.write(bytes.fromhex(audio))
-                else:
-                    logger.error(f"Unexpected response format: {data}")
+                audio_data = self.call_tts(text)
+                if audio_data is None:
                     return None
+
+            with open(file_name, "wb") as f:
+                f.write(audio_data)
                     
         except Exception as e:
             logger.critical(f"Error: MiniMax TTS API failed to generate audio: {e}")
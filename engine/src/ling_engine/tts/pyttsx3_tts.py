@@ -26,6 +26,13 @@ class TTSEngine(TTSInterface):
             os.makedirs(self.new_audio_dir)
 
     #! This method (pyttsx3) is not thread safe. It will blow if it's called from multiple threads at the same time.
+    def cache_params(self):
+        return {
+            "voice": self.engine.getProperty("voice"),
+            "rate": self.engine.getProperty("rate"),
+            "volume": self.engine.getProperty("volume"),
+        }
+
     def generate_audio(self, text, file_name_no_ext=None):
         logger.debug(f"Start Generating {file_name_no_ext}")
         file_name = self.generate_cache_file_name(file_name_no_ext, self.file_extension)
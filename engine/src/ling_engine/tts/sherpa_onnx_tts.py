@@ -1,10 +1,12 @@
 import sys
 import os
+import asyncio
 
+import numpy as np
 import sherpa_onnx
 import soundfile as sf
 from loguru import logger
-from .tts_interface import TTSInterface
+from .tts_interface import TTSInterface, SynthesizedAudio
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
@@ -76,6 +78,18 @@ class TTSEngine(TTSInterface):
         # Create and return the sherpa-onnx OfflineTts object
         return sherpa_onnx.OfflineTts(tts_config)
 
+    def cache_params(self):
+        return {
+            "vits_model": self.vits_model,
+            "vits_lexicon": self.vits_lexicon,
+            "vits_tokens": self.vits_tokens,
+            "vits_data_dir": self.vits_data_dir,
+            "vits_dict_dir": self.vits_dict_dir,
+            "tts_rule_fsts": self.tts_rule_fsts,
+            "sid": self.sid,
+            "speed": self.speed,
+        }
+
     def generate_audio(self, text, file_name_no_ext=None):
         """
         Generate speech audio file using sherpa-onnx TTS.
@@ -110,3 +124,25 @@ class TTSEngine(TTSInterface):
         except Exception as e:
             logger.critical(f"\nError: sherpa-onnx unable to generate audio: {e}")
             return None
+
+    async def async_synthesize(self, text):
+        return await asyncio.to_thread(self._synthesize_to_memory, text)
+
+    def _synthesize_to_memory(self, text):
+        """Return the generated samples as raw 16-bit PCM, skipping the wav file."""
+        try:
+            audio = self.tts.generate(text, sid=self.sid, speed=self.speed)
+
+            if len(audio.samples) == 0:
+                logger.error(
+                    "Error in generating audios. Please read previous error messages."
+                )
+                return None
+
+            samples = np.clip(np.asarray(audio.samples, dtype=np.float32), -1.0, 1.0)
+            pcm = (samples * 32767).astype("<i2").tobytes()
+            return SynthesizedAudio(pcm, "pcm", audio.sample_rate)
+
+        except Exception as e:
+            logger.critical(f"\nError: sherpa-onnx unable to generate audio: {e}")
+            return None
@@ -0,0 +1,429 @@
+"""
+TTS 合成结果缓存（内容寻址）
+
+问候语、口头禅、简短回复会被反复合成。这里以
+(引擎模块与类名, 音色/模型参数, 规范化文本) 的 sha256 作为键缓存 SynthesizedAudio：
+
+- 内存层：按字节数限容的 LRU
+- 磁盘层：tts_cache/<前两位>/<键>.tts，读取时 mmap，命中后提升回内存层
+
+同一键的并发未命中只会触发一次真实合成（single-flight）。
+统计通过 runtime_stats 的 "tts_cache" 暴露：命中率、节省的字节数等。
+
+环境变量：
+    TTS_CACHE_ENABLED    默认 true
+    TTS_CACHE_MEMORY_MB  内存层上限，默认 64
+    TTS_CACHE_DISK_MB    磁盘层上限，默认 512，为 0 时关闭磁盘层
+    TTS_CACHE_DIR        磁盘层目录，默认 tts_cache（不放在 cache/ 下，那里退出时会被清空）
+"""
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from .tts_interface import SynthesizedAudio
+from ..utils.runtime_stats import register_stats_provider
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 磁盘文件格式：4 字节头长度（大端）+ JSON 头 + 音频字节
+_HEADER_LEN = struct.Struct(">I")
+
+# 这些属性不影响合成结果（或属于凭据），不参与缓存键
+_EXCLUDED_PARAM_HINTS = ("key", "token", "secret", "password", "dir", "path", "cache", "client", "session")
+
+# 缓存键格式版本；键的组成变化时递增，旧的磁盘条目随之失效
+_KEY_VERSION = 2
+
+
+def normalize_text(text: str) -> str:
+    """统一全/半角与空白，使只差空格的句子命中同一条缓存"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+_SKIP = object()
+
+
+def _param_value(value: Any) -> Any:
+    """转成可 JSON 序列化的形式；无法表示的对象（客户端、模型等）返回 _SKIP"""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        items = {str(k): _param_value(v) for k, v in value.items()}
+        return {k: v for k, v in items.items() if v is not _SKIP}
+    if isinstance(value, (list, tuple)):
+        items = [_param_value(v) for v in value]
+        return [v for v in items if v is not _SKIP]
+    # pydantic 模型（如 ElevenLabs 的 VoiceSettings）
+    for dump in ("model_dump", "dict"):
+        method = getattr(value, dump, None)
+        if callable(method):
+            try:
+                return _param_value(method())
+            except Exception:
+                break
+    return _SKIP
+
+
+def engine_cache_params(tts_engine) -> Dict[str, Any]:
+    """提取影响合成结果的引擎参数（音色、模型、语速等）
+
+    优先使用引擎的 cache_params()；未实现（返回 None）时取实例上的公共属性，
+    跳过凭据、目录和客户端对象，dict / pydantic 值按内容序列化。
+    """
+    custom = getattr(tts_engine, "cache_params", None)
+    if callable(custom):
+        params = custom()
+        if params is not None:
+            return _param_value(dict(params))
+
+    params: Dict[str, Any] = {}
+    for name, value in vars(tts_engine).items():
+        if name.startswith("_"):
+            continue
+        lowered = name.lower()
+        if any(hint in lowered for hint in _EXCLUDED_PARAM_HINTS):
+            continue
+        value = _param_value(value)
+        if value is not _SKIP:
+            params[name] = value
+    return params
+
+
+def make_cache_key(tts_engine, text: str) -> str:
+    payload = json.dumps(
+        {
+            "v": _KEY_VERSION,
+            "engine": type(tts_engine).__module__ + "." + type(tts_engine).__name__,
+            "params": engine_cache_params(tts_engine),
+            "text": normalize_text(text),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """两级 TTS 结果缓存：内存 LRU + mmap 磁盘层"""
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        cache_dir: Optional[str] = "tts_cache",
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes if cache_dir else 0
+        self.cache_dir = cache_dir
+
+        self._memory: "OrderedDict[str, SynthesizedAudio]" = OrderedDict()
+        self._memory_bytes = 0
+        # 磁盘索引：键 -> 文件大小，按最近使用排序
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # 等待同一键正在进行的合成而省下的请求
+        self.coalesced = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+        if self.max_disk_bytes > 0:
+            self._load_disk_index()
+
+    # ---------- 内存层 ----------
+
+    def _memory_get(self, key: str) -> Optional[SynthesizedAudio]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+            return audio
+
+    def _memory_put(self, key: str, audio: SynthesizedAudio) -> None:
+        size = len(audio.data)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old.data)
+            self._memory[key] = audio
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.data)
+                self.evictions += 1
+
+    # ---------- 磁盘层 ----------
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.tts")
+
+    def _load_disk_index(self) -> None:
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".tts"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _mtime, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        if self._disk:
+            logger.info(f"TTS 缓存磁盘层已加载 {len(self._disk)} 条，共 {self._disk_bytes / 1024 / 1024:.1f} MB")
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
+
+    def _disk_get(self, key: str) -> Optional[SynthesizedAudio]:
+        with self._lock:
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+        path = self._path_for(key)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                (header_len,) = _HEADER_LEN.unpack_from(mm, 0)
+                start = _HEADER_LEN.size
+                header = json.loads(mm[start : start + header_len])
+                data = mm[start + header_len :]
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"TTS 缓存文件损坏，已丢弃 {path}: {e}")
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return SynthesizedAudio(
+            data=data,
+            format=header.get("format", "wav"),
+            sample_rate=header.get("sample_rate"),
+            channels=header.get("channels", 1),
+        )
+
+    def _disk_put(self, key: str, audio: SynthesizedAudio) -> None:
+        header = json.dumps(
+            {"format": audio.format, "sample_rate": audio.sample_rate, "channels": audio.channels}
+        ).encode("utf-8")
+        size = _HEADER_LEN.size + len(header) + len(audio.data)
+        if size > self.max_disk_bytes:
+            return
+        path = self._path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER_LEN.pack(len(header)))
+                f.write(header)
+                f.write(audio.data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入 TTS 磁盘缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old
+            self._disk[key] = size
+            self._disk_bytes += size
+            self._evict_disk()
+
+    # ---------- 对外接口 ----------
+
+    def get(self, key: str) -> Optional[SynthesizedAudio]:
+        audio = self._memory_get(key)
+        if audio is not None:
+            self.memory_hits += 1
+            self.bytes_saved += len(audio.data)
+            return audio
+        if self.max_disk_bytes > 0:
+            audio = self._disk_get(key)
+            if audio is not None:
+                self.disk_hits += 1
+                self.bytes_saved += len(audio.data)
+                self._memory_put(key, audio)
+                return audio
+        return None
+
+    def put(self, key: str, audio: SynthesizedAudio) -> None:
+        self._memory_put(key, audio)
+        if self.max_disk_bytes > 0:
+            self._disk_put(key, audio)
+
+    def discard(self, key: str) -> None:
+        """从两级缓存中移除一条（例如命中的音频无法解码）"""
+        with self._lock:
+            audio = self._memory.pop(key, None)
+            if audio is not None:
+                self._memory_bytes -= len(audio.data)
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+        if size is not None:
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
+
+    async def _prepare(
+        self,
+        key: Optional[str],
+        audio: Optional[SynthesizedAudio],
+        prepare: Optional[Callable[[Optional[SynthesizedAudio]], Any]],
+    ) -> Any:
+        if prepare is None:
+            return audio
+        try:
+            return await asyncio.to_thread(prepare, audio)
+        except Exception:
+            if key is not None:
+                logger.warning(f"缓存的 TTS 音频无法解码，已丢弃: {key[:12]}")
+                await asyncio.to_thread(self.discard, key)
+            raise
+
+    async def get_or_synthesize(
+        self,
+        tts_engine,
+        text: str,
+        synthesize: Callable[[], Awaitable[Optional[SynthesizedAudio]]],
+        prepare: Optional[Callable[[Optional[SynthesizedAudio]], Any]] = None,
+    ) -> Any:
+        """命中直接返回；未命中时调用 synthesize，校验通过后写入缓存
+
+        prepare(audio) 在线程中对音频做解码/校验并返回调用方需要的结果（如 payload），
+        此时返回值为 prepare 的结果，否则返回音频本身。新合成的音频只有在 prepare
+        成功后才写入缓存，被截断或损坏的音频不会被后续请求复用；命中的条目解码失败时
+        同样从缓存中移除。合成失败（返回 None 或抛异常）不会被缓存。
+        """
+        key = make_cache_key(tts_engine, text)
+        audio = self.get(key)
+        if audio is not None:
+            return await self._prepare(key, audio, prepare)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                audio = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 只有发起合成的那一方被取消时才自己重新合成
+                if not inflight.cancelled():
+                    raise
+                return await self._prepare(None, await synthesize(), prepare)
+            if audio is not None:
+                self.coalesced += 1
+                self.bytes_saved += len(audio.data)
+            return await self._prepare(None, audio, prepare)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            audio = await synthesize()
+            result = await self._prepare(None, audio, prepare)
+            if audio is not None and audio.data:
+                await asyncio.to_thread(self.put, key, audio)
+            future.set_result(audio)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+        }
+
+
+_tts_cache: Optional[TTSAudioCache] = None
+_tts_cache_initialized = False
+
+
+def get_tts_cache() -> Optional[TTSAudioCache]:
+    """进程级缓存单例，TTS_CACHE_ENABLED=false 时返回 None"""
+    global _tts_cache, _tts_cache_initialized
+    if _tts_cache_initialized:
+        return _tts_cache
+    _tts_cache_initialized = True
+
+    if os.getenv("TTS_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        logger.info("TTS 结果缓存已禁用")
+        return None
+
+    try:
+        memory_mb = float(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+        disk_mb = float(os.getenv("TTS_CACHE_DISK_MB", "512"))
+    except ValueError:
+        logger.warning("TTS_CACHE_MEMORY_MB / TTS_CACHE_DISK_MB 无效，使用默认值")
+        memory_mb, disk_mb = 64.0, 512.0
+
+    _tts_cache = TTSAudioCache(
+        max_memory_bytes=int(memory_mb * 1024 * 1024),
+        max_disk_bytes=int(disk_mb * 1024 * 1024),
+        cache_dir=os.getenv("TTS_CACHE_DIR", "tts_cache"),
+    )
+    register_stats_provider("tts_cache", _tts_cache.get_stats)
+    return _tts_cache
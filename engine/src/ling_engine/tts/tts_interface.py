@@ -1,7 +1,10 @@
 import abc
 import os
 import asyncio
-from typing import Dict, Any
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, Callable, Iterable, Optional
 
 from loguru import logger
 
@@ -14,7 +17,61 @@ except ImportError:
     logger.warning("TTS成本计算器不可用，计费功能将无法使用")
 
 
+@dataclass
+class SynthesizedAudio:
+    """内存中的合成音频
+
+    data: 编码后的音频字节
+    format: 容器/编码格式，"wav"、"mp3"、"flac"、"ogg" 或 "pcm"（无头 16 位小端 PCM）
+    sample_rate / channels: 仅 "pcm" 格式需要
+    """
+
+    data: bytes
+    format: str = "wav"
+    sample_rate: Optional[int] = None
+    channels: int = 1
+
+
+async def iterate_in_thread(make_iter: Callable[[], Iterable[bytes]]) -> AsyncIterator[bytes]:
+    """在线程中消费同步的音频块迭代器（SDK/requests 流），逐块转交给事件循环"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    def _pump():
+        try:
+            for chunk in make_iter():
+                if stopped.is_set():
+                    break
+                if chunk:
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(None, _pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 消费方提前退出（取消/中断）时让线程尽早停止读取
+        stopped.set()
+
+
 class TTSInterface(metaclass=abc.ABCMeta):
+    # 内存 API 返回的音频格式，引擎按实际输出覆盖（"pcm" 时需同时给出采样率）
+    audio_format: str = "wav"
+    audio_sample_rate: Optional[int] = None
+    # 为 True 时引擎实现了 async_stream_audio，async_synthesize 直接拼接流
+    supports_streaming: bool = False
+
     def __init__(self):
         """初始化TTS接口，设置模型名称用于计费"""
         self.model_name = self._get_model_name()
@@ -42,6 +99,16 @@ class TTSInterface(metaclass=abc.ABCMeta):
         # 默认返回类名，子类应该重写这个方法
         return self.__class__.__name__
     
+    def cache_params(self) -> Optional[Dict[str, Any]]:
+        """
+        Parameters that change the synthesized audio (voice, model, speed, format...).
+
+        tts_cache hashes these into the cache key, so two configurations that
+        sound different must return different values. Never include credentials.
+        Returning None falls back to the engine's public attributes.
+        """
+        return None
+
     @property
     def cost_calculator(self):
         """获取成本计算器实例"""
@@ -111,6 +178,53 @@ class TTSInterface(metaclass=abc.ABCMeta):
         """
         return await asyncio.to_thread(self.generate_audio, text, file_name_no_ext)
 
+    async def async_synthesize(self, text: str) -> Optional[SynthesizedAudio]:
+        """
+        Synthesize speech and return the audio bytes in memory.
+
+        Streaming engines get this for free by joining async_stream_audio and
+        never write to disk. Engines that only implement generate_audio fall
+        back to a temporary file in their cache directory, which is read back
+        and removed immediately.
+
+        A stream that fails after yielding audio raises instead of returning
+        the partial buffer, so a cut-off sentence is never played or cached.
+
+        Returns:
+            SynthesizedAudio, or None if synthesis failed before producing audio
+        """
+        if self.supports_streaming:
+            buf = bytearray()
+            async for chunk in self.async_stream_audio(text):
+                buf.extend(chunk)
+            if not buf:
+                return None
+            return SynthesizedAudio(bytes(buf), self.audio_format, self.audio_sample_rate)
+
+        file_path = await self.async_generate_audio(
+            text, file_name_no_ext=f"tts_{uuid.uuid4().hex[:12]}"
+        )
+        if not file_path or not os.path.exists(file_path):
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        finally:
+            self.remove_file(file_path, verbose=False)
+        ext = os.path.splitext(file_path)[1].lstrip(".").lower()
+        return SynthesizedAudio(data, ext or self.audio_format)
+
+    async def async_stream_audio(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Yield encoded audio chunks (in ``audio_format``) as the engine produces them.
+
+        Engines that set ``supports_streaming = True`` must override this.
+        The default yields the whole in-memory result as a single chunk.
+        """
+        audio = await self.async_synthesize(text)
+        if audio and audio.data:
+            yield audio.data
+
     @abc.abstractmethod
     def generate_audio(self, text: str, file_name_no_ext=None) -> str:
         """
@@ -16,6 +16,9 @@ class TTSEngine(TTSInterface):
         self.new_audio_dir = "cache"
         self.file_extension = "wav"
 
+    def cache_params(self):
+        return {"api_url": self.api_url, "speaker_wav": self.speaker_wav, "language": self.language}
+
     def generate_audio(self, text, file_name_no_ext=None):
         file_name = self.generate_cache_file_name(file_name_no_ext, self.file_extension)
 
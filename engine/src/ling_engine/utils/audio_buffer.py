@@ -0,0 +1,96 @@
+"""
+麦克风音频缓冲区
+
+为每个客户端预分配一段连续的 float32 缓冲区，按块写入 PCM 数据。
+容量不足时按倍数扩容，因此单次写入的摊销开销与已累积的语音长度无关
+（替代原先每块 np.append 整段复制导致的 O(n²) 行为）。
+
+mic-audio-end 到达时通过 take() 取出已写入部分的零拷贝视图交给 ASR，
+缓冲区随即换用新的底层数组，后续写入不会覆盖 ASR 正在读取的数据。
+"""
+
+from typing import Union
+
+import numpy as np
+
+# 16kHz 单声道下约 10 秒语音
+DEFAULT_INITIAL_CAPACITY = 16000 * 10
+
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class PCMBuffer:
+    """可增长的连续 PCM 缓冲区（float32，取值范围 [-1, 1]）"""
+
+    __slots__ = ("_initial_capacity", "_buf", "_size")
+
+    def __init__(self, initial_capacity: int = DEFAULT_INITIAL_CAPACITY):
+        self._initial_capacity = max(1, int(initial_capacity))
+        self._buf = np.empty(self._initial_capacity, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def _reserve(self, n: int) -> np.ndarray:
+        """确保还能写入 n 个采样，返回待写入区域的视图"""
+        end = self._size + n
+        if end > len(self._buf):
+            new_capacity = max(end, len(self._buf) * 2)
+            new_buf = np.empty(new_capacity, dtype=np.float32)
+            new_buf[: self._size] = self._buf[: self._size]
+            self._buf = new_buf
+        return self._buf[self._size : end]
+
+    def extend(self, samples) -> None:
+        """追加 float 采样（列表或 ndarray），用于 JSON 音频帧"""
+        arr = np.asarray(samples, dtype=np.float32)
+        if arr.size == 0:
+            return
+        arr = arr.reshape(-1)
+        self._reserve(arr.size)[:] = arr
+        self._size += arr.size
+
+    def extend_float32_bytes(self, data: BytesLike) -> None:
+        """追加小端 float32 原始字节"""
+        src = np.frombuffer(data, dtype="<f4")
+        if src.size == 0:
+            return
+        self._reserve(src.size)[:] = src
+        self._size += src.size
+
+    def extend_int16_bytes(self, data: BytesLike) -> None:
+        """追加小端 int16 原始字节，并归一化到 [-1, 1]"""
+        src = np.frombuffer(data, dtype="<i2")
+        if src.size == 0:
+            return
+        np.multiply(src, _INT16_SCALE, out=self._reserve(src.size), casting="unsafe")
+        self._size += src.size
+
+    def view(self) -> np.ndarray:
+        """已写入数据的只读零拷贝视图（后续写入可能使其失效）"""
+        out = self._buf[: self._size]
+        out.flags.writeable = False
+        return out
+
+    def take(self) -> np.ndarray:
+        """取出已写入的数据并清空缓冲区
+
+        返回的数组与缓冲区不再共享内存，可安全地交给后台 ASR 任务。
+        """
+        if self._size == 0:
+            return np.array([], dtype=np.float32)
+        out = self._buf[: self._size]
+        self._buf = np.empty(self._initial_capacity, dtype=np.float32)
+        self._size = 0
+        return out
+
+    def clear(self) -> None:
+        """丢弃已写入的数据，保留已分配的内存"""
+        self._size = 0
@@ -0,0 +1,119 @@
+"""有序流水线 — 有界并发执行，按提交顺序交付
+
+逐句 TTS 若合成完一句再开始下一句，总延迟是每句合成时间之和。
+OrderedPipeline 在提交时就启动任务 (最多 max_concurrency 个同时运行)，
+单个交付协程按提交顺序等待队首结果并交付，后面的句子在前面合成时就已开始生成。
+
+- 任务抛异常或交付失败: 取消其余任务，join() 抛出该异常
+- cancel(): 取消未完成的任务，已完成但未交付的结果交给 discard 回调清理 (如删除音频文件)
+
+/tts-ws 路由与 TTSTaskManager.speak 共用。
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+from loguru import logger
+
+
+class OrderedPipeline:
+    """有界并发、按序交付的异步任务流水线"""
+
+    def __init__(
+        self,
+        deliver: Callable[[Any], Awaitable[None]],
+        max_concurrency: int = 3,
+        discard: Optional[Callable[[Any], None]] = None,
+    ):
+        self._deliver = deliver
+        self._discard = discard
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._queue: Deque[asyncio.Task] = deque()
+        self._deliverer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        """已提交但尚未交付的任务数"""
+        return len(self._queue)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> asyncio.Task:
+        """提交 fn(*args, **kwargs)；立即排队执行，结果按提交顺序交付"""
+        if self._closed:
+            raise RuntimeError("pipeline is closed")
+        task = asyncio.create_task(self._run(fn, args, kwargs))
+        self._queue.append(task)
+        if self._deliverer is None or self._deliverer.done():
+            self._deliverer = asyncio.create_task(self._deliver_in_order())
+        return task
+
+    async def _run(self, fn, args, kwargs):
+        async with self._semaphore:
+            return await fn(*args, **kwargs)
+
+    async def _deliver_in_order(self) -> None:
+        while self._queue:
+            task = self._queue[0]
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if self._closed or not task.cancelled():
+                    raise
+                # 单个任务被外部取消：跳过，不影响后续交付
+                self._queue.popleft()
+                continue
+            except Exception as e:
+                self._fail(e)
+                return
+            self._queue.popleft()
+            try:
+                await self._deliver(result)
+            except Exception as e:
+                self._discard_result(result)
+                self._fail(e)
+                return
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._drop_pending()
+
+    def _discard_result(self, result: Any) -> None:
+        if self._discard is None:
+            return
+        try:
+            self._discard(result)
+        except Exception as e:
+            logger.debug(f"清理未交付的流水线结果失败: {e}")
+
+    def _drop_pending(self) -> None:
+        while self._queue:
+            task = self._queue.popleft()
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                if task.exception() is None:
+                    self._discard_result(task.result())
+
+    async def join(self) -> None:
+        """等待所有已提交任务交付完毕；有任务或交付失败时抛出首个异常
+
+        流水线被 cancel() 时直接返回。
+        """
+        while self._deliverer is not None and not self._deliverer.done():
+            # wait() 不会把调用方的取消传给交付协程，交付协程被取消也不会抛到这里
+            await asyncio.wait({self._deliverer})
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self) -> None:
+        """取消全部未交付任务并关闭流水线 (客户端断开或有新的输入时)"""
+        self._closed = True
+        if self._deliverer is not None and not self._deliverer.done():
+            self._deliverer.cancel()
+        self._drop_pending()
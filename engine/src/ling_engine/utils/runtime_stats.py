@@ -0,0 +1,71 @@
+"""
+运行时性能统计
+
+各热路径组件（VAD、TTS、数据库等）在这里注册自己的统计函数，
+管理员接口 /api/admin/runtime-stats 统一汇总输出。
+"""
+
+import threading
+from collections import deque
+from typing import Any, Callable, Dict
+
+from loguru import logger
+
+
+class LatencyStats:
+    """固定窗口的延迟统计（毫秒），内存占用与运行时长无关"""
+
+    def __init__(self, window: int = 1024):
+        self._samples: deque = deque(maxlen=window)
+        self._count = 0
+        self._total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self._count += 1
+            self._total_ms += ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+            total = self._total_ms
+        if not samples:
+            return {"count": count, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+        def _pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+        return {
+            "count": count,
+            "avg_ms": round(total / count, 3),
+            "p50_ms": _pct(0.50),
+            "p95_ms": _pct(0.95),
+            "max_ms": round(samples[-1], 3),
+        }
+
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_stats_provider(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """注册统计函数，同名注册会覆盖旧的"""
+    _providers[name] = provider
+
+
+def unregister_stats_provider(name: str) -> None:
+    _providers.pop(name, None)
+
+
+def collect_runtime_stats() -> Dict[str, Any]:
+    """调用所有已注册的统计函数，单个失败不影响其它"""
+    result: Dict[str, Any] = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            logger.warning(f"收集运行时统计失败 ({name}): {e}")
+            result[name] = {"error": str(e)}
+    return result
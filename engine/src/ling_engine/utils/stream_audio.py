@@ -1,8 +1,13 @@
 import base64
+import io
+import wave
+
+import numpy as np
 from pydub import AudioSegment
 from pydub.utils import make_chunks
 from ..agent.output_types import Actions
 from ..agent.output_types import DisplayText
+from ..tts.tts_interface import SynthesizedAudio
 
 
 def _get_volume_by_chunks(audio: AudioSegment, chunk_length_ms: int) -> list:
@@ -24,6 +29,134 @@ def _get_volume_by_chunks(audio: AudioSegment, chunk_length_ms: int) -> list:
     return [volume / max_volume for volume in volumes]
 
 
+def _sniff_audio_format(data: bytes, hint: str) -> str:
+    """根据文件头判断容器格式，文件头不可识别时使用引擎声明的格式"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if data[:4] == b"fLaC":
+        return "flac"
+    if data[:4] == b"OggS":
+        return "ogg"
+    return hint
+
+
+def decode_audio(audio: SynthesizedAudio) -> tuple[np.ndarray, int, int, bytes | None]:
+    """
+    Decode in-memory TTS output to interleaved int16 samples, once.
+
+    Returns:
+        (samples, sample_rate, channels, wav_bytes). wav_bytes is the original
+        input when it is already 16-bit PCM WAV, so it can be sent as-is.
+    """
+    data = audio.data
+    if not data or len(data) < 100:
+        raise ValueError(f"Generated audio is empty or too small ({len(data or b'')} bytes)")
+
+    fmt = audio.format.lower() if audio.format else ""
+    if fmt == "pcm":
+        if not audio.sample_rate:
+            raise ValueError("Raw PCM audio requires a sample rate")
+        usable = len(data) - len(data) % 2
+        return np.frombuffer(data, dtype="<i2", count=usable // 2), audio.sample_rate, audio.channels, None
+
+    fmt = _sniff_audio_format(data, fmt)
+    if fmt == "wav":
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wf:
+                if wf.getsampwidth() == 2:
+                    frames = wf.readframes(wf.getnframes())
+                    samples = np.frombuffer(frames, dtype="<i2")
+                    return samples, wf.getframerate(), wf.getnchannels(), data
+        except (wave.Error, EOFError):
+            pass  # 非 PCM16 的 WAV（如 float）交给 ffmpeg 处理
+
+    segment = AudioSegment.from_file(io.BytesIO(data), format=fmt or None)
+    if segment.sample_width != 2:
+        segment = segment.set_sample_width(2)
+    samples = np.frombuffer(segment.raw_data, dtype="<i2")
+    return samples, segment.frame_rate, segment.channels, None
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int, channels: int) -> bytes:
+    """Wrap interleaved int16 samples in a WAV header."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.astype("<i2", copy=False).tobytes())
+    return buf.getvalue()
+
+
+def volumes_from_samples(
+    samples: np.ndarray, sample_rate: int, channels: int, chunk_length_ms: int
+) -> list:
+    """
+    Normalized RMS volume per chunk, computed in one vectorized pass.
+
+    Matches _get_volume_by_chunks: the last chunk may be shorter, and RMS is
+    taken over the interleaved samples of each chunk.
+    """
+    step = max(1, int(sample_rate * chunk_length_ms / 1000)) * channels
+    x = samples.astype(np.float64)
+    starts = np.arange(0, len(x), step)
+    sums = np.add.reduceat(x * x, starts)
+    counts = np.diff(np.append(starts, len(x)))
+    volumes = np.sqrt(sums / counts)
+    max_volume = volumes.max()
+    if max_volume == 0:
+        raise ValueError("Audio is empty or all zero.")
+    return (volumes / max_volume).tolist()
+
+
+def prepare_audio_payload_from_bytes(
+    audio: SynthesizedAudio | None,
+    chunk_length_ms: int = 20,
+    display_text: DisplayText = None,
+    actions: Actions = None,
+    forwarded: bool = False,
+) -> dict[str, any]:
+    """
+    Same payload as prepare_audio_payload, built from in-memory TTS output.
+
+    The audio is decoded once; validation, the volume envelope and the WAV
+    encoding all work on that single sample array.
+    """
+    if audio is None:
+        return prepare_audio_payload(
+            None,
+            chunk_length_ms=chunk_length_ms,
+            display_text=display_text,
+            actions=actions,
+            forwarded=forwarded,
+        )
+
+    if isinstance(display_text, DisplayText):
+        display_text = display_text.to_dict()
+
+    samples, sample_rate, channels, wav_bytes = decode_audio(audio)
+    if sample_rate <= 0:
+        raise ValueError("Generated audio has a sample rate of 0")
+    if samples.size < channels:
+        raise ValueError("Generated audio has a duration of 0")
+
+    volumes = volumes_from_samples(samples, sample_rate, channels, chunk_length_ms)
+    if wav_bytes is None:
+        wav_bytes = encode_wav(samples, sample_rate, channels)
+
+    return {
+        "type": "audio",
+        "audio": base64.b64encode(wav_bytes).decode("utf-8"),
+        "volumes": volumes,
+        "slice_length": chunk_length_ms,
+        "display_text": display_text,
+        "actions": actions.to_dict() if actions else None,
+        "forwarded": forwarded,
+    }
+
+
 def prepare_audio_payload(
     audio_path: str | None,
     chunk_length_ms: int = 20,
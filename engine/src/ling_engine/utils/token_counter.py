@@ -14,8 +14,11 @@ Token计算模块 - 用于计算文本的token数量和成本估算
 - Token使用统计
 """
 
+import os
 import re
-from typing import Dict, List, Optional, Union, Any, Tuple
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Union, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import logging
@@ -27,8 +30,80 @@ except ImportError:
     pricing_service = None
     logging.getLogger(__name__).warning("数据库定价服务不可用，将使用硬编码价格")
 
+from .usage_meter import current_user_id, get_usage_meter
+
 logger = logging.getLogger(__name__)
 
+# 进程级 tokenizer 注册表: tiktoken 编码器按模型名懒加载，只解析一次
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+# 进程级 TokenCalculator 注册表 (模型名, 货币) -> 实例
+_calculators: Dict[Tuple[str, str], "TokenCalculator"] = {}
+_calculators_lock = threading.Lock()
+_MAX_CALCULATORS = 256
+
+# 单条消息 token 数的记忆化缓存大小 (每个 TokenCalculator 一份)
+_MESSAGE_TOKEN_CACHE_SIZE = 4096
+
+
+def get_encoding(model_name: str):
+    """
+    获取 tiktoken 编码器（进程内共享）
+
+    Args:
+        model_name: 传给 tiktoken.encoding_for_model 的模型名
+
+    Raises:
+        ImportError: tiktoken 未安装
+    """
+    encoding = _encodings.get(model_name)
+    if encoding is None:
+        import tiktoken
+        with _encodings_lock:
+            encoding = _encodings.get(model_name)
+            if encoding is None:
+                encoding = _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+    return encoding
+
+
+def get_token_calculator(model_name: str = "gpt-4o-mini", currency: str = "USD") -> "TokenCalculator":
+    """
+    获取共享的 TokenCalculator，避免每次调用都重新解析模型和加载 tokenizer
+
+    Args:
+        model_name: 模型名称
+        currency: 货币类型
+
+    Returns:
+        TokenCalculator 实例
+    """
+    key = (model_name, currency)
+    calculator = _calculators.get(key)
+    if calculator is None:
+        with _calculators_lock:
+            calculator = _calculators.get(key)
+            if calculator is None:
+                calculator = TokenCalculator(model_name, currency=currency)
+                # 模型名来自请求参数，数量异常时不再登记，防止无限增长
+                if len(_calculators) < _MAX_CALCULATORS:
+                    _calculators[key] = calculator
+    return calculator
+
+
+def _message_text(content: Any) -> str:
+    """取消息内容中的文本（兼容多模态 content 列表）"""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") or "" if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return str(content)
+
 
 class ModelType(Enum):
     """支持的模型类型"""
@@ -204,6 +279,10 @@ class TokenCalculator:
             
         self._tokenizer = None
         self._init_tokenizer()
+
+        # (role, content) -> 该消息的 token 数；多轮对话中不变的历史前缀只需查表
+        self._message_tokens: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._message_tokens_lock = threading.Lock()
     
     def _init_tokenizer(self):
         """初始化tokenizer"""
@@ -218,19 +297,18 @@ class TokenCalculator:
             if self.model_type.value.startswith("gpt") or self.model_type.value.startswith("text-embedding"):
                 # 使用tiktoken for OpenAI models and embeddings
                 try:
-                    import tiktoken
                     if self.model_type in [ModelType.GPT_4O, ModelType.GPT_4O_MINI]:
-                        self._tokenizer = tiktoken.encoding_for_model("gpt-4o")
+                        self._tokenizer = get_encoding("gpt-4o")
                     elif self.model_type == ModelType.GPT_4_TURBO:
-                        self._tokenizer = tiktoken.encoding_for_model("gpt-4-turbo")
+                        self._tokenizer = get_encoding("gpt-4-turbo")
                     elif self.model_type == ModelType.GPT_4:
-                        self._tokenizer = tiktoken.encoding_for_model("gpt-4")
+                        self._tokenizer = get_encoding("gpt-4")
                     elif self.model_type == ModelType.EMB_ADA_002:
-                        self._tokenizer = tiktoken.encoding_for_model("text-embedding-ada-002")
+                        self._tokenizer = get_encoding("text-embedding-ada-002")
                     elif self.model_type in [ModelType.EMB_3_SMALL, ModelType.EMB_3_LARGE]:
-                        self._tokenizer = tiktoken.encoding_for_model("text-embedding-3-large")
+                        self._tokenizer = get_encoding("text-embedding-3-large")
                     else:  # GPT-3.5-turbo or default
-                        self._tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
+                        self._tokenizer = get_encoding("gpt-3.5-turbo")
                     if self.debug:
                         logger.info(f"✅ 已加载tiktoken tokenizer for {self.model_type.value}")
                 except ImportError:
@@ -246,9 +324,8 @@ class TokenCalculator:
             elif self.model_type.value.startswith("deepseek"):
                 # DeepSeek模型使用近似计算 (类似GPT模型的token计算方式)
                 try:
-                    import tiktoken
                     # DeepSeek使用类似GPT-3.5的tokenizer
-                    self._tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
+                    self._tokenizer = get_encoding("gpt-3.5-turbo")
                     if self.debug:
                         logger.info(f"✅ DeepSeek模型 {self.model_type.value} 使用GPT-3.5 tokenizer")
                 except ImportError:
@@ -356,20 +433,35 @@ class TokenCalculator:
         Returns:
             TokenUsage对象
         """
+        keys = [
+            (message.get("role", "") or "", _message_text(message.get("content", "")))
+            for message in messages
+        ]
+        # 多轮对话中不变的历史前缀只需查表，新增消息才真正分词
+        memo = self._message_tokens
+        with self._message_tokens_lock:
+            counts = [memo.get(key) for key in keys]
+            for key, cached in zip(keys, counts):
+                if cached is not None:
+                    memo.move_to_end(key)
+
         total_tokens = 0
-        
-        for message in messages:
-            # 计算消息内容的tokens
-            content = message.get("content", "")
-            role = message.get("role", "")
-            
-            content_tokens = self.count_tokens(content)
-            role_tokens = self.count_tokens(role)
-            
-            # 添加消息格式的额外tokens（经验值）
-            format_tokens = 4  # 每条消息大约4个额外的格式token
-            
-            total_tokens += content_tokens + role_tokens + format_tokens
+        missing = {}
+        for key, cached in zip(keys, counts):
+            if cached is None:
+                cached = missing.get(key)
+                if cached is None:
+                    role, content = key
+                    # 添加消息格式的额外tokens（经验值）
+                    format_tokens = 4  # 每条消息大约4个额外的格式token
+                    cached = missing[key] = self.count_tokens(content) + self.count_tokens(role) + format_tokens
+            total_tokens += cached
+
+        if missing:
+            with self._message_tokens_lock:
+                memo.update(missing)
+                while len(memo) > _MESSAGE_TOKEN_CACHE_SIZE:
+                    memo.popitem(last=False)
         
         # 添加对话格式的额外tokens
         conversation_tokens = 2  # 对话开始和结束的token
@@ -478,14 +570,18 @@ class TokenCalculator:
 
 
 class TokenStatistics:
-    """Token使用统计"""
+    """Token使用统计
+
+    逐条明细只保留最近 history_limit 条（用于导出报告），
+    长期的按模型/用户/服务类型聚合由 usage_meter 负责并定时落库。
+    """
     
-    def __init__(self):
+    def __init__(self, history_limit: int = 1000):
         self.total_usage = TokenUsage()
         self.session_usage = TokenUsage()
         self.model_usage: Dict[str, TokenUsage] = {}
         self.total_cost = 0.0
-        self.usage_history: List[Dict[str, Any]] = []
+        self.usage_history: Deque[Dict[str, Any]] = deque(maxlen=history_limit)
     
     def add_usage(self, model: str, usage: TokenUsage, cost: float = 0.0, metadata: Dict[str, Any] = None):
         """
@@ -505,7 +601,23 @@ class TokenStatistics:
             self.model_usage[model] = TokenUsage()
         self.model_usage[model] += usage
         
-        # 记录使用历史
+        if metadata is None:
+            metadata = {}
+        service_type = metadata.get("service_type") or ("tts" if model == "TTS" else "llm")
+        try:
+            get_usage_meter().record(
+                model=model,
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                total_tokens=usage.total_tokens,
+                cost=cost,
+                service_type=service_type,
+                user_id=metadata.get("user_id") or current_user_id(),
+            )
+        except Exception as e:
+            logger.warning(f"记录用量聚合失败: {e}")
+        
+        # 记录使用历史（有界，只保留最近的明细）
         import time
         
         history_entry = {
@@ -567,7 +679,7 @@ class TokenStatistics:
         
         report = {
             "summary": self.get_summary(),
-            "history": self.usage_history
+            "history": list(self.usage_history)
         }
         
         # 转换TokenUsage对象为字典
@@ -708,7 +820,7 @@ class TokenStatistics:
 
 
 # 全局统计实例
-token_stats = TokenStatistics()
+token_stats = TokenStatistics(history_limit=int(os.getenv("TOKEN_USAGE_HISTORY_LIMIT", "1000")))
 
 
 def quick_count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
@@ -722,7 +834,7 @@ def quick_count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
     Returns:
         token数量
     """
-    calculator = TokenCalculator(model)
+    calculator = get_token_calculator(model)
     return calculator.count_tokens(text)
 
 
@@ -737,7 +849,7 @@ def batch_count_tokens(texts: List[str], model: str = "gpt-4o-mini") -> List[int
     Returns:
         每个文本的token数量列表
     """
-    calculator = TokenCalculator(model)
+    calculator = get_token_calculator(model)
     return [calculator.count_tokens(text) for text in texts]
 
 
@@ -754,7 +866,7 @@ def count_tokens_by_model(text: str, models: List[str]) -> Dict[str, int]:
     """
     result = {}
     for model in models:
-        calculator = TokenCalculator(model)
+        calculator = get_token_calculator(model)
         result[model] = calculator.count_tokens(text)
     return result
 
@@ -869,7 +981,7 @@ def quick_estimate_cost(messages: List[Dict[str, str]],
     Returns:
         成本分析结果
     """
-    calculator = TokenCalculator(model)
+    calculator = get_token_calculator(model)
     return calculator.analyze_conversation(messages, estimated_response)
 
 
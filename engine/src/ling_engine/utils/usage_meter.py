@@ -0,0 +1,483 @@
+"""
+用量计量 - 固定内存的滚动聚合 + 定时批量落库
+
+TokenStatistics.add_usage 每次 LLM / TTS / 嵌入调用都会记一笔，这里不保留逐条明细，而是：
+- 内存中按时间桶（默认 60s）聚合每个 (模型, 服务类型) 的调用数、token、成本，
+  并用分位数草图（对数分桶直方图）记录单次调用 token / 成本的分布；
+  只保留最近 N 个桶，内存占用与运行时长无关
+- 待落库数据按 (桶, 模型, 服务类型, 用户) 聚合，后台任务定时批量 UPSERT 到
+  PostgreSQL 的 token_usage_rollup（计费的数据来源），同时累加到 Redis 的按天
+  哈希（看板用，写失败不重试）
+- PG 写入失败时数据并回待写区下次重试；待写的键数量有上限，超出的用户归入 __overflow__
+
+环境变量：
+    USAGE_METER_BUCKET_SECONDS   时间桶长度，默认 60
+    USAGE_METER_WINDOW_BUCKETS   内存中保留的桶数，默认 60
+    USAGE_METER_FLUSH_INTERVAL   落库间隔（秒），默认 30
+    USAGE_METER_FLUSH_ENABLED    默认 true，false 时只做内存聚合
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .runtime_stats import LatencyStats, register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_KEY = "__overflow__"
+
+_MAX_SERIES = 64  # 内存聚合最多跟踪多少个 (模型, 服务类型)
+_MAX_PENDING_KEYS = 20000  # 待落库的 (桶, 模型, 服务类型, 用户) 上限
+_FLUSH_BATCH = 1000  # 每条 UPSERT 最多写多少行
+_REDIS_TTL_SECONDS = 40 * 86400
+_MAX_RETRY_DELAY_SECONDS = 300.0
+
+_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS token_usage_rollup (
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    model VARCHAR(255) NOT NULL,
+    service_type VARCHAR(32) NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    calls BIGINT NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    total_tokens BIGINT NOT NULL DEFAULT 0,
+    cost DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, model, service_type, user_id)
+)
+"""
+
+_UPSERT_SET = """
+ON CONFLICT (bucket_start, model, service_type, user_id) DO UPDATE SET
+    calls = token_usage_rollup.calls + EXCLUDED.calls,
+    prompt_tokens = token_usage_rollup.prompt_tokens + EXCLUDED.prompt_tokens,
+    completion_tokens = token_usage_rollup.completion_tokens + EXCLUDED.completion_tokens,
+    total_tokens = token_usage_rollup.total_tokens + EXCLUDED.total_tokens,
+    cost = token_usage_rollup.cost + EXCLUDED.cost
+"""
+
+_UPSERT_SQL = """
+INSERT INTO token_usage_rollup
+    (bucket_start, model, service_type, user_id, calls, prompt_tokens, completion_tokens, total_tokens, cost)
+SELECT * FROM unnest($1::timestamptz[], $2::text[], $3::text[], $4::text[],
+                     $5::bigint[], $6::bigint[], $7::bigint[], $8::bigint[], $9::float8[])
+""" + _UPSERT_SET
+
+# asyncpg 不可用时的 psycopg2 版本
+_UPSERT_SQL_SYNC = """
+INSERT INTO token_usage_rollup
+    (bucket_start, model, service_type, user_id, calls, prompt_tokens, completion_tokens, total_tokens, cost)
+VALUES %s
+""" + _UPSERT_SET
+
+
+class QuantileSketch:
+    """对数分桶的分位数草图，相对误差约 relative_accuracy，桶数有上限（固定内存）
+
+    值 v 落在第 ceil(log_gamma(v)) 个桶，gamma = (1 + a) / (1 - a)；
+    桶数超过上限时合并最小的两个桶（牺牲低分位精度，高分位不受影响）。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, max_bins: int = 512):
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_bins = max_bins
+        self._bins: Dict[int, int] = {}
+        self._zeros = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value <= 0:
+            self._zeros += 1
+            return
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        self._bins[idx] = self._bins.get(idx, 0) + 1
+        if len(self._bins) > self._max_bins:
+            lowest, second = sorted(self._bins)[:2]
+            self._bins[second] += self._bins.pop(lowest)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.count += other.count
+        self._zeros += other._zeros
+        for idx, n in other._bins.items():
+            self._bins[idx] = self._bins.get(idx, 0) + n
+        while len(self._bins) > self._max_bins:
+            lowest, second = sorted(self._bins)[:2]
+            self._bins[second] += self._bins.pop(lowest)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self._zeros:
+            return 0.0
+        seen = self._zeros
+        for idx in sorted(self._bins):
+            seen += self._bins[idx]
+            if seen > rank:
+                # 桶中点（几何意义上）
+                return 2 * self._gamma ** idx / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._bins) / (self._gamma + 1)
+
+
+class _Series:
+    """一个时间桶内某 (模型, 服务类型) 的聚合"""
+
+    __slots__ = ("calls", "prompt_tokens", "completion_tokens", "total_tokens", "cost", "tokens_sketch", "cost_sketch")
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.cost = 0.0
+        self.tokens_sketch = QuantileSketch()
+        self.cost_sketch = QuantileSketch()
+
+
+class UsageMeter:
+    """用量计量器（线程安全，record 可在任意线程调用）"""
+
+    def __init__(
+        self,
+        bucket_seconds: int = 60,
+        window_buckets: int = 60,
+        flush_interval: float = 30.0,
+        flush_enabled: bool = True,
+        max_pending_keys: int = _MAX_PENDING_KEYS,
+    ):
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.window_buckets = max(1, int(window_buckets))
+        self.flush_interval = flush_interval
+        self.flush_enabled = flush_enabled
+        self.max_pending_keys = max_pending_keys
+
+        self._lock = threading.Lock()
+        # 桶起点 (epoch 秒) -> {(模型, 服务类型): _Series}，按时间排列
+        self._buckets: "OrderedDict[int, Dict[Tuple[str, str], _Series]]" = OrderedDict()
+        self._series_keys: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        # (桶起点, 模型, 服务类型, 用户) -> [calls, prompt, completion, total, cost]
+        self._pending: Dict[Tuple[int, str, str, str], List[float]] = {}
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self._table_ready = False
+
+        self.recorded = 0
+        self.flushed_rows = 0
+        self.overflowed = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._flush_latency = LatencyStats()
+
+    # ---------- 记录 ----------
+
+    def _series_key(self, model: str, service_type: str) -> Tuple[str, str]:
+        key = (model, service_type)
+        if key in self._series_keys:
+            self._series_keys.move_to_end(key)
+            return key
+        if len(self._series_keys) >= _MAX_SERIES:
+            return (OVERFLOW_KEY, service_type)
+        self._series_keys[key] = None
+        return key
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        cost: float = 0.0,
+        service_type: str = "llm",
+        user_id: str = "",
+        now: Optional[float] = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds) * self.bucket_seconds
+        model = model or "unknown"
+        with self._lock:
+            self.recorded += 1
+            series_map = self._buckets.get(bucket)
+            if series_map is None:
+                series_map = self._buckets[bucket] = {}
+                while len(self._buckets) > self.window_buckets:
+                    self._buckets.popitem(last=False)
+            key = self._series_key(model, service_type)
+            series = series_map.get(key)
+            if series is None:
+                series = series_map[key] = _Series()
+            series.calls += 1
+            series.prompt_tokens += prompt_tokens
+            series.completion_tokens += completion_tokens
+            series.total_tokens += total_tokens
+            series.cost += cost
+            series.tokens_sketch.add(total_tokens)
+            series.cost_sketch.add(cost)
+
+            if self.flush_enabled:
+                self._add_pending((bucket, model, service_type, user_id or ""),
+                                  [1, prompt_tokens, completion_tokens, total_tokens, cost])
+
+    def _add_pending(self, key: Tuple[int, str, str, str], values: List[float]) -> None:
+        row = self._pending.get(key)
+        if row is None:
+            if len(self._pending) >= self.max_pending_keys:
+                self.overflowed += 1
+                key = (key[0], key[1], key[2], OVERFLOW_KEY)
+                row = self._pending.get(key)
+            if row is None:
+                self._pending[key] = list(values)
+                return
+        for i, v in enumerate(values):
+            row[i] += v
+
+    # ---------- 后台落库 ----------
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self) -> None:
+        if self.flush_enabled:
+            self._ensure_started()
+
+    async def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                break
+            if await self.flush():
+                delay = self.flush_interval
+            else:
+                delay = min(max(delay, self.flush_interval) * 2, _MAX_RETRY_DELAY_SECONDS)
+
+    async def flush(self) -> bool:
+        """把待写聚合写入 PG（和 Redis），PG 失败返回 False 并保留数据待重试"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return True
+
+            rows = [
+                (datetime.fromtimestamp(k[0], tz=timezone.utc), k[1], k[2], k[3],
+                 int(v[0]), int(v[1]), int(v[2]), int(v[3]), float(v[4]))
+                for k, v in pending.items()
+            ]
+            started = time.perf_counter()
+            try:
+                for i in range(0, len(rows), _FLUSH_BATCH):
+                    await self._write_rows(rows[i:i + _FLUSH_BATCH])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"用量聚合写入数据库失败（{len(rows)} 行，稍后重试）: {e}")
+                # UPSERT 是累加的，整批并回重试会重复计入已成功的分批，只并回未写入的部分
+                with self._lock:
+                    for k, v in list(pending.items())[i:]:
+                        self._add_pending(k, v)
+                return False
+            self._flush_latency.record((time.perf_counter() - started) * 1000)
+            self.flushed_rows += len(rows)
+
+            try:
+                await asyncio.to_thread(self._write_redis, pending)
+            except Exception as e:
+                logger.warning(f"用量聚合写入 Redis 失败（仅影响看板）: {e}")
+            return True
+
+    async def _write_rows(self, rows: List[tuple]) -> None:
+        from ..database.pgsql.async_database_manager import get_async_db_manager
+
+        db = await get_async_db_manager()
+        if db is None:
+            await asyncio.to_thread(self._write_rows_sync, rows)
+            return
+        if not self._table_ready:
+            await db.execute(_CREATE_TABLE_SQL)
+            self._table_ready = True
+        await db.execute(_UPSERT_SQL, *[list(col) for col in zip(*rows)])
+
+    def _write_rows_sync(self, rows: List[tuple]) -> None:
+        from psycopg2.extras import execute_values
+        from ..database.pgsql.database_manager import get_db_manager
+
+        db = get_db_manager()
+        conn = db.get_connection()
+        if conn is None:
+            raise RuntimeError("无法获取数据库连接")
+        try:
+            with conn.cursor() as cur:
+                if not self._table_ready:
+                    cur.execute(_CREATE_TABLE_SQL)
+                execute_values(cur, _UPSERT_SQL_SYNC, rows, page_size=len(rows))
+            conn.commit()
+            self._table_ready = True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            db.return_connection(conn)
+
+    def _write_redis(self, pending: Dict[Tuple[int, str, str, str], List[float]]) -> None:
+        """按天累加: usage:{日期} 按模型/服务类型，usage_user:{日期} 按用户"""
+        from ..database.pgsql.database_manager import get_redis_manager
+
+        redis_manager = get_redis_manager()
+        pipe = redis_manager.client.pipeline(transaction=False)
+        keys = set()
+        for (bucket, model, service_type, user_id), (calls, prompt, completion, total, cost) in pending.items():
+            day = time.strftime("%Y%m%d", time.gmtime(bucket))
+            series_key = redis_manager._k("usage", day)
+            field = f"{model}|{service_type}"
+            pipe.hincrby(series_key, f"{field}|calls", int(calls))
+            pipe.hincrby(series_key, f"{field}|prompt_tokens", int(prompt))
+            pipe.hincrby(series_key, f"{field}|completion_tokens", int(completion))
+            pipe.hincrby(series_key, f"{field}|total_tokens", int(total))
+            pipe.hincrbyfloat(series_key, f"{field}|cost", float(cost))
+            keys.add(series_key)
+            if user_id:
+                user_key = redis_manager._k("usage_user", day)
+                pipe.hincrby(user_key, f"{user_id}|total_tokens", int(total))
+                pipe.hincrbyfloat(user_key, f"{user_id}|cost", float(cost))
+                keys.add(user_key)
+        for key in keys:
+            pipe.expire(key, _REDIS_TTL_SECONDS)
+        pipe.execute()
+
+    async def close(self) -> None:
+        """停止后台任务并刷入剩余数据"""
+        self._closing = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.warning(f"用量落库任务异常退出: {e}")
+            self._task = None
+        if self.flush_enabled and not await self.flush():
+            logger.error(f"关闭时仍有 {len(self._pending)} 行用量聚合未写入数据库")
+
+    # ---------- 查询 ----------
+
+    def snapshot(self, last_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """最近一段时间（默认整个内存窗口）按 (模型, 服务类型) 汇总"""
+        cutoff = 0 if last_seconds is None else time.time() - last_seconds
+        merged: Dict[Tuple[str, str], _Series] = {}
+        with self._lock:
+            for bucket, series_map in self._buckets.items():
+                if bucket + self.bucket_seconds <= cutoff:
+                    continue
+                for key, series in series_map.items():
+                    total = merged.get(key)
+                    if total is None:
+                        total = merged[key] = _Series()
+                    total.calls += series.calls
+                    total.prompt_tokens += series.prompt_tokens
+                    total.completion_tokens += series.completion_tokens
+                    total.total_tokens += series.total_tokens
+                    total.cost += series.cost
+                    total.tokens_sketch.merge(series.tokens_sketch)
+                    total.cost_sketch.merge(series.cost_sketch)
+        return {
+            f"{model}|{service_type}": {
+                "calls": s.calls,
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "total_tokens": s.total_tokens,
+                "cost": round(s.cost, 6),
+                "tokens_p50": round(s.tokens_sketch.quantile(0.50), 1),
+                "tokens_p95": round(s.tokens_sketch.quantile(0.95), 1),
+                "tokens_p99": round(s.tokens_sketch.quantile(0.99), 1),
+                "cost_p95": round(s.cost_sketch.quantile(0.95), 6),
+            }
+            for (model, service_type), s in sorted(merged.items())
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+            buckets = len(self._buckets)
+        return {
+            "window_seconds": self.bucket_seconds * self.window_buckets,
+            "buckets": buckets,
+            "recorded": self.recorded,
+            "pending_rows": pending,
+            "flushed_rows": self.flushed_rows,
+            "overflowed": self.overflowed,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "flush_latency": self._flush_latency.snapshot(),
+            "last_hour": self.snapshot(last_seconds=3600),
+        }
+
+
+def current_user_id() -> str:
+    """当前请求上下文中的用户 ID（没有时为空字符串）"""
+    try:
+        from ..bff_integration.auth.user_context import user_context_var
+        context = user_context_var.get()
+        return str(context.user_id) if context and context.user_id else ""
+    except Exception:
+        return ""
+
+
+_usage_meter: Optional[UsageMeter] = None
+_usage_meter_lock = threading.Lock()
+
+
+def get_usage_meter() -> UsageMeter:
+    """进程级用量计量器（首次调用时按环境变量创建）"""
+    global _usage_meter
+    if _usage_meter is None:
+        with _usage_meter_lock:
+            if _usage_meter is None:
+                try:
+                    bucket_seconds = int(os.getenv("USAGE_METER_BUCKET_SECONDS", "60"))
+                    window_buckets = int(os.getenv("USAGE_METER_WINDOW_BUCKETS", "60"))
+                    flush_interval = float(os.getenv("USAGE_METER_FLUSH_INTERVAL", "30"))
+                except ValueError:
+                    logger.warning("USAGE_METER_* 配置无效，使用默认值")
+                    bucket_seconds, window_buckets, flush_interval = 60, 60, 30.0
+                meter = UsageMeter(
+                    bucket_seconds=bucket_seconds,
+                    window_buckets=window_buckets,
+                    flush_interval=flush_interval,
+                    flush_enabled=os.getenv("USAGE_METER_FLUSH_ENABLED", "true").lower() in ("1", "true", "yes"),
+                )
+                register_stats_provider("usage_meter", meter.get_stats)
+                _usage_meter = meter
+    return _usage_meter
+
+
+async def start_usage_meter() -> None:
+    """服务启动时启动后台落库任务"""
+    await get_usage_meter().start()
+
+
+async def close_usage_meter() -> None:
+    if _usage_meter is not None:
+        await _usage_meter.close()
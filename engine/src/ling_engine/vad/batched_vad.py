@@ -0,0 +1,210 @@
+"""
+跨连接批量 Silero VAD
+
+每个客户端持有独立的 VADSession（状态机、RNN 状态、上下文窗口互不共享），
+调度器在每个 tick 内把所有连接待处理的 512 采样窗口拼成一个 batch，
+在线程池中执行一次 ONNX 推理，避免阻塞事件循环。
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from ..utils.runtime_stats import LatencyStats
+
+# Silero v5 ONNX 模型的 RNN 状态形状为 (2, batch, 128)
+_STATE_DIM = 128
+
+
+@dataclass
+class _PendingWindow:
+    window: np.ndarray
+    enqueued_at: float
+    outputs: List[bytes]
+    done: Optional[asyncio.Future] = None
+
+
+@dataclass
+class _SchedulerStats:
+    batches: int = 0
+    windows: int = 0
+    max_batch: int = 0
+    errors: int = 0
+    window_latency: LatencyStats = field(default_factory=LatencyStats)
+    inference_latency: LatencyStats = field(default_factory=LatencyStats)
+
+
+class VADSession:
+    """单个客户端的 VAD 会话"""
+
+    def __init__(self, scheduler: "SileroBatchScheduler", client_uid: str):
+        from .silero import StateMachine
+
+        self.client_uid = client_uid
+        self.engine = scheduler.engine
+        self._scheduler = scheduler
+        self._window_size = scheduler.window_size
+        self.state_machine = StateMachine(scheduler.config)
+        self.rnn_state = np.zeros((2, _STATE_DIM), dtype=np.float32)
+        self.context = np.zeros(scheduler.context_size, dtype=np.float32)
+        self._carry = np.empty(0, dtype=np.float32)
+        self.pending: Deque[_PendingWindow] = deque()
+        self.closed = False
+
+    async def detect_speech(self, audio_data) -> List[bytes]:
+        """与 VADEngine.detect_speech 产出相同的事件序列，但在批量调度器中执行
+
+        不足一个窗口的尾部采样会保留到下一次调用，而不是被丢弃。
+        """
+        audio = np.asarray(audio_data, dtype=np.float32).reshape(-1)
+        if self._carry.size:
+            audio = np.concatenate([self._carry, audio])
+        n_windows = audio.size // self._window_size
+        self._carry = audio[n_windows * self._window_size :].copy()
+        if n_windows == 0 or self.closed:
+            return []
+
+        outputs: List[bytes] = []
+        done = asyncio.get_running_loop().create_future()
+        now = time.perf_counter()
+        windows = audio[: n_windows * self._window_size].reshape(n_windows, self._window_size)
+        for i, window in enumerate(windows):
+            self.pending.append(
+                _PendingWindow(window, now, outputs, done if i == n_windows - 1 else None)
+            )
+        self._scheduler.notify()
+        return await done
+
+    def close(self) -> None:
+        self.closed = True
+        self._scheduler.remove_session(self)
+        while self.pending:
+            item = self.pending.popleft()
+            if item.done and not item.done.done():
+                item.done.set_result(item.outputs)
+
+
+class SileroBatchScheduler:
+    """把多个 VADSession 的窗口合并成一次 Silero 推理"""
+
+    def __init__(
+        self,
+        engine,
+        max_batch_size: int = 64,
+        batch_window_ms: float = 5.0,
+    ):
+        self.engine = engine
+        self.config = engine.config
+        self.window_size = engine.window_size_samples
+        self.context_size = 64 if self.config.target_sr == 16000 else 32
+        self.max_batch_size = max_batch_size
+        self.batch_window_s = batch_window_ms / 1000.0
+
+        self._sessions: Dict[int, VADSession] = {}
+        self._session = None  # onnxruntime.InferenceSession，首次推理时加载
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = _SchedulerStats()
+
+    def create_session(self, client_uid: str) -> VADSession:
+        session = VADSession(self, client_uid)
+        self._sessions[id(session)] = session
+        return session
+
+    def remove_session(self, session: VADSession) -> None:
+        self._sessions.pop(id(session), None)
+
+    def notify(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def _load_model(self):
+        from silero_vad import load_silero_vad
+
+        logger.info("Loading Silero-VAD ONNX model for batched inference...")
+        return load_silero_vad(onnx=True).session
+
+    def _infer(self, x: np.ndarray, state: np.ndarray):
+        if self._session is None:
+            self._session = self._load_model()
+        out, new_state = self._session.run(
+            None,
+            {
+                "input": x,
+                "state": state,
+                "sr": np.array(self.config.target_sr, dtype=np.int64),
+            },
+        )
+        return np.asarray(out).reshape(-1), new_state
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # 稍等片刻，让其它连接同一时刻到达的音频进入同一个 batch
+            if self.batch_window_s > 0:
+                await asyncio.sleep(self.batch_window_s)
+
+            while True:
+                ready = [s for s in self._sessions.values() if s.pending]
+                if not ready:
+                    break
+                ready.sort(key=lambda s: s.pending[0].enqueued_at)
+                batch = ready[: self.max_batch_size]
+                items = [s.pending.popleft() for s in batch]
+
+                x = np.stack(
+                    [np.concatenate([s.context, it.window]) for s, it in zip(batch, items)]
+                )
+                state = np.stack([s.rnn_state for s in batch], axis=1)
+
+                started = time.perf_counter()
+                try:
+                    probs, new_state = await loop.run_in_executor(None, self._infer, x, state)
+                except Exception as e:
+                    self._stats.errors += 1
+                    logger.error(f"批量 VAD 推理失败: {e}")
+                    for it in items:
+                        if it.done and not it.done.done():
+                            it.done.set_result(it.outputs)
+                    continue
+                finished = time.perf_counter()
+
+                self._stats.batches += 1
+                self._stats.windows += len(batch)
+                self._stats.max_batch = max(self._stats.max_batch, len(batch))
+                self._stats.inference_latency.record((finished - started) * 1000)
+
+                for i, (s, it) in enumerate(zip(batch, items)):
+                    s.rnn_state = new_state[:, i, :]
+                    s.context = x[i, -self.context_size :]
+                    prob = float(probs[i])
+                    if prob:
+                        for _probs, _dbs, chunk in s.state_machine.get_result(prob, it.window):
+                            it.outputs.append(bytes(chunk))
+                    self._stats.window_latency.record((finished - it.enqueued_at) * 1000)
+                    if it.done and not it.done.done():
+                        it.done.set_result(it.outputs)
+
+    def get_stats(self) -> Dict:
+        batches = self._stats.batches
+        avg_batch = self._stats.windows / batches if batches else 0.0
+        return {
+            "active_sessions": len(self._sessions),
+            "batches": batches,
+            "windows": self._stats.windows,
+            "errors": self._stats.errors,
+            "avg_batch_size": round(avg_batch, 2),
+            "max_batch_size": self._stats.max_batch,
+            "batch_occupancy": round(avg_batch / self.max_batch_size, 4),
+            "window_latency": self._stats.window_latency.snapshot(),
+            "inference_latency": self._stats.inference_latency.snapshot(),
+        }
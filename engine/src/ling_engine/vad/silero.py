@@ -45,11 +45,28 @@ class VADEngine(VADInterface):
         self.state = StateMachine(self.config)
         self.window_size_samples = 512 if self.config.target_sr == 16000 else 256
         # 512 / 16000 = 0.032s
+        self._batch_scheduler = None
 
     def load_vad_model(self):
         logger.info("Loading Silero-VAD model...")
         return load_silero_vad()
 
+    def create_session(self, client_uid: str):
+        """Create an isolated per-client VAD session.
+
+        Sessions keep their own state machine and model state, and their
+        windows are batched with other clients' windows by a shared scheduler
+        that runs inference off the event loop. ``detect_speech`` on the engine
+        itself keeps using the single shared state machine.
+        """
+        if self._batch_scheduler is None:
+            from .batched_vad import SileroBatchScheduler
+            from ..utils.runtime_stats import register_stats_provider
+
+            self._batch_scheduler = SileroBatchScheduler(self)
+            register_stats_provider("vad", self._batch_scheduler.get_stats)
+        return self._batch_scheduler.create_session(client_uid)
+
     def detect_speech(self, audio_data: list[float]):
         audio_np = np.array(audio_data, dtype=np.float32)
         for i in range(0, len(audio_np), self.window_size_samples):
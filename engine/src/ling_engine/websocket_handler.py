@@ -1,10 +1,10 @@
 import aiohttp
+from functools import partial
 from typing import Dict, List, Optional, Callable, TypedDict, Any
 from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
 import json
 from enum import Enum
-import numpy as np
 from loguru import logger
 import os
 from datetime import datetime
@@ -19,11 +19,13 @@ from .chat_group import (
 from .service_context import ServiceContext
 from .message_handler import message_handler
 from .utils.stream_audio import prepare_audio_payload
+from .utils.audio_buffer import PCMBuffer
+from .asr.stream_transcriber import StreamTranscriber
 from .chat_history_manager import (
-    create_new_history,
-    get_history,
+    acreate_new_history,
+    aget_history,
     delete_history,
-    get_history_list,
+    aget_history_page,
     pin_history,
     rename_history_custom_title,
 )
@@ -51,7 +53,7 @@ class MessageType(Enum):
     CONVERSATION = ["mic-audio-end", "text-input", "ai-speak-signal"]
     CONFIG = ["fetch-configs", "switch-config"]
     CONTROL = ["interrupt-signal", "audio-play-start"]
-    DATA = ["mic-audio-data"]
+    DATA = ["mic-audio-data", "mic-audio-format"]
     MCP = ["mcp-request"]  # Add MCP message type
 
 
@@ -62,8 +64,11 @@ class WSMessage(TypedDict, total=False):
     action: Optional[str]
     text: Optional[str]
     audio: Optional[List[float]]
+    format: Optional[str]  # mic-audio-format: "float32" | "int16"
     images: Optional[List[str]]
     history_uid: Optional[str]
+    limit: Optional[int]  # fetch-history-list 分页大小，不传时返回全部
+    cursor: Optional[str]  # fetch-history-list 上一页返回的 next_cursor
     file: Optional[str]
     display_text: Optional[dict]
     user_id: Optional[str]  # 添加用户标识字段
@@ -79,7 +84,13 @@ class WebSocketHandler:
         self.chat_group_manager = ChatGroupManager()
         self.current_conversation_tasks: Dict[str, Optional[asyncio.Task]] = {}
         self.default_context_cache = default_context_cache
-        self.received_data_buffers: Dict[str, np.ndarray] = {}
+        self.received_data_buffers: Dict[str, PCMBuffer] = {}
+        # 二进制音频帧的采样格式（"float32" 或 "int16"），由 mic-audio-format 消息设置
+        self.binary_audio_formats: Dict[str, str] = {}
+        # 每个客户端独立的 VAD 会话（状态机不跨连接共享）
+        self.vad_sessions: Dict[str, Any] = {}
+        # 每个客户端当前语音段的流式识别会话（仅 ASR 引擎支持流式时存在）
+        self.asr_streams: Dict[str, StreamTranscriber] = {}
 
         
         # 读取MCP配置
@@ -152,6 +163,7 @@ class WebSocketHandler:
             "rename-history": self._handle_rename_history,
             "interrupt-signal": self._handle_interrupt,
             "mic-audio-data": self._handle_audio_data,
+            "mic-audio-format": self._handle_audio_format,
             "mic-audio-end": self._handle_conversation_trigger,
             "raw-audio-data": self._handle_raw_audio_data,
             "text-input": self._handle_conversation_trigger,
@@ -221,7 +233,7 @@ class WebSocketHandler:
         """Store client data and initialize group status"""
         self.client_connections[client_uid] = websocket
         self.client_contexts[client_uid] = session_service_context
-        self.received_data_buffers[client_uid] = np.array([])
+        self.received_data_buffers[client_uid] = PCMBuffer()
         
         # 为会话上下文设置WebSocket连接
         session_service_context.set_websocket(websocket)
@@ -677,7 +689,16 @@ class WebSocketHandler:
             
             while True:
                 try:
-                    data = await websocket.receive_json()
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(message.get("code", 1000))
+
+                    # 二进制帧：麦克风 PCM 数据，直接写入客户端音频缓冲区
+                    if message.get("bytes") is not None:
+                        self._handle_binary_audio_data(client_uid, message["bytes"])
+                        continue
+
+                    data = json.loads(message.get("text") or "")
                     message_handler.handle_message(client_uid, data)
                     await self._route_message(websocket, client_uid, data)
                 except WebSocketDisconnect:
@@ -891,6 +912,13 @@ class WebSocketHandler:
         self.client_connections.pop(client_uid, None)
         self.client_contexts.pop(client_uid, None)
         self.received_data_buffers.pop(client_uid, None)
+        self.binary_audio_formats.pop(client_uid, None)
+        vad_session = self.vad_sessions.pop(client_uid, None)
+        if vad_session is not None:
+            vad_session.close()
+        asr_stream = self.asr_streams.pop(client_uid, None)
+        if asr_stream is not None:
+            asr_stream.close()
 
         # 清理MCP处理结果缓存（按客户端隔离）
         if hasattr(self, '_processed_mcp_results_by_client'):
@@ -1024,11 +1052,23 @@ class WebSocketHandler:
         
         logger.info(f"📋 获取历史记录列表 - 角色: {context.character_config.conf_uid}, 用户: {user_id}")
         
-        histories = get_history_list(context.character_config.conf_uid, user_id)
+        page = await aget_history_page(
+            context.character_config.conf_uid,
+            user_id,
+            limit=data.get("limit"),
+            cursor=data.get("cursor"),
+        )
+        histories = page["histories"]
         logger.info(f"📋 找到 {len(histories)} 条历史记录")
         
         await websocket.send_text(
-            json.dumps({"type": "history-list", "histories": histories})
+            json.dumps(
+                {
+                    "type": "history-list",
+                    "histories": histories,
+                    "next_cursor": page["next_cursor"],
+                }
+            )
         )
 
     async def _handle_fetch_history(
@@ -1089,7 +1129,7 @@ class WebSocketHandler:
 
         messages = [
             msg
-            for msg in get_history(
+            for msg in await aget_history(
                 context.character_config.conf_uid,
                 history_uid,
                 user_id
@@ -1145,7 +1185,7 @@ class WebSocketHandler:
         
         logger.info(f"📝 创建新历史记录 - 角色: {context.character_config.conf_uid}, 用户: {user_id}")
         
-        history_uid = create_new_history(context.character_config.conf_uid, user_id)
+        history_uid = await acreate_new_history(context.character_config.conf_uid, user_id)
         if history_uid:
             context.history_uid = history_uid
             # 🎭 传入正确的用户ID给情绪系统
@@ -1245,14 +1285,91 @@ class WebSocketHandler:
     async def _handle_audio_data(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
     ) -> None:
-        """Handle incoming audio data"""
+        """Handle incoming audio data (JSON fallback for binary frames)"""
         audio_data = data.get("audio", [])
         if audio_data:
-            self.received_data_buffers[client_uid] = np.append(
-                self.received_data_buffers[client_uid],
-                np.array(audio_data, dtype=np.float32),
+            buffer = self.received_data_buffers[client_uid]
+            start = len(buffer)
+            buffer.extend(audio_data)
+            self._feed_asr_stream(client_uid, buffer, start)
+
+    async def _handle_audio_format(
+        self, websocket: WebSocket, client_uid: str, data: WSMessage
+    ) -> None:
+        """Set the sample format used by subsequent binary audio frames"""
+        audio_format = data.get("format", "float32")
+        if audio_format not in ("float32", "int16"):
+            logger.warning(f"Unsupported binary audio format: {audio_format}")
+            return
+        self.binary_audio_formats[client_uid] = audio_format
+
+    def _handle_binary_audio_data(self, client_uid: str, payload: bytes) -> None:
+        """Handle a binary websocket frame of little-endian mic PCM"""
+        buffer = self.received_data_buffers.get(client_uid)
+        if buffer is None:
+            return
+        start = len(buffer)
+        if self.binary_audio_formats.get(client_uid) == "int16":
+            if len(payload) % 2:
+                logger.warning(f"Dropping malformed int16 audio frame from {client_uid}")
+                return
+            buffer.extend_int16_bytes(payload)
+        else:
+            if len(payload) % 4:
+                logger.warning(f"Dropping malformed float32 audio frame from {client_uid}")
+                return
+            buffer.extend_float32_bytes(payload)
+        self._feed_asr_stream(client_uid, buffer, start)
+
+    def _feed_asr_stream(self, client_uid: str, buffer: PCMBuffer, start: int) -> None:
+        """把缓冲区中 start 之后新写入的音频送入流式识别
+
+        会话与缓冲区不同步（刚开始说话、切换了 ASR 引擎、中途经过 raw-audio-data 等）时
+        重建会话并送入整段已缓冲音频，保证 finish 的结果对应缓冲区的全部内容。
+        """
+        context = self.client_contexts.get(client_uid)
+        asr_engine = context.asr_engine if context else None
+        if asr_engine is None or not asr_engine.supports_streaming:
+            return
+        stream = self.asr_streams.get(client_uid)
+        if stream is None or stream.engine is not asr_engine or stream.samples != start:
+            if stream is not None:
+                stream.close()
+            try:
+                stream = StreamTranscriber(
+                    asr_engine,
+                    on_partial=partial(self._send_partial_transcription, client_uid),
+                )
+            except Exception as e:
+                logger.warning(f"创建流式识别会话失败: {e}")
+                self.asr_streams.pop(client_uid, None)
+                return
+            self.asr_streams[client_uid] = stream
+            start = 0
+        # 复制出新写入的部分：缓冲区 take()/扩容后旧视图不再可靠
+        stream.feed(buffer.view()[start:].copy())
+
+    async def _send_partial_transcription(self, client_uid: str, text: str) -> None:
+        websocket = self.client_connections.get(client_uid)
+        if websocket is not None:
+            await websocket.send_text(
+                json.dumps({"type": "user-input-partial-transcription", "text": text})
             )
 
+    async def finish_asr_stream(self, client_uid: str, samples: int) -> Optional[str]:
+        """结束当前语音段的流式识别并返回最终文本
+
+        samples 为本段语音的采样数；没有流式会话、会话与语音不一致或识别失败时返回 None，
+        调用方应改用整段识别。
+        """
+        stream = self.asr_streams.pop(client_uid, None)
+        if stream is None:
+            return None
+        if stream.samples != samples:
+            stream.close()
+            return None
+        return await stream.finish()
+
     async def _handle_raw_audio_data(
         self, websocket: WebSocket, client_uid: str, data: WSMessage
     ) -> None:
@@ -1260,7 +1377,12 @@ class WebSocketHandler:
         context = self.client_contexts[client_uid]
         chunk = data.get("audio", [])
         if chunk:
-            for audio_bytes in context.vad_engine.detect_speech(chunk):
+            vad_session = self._get_vad_session(client_uid, context)
+            if vad_session is not None:
+                vad_results = await vad_session.detect_speech(chunk)
+            else:
+                vad_results = context.vad_engine.detect_speech(chunk)
+            for audio_bytes in vad_results:
                 if audio_bytes == b"<|PAUSE|>":
                     await websocket.send_text(
                         json.dumps({"type": "control", "text": "interrupt"})
@@ -1269,14 +1391,24 @@ class WebSocketHandler:
                     pass
                 elif len(audio_bytes) > 1024:
                     # Detected audio activity (voice)
-                    self.received_data_buffers[client_uid] = np.append(
-                        self.received_data_buffers[client_uid],
-                        np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32),
-                    )
+                    self.received_data_buffers[client_uid].extend_int16_bytes(audio_bytes)
                     await websocket.send_text(
                         json.dumps({"type": "control", "text": "mic-audio-end"})
                     )
 
+    def _get_vad_session(self, client_uid: str, context: ServiceContext):
+        """Return the client's VAD session, recreating it if the VAD engine changed"""
+        vad_engine = context.vad_engine
+        if not hasattr(vad_engine, "create_session"):
+            return None
+        session = self.vad_sessions.get(client_uid)
+        if session is None or session.engine is not vad_engine:
+            if session is not None:
+                session.close()
+            session = vad_engine.create_session(client_uid)
+            self.vad_sessions[client_uid] = session
+        return session
+
     async def _check_and_deduct_message(self, websocket: WebSocket, client_uid: str) -> bool:
         """检查用户是否可以发送消息，若可以则扣减积分。
 
@@ -1802,12 +1934,14 @@ class WebSocketHandler:
             # 【MCP积分预检查】- 在工具调用前检查积分是否充足
             # 暂时使用默认积分（6.25），实际扣除会根据具体工具调整
             try:
-                from .bff_integration.database.credit_repository import CreditRepository
-                credit_repo = CreditRepository()
+                from .bff_integration.database.repository_registry import get_credit_repository
+                credit_repo = get_credit_repository()
 
                 # 预检查积分是否充足（使用最大可能消耗：音乐MCP的6.25积分）
                 mcp_credit_cost = 6.25
-                has_sufficient_credits = credit_repo.check_sufficient_credits(user_id, mcp_credit_cost)
+                has_sufficient_credits = await asyncio.to_thread(
+                    credit_repo.check_sufficient_credits, user_id, mcp_credit_cost
+                )
 
                 if not has_sufficient_credits:
                     logger.warning(f"🚫 用户 {user_id} 积分不足，无法调用MCP工具")
@@ -2588,8 +2722,8 @@ class WebSocketHandler:
             bool: 是否扣除成功
         """
         try:
-            from .bff_integration.database.credit_repository import CreditRepository
-            credit_repo = CreditRepository()
+            from .bff_integration.database.repository_registry import get_credit_repository
+            credit_repo = get_credit_repository()
 
             # 定义不同工具的积分消耗（根据工具名称关键词匹配）
             tool_credits_map = {
@@ -2611,7 +2745,7 @@ class WebSocketHandler:
                         break
 
             # 执行积分扣除
-            consumption_result = credit_repo.consume_credits(user_id, credit_cost)
+            consumption_result = await asyncio.to_thread(credit_repo.consume_credits, user_id, credit_cost)
 
             if consumption_result["success"]:
                 logger.info(f"✅ MCP工具调用成功扣除用户 {user_id} 积分: {consumption_result['consumed_amount']}")
@@ -0,0 +1,288 @@
+"""GDPR 流式导出：游标解析、断点续传与服务端游标释放的回归测试。"""
+
+from __future__ import annotations
+
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from ling_engine.bff_integration.api.ling_auth_routes import (
+    EXPORT_STREAM_COLLECTIONS,
+    _parse_export_cursor,
+    _stream_user_export,
+)
+from ling_engine.bff_integration.database.ling_user_repository import LingUserRepository
+from ling_engine.soul.ethics import memory_transparency
+from ling_engine.soul.storage import soul_collections
+
+USER_ID = "user-1"
+
+
+def _txn_id(n: int) -> str:
+    return str(uuid.UUID(int=n))
+
+
+class _FakeMongoCollection:
+    """按 user_id / _id $gt 过滤并按 _id 升序返回；fail_after 条后抛异常"""
+
+    def __init__(self, docs, fail_after=None):
+        self.docs = docs
+        self.fail_after = fail_after
+
+    def find(self, query, sort=None, batch_size=None):
+        after = query.get("_id", {}).get("$gt")
+        docs = sorted(
+            (dict(d) for d in self.docs
+             if d["user_id"] == query["user_id"] and (after is None or d["_id"] > after)),
+            key=lambda d: d["_id"],
+        )
+        fail_after = self.fail_after
+
+        async def cursor():
+            for i, doc in enumerate(docs):
+                if fail_after is not None and i >= fail_after:
+                    raise RuntimeError("mongo read failed")
+                yield doc
+        return cursor()
+
+
+class _FakeRepo:
+    """iter_credit_transactions 与仓储层语义一致：id 升序，after_id 之后分批"""
+
+    def __init__(self, transactions, fail_after=None):
+        self.transactions = transactions
+        self.fail_after = fail_after
+
+    def get_user_by_id(self, user_id):
+        return {"id": user_id, "username": "miku", "password_hash": "bcrypt-hash"}
+
+    def iter_credit_transactions(self, user_id, after_id=None, batch_size=2):
+        rows = [r for r in self.transactions if after_id is None or r["id"] > after_id]
+        for i in range(0, len(rows), batch_size):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise RuntimeError("connection lost")
+            yield rows[i:i + batch_size]
+
+
+class TestParseExportCursor(unittest.TestCase):
+    def test_valid_cursors(self):
+        oid = str(ObjectId())
+        self.assertEqual(_parse_export_cursor("user:"), ("user", ""))
+        self.assertEqual(
+            _parse_export_cursor(f"credit_transactions:{_txn_id(7)}"),
+            ("credit_transactions", _txn_id(7)),
+        )
+        self.assertEqual(_parse_export_cursor(f"emotions:{oid}"), ("emotions", oid))
+        self.assertEqual(_parse_export_cursor(f"life_chapters:{oid}"), ("life_chapters", oid))
+
+    def test_bad_cursors_are_rejected(self):
+        oid = str(ObjectId())
+        for cursor in (
+            "",
+            "user",
+            "user:1",
+            "credit_transactions:",
+            "credit_transactions:not-a-uuid",
+            "credit_transactions:------------------------------------",
+            f"credit_transactions:{oid}",
+            "emotions:",
+            f"emotions:{oid[:-1]}",
+            f"emotions:{oid.upper()}",
+            f"self_narrative:{oid}",
+            f"unknown:{oid}",
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as ctx:
+                    _parse_export_cursor(cursor)
+                self.assertEqual(ctx.exception.status_code, 400)
+
+
+class TestStreamUserExport(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.transactions = [{"id": _txn_id(n), "amount": n} for n in range(1, 6)]
+        docs = {key: [] for key in memory_transparency.EXPORT_COLLECTION_KEYS}
+        # importance / knowledge_* 留空，覆盖跨越空集合的续传
+        for key, count in (("emotions", 3), ("stories", 2), ("relationships", 1), ("life_chapters", 2)):
+            docs[key] = [{"_id": ObjectId(), "user_id": USER_ID, "n": i} for i in range(count)]
+        docs["stories"].append({"_id": ObjectId(), "user_id": "someone-else", "n": 99})
+        names = memory_transparency._export_collections()
+        self.mongo = {names[key]: _FakeMongoCollection(d) for key, d in docs.items()}
+
+        async def get_collection(name):
+            return self.mongo.get(name)
+
+        patcher = mock.patch.object(soul_collections, "get_collection", get_collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fail(self, key, after):
+        self.mongo[memory_transparency._export_collections()[key]].fail_after = after
+
+    async def _export(self, repo=None, cursor=None):
+        resume = _parse_export_cursor(cursor) if cursor else None
+        repo = repo or _FakeRepo(self.transactions)
+        return [json.loads(line) async for line in _stream_user_export(repo, USER_ID, resume)]
+
+    @staticmethod
+    def _cursors(lines):
+        return [line["cursor"] for line in lines if line["type"] == "record"]
+
+    async def test_full_export(self):
+        lines = await self._export()
+        self.assertEqual(lines[0]["type"], "meta")
+        self.assertEqual(lines[0]["collections"], list(EXPORT_STREAM_COLLECTIONS))
+        self.assertEqual(lines[-1], {"type": "done", "counts": {
+            "user": 1, "credit_transactions": 5,
+            "emotions": 3, "stories": 2, "relationships": 1, "life_chapters": 2,
+        }})
+        self.assertNotIn("password_hash", lines[1]["data"])
+        self.assertEqual(lines[1]["cursor"], "user:")
+
+    async def test_resume_from_every_cursor_has_no_gaps_or_duplicates(self):
+        cursors = self._cursors(await self._export())
+        self.assertEqual(len(cursors), 1 + 5 + 8)
+        for i, cursor in enumerate(cursors):
+            with self.subTest(cursor=cursor):
+                lines = await self._export(cursor=cursor)
+                self.assertEqual(lines[0]["resumed_from"], cursor)
+                self.assertEqual(self._cursors(lines), cursors[i + 1:])
+                self.assertEqual(lines[-1]["type"], "done")
+
+    async def test_mongo_failure_ends_with_error_and_resumes_from_its_cursor(self):
+        full = self._cursors(await self._export())
+        self._fail("stories", 1)
+
+        lines = await self._export()
+        error = lines[-1]
+        self.assertEqual(error["type"], "error")
+        self.assertEqual(error["collection"], "stories")
+        self.assertEqual(error["cursor"], self._cursors(lines)[-1])
+        self.assertTrue(error["cursor"].startswith("stories:"))
+        self.assertNotIn("done", [line["type"] for line in lines])
+
+        self._fail("stories", None)
+        resumed = await self._export(cursor=error["cursor"])
+        self.assertEqual(self._cursors(lines) + self._cursors(resumed), full)
+        self.assertEqual(resumed[-1]["type"], "done")
+
+    async def test_failure_at_start_of_collection_names_that_collection(self):
+        self._fail("relationships", 0)
+        lines = await self._export()
+        self.assertEqual(lines[-1]["collection"], "relationships")
+        # 最后输出的是上一个非空集合的记录，从它续传会从 relationships 开头继续
+        self.assertTrue(lines[-1]["cursor"].startswith("stories:"))
+
+    async def test_credit_transaction_failure_ends_with_error(self):
+        full = self._cursors(await self._export())
+        lines = await self._export(repo=_FakeRepo(self.transactions, fail_after=2))
+        self.assertEqual(lines[-1]["type"], "error")
+        self.assertEqual(lines[-1]["collection"], "credit_transactions")
+        self.assertEqual(lines[-1]["cursor"], f"credit_transactions:{_txn_id(2)}")
+
+        resumed = await self._export(cursor=lines[-1]["cursor"])
+        self.assertEqual(self._cursors(lines) + self._cursors(resumed), full)
+
+    async def test_legacy_export_still_skips_failed_collections(self):
+        self._fail("emotions", 0)
+        export = await memory_transparency.export_user_data(USER_ID)
+        self.assertEqual(export["emotions"], [])
+        self.assertEqual(len(export["life_chapters"]), 2)
+
+
+class _FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+        self.itersize = None
+        self.executed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def execute(self, sql, params):
+        self.executed = params
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class _FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+        self.committed = self.rolled_back = False
+
+    def cursor(self, name=None, cursor_factory=None):
+        assert name, "export must use a named (server-side) cursor"
+        cur = _FakeNamedCursor(self.rows)
+        self.cursors.append(cur)
+        return cur
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class _FakeDbManager:
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = []
+
+    def get_connection(self):
+        return self.conn
+
+    def return_connection(self, conn):
+        self.released.append(conn)
+
+
+class TestIterCreditTransactions(unittest.IsolatedAsyncioTestCase):
+    def _repo(self, count):
+        conn = _FakeConnection([{"id": _txn_id(n)} for n in range(1, count + 1)])
+        db = _FakeDbManager(conn)
+        with mock.patch.object(LingUserRepository, "_init_tables"):
+            repo = LingUserRepository(db)
+        return repo, conn, db
+
+    def test_full_read_commits_and_releases(self):
+        repo, conn, db = self._repo(5)
+        batches = list(repo.iter_credit_transactions(USER_ID, after_id=_txn_id(0), batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(conn.cursors[0].executed, (USER_ID, _txn_id(0)))
+        self.assertTrue(conn.cursors[0].closed)
+        self.assertTrue(conn.committed)
+        self.assertEqual(db.released, [conn])
+
+    def test_early_close_closes_cursor_and_releases_connection(self):
+        repo, conn, db = self._repo(5)
+        batches = repo.iter_credit_transactions(USER_ID, batch_size=2)
+        next(batches)
+        self.assertEqual(db.released, [])
+        batches.close()
+        self.assertTrue(conn.cursors[0].closed)
+        self.assertTrue(conn.rolled_back)
+        self.assertEqual(db.released, [conn])
+
+    async def test_closing_the_stream_mid_export_releases_connection(self):
+        repo, conn, db = self._repo(5)
+        repo.get_user_by_id = lambda user_id: None
+        stream = _stream_user_export(repo, USER_ID, None)
+        await stream.__anext__()  # meta
+        first = json.loads(await stream.__anext__())
+        self.assertEqual(first["collection"], "credit_transactions")
+        await stream.aclose()
+        self.assertTrue(conn.cursors[0].closed)
+        self.assertEqual(db.released, [conn])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""MCP 搜索结果缓存：LRU、TTL、倒排索引与 single-flight 的回归测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from ling_engine import mcp_search_cache
+from ling_engine.mcp_search_cache import MCPSearchCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMCPSearchCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        # 只替换本模块看到的 time，事件循环仍用真实时钟
+        patcher = patch.object(mcp_search_cache, "time", SimpleNamespace(monotonic=self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_exact_and_similar_hits_stay_within_scope(self):
+        cache = MCPSearchCache(max_entries=8, ttl=60)
+        cache.put("u1:search", "北京明天的天气怎么样", ["weather"])
+
+        self.assertEqual(cache.get("u1:search", "北京明天的天气怎么样"), ["weather"])
+        self.assertEqual(cache.get("u1:search", "北京明天的天气怎么样呀"), ["weather"])
+        self.assertIsNone(cache.get("u2:search", "北京明天的天气怎么样"))
+        self.assertIsNone(cache.get("u1:search", "播放周杰伦的歌"))
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["similar_hits"]), (1, 1))
+
+    def test_lru_eviction_cleans_the_index(self):
+        cache = MCPSearchCache(max_entries=2, ttl=60)
+        cache.put("s", "python asyncio 教程", 1)
+        cache.put("s", "rust tokio 教程", 2)
+        cache.get("s", "python asyncio 教程")
+        cache.put("s", "go goroutine 教程", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("s", "rust tokio 教程"))
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+        indexed = set().union(*cache._index.values())
+        self.assertEqual(indexed, set(cache._entries))
+
+    def test_expired_entries_are_dropped(self):
+        cache = MCPSearchCache(max_entries=8, ttl=10)
+        cache.put("s", "python asyncio 教程", 1)
+        self.clock.now += 11
+
+        self.assertIsNone(cache.get("s", "python asyncio 教程"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache._index, {})
+
+    def test_expired_best_match_does_not_hide_a_live_similar_entry(self):
+        cache = MCPSearchCache(max_entries=8, ttl=60, similarity_threshold=0.5)
+        cache.put("s", "帮我搜索 python asyncio 教程", "live")
+        cache.put("s", "帮我搜索 python asyncio 教程吧", "stale", ttl=1)
+        self.clock.now += 2
+
+        self.assertEqual(cache.get("s", "帮我搜索 python asyncio 教程吧呀"), "live")
+        self.assertEqual(len(cache), 1)
+
+    async def test_concurrent_loads_are_coalesced(self):
+        cache = MCPSearchCache(max_entries=8, ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return ["result"]
+
+        results = await asyncio.gather(*(cache.get_or_load("s", "天气", loader) for _ in range(5)))
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [["result"]] * 5)
+        self.assertEqual(cache.get_stats()["coalesced"], 4)
+        self.assertEqual(cache.get("s", "天气"), ["result"])
+
+    async def test_failed_load_is_not_cached(self):
+        cache = MCPSearchCache(max_entries=8, ttl=60)
+
+        async def loader():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_load("s", "天气", loader)
+        await asyncio.sleep(0)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()["inflight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""MCP 工具索引：候选召回必须与逐个工具打分的结果一致。"""
+
+from __future__ import annotations
+
+import logging
+import random
+import unittest
+
+from ling_engine.mcp_tool_index import ToolIndex, bump_tools_generation
+from ling_engine.mcp_tool_orchestrator import MCPToolOrchestrator
+
+
+class _Manager:
+    def __init__(self, tools):
+        self.tools = tools
+
+    def get_available_tools(self):
+        return self.tools
+
+
+def _tool(name, description, with_parameters=True):
+    function = {"name": name, "description": description}
+    if with_parameters:
+        function["parameters"] = {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"],
+        }
+    return {"function": function}
+
+
+async def _full_scan(orchestrator, requirement, max_tools):
+    matches = []
+    for tool_info in orchestrator.enhanced_manager.get_available_tools():
+        match = await orchestrator._calculate_tool_match(requirement, tool_info)
+        if match and match.confidence > 0.05:
+            matches.append(match)
+    matches.sort(key=lambda m: m.confidence, reverse=True)
+    return [(m.tool_name, m.confidence) for m in matches[:max_tools]]
+
+
+class TestFindBestTools(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    async def _assert_same_as_full_scan(self, orchestrator, requirement, max_tools=3):
+        got = [(m.tool_name, m.confidence) for m in await orchestrator.find_best_tools(requirement, max_tools)]
+        self.assertEqual(got, await _full_scan(orchestrator, requirement, max_tools), requirement)
+        return got
+
+    async def test_name_substring_matches_are_recalled(self):
+        tools = [
+            _tool("stock.quote", "get price"),
+            _tool("bing", "web lookup engine"),
+            _tool("trans", "convert text"),
+        ]
+        orchestrator = MCPToolOrchestrator(_Manager(tools))
+        for requirement, expected in (
+            ("stockquote AAPL", "stock.quote"),
+            ("bingsearch please", "bing"),
+            ("translate this", "trans"),
+        ):
+            got = await self._assert_same_as_full_scan(orchestrator, requirement)
+            self.assertEqual(got[0][0], expected)
+
+    async def test_many_equally_scored_tools_keep_full_scan_order(self):
+        tools = [_tool(f"search_provider{i}", f"搜索网页 v{i}") for i in range(40)]
+        tools.append(_tool("zz_bing_search", "搜索 bing"))
+        orchestrator = MCPToolOrchestrator(_Manager(tools))
+        got = await self._assert_same_as_full_scan(orchestrator, "帮我 bing")
+        self.assertEqual(got[0][0], "zz_bing_search")
+
+    async def test_random_tool_sets_match_full_scan(self):
+        rng = random.Random(1)
+        words = ["search", "bing", "map", "weather", "quote", "stock", "天气", "地图", "搜索", "帮我", "find", "a", ".", "-", "_"]
+        for _ in range(100):
+            names = set()
+            tools = []
+            for i in range(rng.randint(1, 40)):
+                name = "".join(rng.choice(words) for _ in range(rng.randint(1, 3))) + str(i)
+                names.add(name)
+                description = " ".join(rng.choice(words) for _ in range(rng.randint(0, 5)))
+                tools.append(_tool(name, description, rng.random() < 0.7))
+            orchestrator = MCPToolOrchestrator(_Manager(tools))
+            for _ in range(4):
+                requirement = " ".join(rng.choice(words) for _ in range(rng.randint(0, 4)))
+                await self._assert_same_as_full_scan(orchestrator, requirement, rng.randint(1, 5))
+
+    async def test_hot_reload_resyncs_changed_tools(self):
+        tools = [_tool("weather_now", "天气 forecast")]
+        orchestrator = MCPToolOrchestrator(_Manager(tools))
+        self.assertEqual((await orchestrator.find_best_tools("北京天气"))[0].tool_name, "weather_now")
+
+        tools[0] = _tool("map_route", "地图 导航")
+        bump_tools_generation()
+        self.assertEqual((await orchestrator.find_best_tools("北京天气")), [])
+        self.assertEqual((await orchestrator.find_best_tools("地图导航"))[0].tool_name, "map_route")
+
+
+class TestToolIndex(unittest.TestCase):
+    def test_sync_is_incremental_and_cleans_postings(self):
+        index = ToolIndex({"search": ["搜索"]})
+        self.assertEqual(index.sync([_tool("a_b", "x"), _tool("c", "搜索")]), (2, 0, 0))
+        self.assertEqual(index.sync([_tool("a_b", "x"), _tool("c", "搜索")]), (0, 0, 0))
+        self.assertEqual(index.sync([_tool("a_b", "y")]), (0, 1, 1))
+        self.assertNotIn("c", index)
+        self.assertEqual([d.name for d in index.candidates("搜索 y")], ["a_b"])
+        self.assertNotIn("x", index._desc_postings)
+        self.assertNotIn("search", index._category_postings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""聊天消息写后台批量落库：坏行隔离与待写队列上限的回归测试。"""
+
+from __future__ import annotations
+
+import itertools
+import unittest
+from unittest.mock import MagicMock
+
+from ling_engine.database.pgsql import message_writer
+from ling_engine.database.pgsql.message_writer import MessageWriteBehind
+
+
+class _FakeRedis:
+    namespace = "test"
+
+    def __init__(self):
+        self.hashes = {}
+
+    def _k(self, *parts):
+        return ":".join([self.namespace, *parts])
+
+    def hset_json(self, key, field, value, ex=None):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hgetall_json(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+
+class _Ids:
+    def __init__(self):
+        self._counter = itertools.count(1)
+
+    def generate_id(self):
+        return next(self._counter)
+
+
+class _CheckViolation(Exception):
+    sqlstate = "23514"
+
+
+class _FakeDatabase:
+    """按行记录写入
+
+    content 在 poison 中的行因违反约束失败；在 flaky 中的行因连接错误失败；
+    down 为 True 时全部因连接错误失败。
+    """
+
+    def __init__(self, poison=(), flaky=()):
+        self.poison = set(poison)
+        self.flaky = set(flaky)
+        self.down = False
+        self.rows = []
+        self.calls = 0
+
+    async def write(self, batch):
+        self.calls += 1
+        if self.down or any(e["content"] in self.flaky for e in batch):
+            raise ConnectionError("connection reset")
+        if any(e["content"] in self.poison for e in batch):
+            raise _CheckViolation("insert failed")
+        self.rows.extend(e["content"] for e in batch)
+
+
+class TestMessageWriteBehind(unittest.IsolatedAsyncioTestCase):
+    def _writer(self, db, **kwargs):
+        writer = MessageWriteBehind(_FakeRedis(), _Ids(), flush_interval=60, **kwargs)
+        writer.cache = MagicMock()
+        writer._write_batch = db.write
+        self.addAsyncCleanup(self._stop, writer)
+        return writer
+
+    async def _stop(self, writer):
+        writer._closing = True
+        if writer._task is not None:
+            writer._wakeup.set()
+            await writer._task
+
+    async def _enqueue(self, writer, *contents):
+        for content in contents:
+            await writer.enqueue("s1", "u1", "ling", "user", content)
+
+    async def test_poison_row_is_dead_lettered_and_does_not_block_later_rows(self):
+        db = _FakeDatabase(poison={"bad"})
+        writer = self._writer(db)
+        await self._enqueue(writer, "a", "bad", "b")
+
+        self.assertTrue(await writer.flush())
+
+        self.assertEqual(db.rows, ["a", "b"])
+        self.assertEqual(writer.get_stats()["pending"], 0)
+        self.assertEqual(writer.dead_lettered, 1)
+        self.assertEqual(writer.redis.hgetall_json(writer._wal_key), {})
+        dead = writer.redis.hgetall_json(writer._dead_key)
+        self.assertEqual([e["content"] for e in dead.values()], ["bad"])
+
+    async def test_outage_keeps_rows_for_retry(self):
+        db = _FakeDatabase()
+        db.down = True
+        writer = self._writer(db)
+        await self._enqueue(writer, *[f"m{i}" for i in range(10)])
+
+        self.assertFalse(await writer.flush())
+        # 1 次整批 + 探测上限内的逐条写入，不会逐条写完整批
+        self.assertEqual(db.calls, 1 + message_writer._ROW_PROBE_LIMIT)
+        self.assertEqual(writer.get_stats()["pending"], 10)
+        self.assertEqual(writer.dead_lettered, 0)
+
+        db.down = False
+        self.assertTrue(await writer.flush())
+        self.assertEqual(db.rows, [f"m{i}" for i in range(10)])
+        self.assertEqual(len(writer.redis.hgetall_json(writer._wal_key)), 0)
+
+    async def test_transient_row_failure_is_retried_not_dead_lettered(self):
+        db = _FakeDatabase(flaky={"b"})
+        writer = self._writer(db)
+        await self._enqueue(writer, "a", "b", "c")
+
+        # 逐条写入时 a、c 成功也不能把因连接错误失败的 b 当作坏数据
+        self.assertFalse(await writer.flush())
+        self.assertEqual(db.rows, ["a", "c"])
+        self.assertEqual(writer.dead_lettered, 0)
+        self.assertEqual([r["content"] for r in writer.pending_for("s1")], ["b"])
+        self.assertEqual(len(writer.redis.hgetall_json(writer._wal_key)), 1)
+
+        db.flaky.clear()
+        self.assertTrue(await writer.flush())
+        self.assertEqual(db.rows, ["a", "c", "b"])
+        self.assertEqual(writer.redis.hgetall_json(writer._dead_key), {})
+
+    async def test_row_failing_transiently_is_dead_lettered_after_max_attempts(self):
+        db = _FakeDatabase(flaky={"stuck"})
+        writer = self._writer(db)
+        await self._enqueue(writer, "stuck")
+
+        for _ in range(message_writer._MAX_ROW_ATTEMPTS - 1):
+            self.assertFalse(await writer.flush())
+        self.assertEqual(writer.dead_lettered, 0)
+        self.assertTrue(await writer.flush())
+        self.assertEqual(writer.get_stats()["pending"], 0)
+        self.assertEqual(writer.dead_lettered, 1)
+
+    def test_data_errors_are_classified_by_sqlstate(self):
+        self.assertTrue(message_writer._is_data_error(_CheckViolation()))
+        self.assertTrue(message_writer._is_data_error(ValueError("A string literal cannot contain NUL")))
+        self.assertFalse(message_writer._is_data_error(ConnectionError("reset")))
+        self.assertFalse(message_writer._is_data_error(TimeoutError()))
+
+    async def test_full_queue_falls_back_to_synchronous_write(self):
+        db = _FakeDatabase()
+        db.down = True
+        writer = self._writer(db, max_batch=2, max_pending=2)
+        await self._enqueue(writer, "a", "b")
+
+        original_timeout = message_writer._BACKPRESSURE_TIMEOUT_SECONDS
+        message_writer._BACKPRESSURE_TIMEOUT_SECONDS = 0.05
+        self.addCleanup(setattr, message_writer, "_BACKPRESSURE_TIMEOUT_SECONDS", original_timeout)
+
+        with self.assertRaises(ConnectionError):
+            await self._enqueue(writer, "c")
+        self.assertEqual(writer.get_stats()["pending"], 2)
+
+        # 数据库恢复后，等待中的入队方会唤醒刷库腾出空间，照常入队
+        db.down = False
+        await self._enqueue(writer, "d")
+        self.assertTrue(await writer.flush())
+        self.assertEqual(db.rows, ["a", "b", "d"])
+        self.assertEqual(writer.sync_writes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""有序流水线：并发上限、按序交付与取消清理的回归测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from ling_engine.utils.ordered_pipeline import OrderedPipeline
+
+
+class TestOrderedPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_results_are_delivered_in_submission_order(self):
+        delivered = []
+
+        async def deliver(result):
+            delivered.append(result)
+
+        async def work(name, delay):
+            await asyncio.sleep(delay)
+            return name
+
+        pipeline = OrderedPipeline(deliver, max_concurrency=3)
+        for name, delay in (("a", 0.03), ("b", 0.0), ("c", 0.01)):
+            pipeline.submit(work, name, delay)
+        await pipeline.join()
+        self.assertEqual(delivered, ["a", "b", "c"])
+        self.assertEqual(len(pipeline), 0)
+
+    async def test_concurrency_is_bounded(self):
+        running = peak = 0
+
+        async def work(i):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return i
+
+        async def deliver(result):
+            pass
+
+        pipeline = OrderedPipeline(deliver, max_concurrency=2)
+        for i in range(6):
+            pipeline.submit(work, i)
+        await pipeline.join()
+        self.assertEqual(peak, 2)
+
+    async def test_task_error_cancels_the_rest_and_discards_finished_results(self):
+        delivered, discarded = [], []
+
+        async def deliver(result):
+            delivered.append(result)
+
+        async def work(name, delay, fail=False):
+            await asyncio.sleep(delay)
+            if fail:
+                raise ValueError(name)
+            return name
+
+        pipeline = OrderedPipeline(deliver, max_concurrency=4, discard=discarded.append)
+        pipeline.submit(work, "a", 0.0)
+        pipeline.submit(work, "b", 0.02, fail=True)
+        pipeline.submit(work, "c", 0.0)
+        slow = pipeline.submit(work, "d", 1.0)
+
+        with self.assertRaises(ValueError):
+            await pipeline.join()
+        self.assertEqual(delivered, ["a"])
+        self.assertEqual(discarded, ["c"])
+        await asyncio.sleep(0)
+        self.assertTrue(slow.cancelled())
+
+    async def test_delivery_error_discards_the_failed_result(self):
+        discarded = []
+
+        async def deliver(result):
+            raise ConnectionError("client gone")
+
+        async def work(name):
+            return name
+
+        pipeline = OrderedPipeline(deliver, discard=discarded.append)
+        pipeline.submit(work, "a")
+        with self.assertRaises(ConnectionError):
+            await pipeline.join()
+        self.assertEqual(discarded, ["a"])
+
+    async def test_cancel_closes_the_pipeline(self):
+        delivered, discarded = [], []
+        gate = asyncio.Event()
+
+        async def deliver(result):
+            await gate.wait()
+            delivered.append(result)
+
+        async def work(name):
+            return name
+
+        pipeline = OrderedPipeline(deliver, discard=discarded.append)
+        pipeline.submit(work, "a")
+        pipeline.submit(work, "b")
+        await asyncio.sleep(0.01)
+        pipeline.cancel()
+        await pipeline.join()
+
+        self.assertTrue(pipeline.closed)
+        self.assertEqual(delivered, [])
+        self.assertEqual(discarded, ["b"])
+        with self.assertRaises(RuntimeError):
+            pipeline.submit(work, "c")
+
+    async def test_externally_cancelled_task_is_skipped(self):
+        delivered = []
+
+        async def deliver(result):
+            delivered.append(result)
+
+        async def work(name, delay):
+            await asyncio.sleep(delay)
+            return name
+
+        pipeline = OrderedPipeline(deliver)
+        pipeline.submit(work, "a", 0.0)
+        pipeline.submit(work, "b", 1.0).cancel()
+        pipeline.submit(work, "c", 0.0)
+        await pipeline.join()
+        self.assertEqual(delivered, ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
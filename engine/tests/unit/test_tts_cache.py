@@ -0,0 +1,168 @@
+"""TTS 结果缓存：缓存键与两级存储的回归测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import unittest
+
+from pydantic import BaseModel
+
+from ling_engine.tts.tts_cache import TTSAudioCache, engine_cache_params, make_cache_key
+from ling_engine.tts.tts_interface import SynthesizedAudio
+
+
+class _VoiceSettings(BaseModel):
+    stability: float = 0.5
+    similarity_boost: float = 0.75
+
+
+class _PlainEngine:
+    def __init__(self, voice="alloy", settings=None):
+        self.voice = voice
+        self.voice_settings = settings or _VoiceSettings()
+        self.api_key = "secret"
+        self.client = object()
+
+
+class _ExplicitEngine(_PlainEngine):
+    def __init__(self, config: dict):
+        super().__init__()
+        self.config = config
+
+    def cache_params(self):
+        return {"voice": self.config["voice"], "rate": self.config["rate"]}
+
+
+def _audio(payload: bytes) -> SynthesizedAudio:
+    return SynthesizedAudio(data=payload, format="mp3", sample_rate=24000)
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_pydantic_values_are_serialized_into_the_key(self):
+        calm = _PlainEngine(settings=_VoiceSettings(stability=0.9))
+        lively = _PlainEngine(settings=_VoiceSettings(stability=0.1))
+        self.assertEqual(engine_cache_params(calm)["voice_settings"]["stability"], 0.9)
+        self.assertNotEqual(make_cache_key(calm, "你好"), make_cache_key(lively, "你好"))
+
+    def test_credentials_and_clients_are_excluded(self):
+        params = engine_cache_params(_PlainEngine())
+        self.assertNotIn("api_key", params)
+        self.assertNotIn("client", params)
+
+    def test_explicit_cache_params_are_preferred(self):
+        a = _ExplicitEngine({"voice": "zh-CN-XiaoxiaoNeural", "rate": "+0%"})
+        b = _ExplicitEngine({"voice": "zh-CN-YunxiNeural", "rate": "+0%"})
+        self.assertEqual(engine_cache_params(a), {"voice": "zh-CN-XiaoxiaoNeural", "rate": "+0%"})
+        self.assertNotEqual(make_cache_key(a, "你好"), make_cache_key(b, "你好"))
+
+    def test_engine_class_is_part_of_the_key(self):
+        explicit = _ExplicitEngine({"voice": "alloy", "rate": None})
+        self.assertNotEqual(make_cache_key(_PlainEngine(), "hi"), make_cache_key(explicit, "hi"))
+
+    def test_whitespace_only_differences_share_a_key(self):
+        engine = _PlainEngine()
+        self.assertEqual(make_cache_key(engine, "你好  世界 "), make_cache_key(engine, "你好 世界"))
+
+
+class TestTTSAudioCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_memory_lru_evicts_least_recently_used(self):
+        cache = TTSAudioCache(max_memory_bytes=10, cache_dir=None)
+        cache.put("a", _audio(b"aaaa"))
+        cache.put("b", _audio(b"bbbb"))
+        cache.get("a")
+        cache.put("c", _audio(b"cccc"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_disk_tier_survives_restart(self):
+        cache = TTSAudioCache(cache_dir=self._tmp.name)
+        cache.put("k" * 64, _audio(b"\x00\x01audio"))
+
+        reloaded = TTSAudioCache(cache_dir=self._tmp.name)
+        audio = reloaded.get("k" * 64)
+        self.assertEqual(audio.data, b"\x00\x01audio")
+        self.assertEqual((audio.format, audio.sample_rate), ("mp3", 24000))
+        self.assertEqual(reloaded.disk_hits, 1)
+
+    async def test_concurrent_misses_synthesize_once(self):
+        cache = TTSAudioCache(cache_dir=None)
+        engine = _PlainEngine()
+        calls = 0
+
+        async def synthesize():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return _audio(b"voice")
+
+        results = await asyncio.gather(
+            *(cache.get_or_synthesize(engine, "早上好", synthesize) for _ in range(5))
+        )
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(r.data == b"voice" for r in results))
+        self.assertEqual(cache.coalesced, 4)
+
+    async def test_failed_synthesis_is_not_cached(self):
+        cache = TTSAudioCache(cache_dir=None)
+
+        async def fail():
+            return None
+
+        self.assertIsNone(await cache.get_or_synthesize(_PlainEngine(), "x", fail))
+        self.assertEqual(cache.get_stats()["memory_entries"], 0)
+
+    async def test_audio_is_cached_only_after_prepare_succeeds(self):
+        cache = TTSAudioCache(cache_dir=self._tmp.name)
+        engine = _PlainEngine()
+
+        async def truncated():
+            return _audio(b"cut")
+
+        def reject(audio):
+            raise ValueError("truncated audio")
+
+        with self.assertRaises(ValueError):
+            await cache.get_or_synthesize(engine, "你好", truncated, reject)
+        self.assertIsNone(cache.get(make_cache_key(engine, "你好")))
+        self.assertEqual(cache.get_stats()["disk_entries"], 0)
+
+        payload = await cache.get_or_synthesize(
+            engine, "你好", lambda: asyncio.sleep(0, _audio(b"voice")), lambda a: {"size": len(a.data)}
+        )
+        self.assertEqual(payload, {"size": 5})
+        self.assertEqual(cache.get(make_cache_key(engine, "你好")).data, b"voice")
+
+    async def test_raising_synthesis_is_not_cached(self):
+        cache = TTSAudioCache(cache_dir=None)
+
+        async def broken_stream():
+            raise ConnectionError("stream dropped")
+
+        with self.assertRaises(ConnectionError):
+            await cache.get_or_synthesize(_PlainEngine(), "x", broken_stream)
+        self.assertEqual(cache.get_stats()["memory_entries"], 0)
+
+    async def test_undecodable_hit_is_discarded(self):
+        cache = TTSAudioCache(cache_dir=self._tmp.name)
+        engine = _PlainEngine()
+        key = make_cache_key(engine, "早上好")
+        cache.put(key, _audio(b"corrupt"))
+
+        def reject(audio):
+            raise ValueError("bad audio")
+
+        with self.assertRaises(ValueError):
+            await cache.get_or_synthesize(engine, "早上好", lambda: asyncio.sleep(0, None), reject)
+        stats = cache.get_stats()
+        self.assertEqual((stats["memory_entries"], stats["disk_entries"]), (0, 0))
+        self.assertIsNone(TTSAudioCache(cache_dir=self._tmp.name).get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""流式 TTS 引擎中途失败时不能把截断的音频当作成功结果。"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import tempfile
+import unittest
+
+
+@unittest.skipUnless(importlib.util.find_spec("requests"), "requests is not installed")
+class TestStreamFailure(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # 引擎初始化时会在当前目录创建 cache/
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        self.addCleanup(os.chdir, self._cwd)
+
+    def _engine(self, chunks):
+        from ling_engine.tts.minimax_tts import TTSEngine
+
+        engine = TTSEngine(api_key="test", group_id="test")
+
+        def call_tts_stream(text):
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        engine.call_tts_stream = call_tts_stream
+        return engine
+
+    async def test_failure_after_audio_raises(self):
+        engine = self._engine([b"first half", ConnectionError("stream dropped")])
+        with self.assertRaises(ConnectionError):
+            await engine.async_synthesize("你好")
+
+    async def test_failure_before_audio_returns_none(self):
+        engine = self._engine([ConnectionError("refused")])
+        self.assertIsNone(await engine.async_synthesize("你好"))
+
+    async def test_complete_stream_is_joined(self):
+        engine = self._engine([b"ab", b"cd"])
+        audio = await engine.async_synthesize("你好")
+        self.assertEqual(audio.data, b"abcd")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""用量计量：滚动聚合、分位数草图与批量落库的回归测试。"""
+
+from __future__ import annotations
+
+import random
+import unittest
+from unittest.mock import patch
+
+from ling_engine.utils import usage_meter
+from ling_engine.utils.usage_meter import OVERFLOW_KEY, QuantileSketch, UsageMeter
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles_stay_within_relative_accuracy(self):
+        rng = random.Random(3)
+        values = sorted(rng.lognormvariate(6, 1.2) for _ in range(5000))
+        sketch = QuantileSketch(relative_accuracy=0.02)
+        for v in values:
+            sketch.add(v)
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q) / exact, 1.0, delta=0.03)
+
+    def test_zeros_and_merge(self):
+        a, b = QuantileSketch(), QuantileSketch()
+        for _ in range(3):
+            a.add(0)
+        b.add(100)
+        a.merge(b)
+        self.assertEqual(a.count, 4)
+        self.assertEqual(a.quantile(0.5), 0.0)
+        self.assertAlmostEqual(a.quantile(1.0), 100, delta=2)
+
+    def test_bins_are_bounded(self):
+        sketch = QuantileSketch(max_bins=16)
+        for i in range(1, 2000):
+            sketch.add(float(i))
+        self.assertLessEqual(len(sketch._bins), 16)
+        self.assertAlmostEqual(sketch.quantile(0.99) / 1980, 1.0, delta=0.03)
+
+
+class TestUsageMeter(unittest.IsolatedAsyncioTestCase):
+    def test_window_keeps_only_recent_buckets(self):
+        meter = UsageMeter(bucket_seconds=60, window_buckets=2, flush_enabled=False)
+        for minute in range(5):
+            meter.record("gpt", 10, 5, 15, cost=0.01, now=minute * 60)
+        self.assertEqual(meter.get_stats()["buckets"], 2)
+        self.assertEqual(meter.snapshot()["gpt|llm"]["calls"], 2)
+
+    def test_same_key_is_aggregated(self):
+        meter = UsageMeter()
+        meter.record("gpt", 10, 5, 15, cost=0.5, user_id="u1", now=30)
+        meter.record("gpt", 20, 5, 25, cost=0.5, user_id="u1", now=59)
+        self.assertEqual(meter._pending, {(0, "gpt", "llm", "u1"): [2, 30, 10, 40, 1.0]})
+        summary = meter.snapshot()["gpt|llm"]
+        self.assertEqual((summary["calls"], summary["total_tokens"]), (2, 40))
+
+    def test_pending_keys_overflow_into_a_shared_row(self):
+        meter = UsageMeter(max_pending_keys=2)
+        for user_id in ("u1", "u2", "u3", "u4"):
+            meter.record("gpt", 1, 1, 2, user_id=user_id, now=0)
+        self.assertEqual(len(meter._pending), 3)
+        self.assertEqual(meter._pending[(0, "gpt", "llm", OVERFLOW_KEY)][0], 2)
+        self.assertEqual(meter.overflowed, 2)
+
+    async def test_failed_flush_only_requeues_unwritten_batches(self):
+        meter = UsageMeter()
+        for user_id in ("u1", "u2", "u3"):
+            meter.record("gpt", 1, 1, 2, user_id=user_id, now=0)
+        written = []
+
+        async def write_rows(rows):
+            if written:
+                raise RuntimeError("db down")
+            written.extend(rows)
+
+        meter._write_rows = write_rows
+        meter._write_redis = lambda pending: None
+        with patch.object(usage_meter, "_FLUSH_BATCH", 1):
+            self.assertFalse(await meter.flush())
+            self.assertEqual([row[3] for row in written], ["u1"])
+            self.assertEqual({k[3] for k in meter._pending}, {"u2", "u3"})
+
+            written.clear()
+
+            async def ok(rows):
+                written.extend(rows)
+
+            meter._write_rows = ok
+            self.assertTrue(await meter.flush())
+        self.assertEqual(sorted(row[3] for row in written), ["u2", "u3"])
+        self.assertEqual(meter._pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
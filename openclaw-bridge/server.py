@@ -3,21 +3,27 @@
 OpenClaw Bridge Server
 让数字人后端调用 OpenClaw Agent（初音未来）
 
-提供 OpenAI 兼容的 /v1/chat/completions API
+提供 OpenAI 兼容的 /v1/chat/completions API (支持 stream=true 的 SSE 输出)
+
+设置 OPENCLAW_WORKER_CMD 后使用常驻 worker 进程池 (见 worker_pool.py)，
+否则每个请求启动一次 OpenClaw CLI。
 """
 
 import os
 import json
 import subprocess
 import asyncio
-from typing import Optional, List, Dict, Any
+from typing import AsyncIterator, Optional, List, Dict, Any
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 import time
 import uuid
 
+from worker_pool import PoolBusy, WorkerError, WorkerPool, extract_reply
+
 app = FastAPI(title="OpenClaw Bridge", version="1.0.0")
 
 # CORS
@@ -38,6 +44,13 @@ OPENCLAW_CLI = os.environ.get(
 # 默认 session id（用于保持对话上下文）
 DEFAULT_SESSION_ID = "vtuber-avatar"
 
+# 常驻 worker 命令 (逐行 JSON 协议，见 worker_pool.py)；为空时每个请求启动一次 CLI
+OPENCLAW_WORKER_CMD = os.environ.get("OPENCLAW_WORKER_CMD", "")
+OPENCLAW_POOL_SIZE = int(os.environ.get("OPENCLAW_POOL_SIZE", "4"))
+OPENCLAW_QUEUE_LIMIT = int(os.environ.get("OPENCLAW_QUEUE_LIMIT", "16"))
+
+worker_pool: Optional[WorkerPool] = None
+
 
 class Message(BaseModel):
     role: str
@@ -50,6 +63,8 @@ class ChatCompletionRequest(BaseModel):
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 2048
     stream: Optional[bool] = False
+    # 扩展字段: 指定 OpenClaw 会话，不传时使用默认会话
+    session_id: Optional[str] = None
 
 
 class ChatCompletionResponse(BaseModel):
@@ -94,26 +109,7 @@ async def call_openclaw(message: str, session_id: str = DEFAULT_SESSION_ID) -> s
         # 解析 JSON 输出
         output = stdout.decode('utf-8', errors='ignore')
         try:
-            result = json.loads(output)
-            # OpenClaw 返回格式: result.payloads[0].text
-            if isinstance(result, dict):
-                if result.get('status') == 'ok' and 'result' in result:
-                    payloads = result.get('result', {}).get('payloads', [])
-                    if payloads and len(payloads) > 0:
-                        reply = payloads[0].get('text', '')
-                        if reply:
-                            return reply
-                # 备用解析
-                reply = (
-                    result.get('reply') or 
-                    result.get('response') or 
-                    result.get('content') or
-                    result.get('message') or
-                    str(result)
-                )
-            else:
-                reply = str(result)
-            return reply
+            return extract_reply(json.loads(output))
         except json.JSONDecodeError:
             # 如果不是 JSON，直接返回输出
             return output.strip()
@@ -125,9 +121,86 @@ async def call_openclaw(message: str, session_id: str = DEFAULT_SESSION_ID) -> s
         return f"抱歉，出了点问题: {str(e)[:100]}"
 
 
+async def stream_openclaw(message: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[str]:
+    """逐段产出回复: 有 worker 池时转发 worker 的分片，否则整段回复作为一个分片
+
+    还没有输出分片时出错，以一句道歉作为回复；已输出部分回复后出错则抛出
+    WorkerError / asyncio.TimeoutError，由调用方按错误结束，避免把道歉拼在半截回复后面。
+    """
+    global worker_pool
+    if not OPENCLAW_WORKER_CMD:
+        yield await call_openclaw(message, session_id)
+        return
+    if worker_pool is None:
+        worker_pool = WorkerPool(OPENCLAW_WORKER_CMD, OPENCLAW_POOL_SIZE, OPENCLAW_QUEUE_LIMIT)
+    streamed = False
+    try:
+        async for delta in worker_pool.stream(session_id, message):
+            streamed = True
+            yield delta
+    except PoolBusy:
+        yield "抱歉，现在找我的人太多了，请稍后再试~"
+    except asyncio.TimeoutError:
+        print(f"[OpenClaw Bridge] worker 读取超时 (已输出部分回复: {streamed})")
+        if streamed:
+            raise
+        yield "抱歉，思考太久了，请再试一次~"
+    except WorkerError as e:
+        print(f"[OpenClaw Bridge] worker 错误: {e}")
+        if streamed:
+            raise
+        yield f"抱歉，我遇到了一些问题: {str(e)[:200]}"
+
+
+def _sse_chunk(completion_id: str, created: int, delta: Dict[str, Any],
+               finish_reason: Optional[str] = None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": "openclaw",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+def _sse_error(message: str) -> str:
+    # 与 OpenAI 流式接口的错误事件格式一致，客户端 SDK 收到后抛出异常而不是当作正常结束
+    error = {"error": {"message": message, "type": "openclaw_worker_error"}}
+    return f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+
+
+async def _sse_stream(message: str, session_id: str) -> AsyncIterator[str]:
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
+    created = int(time.time())
+    yield _sse_chunk(completion_id, created, {"role": "assistant"})
+    try:
+        async for delta in stream_openclaw(message, session_id):
+            yield _sse_chunk(completion_id, created, {"content": delta})
+    except asyncio.TimeoutError:
+        yield _sse_error("OpenClaw worker timed out mid-reply")
+        yield "data: [DONE]\n\n"
+        return
+    except WorkerError as e:
+        yield _sse_error(f"OpenClaw worker failed mid-reply: {str(e)[:200]}")
+        yield "data: [DONE]\n\n"
+        return
+    yield _sse_chunk(completion_id, created, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if worker_pool is not None:
+        await worker_pool.close()
+
+
 @app.get("/health")
 async def health():
-    return {"status": "UP", "service": "OpenClaw Bridge"}
+    status = {"status": "UP", "service": "OpenClaw Bridge"}
+    if worker_pool is not None:
+        status["worker_pool"] = worker_pool.get_stats()
+    return status
 
 
 @app.get("/v1/models")
@@ -159,9 +232,22 @@ async def chat_completions(request: ChatCompletionRequest):
         raise HTTPException(status_code=400, detail="No user message found")
     
     last_message = user_messages[-1].content
+    session_id = request.session_id or DEFAULT_SESSION_ID
+    
+    if request.stream:
+        return StreamingResponse(
+            _sse_stream(last_message, session_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
     
     # 调用 OpenClaw
-    reply = await call_openclaw(last_message)
+    try:
+        reply = "".join([delta async for delta in stream_openclaw(last_message, session_id)])
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="OpenClaw worker timed out mid-reply")
+    except WorkerError as e:
+        raise HTTPException(status_code=502, detail=f"OpenClaw worker failed mid-reply: {str(e)[:200]}")
     
     # 构造 OpenAI 兼容的响应
     return ChatCompletionResponse(
@@ -190,5 +276,7 @@ if __name__ == "__main__":
     print("🌸 OpenClaw Bridge 启动中...")
     print(f"   OpenClaw CLI: {OPENCLAW_CLI}")
     print(f"   Session ID: {DEFAULT_SESSION_ID}")
+    if OPENCLAW_WORKER_CMD:
+        print(f"   Worker 池: {OPENCLAW_WORKER_CMD} (最多 {OPENCLAW_POOL_SIZE} 个, 排队上限 {OPENCLAW_QUEUE_LIMIT})")
     print("   API: http://localhost:12394/v1/chat/completions")
     uvicorn.run(app, host="0.0.0.0", port=12394)
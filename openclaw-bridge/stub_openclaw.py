@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+模拟 OpenClaw worker 协议的桩程序 (本地测试桥接用)
+
+    OPENCLAW_WORKER_CMD="python stub_openclaw.py --delay 0.05" python server.py
+
+每条请求把消息按字回显为若干分片，最后发送结束帧；
+消息为 "crash" 时直接退出，"crash-mid" 时发出一半分片后退出，
+"error" 时返回 error 帧，便于测试异常路径。
+"""
+
+import argparse
+import json
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenClaw worker protocol stub")
+    parser.add_argument("--delay", type=float, default=0.02, help="每个分片之间的间隔秒数")
+    parser.add_argument("--startup", type=float, default=0.0, help="模拟启动耗时秒数")
+    parser.add_argument("--no-stream", action="store_true", help="不发分片，只在结束帧里返回完整结果")
+    args = parser.parse_args()
+
+    time.sleep(args.startup)
+    print("stub openclaw worker ready", flush=True)  # 非协议输出，桥接应忽略
+    turns = 0
+    for line in sys.stdin:
+        request = json.loads(line)
+        request_id = request["id"]
+        message = request["message"]
+        turns += 1
+        if message == "crash":
+            sys.exit(1)
+        if message == "error":
+            print(json.dumps({"id": request_id, "error": "stub error"}), flush=True)
+            continue
+        reply = f"[{request['session_id']}#{turns}] {message}"
+        if args.no_stream:
+            result = {"status": "ok", "result": {"payloads": [{"text": reply}]}}
+            print(json.dumps({"id": request_id, "done": True, "result": result}, ensure_ascii=False), flush=True)
+            continue
+        for i, ch in enumerate(reply):
+            if message == "crash-mid" and i == len(reply) // 2:
+                sys.exit(1)
+            print(json.dumps({"id": request_id, "delta": ch}, ensure_ascii=False), flush=True)
+            time.sleep(args.delay)
+        print(json.dumps({"id": request_id, "done": True}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+BRIDGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# server.py 用顶层 import 引用 worker_pool，测试时把桥接目录放进 sys.path
+if BRIDGE_DIR not in sys.path:
+    sys.path.insert(0, BRIDGE_DIR)
+
+
+@pytest.fixture
+def stub_cmd():
+    """启动 stub_openclaw.py 的命令行，额外参数原样追加"""
+    def make(*args: str) -> str:
+        stub = os.path.join(BRIDGE_DIR, "stub_openclaw.py")
+        return " ".join(shlex.quote(part) for part in (sys.executable, stub, *args))
+    return make
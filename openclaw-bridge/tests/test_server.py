@@ -0,0 +1,99 @@
+"""/v1/chat/completions 的 SSE 帧格式与 worker 出错时的结束方式测试"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+import server  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+
+def _with_pool(monkeypatch, worker_cmd: str, make_coro, **pool_kwargs):
+    """用 stub worker 池执行 make_coro()，池在同一事件循环里创建和关闭"""
+    monkeypatch.setattr(server, "OPENCLAW_WORKER_CMD", worker_cmd)
+
+    async def run():
+        pool = WorkerPool(worker_cmd, **pool_kwargs)
+        monkeypatch.setattr(server, "worker_pool", pool)
+        try:
+            return await make_coro()
+        finally:
+            await pool.close()
+    return asyncio.run(run())
+
+
+def _events(monkeypatch, worker_cmd: str, message: str, session_id: str, **pool_kwargs):
+    async def collect():
+        return [chunk async for chunk in server._sse_stream(message, session_id)]
+    return _with_pool(monkeypatch, worker_cmd, collect, **pool_kwargs)
+
+
+def _payloads(events):
+    for event in events:
+        assert event.startswith("data: ") and event.endswith("\n\n")
+    assert events[-1] == "data: [DONE]\n\n"
+    return [json.loads(event[len("data: "):]) for event in events[:-1]]
+
+
+def test_sse_stream_frames_worker_deltas(stub_cmd, monkeypatch):
+    payloads = _payloads(_events(monkeypatch, stub_cmd("--delay", "0"), "你好", "s1"))
+
+    assert len({p["id"] for p in payloads}) == 1
+    assert payloads[0]["id"].startswith("chatcmpl-")
+    assert all(p["object"] == "chat.completion.chunk" for p in payloads)
+    assert all(p["model"] == "openclaw" for p in payloads)
+
+    first, *content, last = [p["choices"][0] for p in payloads]
+    assert first == {"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}
+    assert last == {"index": 0, "delta": {}, "finish_reason": "stop"}
+    assert all(c["finish_reason"] is None for c in content)
+    assert "".join(c["delta"]["content"] for c in content) == "[s1#1] 你好"
+    # 每个分片单独成帧，不等整段回复
+    assert len(content) == len("[s1#1] 你好")
+
+
+def test_sse_stream_reports_crash_before_output_as_reply(stub_cmd, monkeypatch):
+    payloads = _payloads(_events(monkeypatch, stub_cmd("--delay", "0"), "crash", "s1"))
+
+    choices = [p["choices"][0] for p in payloads]
+    assert choices[-1]["finish_reason"] == "stop"
+    assert len(choices) == 3
+    assert choices[1]["delta"]["content"].startswith("抱歉")
+
+
+def _assert_ends_with_error(events):
+    payloads = _payloads(events)
+    assert "error" in payloads[-1]
+    choices = [p["choices"][0] for p in payloads[:-1]]
+    assert all(c["finish_reason"] is None for c in choices)
+    content = "".join(c["delta"].get("content", "") for c in choices)
+    assert "抱歉" not in content
+    return content, payloads[-1]["error"]
+
+
+def test_sse_stream_crash_after_partial_output_ends_with_error(stub_cmd, monkeypatch):
+    events = _events(monkeypatch, stub_cmd("--delay", "0"), "crash-mid", "s1")
+
+    content, error = _assert_ends_with_error(events)
+    # 只转发了崩溃前的那一半分片，没有 stop 结束块
+    assert "[s1#1] crash-mid".startswith(content) and content
+    assert error["type"] == "openclaw_worker_error"
+
+
+def test_sse_stream_timeout_after_partial_output_ends_with_error(stub_cmd, monkeypatch):
+    events = _events(monkeypatch, stub_cmd("--delay", "1"), "slow", "s1", read_timeout=0.3)
+
+    content, error = _assert_ends_with_error(events)
+    assert content == "["
+    assert "timed out" in error["message"]
+
+
+def test_non_stream_crash_after_partial_output_is_an_http_error(stub_cmd, monkeypatch):
+    request = server.ChatCompletionRequest(messages=[{"role": "user", "content": "crash-mid"}])
+
+    with pytest.raises(server.HTTPException) as excinfo:
+        _with_pool(monkeypatch, stub_cmd("--delay", "0"), lambda: server.chat_completions(request))
+    assert excinfo.value.status_code == 502
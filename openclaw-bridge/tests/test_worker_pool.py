@@ -0,0 +1,138 @@
+"""WorkerPool 异常路径测试，worker 由 stub_openclaw.py 充当"""
+
+import asyncio
+
+import pytest
+
+from worker_pool import PoolBusy, WorkerError, WorkerPool, WorkerReplyError
+
+
+async def _collect(pool: WorkerPool, session_id: str, message: str) -> str:
+    return "".join([delta async for delta in pool.stream(session_id, message)])
+
+
+def test_stream_reuses_session_worker(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--delay", "0"))
+        try:
+            first = await _collect(pool, "s1", "hi")
+            second = await _collect(pool, "s1", "again")
+            return first, second, pool.get_stats()
+        finally:
+            await pool.close()
+
+    first, second, stats = asyncio.run(run())
+    assert first == "[s1#1] hi"
+    assert second == "[s1#2] again"
+    assert stats["spawned"] == 1
+    assert stats["reused"] == 1
+
+
+def test_no_stream_worker_yields_result_text(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--no-stream"))
+        try:
+            return await _collect(pool, "s1", "hi")
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == "[s1#1] hi"
+
+
+def test_crash_drops_worker_and_respawns(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--delay", "0"))
+        try:
+            with pytest.raises(WorkerError) as excinfo:
+                await _collect(pool, "s1", "crash")
+            assert not isinstance(excinfo.value, WorkerReplyError)
+            after_crash = pool.get_stats()
+            reply = await _collect(pool, "s1", "hi")
+            return after_crash, reply, pool.get_stats()
+        finally:
+            await pool.close()
+
+    after_crash, reply, stats = asyncio.run(run())
+    assert after_crash["crashed"] == 1
+    assert after_crash["workers"] == 0
+    assert after_crash["busy"] == 0
+    # 新进程的对话轮次从 1 重新开始
+    assert reply == "[s1#1] hi"
+    assert stats["spawned"] == 2
+
+
+def test_error_frame_keeps_worker(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--delay", "0"))
+        try:
+            with pytest.raises(WorkerReplyError, match="stub error"):
+                await _collect(pool, "s1", "error")
+            reply = await _collect(pool, "s1", "hi")
+            return reply, pool.get_stats()
+        finally:
+            await pool.close()
+
+    reply, stats = asyncio.run(run())
+    # 同一进程继续服务，轮次接着 error 那一轮往后数
+    assert reply == "[s1#2] hi"
+    assert stats["crashed"] == 0
+    assert stats["spawned"] == 1
+    assert stats["reused"] == 1
+
+
+def test_pool_busy_when_queue_full(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--delay", "0.05"), max_workers=1, max_queue=0)
+        try:
+            started = asyncio.Event()
+
+            async def slow():
+                async for _ in pool.stream("s1", "slow reply"):
+                    started.set()
+
+            task = asyncio.create_task(slow())
+            await asyncio.wait_for(started.wait(), timeout=10)
+            with pytest.raises(PoolBusy):
+                await _collect(pool, "s2", "hi")
+            await task
+            return pool.get_stats()
+        finally:
+            await pool.close()
+
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 1
+    assert stats["busy"] == 0
+
+
+def test_client_disconnect_kills_and_releases_worker(stub_cmd):
+    async def run():
+        pool = WorkerPool(stub_cmd("--delay", "0.05"), max_workers=1, max_queue=0)
+        try:
+            started = asyncio.Event()
+            workers = []
+
+            async def consume():
+                async with pool.acquire("s1") as worker:
+                    workers.append(worker)
+                    async for _ in worker.ask("a long reply that gets cut off"):
+                        started.set()
+
+            task = asyncio.create_task(consume())
+            await asyncio.wait_for(started.wait(), timeout=10)
+            process = workers[0].process
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            released = pool.get_stats()
+            # 回复没读完的进程必须结束，否则下一个请求会读到上一轮的残留分片
+            reply = await _collect(pool, "s1", "hi")
+            return process.returncode, released, reply, pool.get_stats()
+        finally:
+            await pool.close()
+
+    returncode, released, reply, stats = asyncio.run(run())
+    assert returncode is not None
+    assert released["busy"] == 0
+    assert released["workers"] == 0
+    assert reply == "[s1#1] hi"
+    assert stats["spawned"] == 2
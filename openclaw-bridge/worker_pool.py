@@ -0,0 +1,282 @@
+"""
+OpenClaw 常驻 worker 进程池
+
+每次请求都启动一次 OpenClaw CLI 时，进程启动 + 加载 Agent 的开销占了桥接延迟的大头，
+而且要等整段回复结束才能返回。这里按 session id 维护常驻 worker 进程，
+通过 stdin/stdout 上逐行 JSON (NDJSON) 通信，回复分片到达即可转发:
+
+    请求 (stdin):  {"id": "<req>", "session_id": "...", "message": "..."}
+    分片 (stdout): {"id": "<req>", "delta": "部分文本"}
+    结束 (stdout): {"id": "<req>", "done": true, "result": {...}}   # result 可选，格式同 --json 输出
+    失败 (stdout): {"id": "<req>", "error": "..."}
+
+- 同一 session 的请求串行 (保持对话上下文)，不同 session 并行
+- worker 总数有上限，满了时回收最久未用的空闲 worker；都在忙则排队，排队数也有上限
+- worker 异常退出或请求中途被放弃 (客户端断开) 时结束该进程，下次请求重新启动
+
+stub_openclaw.py 实现了同样的协议，可用于本地测试。
+"""
+
+import asyncio
+import json
+import shlex
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class WorkerError(Exception):
+    """worker 进程异常 (启动失败、提前退出、协议错误、返回 error)"""
+
+
+class WorkerReplyError(WorkerError):
+    """worker 正常返回了 error 帧 (进程本身仍可复用)"""
+
+
+class PoolBusy(Exception):
+    """排队请求数已达上限"""
+
+
+def extract_reply(result: Any) -> str:
+    """从 OpenClaw --json 输出中取回复文本"""
+    # OpenClaw 返回格式: result.payloads[0].text
+    if isinstance(result, dict):
+        if result.get('status') == 'ok' and 'result' in result:
+            payloads = result.get('result', {}).get('payloads', [])
+            if payloads and len(payloads) > 0:
+                reply = payloads[0].get('text', '')
+                if reply:
+                    return reply
+        # 备用解析
+        return (
+            result.get('reply') or
+            result.get('response') or
+            result.get('content') or
+            result.get('message') or
+            str(result)
+        )
+    return str(result)
+
+
+class OpenClawWorker:
+    """单个常驻 OpenClaw 进程，一次处理一个请求"""
+
+    def __init__(self, cmd: List[str], session_id: str, read_timeout: float = 130):
+        self.cmd = cmd
+        self.session_id = session_id
+        self.read_timeout = read_timeout
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.busy = False
+        self.last_used = time.monotonic()
+        self.requests_served = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=1024 * 1024,
+            )
+        except OSError as e:
+            raise WorkerError(f"无法启动 OpenClaw worker: {e}") from e
+
+    async def _readline(self) -> bytes:
+        # 不用 wait_for: Python < 3.12 下读取恰好完成时它会吞掉外部取消，
+        # 客户端断开后请求会继续读完，worker 也不会被结束
+        read = asyncio.ensure_future(self.process.stdout.readline())
+        try:
+            done, _ = await asyncio.wait({read}, timeout=self.read_timeout)
+        except BaseException:
+            read.cancel()
+            raise
+        if not done:
+            read.cancel()
+            raise asyncio.TimeoutError
+        try:
+            return read.result()
+        except ValueError as e:  # 单行超过 limit
+            raise WorkerError(f"worker 输出过长: {e}") from e
+
+    async def ask(self, message: str) -> AsyncIterator[str]:
+        """发送一条消息，逐个产出回复分片"""
+        if not self.alive:
+            raise WorkerError("worker 已退出")
+        request_id = uuid.uuid4().hex
+        line = json.dumps(
+            {"id": request_id, "session_id": self.session_id, "message": message},
+            ensure_ascii=False,
+        )
+        try:
+            self.process.stdin.write(line.encode("utf-8") + b"\n")
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise WorkerError(f"worker 已退出: {e}") from e
+
+        streamed = False
+        while True:
+            raw = await self._readline()
+            if not raw:
+                code = await self.process.wait()
+                raise WorkerError(f"worker 提前退出 (code={code})")
+            try:
+                frame = json.loads(raw)
+            except json.JSONDecodeError:
+                continue  # CLI 的日志行等非协议输出
+            if not isinstance(frame, dict) or frame.get("id") != request_id:
+                continue
+            if frame.get("error"):
+                raise WorkerReplyError(str(frame["error"]))
+            delta = frame.get("delta")
+            if delta:
+                streamed = True
+                yield delta
+            if frame.get("done"):
+                # worker 不分片时只在结束帧里给出完整结果
+                if not streamed and frame.get("result") is not None:
+                    reply = extract_reply(frame["result"])
+                    if reply:
+                        yield reply
+                self.requests_served += 1
+                return
+
+    async def close(self) -> None:
+        process, self.process = self.process, None
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.stdin.close()
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except Exception:
+            pass
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+class WorkerPool:
+    """按 session id 复用的 worker 池，带并发上限和有界排队"""
+
+    def __init__(self, cmd: str, max_workers: int = 4, max_queue: int = 16, read_timeout: float = 130):
+        self.cmd = shlex.split(cmd)
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.read_timeout = read_timeout
+        self._workers: Dict[str, OpenClawWorker] = {}
+        self._cond = asyncio.Condition()
+        self._waiting = 0
+        self._stats = {"spawned": 0, "reused": 0, "evicted": 0, "crashed": 0, "rejected": 0}
+
+    def _evict_idle(self) -> Optional[OpenClawWorker]:
+        idle = [w for w in self._workers.values() if not w.busy]
+        if not idle:
+            return None
+        victim = min(idle, key=lambda w: w.last_used)
+        del self._workers[victim.session_id]
+        self._stats["evicted"] += 1
+        return victim
+
+    async def _checkout(self, session_id: str) -> OpenClawWorker:
+        to_close = []
+        async with self._cond:
+            queued = False
+            try:
+                while True:
+                    worker = self._workers.get(session_id)
+                    if worker is not None and not worker.alive and not worker.busy:
+                        del self._workers[session_id]
+                        worker = None
+                    if worker is not None:
+                        if not worker.busy:
+                            worker.busy = True
+                            self._stats["reused"] += 1
+                            break
+                    elif len(self._workers) < self.max_workers:
+                        worker = None
+                        break
+                    else:
+                        victim = self._evict_idle()
+                        if victim is not None:
+                            to_close.append(victim)
+                            worker = None
+                            break
+                    if not queued:
+                        if self._waiting >= self.max_queue:
+                            self._stats["rejected"] += 1
+                            raise PoolBusy("OpenClaw worker 全忙且排队已满")
+                        queued = True
+                        self._waiting += 1
+                    await self._cond.wait()
+            finally:
+                if queued:
+                    self._waiting -= 1
+            if worker is None:
+                # 先占位再在锁外启动进程
+                worker = OpenClawWorker(self.cmd, session_id, self.read_timeout)
+                worker.busy = True
+                self._workers[session_id] = worker
+        for victim in to_close:
+            await victim.close()
+        if worker.process is None:
+            try:
+                await worker.start()
+            except BaseException:
+                await asyncio.shield(self._checkin(worker, healthy=False))
+                raise
+            self._stats["spawned"] += 1
+        return worker
+
+    async def _checkin(self, worker: OpenClawWorker, healthy: bool) -> None:
+        if not healthy:
+            await worker.close()
+        async with self._cond:
+            worker.busy = False
+            worker.last_used = time.monotonic()
+            if not healthy and self._workers.get(worker.session_id) is worker:
+                del self._workers[worker.session_id]
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def acquire(self, session_id: str) -> AsyncIterator[OpenClawWorker]:
+        """借出该 session 的 worker；块内异常或被取消时结束该进程 (回复可能没读完)"""
+        worker = await self._checkout(session_id)
+        healthy = False
+        try:
+            yield worker
+            healthy = worker.alive
+        except WorkerReplyError:
+            healthy = worker.alive
+            raise
+        except WorkerError:
+            self._stats["crashed"] += 1
+            raise
+        finally:
+            await asyncio.shield(self._checkin(worker, healthy))
+
+    async def stream(self, session_id: str, message: str) -> AsyncIterator[str]:
+        async with self.acquire(session_id) as worker:
+            async for delta in worker.ask(message):
+                yield delta
+
+    async def close(self) -> None:
+        async with self._cond:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            self._cond.notify_all()
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "workers": len(self._workers),
+            "busy": sum(1 for w in self._workers.values() if w.busy),
+            "waiting": self._waiting,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
@@ -8,9 +8,16 @@ Usage:
     uvicorn main:app --host 0.0.0.0 --port 12394
 """
 
+import asyncio
+import hashlib
+import json
+import mmap
 import os
+import struct
+import threading
 import time
-from collections import defaultdict
+import unicodedata
+from collections import OrderedDict, defaultdict
 
 import httpx
 from fastapi import FastAPI, HTTPException, Request
@@ -41,6 +48,12 @@ RATE_LIMIT = int(os.getenv("TTS_RATE_LIMIT", "30"))
 # Max text length per request
 MAX_TEXT_LENGTH = int(os.getenv("TTS_MAX_TEXT_LENGTH", "500"))
 
+# Result cache: in-memory LRU per worker, disk tier shared by all workers
+CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MEMORY_BYTES = int(float(os.getenv("TTS_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+CACHE_DISK_BYTES = int(float(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024)
+CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/tmp/ling-tts-cache")
+
 # ── App ────────────────────────────────────────────────────────
 
 app = FastAPI(title="Ling TTS Proxy", docs_url=None, redoc_url=None)
@@ -70,6 +83,139 @@ def _check_rate_limit(ip: str) -> bool:
     return True
 
 
+# ── TTS result cache ───────────────────────────────────────────
+#
+# Content-addressed: sha256 of (reference_id, format, latency, normalized
+# text). Memory hits are served without touching disk; disk entries are
+# read through mmap and promoted back into memory.
+
+_HEADER_LEN = struct.Struct(">I")
+
+
+def _cache_key(text: str, reference_id: str, fmt: str, latency: str) -> str:
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    raw = json.dumps(
+        [reference_id, fmt, latency, normalized], ensure_ascii=False
+    ).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, max_memory_bytes: int, max_disk_bytes: int, cache_dir: str):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = cache_dir
+        self._memory: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bytes_saved": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.tts")
+
+    def _remember(self, key: str, content: bytes, content_type: str) -> None:
+        if len(content) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old[0])
+            self._memory[key] = (content, content_type)
+            self._memory_bytes += len(content)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+        if hit is not None:
+            self.stats["memory_hits"] += 1
+            self.stats["bytes_saved"] += len(hit[0])
+            return hit
+
+        if self.max_disk_bytes > 0:
+            try:
+                with open(self._path(key), "rb") as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                ) as mm:
+                    (header_len,) = _HEADER_LEN.unpack_from(mm, 0)
+                    start = _HEADER_LEN.size
+                    content_type = mm[start : start + header_len].decode("utf-8")
+                    content = mm[start + header_len :]
+                os.utime(self._path(key))  # LRU order for disk eviction
+            except (OSError, ValueError, struct.error):
+                pass
+            else:
+                self.stats["disk_hits"] += 1
+                self.stats["bytes_saved"] += len(content)
+                self._remember(key, content, content_type)
+                return content, content_type
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, content: bytes, content_type: str) -> None:
+        self._remember(key, content, content_type)
+        if self.max_disk_bytes <= 0:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        header = content_type.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER_LEN.pack(len(header)))
+                f.write(header)
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        # Scanning the directory is not free; trim every few writes instead
+        self._disk_writes += 1
+        if self._disk_writes % 32 == 1:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        # Workers share the directory, so the filesystem is the index
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tts"):
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def snapshot(self) -> dict:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
+
+
+_tts_cache = (
+    TTSCache(CACHE_MEMORY_BYTES, CACHE_DISK_BYTES, CACHE_DIR) if CACHE_ENABLED else None
+)
+
+
 # ── Request model ──────────────────────────────────────────────
 
 
@@ -88,6 +234,11 @@ async def health():
     return {"status": "ok", "service": "ling-tts-proxy"}
 
 
+@app.get("/stats")
+async def stats():
+    return {"cache": _tts_cache.snapshot() if _tts_cache else None}
+
+
 @app.post("/api/tts/generate")
 async def generate_tts(req: TTSRequest, request: Request):
     if not FISH_TTS_API_KEY:
@@ -105,6 +256,19 @@ async def generate_tts(req: TTSRequest, request: Request):
     if len(text) > MAX_TEXT_LENGTH:
         text = text[:MAX_TEXT_LENGTH]
 
+    reference_id = req.reference_id or FISH_TTS_REFERENCE_ID
+    cache_key = None
+    if _tts_cache is not None:
+        cache_key = _cache_key(text, reference_id, req.format, req.latency)
+        cached = await asyncio.to_thread(_tts_cache.get, cache_key)
+        if cached is not None:
+            content, content_type = cached
+            return Response(
+                content=content,
+                media_type=content_type,
+                headers={"Cache-Control": "no-cache", "X-TTS-Cache": "HIT"},
+            )
+
     try:
         async with httpx.AsyncClient(timeout=30.0) as client:
             resp = await client.post(
@@ -115,7 +279,7 @@ async def generate_tts(req: TTSRequest, request: Request):
                 },
                 json={
                     "text": text,
-                    "reference_id": req.reference_id or FISH_TTS_REFERENCE_ID,
+                    "reference_id": reference_id,
                     "format": req.format,
                     "latency": req.latency,
                 },
@@ -125,10 +289,14 @@ async def generate_tts(req: TTSRequest, request: Request):
                 raise HTTPException(502, "TTS service unavailable")
 
             content_type = resp.headers.get("content-type", "audio/mpeg")
+            if cache_key is not None and resp.content:
+                await asyncio.to_thread(
+                    _tts_cache.put, cache_key, resp.content, content_type
+                )
             return Response(
                 content=resp.content,
                 media_type=content_type,
-                headers={"Cache-Control": "no-cache"},
+                headers={"Cache-Control": "no-cache", "X-TTS-Cache": "MISS"},
             )
 
     except httpx.TimeoutException: